@@ -0,0 +1,134 @@
+"""
+Eventos de escritura de tareas.
+
+TaskService publica un TaskEvent tras cada escritura confirmada. Los
+suscriptores del mismo proceso lo reciben de forma síncrona; con
+TASK_EVENTS_BACKEND=redis además se retransmiten por un canal pub/sub para
+consumidores en otros procesos (p. ej. el planificador de recordatorios).
+Un suscriptor que falla nunca hace fallar la escritura.
+"""
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+from app.core import after_commit
+
+logger = logging.getLogger(__name__)
+
+SAVED = "saved"
+DELETED = "deleted"
+
+# Campos de TaskEvent que viajan en JSON como ISO 8601
+DATETIME_FIELDS = ("due_at", "reminder_sent_at")
+
+
+class TaskEvent(NamedTuple):
+    kind: str
+    task_id: str
+    user_id: Optional[str] = None
+    status: Optional[str] = None
+    priority: Optional[str] = None
+    due_at: Optional[datetime] = None
+    occurred_at: Optional[float] = None  # time.time() de la escritura; para medir el retraso de los consumidores
+    reminder_sent_at: Optional[datetime] = None  # Recordatorio ya enviado para el due_at actual
+
+    @classmethod
+    def saved(cls, task) -> "TaskEvent":
+        return cls(SAVED, str(task.id), str(task.user_id), _value(task.status), _value(task.priority), task.due_at,
+                   time.time(), task.reminder_sent_at)
+
+    @classmethod
+    def deleted(cls, task_id) -> "TaskEvent":
+        return cls(DELETED, str(task_id), occurred_at=time.time())
+
+    def to_json(self) -> str:
+        data = self._asdict()
+        for name in DATETIME_FIELDS:
+            data[name] = data[name].isoformat() if data[name] else None
+        return json.dumps(data)
+
+    @classmethod
+    def from_json(cls, raw) -> "TaskEvent":
+        data = json.loads(raw)
+        for name in DATETIME_FIELDS:
+            data[name] = datetime.fromisoformat(data[name]) if data.get(name) else None
+        return cls(**data)
+
+
+def _value(enum_value):
+    return getattr(enum_value, "value", enum_value)
+
+
+_subscribers: List[Callable[[TaskEvent], None]] = []
+
+
+def subscribe(handler: Callable[[TaskEvent], None]) -> None:
+    if handler not in _subscribers:
+        _subscribers.append(handler)
+
+
+def unsubscribe(handler: Callable[[TaskEvent], None]) -> None:
+    if handler in _subscribers:
+        _subscribers.remove(handler)
+
+
+def publish(event: TaskEvent) -> None:
+    # Dentro de una transacción externa, los suscriptores lo reciben tras su commit
+    if after_commit.defer(publish, event):
+        return
+    for handler in list(_subscribers):
+        try:
+            handler(event)
+        except Exception as e:
+            logger.error(f"Error en suscriptor de eventos de tareas {handler!r}: {str(e)}")
+
+
+class RedisEventPublisher:
+    """Suscriptor que retransmite los eventos a un canal de Redis."""
+
+    def __init__(self, url: str, channel: str):
+        import redis
+        self.channel = channel
+        self._client = redis.Redis.from_url(url)
+
+    def __call__(self, event: TaskEvent) -> None:
+        self._client.publish(self.channel, event.to_json())
+
+
+def listen_redis(url: str, channel: str, handler: Callable[[TaskEvent], None], stop: threading.Event) -> threading.Thread:
+    """Entrega a `handler`, en un hilo, los eventos publicados por otros procesos."""
+    import redis
+    pubsub = redis.Redis.from_url(url).pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(channel)
+
+    def run():
+        while not stop.is_set():
+            message = pubsub.get_message(timeout=1.0)
+            if message is None:
+                continue
+            try:
+                handler(TaskEvent.from_json(message["data"]))
+            except Exception as e:
+                logger.error(f"Evento de tarea inválido en {channel}: {str(e)}")
+        pubsub.close()
+
+    thread = threading.Thread(target=run, name="task-events-listener", daemon=True)
+    thread.start()
+    return thread
+
+
+_configured = False
+
+
+def configure_publishers() -> None:
+    """Registra la retransmisión a Redis si está configurada. Idempotente."""
+    global _configured
+    if _configured:
+        return
+    _configured = True
+    from app.core.config import settings
+    if settings.TASK_EVENTS_BACKEND == "redis":
+        subscribe(RedisEventPublisher(settings.TASK_EVENTS_REDIS_URL or settings.CELERY_BROKER_URL,
+                                      settings.TASK_EVENTS_CHANNEL))
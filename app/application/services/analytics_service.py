@@ -0,0 +1,213 @@
+"""
+Agregaciones de analítica de tareas por hora y por día.
+
+El job roll_up_task_analytics (celery beat) lee solo las tareas creadas o
+completadas desde su último watermark y suma los deltas a `task_rollups` y
+`task_completion_time_rollups`. GET /tasks/analytics responde desde esas
+tablas, sin leer `tasks`.
+
+El primer run fija el watermark al inicio del día UTC en curso; la historia
+anterior se carga con el backfill, que recalcula días completos desde
+`tasks` y `tasks_archive`:
+
+    python -m app.application.services.analytics_service --backfill --since 2024-01-01
+"""
+import argparse
+import bisect
+import logging
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Tuple
+from app.infrastructure.repositories.analytics_repository import TaskAnalyticsRepository
+from app.domain.models.task_rollup import COMPLETION_TIME_BINS
+from app.domain.models.enums import RollupGranularity, TaskPriority
+from app.domain.schemas.analytics import (
+    GetTaskAnalyticsQuery, TaskAnalytics, TaskActivityBucket, CompletionTimeStats
+)
+from app.core.metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+WATERMARK = "task_rollups"
+
+ROLLUP_ROWS = Counter("task_rollup_source_rows_total", "Task changes folded into the analytics rollups", ["kind"])
+ROLLUP_DURATION = Histogram("task_rollup_duration_seconds", "Duration of one incremental rollup run")
+ROLLUP_WATERMARK_AGE = Gauge(
+    "task_rollup_watermark_age_seconds", "Age of the analytics rollup watermark after the last run",
+)
+
+
+def bucket_start(value: datetime, granularity: RollupGranularity) -> datetime:
+    if granularity == RollupGranularity.hour:
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def completion_bin(seconds: float) -> int:
+    return bisect.bisect_left(COMPLETION_TIME_BINS, seconds)
+
+
+def aggregate(created_rows, completed_rows) -> Tuple[Dict, Dict]:
+    """Deltas por franja (hora y día) a partir de las filas de origen."""
+    activity = defaultdict(lambda: [0, 0, 0.0])
+    completion = defaultdict(int)
+    for created_at, user_id, priority in created_rows:
+        for granularity in RollupGranularity:
+            activity[(granularity, bucket_start(created_at, granularity), user_id, priority)][0] += 1
+    for created_at, completed_at, user_id, priority in completed_rows:
+        seconds = max(0.0, (completed_at - created_at).total_seconds())
+        bin_index = completion_bin(seconds)
+        for granularity in RollupGranularity:
+            bucket = bucket_start(completed_at, granularity)
+            delta = activity[(granularity, bucket, user_id, priority)]
+            delta[1] += 1
+            delta[2] += seconds
+            completion[(granularity, bucket, priority, bin_index)] += 1
+    return dict(activity), dict(completion)
+
+
+def estimate_median(bins: Dict[int, int]) -> Optional[float]:
+    """
+    Mediana aproximada a partir del histograma, interpolando dentro del
+    intervalo que la contiene. En el último intervalo (sin límite superior)
+    devuelve su límite inferior.
+    """
+    total = sum(bins.values())
+    if not total:
+        return None
+    target = total / 2
+    seen = 0
+    for bin_index in sorted(bins):
+        count = bins[bin_index]
+        if seen + count >= target:
+            lower = COMPLETION_TIME_BINS[bin_index - 1] if bin_index > 0 else 0
+            if bin_index >= len(COMPLETION_TIME_BINS):
+                return float(lower)
+            upper = COMPLETION_TIME_BINS[bin_index]
+            return lower + (upper - lower) * (target - seen) / count
+        seen += count
+    return None
+
+
+class TaskAnalyticsService:
+    def __init__(self, repository: TaskAnalyticsRepository):
+        self.repository = repository
+
+    def _watermark(self, now: datetime) -> datetime:
+        watermark = self.repository.get_watermark(WATERMARK)
+        if watermark is None:
+            watermark = self.repository.init_watermark(WATERMARK, bucket_start(now, RollupGranularity.day))
+        return watermark
+
+    def roll_up(self, lag: timedelta, max_window: timedelta) -> dict:
+        """
+        Procesa las tareas creadas o completadas en (watermark, ahora - lag],
+        como mucho `max_window` por ejecución. `lag` deja margen a las
+        transacciones en curso cuyo created_at/completed_at es anterior a su commit.
+        """
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        previous = self._watermark(now)
+        until = min(now - lag, previous + max_window)
+        if until <= previous:
+            return {"watermark": previous.isoformat(), "created": 0, "completed": 0}
+
+        created = self.repository.created_between(previous, until)
+        completed = self.repository.completed_between(previous, until)
+        activity, completion = aggregate(created, completed)
+        if not self.repository.apply_increment(WATERMARK, previous, until, activity, completion):
+            logger.info("Agregación de analítica omitida: otra ejecución ya avanzó el watermark")
+            return {"watermark": previous.isoformat(), "created": 0, "completed": 0, "skipped": True}
+
+        ROLLUP_ROWS.labels("created").inc(len(created))
+        ROLLUP_ROWS.labels("completed").inc(len(completed))
+        ROLLUP_DURATION.observe(time.perf_counter() - started)
+        ROLLUP_WATERMARK_AGE.set((datetime.utcnow() - until).total_seconds())
+        logger.info(f"Analítica agregada hasta {until.isoformat()}: {len(created)} creadas, {len(completed)} completadas")
+        return {"watermark": until.isoformat(), "created": len(created), "completed": len(completed)}
+
+    def backfill(self, since: date) -> dict:
+        """
+        Recalcula día a día las agregaciones de [since, día del watermark)
+        desde `tasks` y `tasks_archive`. Cada día es una transacción que
+        reemplaza sus filas, así que se puede repetir. Los días desde el del
+        watermark son del job incremental y no se tocan.
+        """
+        started = time.perf_counter()
+        end = bucket_start(self._watermark(datetime.utcnow()), RollupGranularity.day)
+        day = datetime.combine(since, datetime.min.time())
+        days = 0
+        rows = 0
+        while day < end:
+            next_day = day + timedelta(days=1)
+            created = self.repository.created_between(day, next_day, include_archive=True, half_open=True)
+            completed = self.repository.completed_between(day, next_day, include_archive=True, half_open=True)
+            activity, completion = aggregate(created, completed)
+            self.repository.replace_range(day, next_day, activity, completion)
+            rows += len(created) + len(completed)
+            days += 1
+            day = next_day
+        elapsed = time.perf_counter() - started
+        logger.info(f"Backfill de analítica: {days} días, {rows} filas de origen en {elapsed:.1f} s")
+        return {"days": days, "source_rows": rows, "until": end.isoformat(), "seconds": round(elapsed, 3)}
+
+    def get_analytics(self, query: GetTaskAnalyticsQuery) -> TaskAnalytics:
+        start = bucket_start(query.start, query.granularity)
+        activity = [
+            TaskActivityBucket(bucket_start=row.bucket_start, user_id=row.user_id,
+                               created=row.created, completed=row.completed)
+            for row in self.repository.activity(query.granularity, start, query.end, query.user_id)
+        ]
+        totals = {priority: (count, seconds) for priority, count, seconds
+                  in self.repository.completion_seconds(query.granularity, start, query.end, query.user_id)}
+        bins = defaultdict(dict)
+        if query.user_id is None:
+            # El histograma no distingue usuarios: la mediana solo es global
+            for priority, bin_index, count in self.repository.completion_histogram(query.granularity, start, query.end):
+                bins[priority][bin_index] = count
+        completion_time = []
+        for priority in TaskPriority:
+            count, seconds = totals.get(priority, (0, 0.0))
+            completion_time.append(CompletionTimeStats(
+                priority=priority,
+                completed=count or 0,
+                median_seconds=estimate_median(bins[priority]) if priority in bins else None,
+                mean_seconds=seconds / count if count else None,
+            ))
+        return TaskAnalytics(
+            granularity=query.granularity, start=start, end=query.end,
+            watermark=self.repository.get_watermark(WATERMARK),
+            activity=activity, completion_time=completion_time,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agregaciones de analítica de tareas")
+    parser.add_argument("--backfill", action="store_true", help="Recalcular la historia anterior al watermark")
+    parser.add_argument("--since", type=date.fromisoformat, help="Primer día del backfill (YYYY-MM-DD)")
+    parser.add_argument("--roll-up", action="store_true", help="Ejecutar una agregación incremental ahora")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from app.core.config import settings
+    from app.infrastructure.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        service = TaskAnalyticsService(TaskAnalyticsRepository(db))
+        if args.backfill:
+            if args.since is None:
+                parser.error("--backfill requiere --since")
+            print(service.backfill(args.since))
+        if args.roll_up:
+            print(service.roll_up(timedelta(seconds=settings.ANALYTICS_ROLLUP_LAG_SECONDS),
+                                  timedelta(hours=settings.ANALYTICS_ROLLUP_MAX_WINDOW_HOURS)))
+        if not (args.backfill or args.roll_up):
+            parser.print_help()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Ejecución de lotes de comandos de tareas (POST /commands/batch).
+
+Todos los comandos del lote se ejecutan en orden a través de TaskService
+sobre una misma conexión y una única transacción (ver SingleTransaction):
+los commits de los repositorios se convierten en SAVEPOINTs y solo hay un
+COMMIT real al final. Las notificaciones de Celery y los TaskEvent se
+acumulan durante el lote y se emiten tras ese commit; si el lote (o un
+comando, en modo per_item) se deshace, no se emiten.
+
+- atomic: el primer comando que falla deshace todo el lote; los siguientes
+  no se ejecutan y se devuelven con 424.
+- per_item: cada comando va en su propio SAVEPOINT; los que fallan se
+  deshacen y el resto se confirma.
+
+Con sharding, el lote se ejecuta en el shard del usuario: una transacción no
+puede abarcar varios shards, así que los comandos sobre tareas de otro
+shard fallan con 400.
+"""
+import logging
+import time
+from typing import Callable, Optional, Tuple
+from uuid import UUID
+from app.application.services.task_service import TaskService
+from app.infrastructure.repositories.task_repository import TaskRepository
+from app.infrastructure.database import SingleTransaction
+from app.infrastructure.sharding import get_shard_registry, sharding_enabled
+from app.domain.schemas.task import (
+    Task, TaskUpdate,
+    CreateTaskCommand, UpdateTaskCommand, DeleteTaskCommand,
+    AssignTaskCommand, CompleteTaskCommand
+)
+from app.domain.schemas.command import (
+    BatchCreateTask, BatchUpdateTask, BatchAssignTask, BatchCompleteTask, BatchDeleteTask,
+    CommandBatchRequest, CommandBatchResponse, CommandResult
+)
+from app.domain.models.enums import BatchMode
+from app.domain.exceptions import VersionConflictError
+from app.core import after_commit
+from app.core.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+BATCH_COMMANDS = Counter("command_batch_commands_total", "Commands executed in batches by type and status", ["type", "status"])
+BATCH_SIZE = Histogram(
+    "command_batch_size", "Commands per batch request",
+    buckets=(1, 2, 5, 10, 20, 50, 100),
+)
+BATCH_DURATION = Histogram("command_batch_duration_seconds", "Duration of one command batch transaction", ["mode"])
+
+# Comandos posteriores a un fallo en modo atomic: no se ejecutaron
+NOT_EXECUTED = 424
+
+
+class CommandFailed(Exception):
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+
+
+class CommandBatchService:
+    def __init__(self, transaction_factory: Callable[..., SingleTransaction] = SingleTransaction):
+        self.transaction_factory = transaction_factory
+
+    def handle_batch(self, request: CommandBatchRequest, user_id: UUID, is_admin: bool) -> CommandBatchResponse:
+        started = time.perf_counter()
+        BATCH_SIZE.observe(len(request.commands))
+        results = []
+        shard_map, shard, bind = None, None, None
+        if sharding_enabled():
+            registry = get_shard_registry()
+            shard_map = registry.shard_map
+            shard = shard_map.shard_for(user_id)
+            bind = registry.engines[shard]
+        with self.transaction_factory(bind) as tx, after_commit.collect() as side_effects:
+            service = TaskService(TaskRepository(tx.db))
+            failed = False
+            for index, command in enumerate(request.commands):
+                if failed:
+                    results.append(CommandResult(index=index, type=command.type, status=NOT_EXECUTED,
+                                                 error="No ejecutado: un comando anterior del lote falló"))
+                    continue
+                savepoint = tx.savepoint() if request.mode == BatchMode.per_item else None
+                position = after_commit.mark()
+                try:
+                    task_id = getattr(command, "task_id", None)
+                    if shard_map is not None and task_id is not None and shard_map.shard_for(task_id) != shard:
+                        raise CommandFailed(400, "La tarea está en otro shard: no puede ir en este lote")
+                    status, task = self._execute(service, command, user_id, is_admin)
+                    results.append(CommandResult(index=index, type=command.type, status=status, task=task))
+                except CommandFailed as e:
+                    results.append(CommandResult(index=index, type=command.type, status=e.status, error=str(e)))
+                    # Deshacer lo que el comando llegara a escribir y sus efectos pendientes
+                    after_commit.discard(position)
+                    if savepoint is not None:
+                        tx.rollback_to(savepoint)
+                    else:
+                        failed = True
+                    continue
+                if savepoint is not None:
+                    tx.release(savepoint)
+
+            committed = not failed and any(result.status < 400 for result in results)
+            if committed:
+                tx.commit()
+            else:
+                tx.rollback()
+                side_effects.clear()
+
+        # Fuera del ámbito del lote: publicar y encolar ya no se difieren
+        after_commit.run(side_effects)
+        for result in results:
+            BATCH_COMMANDS.labels(result.type, str(result.status)).inc()
+        BATCH_DURATION.labels(request.mode.value).observe(time.perf_counter() - started)
+        logger.info(f"Lote de {len(results)} comandos ({request.mode.value}) de {user_id}: "
+                    f"{'confirmado' if committed else 'deshecho'}")
+        return CommandBatchResponse(mode=request.mode, committed=committed, results=results)
+
+    def _execute(self, service: TaskService, command, user_id: UUID, is_admin: bool) -> Tuple[int, Optional[Task]]:
+        """Ejecuta un comando con los códigos de estado de su endpoint individual."""
+        try:
+            if isinstance(command, BatchCreateTask):
+                try:
+                    task = service.handle_create_task(CreateTaskCommand(
+                        **command.model_dump(include=set(CreateTaskCommand.model_fields) - {"user_id"}),
+                        user_id=user_id,
+                        needs_background_processing=command.processing_params is not None,
+                    ))
+                except Exception as e:
+                    # Como POST /tasks
+                    raise CommandFailed(400, str(e))
+            elif isinstance(command, BatchUpdateTask):
+                task = service.handle_update_task(UpdateTaskCommand(
+                    # Solo los campos enviados, como en PUT /tasks/{id}
+                    **command.model_dump(include=set(TaskUpdate.model_fields), exclude_unset=True),
+                    task_id=command.task_id, user_id=user_id, is_admin=is_admin,
+                    expected_version=command.expected_version,
+                ))
+            elif isinstance(command, BatchAssignTask):
+                task = service.handle_assign_task(AssignTaskCommand(
+                    task_id=command.task_id, assigner_id=user_id, assignee_id=command.assignee_id, is_admin=is_admin,
+                ))
+            elif isinstance(command, BatchCompleteTask):
+                task = service.handle_complete_task(CompleteTaskCommand(
+                    task_id=command.task_id, user_id=user_id, is_admin=is_admin,
+                ))
+            elif isinstance(command, BatchDeleteTask):
+                if not service.handle_delete_task(DeleteTaskCommand(
+                    task_id=command.task_id, user_id=user_id, is_admin=is_admin,
+                )):
+                    raise CommandFailed(404, "Tarea no encontrada")
+                return 204, None
+            else:
+                raise CommandFailed(400, f"Comando no soportado: {command.type}")
+        except CommandFailed:
+            raise
+        except VersionConflictError as e:
+            raise CommandFailed(409, f"{e} (versión actual: {e.current_version})")
+        except ValueError as e:
+            raise CommandFailed(403, str(e))
+        except Exception as e:
+            logger.error(f"Error en comando {command.type} del lote: {str(e)}")
+            raise CommandFailed(500, str(e))
+
+        if not task:
+            raise CommandFailed(404, "Tarea no encontrada")
+        # Serializar ahora: comandos posteriores del lote pueden modificar la misma tarea
+        return 200, Task.model_validate(task)
@@ -0,0 +1,265 @@
+"""
+Planificador de recordatorios de fecha límite.
+
+Mantiene en un min-heap solo las tareas cuyo recordatorio (due_at menos
+REMINDER_LEAD_SECONDS) cae dentro de la ventana siguiente
+(REMINDER_WINDOW_SECONDS). El heap se alimenta de:
+
+- una consulta por rango sobre ix_tasks_due_at al arrancar (incluidos los
+  recordatorios atrasados de REMINDER_GRACE_SECONDS) y cada vez que la
+  ventana avanza, solo para el tramo nuevo;
+- los TaskEvent de TaskService, para altas, cambios y borrados dentro de la
+  ventana actual.
+
+Las entradas obsoletas del heap se descartan de forma perezosa al salir:
+`_entries` guarda la planificación vigente de cada tarea.
+
+Uso (un único proceso por despliegue):
+    python -m app.application.services.reminder_scheduler
+"""
+import heapq
+import itertools
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from app.application.events import TaskEvent, DELETED
+from app.core.metrics import Counter, Gauge, Histogram
+from app.domain.models.enums import TaskStatus
+
+logger = logging.getLogger(__name__)
+
+REMINDERS_SENT = Counter("task_reminders_sent_total", "Due-date reminders sent")
+REMINDER_HEAP_SIZE = Gauge("task_reminder_heap_size", "Reminders scheduled in the in-memory window")
+REMINDER_LAG = Histogram(
+    "task_reminder_lag_seconds", "Delay between the scheduled reminder time and sending it",
+    buckets=(0.1, 0.5, 1.0, 5.0, 30.0, 60.0, 300.0, 3600.0),
+)
+
+_OPEN_STATUSES = frozenset((TaskStatus.pending.value, TaskStatus.in_progress.value))
+
+
+class Reminder(NamedTuple):
+    remind_at: datetime
+    task_id: str
+    user_id: str
+    priority: Optional[str]
+
+
+class ReminderScheduler:
+    def __init__(self, session_factory: Callable, lead: timedelta, window: timedelta, grace: timedelta,
+                 clock: Callable[[], datetime] = datetime.utcnow):
+        self.session_factory = session_factory
+        self.lead = lead
+        self.window = window
+        self.grace = grace
+        self.clock = clock
+        self._heap: List[Tuple[datetime, int, str]] = []
+        self._entries: Dict[str, Reminder] = {}
+        self._sequence = itertools.count()
+        self._horizon: Optional[datetime] = None
+        # Eventos recibidos mientras se consulta el tramo nuevo de la ventana
+        self._refill_events: Optional[List[TaskEvent]] = None
+        # Recordatorios sacados del heap cuyo reminder_sent_at aún no está
+        # confirmado: los eventos de ese intervalo todavía no lo llevan
+        self._firing: Dict[str, datetime] = {}
+        self._condition = threading.Condition()
+
+    # Carga desde la base de datos
+    def _load(self, start: datetime, end: datetime) -> list:
+        from app.infrastructure.repositories.sharded_task_repository import open_task_repository
+        db = self.session_factory()
+        try:
+            with open_task_repository(db) as repository:
+                return repository.get_due_between(start + self.lead, end + self.lead)
+        finally:
+            db.close()
+
+    def _schedule_rows(self, rows: list) -> None:
+        for row in rows:
+            self._schedule(Reminder(row.due_at - self.lead, str(row.id), str(row.user_id),
+                                    getattr(row.priority, "value", row.priority)))
+
+    def rebuild(self) -> None:
+        """Reconstruye el heap (arranque): ventana siguiente más recordatorios atrasados."""
+        now = self.clock()
+        with self._condition:
+            self._heap.clear()
+            self._entries.clear()
+            self._horizon = now + self.window
+            rows = self._load(now - self.grace, self._horizon)
+            self._schedule_rows(rows)
+            self._condition.notify()
+        logger.info(f"Planificador de recordatorios reconstruido: {len(rows)} tareas hasta {self._horizon.isoformat()}")
+
+    def _advance_window(self, now: datetime) -> None:
+        """
+        Carga el tramo nuevo de la ventana: [horizonte anterior, now + window).
+        La consulta se hace sin el lock, porque on_event se llama desde los
+        hilos de las peticiones tras su commit. Los eventos que llegan
+        mientras tanto se vuelven a aplicar después de las filas cargadas,
+        que pueden ser anteriores a ellos.
+        """
+        new_horizon = now + self.window
+        with self._condition:
+            start = self._horizon
+            self._refill_events = []
+        try:
+            rows = self._load(start, new_horizon)
+        except BaseException:
+            with self._condition:
+                self._refill_events = None
+            raise
+        with self._condition:
+            self._schedule_rows(rows)
+            self._horizon = new_horizon
+            events, self._refill_events = self._refill_events, None
+            for event in events:
+                self._apply(event)
+            REMINDER_HEAP_SIZE.set(len(self._entries))
+            self._condition.notify()
+
+    # Planificación
+    def _schedule(self, reminder: Reminder) -> None:
+        if self._entries.get(reminder.task_id) == reminder:
+            return
+        self._entries[reminder.task_id] = reminder
+        heapq.heappush(self._heap, (reminder.remind_at, next(self._sequence), reminder.task_id))
+        REMINDER_HEAP_SIZE.set(len(self._entries))
+
+    def on_event(self, event: TaskEvent) -> None:
+        """Suscriptor de eventos de TaskService."""
+        with self._condition:
+            if self._horizon is None:
+                return
+            if self._refill_events is not None:
+                self._refill_events.append(event)
+            self._apply(event)
+            REMINDER_HEAP_SIZE.set(len(self._entries))
+
+    def _apply(self, event: TaskEvent) -> None:
+        # Con el recordatorio ya enviado (reminder_sent_at), guardar la tarea
+        # no lo repite; cambiar due_at lo anula en handle_update_task
+        if (event.kind == DELETED or event.status not in _OPEN_STATUSES or event.due_at is None
+                or event.reminder_sent_at is not None):
+            self._entries.pop(event.task_id, None)
+            return
+        remind_at = event.due_at - self.lead
+        if self._firing.get(event.task_id) == remind_at:
+            return
+        if remind_at < self._horizon:
+            self._schedule(Reminder(remind_at, event.task_id, event.user_id, event.priority))
+            self._condition.notify()
+        else:
+            # Fuera de la ventana: la recogerá la consulta de la ventana siguiente
+            self._entries.pop(event.task_id, None)
+
+    def pop_due(self, now: datetime) -> List[Reminder]:
+        due = []
+        with self._condition:
+            while self._heap and self._heap[0][0] <= now:
+                remind_at, _, task_id = heapq.heappop(self._heap)
+                reminder = self._entries.get(task_id)
+                # Entrada obsoleta: la tarea se replanificó, completó o borró
+                if reminder is None or reminder.remind_at != remind_at:
+                    continue
+                del self._entries[task_id]
+                self._firing[task_id] = remind_at
+                due.append(reminder)
+            REMINDER_HEAP_SIZE.set(len(self._entries))
+        return due
+
+    def fire(self, reminders: List[Reminder]) -> None:
+        if not reminders:
+            return
+        from uuid import UUID
+        from app.infrastructure.celery.dispatch import enqueue
+        from app.infrastructure.repositories.sharded_task_repository import open_task_repository
+        now = self.clock()
+        try:
+            for reminder in reminders:
+                enqueue("send_task_notification", reminder.user_id, reminder.task_id, "due_reminder",
+                        priority=reminder.priority)
+                REMINDER_LAG.observe(max(0.0, (now - reminder.remind_at).total_seconds()))
+            db = self.session_factory()
+            try:
+                with open_task_repository(db) as repository:
+                    repository.mark_reminders_sent([UUID(reminder.task_id) for reminder in reminders])
+            finally:
+                db.close()
+        finally:
+            with self._condition:
+                for reminder in reminders:
+                    if self._firing.get(reminder.task_id) == reminder.remind_at:
+                        del self._firing[reminder.task_id]
+        REMINDERS_SENT.inc(len(reminders))
+        logger.info(f"Enviados {len(reminders)} recordatorios de fecha límite")
+
+    def run(self, stop: threading.Event) -> None:
+        self.rebuild()
+        while not stop.is_set():
+            now = self.clock()
+            if now + self.window / 2 >= self._horizon:
+                self._advance_window(now)
+            try:
+                self.fire(self.pop_due(now))
+            except Exception as e:
+                logger.error(f"Error enviando recordatorios: {str(e)}")
+            with self._condition:
+                # Dormir hasta el siguiente recordatorio, el avance de ventana o un evento nuevo
+                next_refill = self._horizon - self.window / 2
+                wake_at = min(self._heap[0][0], next_refill) if self._heap else next_refill
+                timeout = max(0.0, (wake_at - self.clock()).total_seconds())
+                self._condition.wait(timeout=min(timeout, 60.0))
+
+    def stop_waiting(self) -> None:
+        with self._condition:
+            self._condition.notify()
+
+
+def create_scheduler() -> ReminderScheduler:
+    from app.core.config import settings
+    from app.infrastructure.database import SessionLocal
+    return ReminderScheduler(
+        SessionLocal,
+        lead=timedelta(seconds=settings.REMINDER_LEAD_SECONDS),
+        window=timedelta(seconds=settings.REMINDER_WINDOW_SECONDS),
+        grace=timedelta(seconds=settings.REMINDER_GRACE_SECONDS),
+    )
+
+
+def start_in_background(scheduler: ReminderScheduler, stop: threading.Event) -> threading.Thread:
+    """Arranca el planificador en un hilo y lo suscribe a los eventos del proceso."""
+    from app.application import events
+    events.subscribe(scheduler.on_event)
+    thread = threading.Thread(target=scheduler.run, args=(stop,), name="reminder-scheduler", daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    import signal
+    from app.core.config import settings
+    from app.core.logging_config import setup_logging
+    from app.application import events
+
+    setup_logging()
+    scheduler = create_scheduler()
+    stop = threading.Event()
+    if settings.TASK_EVENTS_BACKEND == "redis":
+        events.listen_redis(settings.TASK_EVENTS_REDIS_URL or settings.CELERY_BROKER_URL,
+                            settings.TASK_EVENTS_CHANNEL, scheduler.on_event, stop)
+    else:
+        logger.warning("TASK_EVENTS_BACKEND=memory: las escrituras de la API se verán al avanzar la ventana")
+
+    def shutdown(*_):
+        stop.set()
+        scheduler.stop_waiting()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    scheduler.run(stop)
+
+
+if __name__ == "__main__":
+    main()
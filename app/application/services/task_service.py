@@ -1,79 +1,128 @@
 from app.infrastructure.repositories.task_repository import TaskRepository
+from app.infrastructure.repositories.task_view_repository import TaskViewRepository
 from app.domain.schemas.task import (
     Task, TaskCreate, TaskUpdate, 
     CreateTaskCommand, UpdateTaskCommand, DeleteTaskCommand,
-    AssignTaskCommand, CompleteTaskCommand,
-    GetTaskQuery, GetTasksQuery
+    AssignTaskCommand, ClaimNextTaskCommand, CompleteTaskCommand,
+    GetTaskQuery, GetTasksQuery, BatchGetTasksQuery,
+    TaskWithUsers, TaskBatchGetResponse, expanded_task_schema
 )
-from app.infrastructure.celery.tasks import process_task, send_task_notification
+from app.domain.schemas.user import UserSummary
+from app.domain.exceptions import VersionConflictError
+from app.application.events import TaskEvent, publish
+from app.infrastructure.dataloader import DataLoader
+from app.infrastructure.celery.dispatch import enqueue
 from app.core.decorators import transactional
+from app.core.single_flight import SingleFlight
+from app.core.tracing import traced
+from app.core.metrics import Counter, Gauge, Histogram
+from datetime import datetime, timedelta
 from typing import List, Optional
 from uuid import UUID
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+TASKS_ARCHIVED = Counter("tasks_archived_total", "Completed tasks moved to the archive table")
+ARCHIVE_BATCH_SIZE = Histogram(
+    "task_archive_batch_size", "Tasks archived per batch",
+    buckets=(0, 10, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+ARCHIVE_BATCH_DURATION = Histogram(
+    "task_archive_batch_duration_seconds", "Duration of one archive batch transaction",
+)
+ARCHIVE_THROUGHPUT = Gauge(
+    "task_archive_throughput_per_second", "Tasks archived per second in the last archive run",
+)
+TASK_CLAIMS = Counter("task_claims_total", "Claim-next requests by result", ["result"])
+TASK_CLAIM_DURATION = Histogram(
+    "task_claim_duration_seconds", "Duration of the claim-next statement",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+# Lecturas por id agrupadas entre peticiones concurrentes (ver handle_get_task_coalesced)
+TASK_READS = SingleFlight("task_get")
+
 class TaskService:
-    def __init__(self, repository: TaskRepository):
+    def __init__(self, repository: TaskRepository, view_repository: Optional[TaskViewRepository] = None):
         self.repository = repository
+        # Con modelo de lectura, las consultas de tareas activas leen de task_view
+        self.view_repository = view_repository
 
     # Command Handlers
+    @traced()
     @transactional
     def handle_create_task(self, command: CreateTaskCommand) -> Task:
         task = self.repository.create(TaskCreate(
             title=command.title,
             description=command.description,
             priority=command.priority,
-            assigned_to_id=command.assigned_to_id
+            assigned_to_id=command.assigned_to_id,
+            due_at=command.due_at
         ), command.user_id)
         
         # Si la tarea requiere procesamiento en segundo plano
         if command.needs_background_processing:
-            celery_task = process_task.delay(str(task.id), command.processing_params)
-            self.repository.update_celery_task_id(task.id, celery_task.id)
+            celery_task = enqueue(
+                "process_task",
+                str(task.id),
+                command.processing_params.dict() if command.processing_params else None,
+                priority=task.priority
+            )
+            # UPDATE sin el ORM: la instancia de `task` no ve el nuevo id ni la versión
+            task = self.repository.update_celery_task_id(task.id, celery_task.id) or task
             
             # Enviar notificación de creación
-            send_task_notification.delay(
+            enqueue(
+                "send_task_notification",
                 str(command.user_id), 
                 str(task.id), 
-                "created"
+                "created",
+                priority=task.priority
             )
-            
+        
+        publish(TaskEvent.saved(task))
         return task
 
+    @traced()
     @transactional
     def handle_update_task(self, command: UpdateTaskCommand) -> Optional[Task]:
-        # Verificar si el usuario tiene permisos para actualizar la tarea
-        task = self.repository.get_by_id(command.task_id)
-        if not task:
-            logger.warning(f"Intentando actualizar tarea inexistente: {command.task_id}")
-            return None
-            
-        if task.user_id != command.user_id and not command.is_admin:
-            logger.warning(f"Usuario {command.user_id} no autorizado para actualizar tarea {command.task_id}")
-            raise ValueError("No tienes permisos para actualizar esta tarea")
+        # Solo los campos enviados por el cliente, para no sobrescribir el resto con None
+        values = command.dict(include=set(TaskUpdate.model_fields), exclude_unset=True)
+        if "due_at" in values:
+            # Nueva fecha límite: volver a recordar
+            values["reminder_sent_at"] = None
         
-        # Crear el objeto de actualización
-        task_update = TaskUpdate(
-            title=command.title,
-            description=command.description,
-            status=command.status,
-            priority=command.priority,
-            assigned_to_id=command.assigned_to_id
+        # Permisos, versión y escritura en una sola sentencia condicional
+        updated_task = self.repository.update_conditional(
+            command.task_id, values, command.user_id, command.is_admin, command.expected_version
         )
-        
-        updated_task = self.repository.update(command.task_id, task_update)
+        if not updated_task:
+            # Ninguna fila cumplió las condiciones: averiguar cuál falló (solo en este camino)
+            state = self.repository.get_write_state(command.task_id)
+            if state is None:
+                logger.warning(f"Intentando actualizar tarea inexistente: {command.task_id}")
+                return None
+            if state.user_id != command.user_id and not command.is_admin:
+                logger.warning(f"Usuario {command.user_id} no autorizado para actualizar tarea {command.task_id}")
+                raise ValueError("No tienes permisos para actualizar esta tarea")
+            logger.info(f"Conflicto de versión al actualizar tarea {command.task_id}: esperada {command.expected_version}, actual {state.version}")
+            raise VersionConflictError("La tarea ha cambiado desde que se leyó", state.version)
         
         # Enviar notificación de actualización
-        if updated_task:
-            send_task_notification.delay(
-                str(command.user_id), 
-                str(updated_task.id), 
-                "updated"
-            )
-            
+        enqueue(
+            "send_task_notification",
+            str(command.user_id), 
+            str(updated_task.id), 
+            "updated",
+            priority=updated_task.priority
+        )
+        
+        publish(TaskEvent.saved(updated_task))
         return updated_task
 
+    @traced()
     @transactional
     def handle_delete_task(self, command: DeleteTaskCommand) -> bool:
         # Verificar si el usuario tiene permisos para eliminar la tarea
@@ -86,18 +135,24 @@ class TaskService:
             logger.warning(f"Usuario {command.user_id} no autorizado para eliminar tarea {command.task_id}")
             raise ValueError("No tienes permisos para eliminar esta tarea")
         
+        # Leer la prioridad antes de borrar: tras el commit la instancia queda expirada
+        priority = task.priority
         result = self.repository.delete(command.task_id)
         
         # Enviar notificación de eliminación
         if result:
-            send_task_notification.delay(
+            enqueue(
+                "send_task_notification",
                 str(command.user_id), 
                 str(command.task_id), 
-                "deleted"
+                "deleted",
+                priority=priority
             )
+            publish(TaskEvent.deleted(command.task_id))
             
         return result
 
+    @traced()
     @transactional
     def handle_assign_task(self, command: AssignTaskCommand) -> Optional[Task]:
         # Verificar si la tarea existe
@@ -117,14 +172,51 @@ class TaskService:
         
         # Enviar notificación de asignación
         if updated_task:
-            send_task_notification.delay(
+            enqueue(
+                "send_task_notification",
                 str(command.assignee_id), 
                 str(updated_task.id), 
-                "assigned"
+                "assigned",
+                priority=updated_task.priority
             )
+            publish(TaskEvent.saved(updated_task))
             
         return updated_task
 
+    @traced()
+    @transactional
+    def handle_claim_next_task(self, command: ClaimNextTaskCommand) -> Optional[Task]:
+        """
+        Asigna al usuario la siguiente tarea pendiente y la pasa a
+        in_progress de forma atómica. None si no queda ninguna disponible.
+        """
+        with TASK_CLAIM_DURATION.time():
+            task = self.repository.claim_next(
+                command.assignee_id,
+                # Sin ser admin solo se reclaman tareas propias o ya asignadas al usuario
+                visible_to=None if command.is_admin else command.assignee_id,
+                priority=command.priority,
+                created_by_id=command.created_by_id,
+            )
+        if not task:
+            TASK_CLAIMS.labels("empty").inc()
+            return None
+        TASK_CLAIMS.labels("claimed").inc()
+        
+        # Avisar al creador de que otro usuario ha tomado su tarea
+        if task.user_id != command.assignee_id:
+            enqueue(
+                "send_task_notification",
+                str(task.user_id),
+                str(task.id),
+                "claimed",
+                priority=task.priority
+            )
+        
+        publish(TaskEvent.saved(task))
+        return task
+
+    @traced()
     @transactional
     def handle_complete_task(self, command: CompleteTaskCommand) -> Optional[Task]:
         # Verificar si la tarea existe
@@ -143,25 +235,142 @@ class TaskService:
         
         # Enviar notificación de finalización
         if completed_task:
-            send_task_notification.delay(
+            enqueue(
+                "send_task_notification",
                 str(task.user_id), 
                 str(completed_task.id), 
-                "completed"
+                "completed",
+                priority=completed_task.priority
             )
+            publish(TaskEvent.saved(completed_task))
             
         return completed_task
 
     # Query Handlers
+    @traced()
     def handle_get_task(self, query: GetTaskQuery) -> Optional[Task]:
-        task = self.repository.get_by_id(query.task_id)
-        
-        # Verificar permisos para ver la tarea
-        if task and not query.is_admin:
-            if task.user_id != query.user_id and task.assigned_to_id != query.user_id:
-                logger.warning(f"Usuario {query.user_id} no autorizado para ver tarea {query.task_id}")
-                raise ValueError("No tienes permisos para ver esta tarea")
-                
+        task = self._find_task(query.task_id, query.expand)
+        self._check_can_view(task, query)
         return task
 
+    @traced()
+    async def handle_get_task_coalesced(self, query: GetTaskQuery) -> Optional[Task]:
+        """
+        Como handle_get_task, pero las peticiones concurrentes por la misma
+        tarea y expansión comparten una sola consulta. Devuelve un esquema de
+        pydantic (compartido entre peticiones) en lugar de la instancia del ORM;
+        los permisos se comprueban para cada llamador.
+        """
+        task = await TASK_READS.do((query.task_id, query.expand), self._snapshot_task, query.task_id, query.expand)
+        self._check_can_view(task, query)
+        return task
+
+    def _find_task(self, task_id: UUID, expand: frozenset):
+        task = self.view_repository.get_by_id(task_id) if self.view_repository else None
+        if task is None:
+            # Sin modelo de lectura o aún sin proyectar
+            task = self.repository.get_by_id(task_id, expand)
+        return task
+
+    def _snapshot_task(self, task_id: UUID, expand: frozenset):
+        try:
+            task = self._find_task(task_id, expand)
+            return expanded_task_schema(expand).model_validate(task) if task else None
+        finally:
+            # La instantánea ya no depende de la sesión. Sin soltar la conexión,
+            # una ráfaga agotaría el pool mientras espera hilos del threadpool
+            self.repository.end_read()
+
+    def _check_can_view(self, task, query: GetTaskQuery) -> None:
+        if task and not self._can_view(task, query.user_id, query.is_admin):
+            logger.warning(f"Usuario {query.user_id} no autorizado para ver tarea {query.task_id}")
+            raise ValueError("No tienes permisos para ver esta tarea")
+
+    @traced()
     def handle_get_tasks(self, query: GetTasksQuery) -> List[Task]:
-        return self.repository.get_all(query) 
\ No newline at end of file
+        # task_view solo contiene tareas activas: las archivadas salen de la tabla de archivo
+        if self.view_repository and not query.include_archived:
+            return self.view_repository.get_all(query)
+        return self.repository.get_all(query)
+
+    @traced()
+    def handle_batch_get_tasks(self, query: BatchGetTasksQuery,
+                               user_loader: Optional[DataLoader] = None) -> TaskBatchGetResponse:
+        """
+        Resuelve varias tareas con una consulta IN y aplica la regla de
+        handle_get_task (creador, asignado o admin) a todo el conjunto. Con
+        `include_users`, creadores y asignados se cargan con una consulta más
+        a través de `user_loader`.
+        """
+        found = {task.id: task for task in self.repository.get_many(query.task_ids)}
+        requested = list(dict.fromkeys(query.task_ids))
+        not_found = [task_id for task_id in requested if task_id not in found]
+        forbidden = [task_id for task_id in requested
+                     if task_id in found and not self._can_view(found[task_id], query.user_id, query.is_admin)]
+        if forbidden:
+            logger.warning(f"Usuario {query.user_id} no autorizado para ver {len(forbidden)} tareas del lote")
+        denied = set(forbidden)
+        tasks = [found[task_id] for task_id in requested if task_id in found and task_id not in denied]
+
+        users = {}
+        if query.include_users and user_loader is not None:
+            users = user_loader.load_many(
+                [task.user_id for task in tasks] + [task.assigned_to_id for task in tasks]
+            )
+
+        def summary(user_id):
+            user = users.get(user_id)
+            return UserSummary.model_validate(user) if user is not None else None
+
+        # Construir desde las columnas: acceder a task.user dispararía una carga perezosa por fila
+        return TaskBatchGetResponse(
+            tasks=[
+                TaskWithUsers(
+                    **Task.model_validate(task).model_dump(),
+                    user=summary(task.user_id),
+                    assigned_to=summary(task.assigned_to_id),
+                )
+                for task in tasks
+            ],
+            not_found=not_found,
+            forbidden=forbidden,
+        )
+
+    @staticmethod
+    def _can_view(task, user_id: UUID, is_admin: bool) -> bool:
+        return is_admin or task.user_id == user_id or task.assigned_to_id == user_id
+
+    # Mantenimiento
+    @traced()
+    def handle_archive_completed_tasks(self, older_than: timedelta, batch_size: int,
+                                       max_batches: int, pause_seconds: float = 0.0) -> dict:
+        """
+        Archiva tareas completadas hace más de `older_than` en lotes de
+        `batch_size`, con una transacción por lote. Se detiene al agotar las
+        candidatas o tras `max_batches` lotes; el resto queda para la
+        siguiente ejecución.
+        """
+        completed_before = datetime.utcnow() - older_than
+        started = time.perf_counter()
+        archived = 0
+        batches = 0
+        while batches < max_batches:
+            with ARCHIVE_BATCH_DURATION.time():
+                count = self.repository.archive_completed_batch(completed_before, batch_size)
+            if not count:
+                break
+            batches += 1
+            archived += count
+            ARCHIVE_BATCH_SIZE.observe(count)
+            TASKS_ARCHIVED.inc(count)
+            if count < batch_size:
+                break
+            if pause_seconds:
+                time.sleep(pause_seconds)
+        
+        elapsed = time.perf_counter() - started
+        throughput = archived / elapsed if elapsed else 0.0
+        ARCHIVE_THROUGHPUT.set(throughput)
+        logger.info(f"Archivadas {archived} tareas en {batches} lotes ({throughput:.0f} tareas/s)")
+        return {"archived": archived, "batches": batches, "seconds": round(elapsed, 3),
+                "completed_before": completed_before.isoformat()}
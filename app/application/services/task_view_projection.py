@@ -0,0 +1,188 @@
+"""
+Proyección de las escrituras de tareas sobre el modelo de lectura `task_view`.
+
+TaskService publica un TaskEvent tras cada escritura; TaskViewProjector lo
+aplica recalculando la fila desde tasks + users:
+
+- TASK_VIEW_PROJECTION=inline: en el mismo proceso, justo después del commit.
+- TASK_VIEW_PROJECTION=celery: en la cola `projections`, fuera de la petición.
+- TASK_VIEW_PROJECTION=off (por defecto): sin proyección (task_view queda
+  desactualizado).
+
+Con TASK_VIEW_READS las consultas de TaskService leen de `task_view`. Al
+activarlo por primera vez, o tras un periodo sin proyección, reconstruir:
+
+    python -m app.application.services.task_view_projection --rebuild
+
+En modo inline un evento que falla al proyectarse solo se registra (y
+cuenta en task_view_projection_errors_total): la fila queda desactualizada
+hasta la siguiente escritura de la tarea o un --rebuild. En modo celery se
+reintenta. Con TASK_SHARD_URLS no hay proyección: `task_view` se calcula
+desde `tasks` de DATABASE_URL, donde no están las tareas de los shards.
+"""
+import argparse
+import logging
+import threading
+import time
+from typing import Callable, Iterable, Optional
+from uuid import UUID
+from app.application.events import TaskEvent, DELETED
+from app.core.config import settings
+from app.core.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+PROJECTION_LAG = Histogram(
+    "task_view_projection_lag_seconds", "Delay between a task write and its projection into task_view",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 120.0),
+)
+PROJECTED_ROWS = Counter("task_view_projected_total", "task_view rows projected or removed", ["operation"])
+PROJECTION_ERRORS = Counter("task_view_projection_errors_total", "Task events that failed to project")
+
+INLINE = "inline"
+CELERY = "celery"
+OFF = "off"
+
+
+class TaskViewProjector:
+    def __init__(self, session_factory: Callable):
+        self.session_factory = session_factory
+
+    def _repository(self, db):
+        from app.infrastructure.repositories.task_view_repository import TaskViewRepository
+        return TaskViewRepository(db)
+
+    def apply(self, events: Iterable[TaskEvent]) -> None:
+        """Aplica un lote de eventos: un DELETE y un DELETE + INSERT ... SELECT."""
+        events = list(events)
+        saved = [UUID(event.task_id) for event in events if event.kind != DELETED]
+        deleted = [UUID(event.task_id) for event in events if event.kind == DELETED]
+        db = self.session_factory()
+        try:
+            repository = self._repository(db)
+            if deleted:
+                repository.remove(deleted)
+                PROJECTED_ROWS.labels("removed").inc(len(deleted))
+            if saved:
+                PROJECTED_ROWS.labels("projected").inc(repository.project(saved))
+        finally:
+            db.close()
+        now = time.time()
+        for event in events:
+            if event.occurred_at is not None:
+                PROJECTION_LAG.observe(max(0.0, now - event.occurred_at))
+
+    def on_event(self, event: TaskEvent) -> None:
+        """Suscriptor de eventos de TaskService."""
+        try:
+            if projection_mode() == CELERY:
+                from app.infrastructure.celery.dispatch import enqueue
+                enqueue("project_task_view", [event.to_json()])
+            else:
+                self.apply([event])
+        except Exception:
+            PROJECTION_ERRORS.inc()
+            raise
+
+    def refresh_user(self, user_id: UUID) -> int:
+        """
+        Recalcula las filas que muestran al usuario (cambio de nombre o email,
+        asignaciones anuladas al borrarlo). Las tareas que creó las borra la
+        cascada de `tasks`.
+        """
+        db = self.session_factory()
+        try:
+            repository = self._repository(db)
+            written = repository.project(repository.ids_for_user(user_id))
+        finally:
+            db.close()
+        PROJECTED_ROWS.labels("projected").inc(written)
+        return written
+
+    def rebuild(self, batch_size: int = 1000) -> dict:
+        """
+        Reproyecta todas las tareas por lotes de clave primaria. Se puede
+        ejecutar con la API en marcha: cada lote reemplaza sus filas en una
+        transacción y la proyección de eventos sigue aplicándose.
+        """
+        started = time.perf_counter()
+        written = 0
+        batches = 0
+        after: Optional[UUID] = None
+        db = self.session_factory()
+        try:
+            repository = self._repository(db)
+            while True:
+                ids = repository.source_ids_after(after, batch_size)
+                if not ids:
+                    break
+                written += repository.project(ids)
+                batches += 1
+                after = ids[-1]
+        finally:
+            db.close()
+        PROJECTED_ROWS.labels("rebuilt").inc(written)
+        elapsed = time.perf_counter() - started
+        logger.info(f"task_view reconstruido: {written} tareas en {batches} lotes ({elapsed:.1f} s)")
+        return {"projected": written, "batches": batches, "seconds": round(elapsed, 3)}
+
+
+_projector: Optional[TaskViewProjector] = None
+_projector_lock = threading.Lock()
+
+
+def get_projector() -> TaskViewProjector:
+    global _projector
+    if _projector is None:
+        with _projector_lock:
+            if _projector is None:
+                from app.infrastructure.database import SessionLocal
+                _projector = TaskViewProjector(SessionLocal)
+    return _projector
+
+
+def projection_mode() -> str:
+    """TASK_VIEW_PROJECTION efectivo: off con sharding (ver el docstring del módulo)."""
+    from app.infrastructure.sharding import sharding_enabled
+    return OFF if sharding_enabled() else settings.TASK_VIEW_PROJECTION
+
+
+def configure_projection() -> None:
+    """Suscribe el proyector a los eventos de este proceso si está activado."""
+    mode = projection_mode()
+    if mode != settings.TASK_VIEW_PROJECTION:
+        logger.warning(f"TASK_VIEW_PROJECTION={settings.TASK_VIEW_PROJECTION} ignorado: no hay proyección con TASK_SHARD_URLS")
+    if mode in (INLINE, CELERY):
+        from app.application import events
+        events.subscribe(get_projector().on_event)
+
+
+def refresh_user(user_id: UUID) -> None:
+    """Actualiza los datos de presentación de un usuario en task_view, si hay proyección."""
+    mode = projection_mode()
+    if mode == CELERY:
+        from app.infrastructure.celery.dispatch import enqueue
+        enqueue("refresh_task_view_user", str(user_id))
+    elif mode == INLINE:
+        try:
+            get_projector().refresh_user(user_id)
+        except Exception as e:
+            PROJECTION_ERRORS.inc()
+            logger.error(f"Error actualizando task_view para el usuario {user_id}: {str(e)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mantenimiento del modelo de lectura task_view")
+    parser.add_argument("--rebuild", action="store_true", help="Reproyectar todas las tareas")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.rebuild:
+        print(get_projector().rebuild(args.batch_size))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
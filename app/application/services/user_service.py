@@ -1,22 +1,63 @@
 from app.infrastructure.repositories.user_repository import UserRepository
+from app.infrastructure.repositories.task_repository import TaskRepository
 from app.domain.schemas.user import UserCreate, UserUpdate, User
-from app.core.security import verify_password, create_access_token
+from app.core.security import (
+    verify_password, create_access_token, create_refresh_token, decode_token,
+    ACCESS_TOKEN_TYPE, REFRESH_TOKEN_TYPE
+)
+from app.core.token_revocation import get_revocation_store, revocation_key, JTI, FAMILY, REFRESH_TOKEN_EVENTS
 from app.core.decorators import transactional
+from app.core.metrics import Counter
+from app.core.single_flight import SingleFlight
+from app.infrastructure.celery.dispatch import enqueue
+from app.application.services.task_view_projection import refresh_user
+from jose import JWTError
 from datetime import timedelta
 from app.core.config import settings
 from typing import Optional, List
 from uuid import UUID
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+USER_PURGE_ROWS = Counter("user_purge_task_rows_total", "Task rows deleted or unassigned by background user purges")
+
+# Resultados de delete_user
+USER_DELETED = "deleted"
+USER_PURGE_SCHEDULED = "purge_scheduled"
+
+# Campos de usuario desnormalizados en task_view
+DISPLAY_FIELDS = {"email", "first_name", "last_name"}
+
+# Lecturas por id agrupadas entre peticiones concurrentes (get_current_user en cada petición)
+USER_READS = SingleFlight("user_get")
+
 class UserService:
-    def __init__(self, repository: UserRepository):
+    def __init__(self, repository: UserRepository, task_repository=None):
         self.repository = repository
+        # Con TASK_SHARD_URLS, el repositorio de los shards (ver open_task_repository)
+        self.task_repository = task_repository or TaskRepository(repository.db)
 
     def get_user(self, user_id: UUID) -> Optional[User]:
         return self.repository.get_by_id(user_id)
 
+    async def get_user_coalesced(self, user_id: UUID) -> Optional[User]:
+        """
+        get_user con las peticiones concurrentes por el mismo usuario
+        agrupadas en una consulta. Devuelve el esquema User (compartido entre
+        peticiones), no la instancia del ORM.
+        """
+        return await USER_READS.do(user_id, self._snapshot_user, user_id)
+
+    def _snapshot_user(self, user_id: UUID) -> Optional[User]:
+        try:
+            user = self.repository.get_by_id(user_id)
+            return User.model_validate(user) if user else None
+        finally:
+            # Soltar la conexión antes de volver al event loop (ver TaskService._snapshot_task)
+            self.repository.end_read()
+
     def get_users(self) -> List[User]:
         return self.repository.get_all()
 
@@ -45,11 +86,56 @@ class UserService:
                 logger.warning(f"Intento de actualizar usuario con email ya existente: {user.email}")
                 raise ValueError(f"Usuario con email {user.email} ya existe")
                 
-        return self.repository.update(user_id, user)
+        updated_user = self.repository.update(user_id, user)
+        if updated_user and user.model_fields_set & DISPLAY_FIELDS:
+            refresh_user(user_id)
+        return updated_user
 
     @transactional
-    def delete_user(self, user_id: UUID) -> bool:
-        return self.repository.delete(user_id)
+    def delete_user(self, user_id: UUID) -> Optional[str]:
+        """
+        Borra el usuario y devuelve USER_DELETED, o USER_PURGE_SCHEDULED si
+        tiene demasiadas tareas para borrarlas en una sola transacción: en
+        ese caso el job purge_user las borra por lotes y después al usuario.
+        None si el usuario no existe.
+
+        Las tareas se liberan antes de borrar al usuario: en los shards no
+        hay claves foráneas que las borren o desasignen con él. Si el borrado
+        del usuario falla, repetirlo termina el trabajo.
+        """
+        if not self.repository.get_by_id(user_id):
+            return None
+        if self.task_repository.count_created_by(user_id, settings.USER_DELETE_SYNC_MAX_TASKS) > settings.USER_DELETE_SYNC_MAX_TASKS:
+            logger.info(f"Usuario {user_id} con más de {settings.USER_DELETE_SYNC_MAX_TASKS} tareas: borrado por lotes en segundo plano")
+            enqueue("purge_user", str(user_id))
+            return USER_PURGE_SCHEDULED
+        self.task_repository.release_user_tasks(user_id)
+        if not self.repository.delete(user_id):
+            return None
+        # Tareas que tenía asignadas: mostrarlas sin asignado en task_view
+        refresh_user(user_id)
+        return USER_DELETED
+
+    def purge_user(self, user_id: UUID, batch_size: int, pause_seconds: float = 0.0) -> dict:
+        """
+        Borra las tareas del usuario en lotes acotados (transacciones cortas,
+        sin locks largos sobre tasks) y por último el usuario.
+        """
+        affected = 0
+        batches = 0
+        while True:
+            count = self.task_repository.release_user_tasks(user_id, batch_size)
+            if not count:
+                break
+            affected += count
+            batches += 1
+            USER_PURGE_ROWS.inc(count)
+            if pause_seconds:
+                time.sleep(pause_seconds)
+        deleted = self.repository.delete(user_id)
+        refresh_user(user_id)
+        logger.info(f"Purga del usuario {user_id}: {affected} filas de tareas en {batches} lotes")
+        return {"user_id": str(user_id), "task_rows": affected, "batches": batches, "user_deleted": deleted}
 
     def authenticate_user(self, email: str, password: str) -> Optional[User]:
         user = self.repository.get_by_email(email)
@@ -64,6 +150,60 @@ class UserService:
     def create_access_token_for_user(self, user: User) -> str:
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         return create_access_token(
-            data={"sub": str(user.id)},
+            data={"sub": str(user.id), "typ": ACCESS_TOKEN_TYPE},
             expires_delta=access_token_expires
-        ) 
\ No newline at end of file
+        )
+
+    def issue_tokens(self, user: User, family: Optional[str] = None) -> dict:
+        """Access token corto más refresh token rotatorio de la familia `family`."""
+        refresh_token, _ = create_refresh_token(str(user.id), family)
+        return {
+            "access_token": self.create_access_token_for_user(user),
+            "token_type": "bearer",
+            "refresh_token": refresh_token,
+            "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        }
+
+    def _decode_refresh_token(self, refresh_token: str) -> dict:
+        try:
+            claims = decode_token(refresh_token)
+        except JWTError:
+            raise ValueError("Refresh token inválido o caducado")
+        if claims.get("typ") != REFRESH_TOKEN_TYPE or not claims.get("jti") or not claims.get("fam"):
+            raise ValueError("Refresh token inválido o caducado")
+        return claims
+
+    def refresh_tokens(self, refresh_token: str) -> dict:
+        """
+        Canjea un refresh token por un par nuevo sin verificar la contraseña
+        (sin bcrypt). Cada refresh token se usa una sola vez: al rotarlo se
+        revoca su jti. Presentar uno ya usado indica robo, así que se revoca
+        toda su familia y el cliente tiene que volver a hacer login.
+        """
+        claims = self._decode_refresh_token(refresh_token)
+        store = get_revocation_store()
+        family_key = revocation_key(FAMILY, claims["fam"])
+        if store.is_revoked(family_key):
+            REFRESH_TOKEN_EVENTS.labels("rejected").inc()
+            raise ValueError("Refresh token revocado")
+
+        # Revocar el jti hasta que el token habría caducado de todos modos
+        ttl = claims["exp"] - time.time()
+        if not store.revoke(revocation_key(JTI, claims["jti"]), ttl):
+            store.revoke(family_key, settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400)
+            REFRESH_TOKEN_EVENTS.labels("reused").inc()
+            logger.warning(f"Reutilización de refresh token para usuario {claims['sub']}: familia revocada")
+            raise ValueError("Refresh token ya utilizado")
+
+        user = self.repository.get_by_id(UUID(claims["sub"]))
+        if user is None:
+            REFRESH_TOKEN_EVENTS.labels("rejected").inc()
+            raise ValueError("Usuario inexistente")
+        REFRESH_TOKEN_EVENTS.labels("rotated").inc()
+        return self.issue_tokens(user, family=claims["fam"])
+
+    def revoke_refresh_token(self, refresh_token: str) -> None:
+        """Logout: revoca la familia completa del refresh token."""
+        claims = self._decode_refresh_token(refresh_token)
+        get_revocation_store().revoke(revocation_key(FAMILY, claims["fam"]), settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400)
+        REFRESH_TOKEN_EVENTS.labels("revoked").inc() 
\ No newline at end of file
@@ -0,0 +1,61 @@
+"""
+Efectos secundarios diferidos hasta el commit de una transacción externa.
+
+Los servicios publican eventos y encolan tareas de Celery justo después del
+commit de cada repositorio. Cuando varias operaciones comparten una única
+transacción (p. ej. POST /commands/batch), esos commits son SAVEPOINTs: los
+efectos se acumulan aquí y solo se ejecutan si la transacción se confirma.
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_pending: ContextVar[Optional[List[Tuple[Callable, tuple, dict]]]] = ContextVar("after_commit", default=None)
+
+
+def active() -> bool:
+    return _pending.get() is not None
+
+
+def defer(fn: Callable, *args, **kwargs) -> bool:
+    """Acumula la llamada si hay una transacción externa. False si hay que ejecutarla ya."""
+    pending = _pending.get()
+    if pending is None:
+        return False
+    pending.append((fn, args, kwargs))
+    return True
+
+
+@contextmanager
+def collect():
+    """Ámbito de la transacción externa; devuelve la lista de efectos acumulados."""
+    pending: List[Tuple[Callable, tuple, dict]] = []
+    token = _pending.set(pending)
+    try:
+        yield pending
+    finally:
+        _pending.reset(token)
+
+
+def mark() -> int:
+    """Posición actual, para descartar los efectos de un savepoint deshecho (ver discard)."""
+    pending = _pending.get()
+    return len(pending) if pending is not None else 0
+
+
+def discard(position: int) -> None:
+    pending = _pending.get()
+    if pending is not None:
+        del pending[position:]
+
+
+def run(pending: List[Tuple[Callable, tuple, dict]]) -> None:
+    """Ejecuta los efectos tras el commit. Un fallo se registra y no detiene al resto."""
+    for fn, args, kwargs in pending:
+        try:
+            fn(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Error en efecto diferido {getattr(fn, '__name__', fn)}: {str(e)}")
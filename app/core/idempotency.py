@@ -0,0 +1,283 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, NamedTuple, Optional, Tuple
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.metrics import Counter
+
+IDEMPOTENCY_REQUESTS = Counter(
+    "idempotency_requests_total",
+    "Requests carrying an Idempotency-Key, by outcome.",
+    ["outcome"]
+)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+# Errores que se repetirían igual al reintentar (validación, permisos, no
+# encontrada, conflicto): se guardan como las respuestas correctas. Los
+# demás (401, 429, 5xx...) pueden ser transitorios y liberan la clave
+STORED_ERROR_STATUSES = frozenset((
+    status.HTTP_400_BAD_REQUEST,
+    status.HTTP_403_FORBIDDEN,
+    status.HTTP_404_NOT_FOUND,
+    status.HTTP_409_CONFLICT,
+    status.HTTP_422_UNPROCESSABLE_ENTITY,
+))
+
+
+class StoredResponse(NamedTuple):
+    status_code: int
+    body: Any
+    fingerprint: str
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "expires_at", "response", "done")
+
+    def __init__(self, fingerprint: str, expires_at: float):
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+        self.response: Optional[StoredResponse] = None
+        self.done = asyncio.Event()
+
+
+class InMemoryIdempotencyBackend:
+    """
+    Respuestas guardadas en proceso. Las respuestas se reinsertan al final al
+    completarse y todas tienen el mismo TTL, así que el orden del diccionario
+    es (casi) el de caducidad: al insertar se descartan por el principio las
+    caducadas y, si se supera `max_keys`, las más antiguas.
+    """
+
+    blocking = False
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float) -> None:
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now and len(self._entries) <= self.max_keys:
+                break
+            del self._entries[key]
+            # Quien espere a una entrada descartada vuelve a intentarlo
+            entry.done.set()
+
+    def claim(self, key: str, fingerprint: str, lock_ttl: float) -> Tuple[bool, Optional[StoredResponse], Optional[str]]:
+        """
+        Reserva `key` para ejecutar la petición. Devuelve (reservada,
+        respuesta guardada, huella de la petición existente).
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._entries[key] = _Entry(fingerprint, now + lock_ttl)
+                self._evict(now)
+                return True, None, None
+            return False, entry.response, entry.fingerprint
+
+    def complete(self, key: str, response: StoredResponse, ttl: float) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                entry = _Entry(response.fingerprint, 0)
+            entry.response = response
+            entry.expires_at = time.monotonic() + ttl
+            # Reinsertar al final para mantener el orden por caducidad
+            self._entries[key] = entry
+            self._evict(time.monotonic())
+        entry.done.set()
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry.done.set()
+
+    async def wait(self, key: str, timeout: float) -> Optional[StoredResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        try:
+            await asyncio.wait_for(entry.done.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return entry.response
+
+
+class RedisIdempotencyBackend:
+    """
+    Respuestas compartidas entre workers. La reserva es un SET NX con la
+    caducidad del lock; quien espera consulta la clave periódicamente.
+    Requiere el paquete `redis`.
+    """
+
+    POLL_INTERVAL = 0.05
+    blocking = True  # E/S de red: IdempotencyManager lo llama desde el threadpool
+
+    def __init__(self, url: str, prefix: str = "idempotency:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("IDEMPOTENCY_BACKEND=redis requiere el paquete 'redis'") from e
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def _load(self, raw) -> Tuple[Optional[StoredResponse], Optional[str]]:
+        data = json.loads(raw)
+        if data.get("status_code") is None:
+            return None, data["fingerprint"]
+        return StoredResponse(data["status_code"], data["body"], data["fingerprint"]), data["fingerprint"]
+
+    def claim(self, key: str, fingerprint: str, lock_ttl: float) -> Tuple[bool, Optional[StoredResponse], Optional[str]]:
+        marker = json.dumps({"fingerprint": fingerprint})
+        if self._client.set(self.prefix + key, marker, nx=True, px=int(lock_ttl * 1000)):
+            return True, None, None
+        raw = self._client.get(self.prefix + key)
+        if raw is None:
+            # Caducó entre SET y GET: reintentar la reserva
+            return self.claim(key, fingerprint, lock_ttl)
+        response, existing = self._load(raw)
+        return False, response, existing
+
+    def complete(self, key: str, response: StoredResponse, ttl: float) -> None:
+        self._client.set(self.prefix + key, json.dumps(response._asdict()), px=int(ttl * 1000))
+
+    def release(self, key: str) -> None:
+        self._client.delete(self.prefix + key)
+
+    async def wait(self, key: str, timeout: float) -> Optional[StoredResponse]:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            raw = await run_in_threadpool(self._client.get, self.prefix + key)
+            if raw is None:
+                return None
+            response, _ = self._load(raw)
+            if response is not None:
+                return response
+            await asyncio.sleep(self.POLL_INTERVAL)
+        return None
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Huella del cuerpo de la petición para detectar claves reutilizadas con otro contenido."""
+    encoded = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def _replay(response: StoredResponse) -> JSONResponse:
+    return JSONResponse(response.body, status_code=response.status_code, headers={REPLAYED_HEADER: "true"})
+
+
+class IdempotencyManager:
+    def __init__(self, backend, ttl: float, lock_ttl: float, wait_timeout: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+
+    async def _call(self, method: Callable, *args) -> Any:
+        # Las llamadas a un backend bloqueante (Redis) no deben parar el event loop
+        if self.backend.blocking:
+            return await run_in_threadpool(method, *args)
+        return method(*args)
+
+    async def run(self, key: Optional[str], scope: str, payload: Any, handler: Callable[[], Any],
+                  encode: Callable[[Any], Any] = jsonable_encoder) -> Any:
+        """
+        Ejecuta `handler` una sola vez por (`scope`, `key`). Los reintentos
+        reciben la respuesta guardada y los duplicados concurrentes esperan a
+        la petición en curso. Solo se guardan las respuestas correctas y
+        los errores de STORED_ERROR_STATUSES; ante cualquier otro error la
+        clave se libera para que el cliente pueda reintentar.
+        """
+        if key is None:
+            return handler()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{IDEMPOTENCY_HEADER} debe tener entre 1 y {MAX_KEY_LENGTH} caracteres",
+            )
+
+        store_key = f"{scope}:{key}"
+        fingerprint = request_fingerprint(payload)
+        claimed, stored, existing = await self._call(self.backend.claim, store_key, fingerprint, self.lock_ttl)
+        if not claimed:
+            if existing != fingerprint:
+                IDEMPOTENCY_REQUESTS.labels("mismatch").inc()
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=f"{IDEMPOTENCY_HEADER} ya usada con una petición distinta",
+                )
+            if stored is None:
+                IDEMPOTENCY_REQUESTS.labels("waited").inc()
+                stored = await self.backend.wait(store_key, self.wait_timeout)
+            if stored is None:
+                # La original falló sin guardar respuesta (se puede ejecutar
+                # esta) o sigue en curso tras la espera
+                claimed, stored, _ = await self._call(self.backend.claim, store_key, fingerprint, self.lock_ttl)
+                if not claimed and stored is None:
+                    IDEMPOTENCY_REQUESTS.labels("conflict").inc()
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail=f"Hay una petición con la misma {IDEMPOTENCY_HEADER} en curso",
+                        headers={"Retry-After": "1"},
+                    )
+            if stored is not None:
+                IDEMPOTENCY_REQUESTS.labels("replayed").inc()
+                return _replay(stored)
+
+        IDEMPOTENCY_REQUESTS.labels("executed").inc()
+        try:
+            result = handler()
+        except HTTPException as e:
+            if e.status_code in STORED_ERROR_STATUSES:
+                await self._call(self.backend.complete, store_key,
+                                 StoredResponse(e.status_code, {"detail": e.detail}, fingerprint), self.ttl)
+            else:
+                await self._call(self.backend.release, store_key)
+            raise
+        except BaseException:
+            await self._call(self.backend.release, store_key)
+            raise
+        await self._call(self.backend.complete, store_key,
+                         StoredResponse(status.HTTP_200_OK, encode(result), fingerprint), self.ttl)
+        return result
+
+
+_manager: Optional[IdempotencyManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_idempotency_manager() -> IdempotencyManager:
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                if settings.IDEMPOTENCY_BACKEND == "redis":
+                    backend = RedisIdempotencyBackend(settings.IDEMPOTENCY_REDIS_URL or settings.CELERY_BROKER_URL)
+                else:
+                    backend = InMemoryIdempotencyBackend(settings.IDEMPOTENCY_MAX_KEYS)
+                _manager = IdempotencyManager(
+                    backend,
+                    ttl=settings.IDEMPOTENCY_TTL_SECONDS,
+                    lock_ttl=settings.IDEMPOTENCY_LOCK_TTL_SECONDS,
+                    wait_timeout=settings.IDEMPOTENCY_WAIT_TIMEOUT_SECONDS,
+                )
+    return _manager
@@ -3,10 +3,18 @@ import sys
 from logging.handlers import RotatingFileHandler
 import os
 
+_configured = False
+
 def setup_logging():
     """
     Configura el sistema de logging para la aplicación.
+    Es idempotente: llamarla varias veces no duplica los handlers.
     """
+    global _configured
+    if _configured:
+        return
+    _configured = True
+
     # Crear el directorio de logs si no existe
     log_dir = "logs"
     if not os.path.exists(log_dir):
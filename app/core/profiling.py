@@ -0,0 +1,389 @@
+"""
+Profiling bajo demanda de un proceso en marcha (API o worker de Celery).
+
+- CPU: un hilo muestrea las pilas de todos los hilos cada `interval`
+  segundos durante la sesión. Con relojes de CPU por hilo (Linux) cada pila
+  pesa el tiempo de CPU que consumió su hilo desde la muestra anterior, así
+  que los hilos bloqueados no aparecen; sin ellos, cada muestra pesa 1.
+  Se exporta en formato "collapsed" (flamegraph.pl, speedscope, inferno)
+  o como JSON de speedscope.
+- Memoria: snapshots de tracemalloc y diferencias entre ellos.
+- Pilas: volcado de las pilas de los hilos y de las tareas de asyncio.
+
+No hay coste si no hay una sesión activa: el hilo de muestreo solo existe
+durante el profile de CPU y tracemalloc solo traza entre start y stop.
+"""
+import asyncio
+import linecache
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import traceback
+from collections import Counter as Tally
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+PROFILING_SESSIONS = Counter("profiling_sessions_total", "On-demand profiling sessions by kind", ["kind"])
+
+COLLAPSED = "collapsed"
+SPEEDSCOPE = "speedscope"
+PROFILE_FORMATS = (COLLAPSED, SPEEDSCOPE)
+
+_SAMPLER_THREAD_NAME = "cpu-profiler"
+# Rutas de la librería estándar y paquetes instalados: se acortan en los frames
+_PATH_PREFIXES = sorted({os.path.dirname(os.__file__), *(path for path in sys.path if path)}, key=len, reverse=True)
+
+
+class ProfilerBusyError(RuntimeError):
+    """Ya hay un profile de CPU en curso en este proceso."""
+
+
+def _short_path(filename: str) -> str:
+    for prefix in _PATH_PREFIXES:
+        if filename.startswith(prefix + os.sep):
+            return filename[len(prefix) + 1:]
+    return filename
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _stack_labels(frame) -> Tuple[str, ...]:
+    """Pila de funciones desde la raíz hasta `frame`."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels)
+
+
+def _cpu_clock(ident: int) -> Optional[int]:
+    try:
+        return time.pthread_getcpuclockid(ident)
+    except (AttributeError, OSError):
+        return None
+
+
+class CpuProfile:
+    """Pilas muestreadas por hilo con su peso (µs de CPU o número de muestras)."""
+
+    def __init__(self, stacks: Dict[Tuple[str, Tuple[str, ...]], float], unit: str, interval: float,
+                 started_at: datetime, duration: float, samples: int):
+        self.stacks = stacks
+        self.unit = unit
+        self.interval = interval
+        self.started_at = started_at
+        self.duration = duration
+        self.samples = samples
+
+    def collapsed(self) -> str:
+        """Una línea por pila: `hilo;raíz;...;hoja peso`."""
+        lines = [
+            ";".join((thread, *stack)) + f" {int(round(weight))}"
+            for (thread, stack), weight in sorted(self.stacks.items(), key=lambda item: -item[1])
+        ]
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> dict:
+        """Documento de speedscope (https://www.speedscope.app) con un perfil por hilo."""
+        frames: List[dict] = []
+        frame_index: Dict[str, int] = {}
+        profiles: Dict[str, dict] = {}
+        for (thread, stack), weight in self.stacks.items():
+            indexes = []
+            for label in stack:
+                if label not in frame_index:
+                    frame_index[label] = len(frames)
+                    frames.append({"name": label})
+                indexes.append(frame_index[label])
+            profile = profiles.setdefault(thread, {
+                "type": "sampled", "name": thread, "unit": "microseconds" if self.unit == "cpu_us" else "none",
+                "startValue": 0, "endValue": 0, "samples": [], "weights": [],
+            })
+            profile["samples"].append(indexes)
+            profile["weights"].append(weight)
+            profile["endValue"] += weight
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"CPU {self.started_at.isoformat()} ({self.duration:.1f} s)",
+            "exporter": settings.PROJECT_NAME,
+            "shared": {"frames": frames},
+            "profiles": list(profiles.values()),
+        }
+
+    def render(self, output_format: str):
+        return self.collapsed() if output_format == COLLAPSED else self.speedscope()
+
+
+class CpuSampler:
+    """Hilo de muestreo de una sesión de profile de CPU."""
+
+    def __init__(self, seconds: float, interval: float):
+        self.seconds = seconds
+        self.interval = interval
+        self.started_at = datetime.utcnow()
+        self._stacks: Tally = Tally()
+        self._samples = 0
+        self._clocks: Dict[int, Optional[int]] = {}
+        self._cpu_seen: Dict[int, int] = {}
+        self._use_cpu = _cpu_clock(threading.get_ident()) is not None
+        self._stop = threading.Event()
+        self._began = 0.0
+        self._ended: Optional[float] = None
+        self._thread = threading.Thread(target=self._run, name=_SAMPLER_THREAD_NAME, daemon=True)
+
+    def start(self) -> None:
+        self._began = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> CpuProfile:
+        self._stop.set()
+        self._thread.join()
+        return self.result()
+
+    def wait(self) -> CpuProfile:
+        self._thread.join()
+        return self.result()
+
+    def done(self) -> bool:
+        return self._ended is not None
+
+    def result(self) -> CpuProfile:
+        ended = self._ended if self._ended is not None else time.perf_counter()
+        return CpuProfile(dict(self._stacks), "cpu_us" if self._use_cpu else "samples", self.interval,
+                          self.started_at, ended - self._began, self._samples)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        deadline = self._began + self.seconds
+        try:
+            while not self._stop.wait(self.interval) and time.perf_counter() < deadline:
+                self._sample(own)
+        finally:
+            self._ended = time.perf_counter()
+            _finish(self)
+
+    def _sample(self, own: int) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        self._samples += 1
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            weight = self._cpu_weight(ident) if self._use_cpu else 1
+            if weight:
+                self._stacks[(names.get(ident, str(ident)), _stack_labels(frame))] += weight
+
+    def _cpu_weight(self, ident: int) -> int:
+        """µs de CPU del hilo desde la muestra anterior (0 si estuvo bloqueado)."""
+        if ident not in self._clocks:
+            self._clocks[ident] = _cpu_clock(ident)
+        clock = self._clocks[ident]
+        if clock is None:
+            return 0
+        try:
+            now = time.clock_gettime_ns(clock) // 1000
+        except OSError:
+            # El hilo terminó entre sys._current_frames() y la lectura del reloj
+            return 0
+        previous = self._cpu_seen.get(ident)
+        self._cpu_seen[ident] = now
+        return now - previous if previous is not None else 0
+
+
+_cpu_lock = threading.Lock()
+_active: Optional[CpuSampler] = None
+_last: Optional[CpuSampler] = None
+
+
+def _finish(sampler: CpuSampler) -> None:
+    global _active, _last
+    with _cpu_lock:
+        if _active is sampler:
+            _active = None
+        _last = sampler
+    logger.info(f"Profile de CPU terminado: {sampler._samples} muestras en {sampler.result().duration:.1f} s")
+
+
+def start_cpu_profile(seconds: float, interval: float) -> CpuSampler:
+    """Arranca una sesión de `seconds` segundos; solo una a la vez por proceso."""
+    global _active
+    if not 0 < seconds <= settings.PROFILING_MAX_SECONDS:
+        raise ValueError(f"seconds debe estar entre 0 y {settings.PROFILING_MAX_SECONDS}")
+    if not 0.001 <= interval <= 1.0:
+        raise ValueError("interval debe estar entre 1 ms y 1 s")
+    with _cpu_lock:
+        if _active is not None:
+            raise ProfilerBusyError("Ya hay un profile de CPU en curso")
+        _active = CpuSampler(seconds, interval)
+    PROFILING_SESSIONS.labels("cpu").inc()
+    logger.warning(f"Profile de CPU iniciado: {seconds} s cada {interval * 1000:.0f} ms")
+    _active.start()
+    return _active
+
+
+def profile_cpu(seconds: float, interval: float) -> CpuProfile:
+    """Sesión completa, bloqueando el hilo actual."""
+    return start_cpu_profile(seconds, interval).wait()
+
+
+def last_cpu_profile() -> Tuple[Optional[CpuSampler], Optional[CpuSampler]]:
+    """(sesión en curso, última terminada)."""
+    with _cpu_lock:
+        return _active, _last
+
+
+# Memoria
+_IGNORED_TRACES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+_memory_lock = threading.Lock()
+_snapshots: Dict[int, Tuple[datetime, tracemalloc.Snapshot]] = {}
+_next_snapshot_id = 1
+_tracing_started_here = False
+
+
+def start_memory_tracing(frames: int) -> bool:
+    """Activa tracemalloc con `frames` frames por traza. False si ya estaba activo."""
+    global _tracing_started_here
+    with _memory_lock:
+        if tracemalloc.is_tracing():
+            return False
+        tracemalloc.start(frames)
+        _tracing_started_here = True
+    PROFILING_SESSIONS.labels("memory").inc()
+    logger.warning(f"tracemalloc activado con {frames} frames por traza")
+    return True
+
+
+def stop_memory_tracing() -> None:
+    """Desactiva tracemalloc (si se activó aquí) y descarta los snapshots."""
+    global _tracing_started_here
+    with _memory_lock:
+        _snapshots.clear()
+        if _tracing_started_here:
+            tracemalloc.stop()
+            _tracing_started_here = False
+    logger.info("tracemalloc desactivado")
+
+
+def _stat(stat, key_type: str) -> dict:
+    frame = stat.traceback[0]
+    entry = {
+        "location": f"{_short_path(frame.filename)}:{frame.lineno}",
+        "size_bytes": stat.size,
+        "count": stat.count,
+        "size_diff_bytes": getattr(stat, "size_diff", None),
+        "count_diff": getattr(stat, "count_diff", None),
+        "source": linecache.getline(frame.filename, frame.lineno).strip() or None,
+    }
+    if key_type == "traceback":
+        entry["traceback"] = [f"{_short_path(item.filename)}:{item.lineno}" for item in stat.traceback]
+    return entry
+
+
+def take_memory_snapshot(limit: int = 20, key_type: str = "lineno") -> dict:
+    """Guarda un snapshot (los más antiguos se descartan) y devuelve sus mayores consumidores."""
+    global _next_snapshot_id
+    if not tracemalloc.is_tracing():
+        raise ValueError("tracemalloc no está activo: iniciar antes el trazado de memoria")
+    snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED_TRACES)
+    current, peak = tracemalloc.get_traced_memory()
+    with _memory_lock:
+        snapshot_id = _next_snapshot_id
+        _next_snapshot_id += 1
+        taken_at = datetime.utcnow()
+        _snapshots[snapshot_id] = (taken_at, snapshot)
+        while len(_snapshots) > settings.PROFILING_MAX_SNAPSHOTS:
+            del _snapshots[min(_snapshots)]
+    PROFILING_SESSIONS.labels("memory_snapshot").inc()
+    return {
+        "id": snapshot_id,
+        "taken_at": taken_at,
+        "traced_current_bytes": current,
+        "traced_peak_bytes": peak,
+        "top": [_stat(stat, key_type) for stat in snapshot.statistics(key_type)[:limit]],
+    }
+
+
+def diff_memory_snapshots(base_id: int, target_id: Optional[int] = None, limit: int = 20,
+                          key_type: str = "lineno") -> dict:
+    """Crecimiento entre dos snapshots (el último si no se indica `target_id`)."""
+    with _memory_lock:
+        if target_id is None and _snapshots:
+            target_id = max(_snapshots)
+        base, target = _snapshots.get(base_id), _snapshots.get(target_id)
+    if base is None or target is None:
+        raise LookupError(f"Snapshot no encontrado: {base_id if base is None else target_id}")
+    stats = target[1].compare_to(base[1], key_type)
+    return {
+        "base_id": base_id,
+        "target_id": target_id,
+        "elapsed_seconds": (target[0] - base[0]).total_seconds(),
+        "size_diff_bytes": sum(stat.size_diff for stat in stats),
+        "top": [_stat(stat, key_type) for stat in stats[:limit]],
+    }
+
+
+def memory_status() -> dict:
+    with _memory_lock:
+        snapshots = [{"id": snapshot_id, "taken_at": taken_at} for snapshot_id, (taken_at, _) in _snapshots.items()]
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "tracing": tracemalloc.is_tracing(),
+        "frames": tracemalloc.get_traceback_limit(),
+        "traced_current_bytes": current,
+        "traced_peak_bytes": peak,
+        "snapshots": snapshots,
+    }
+
+
+# Pilas
+def _format_stack(frames) -> List[str]:
+    summary = traceback.StackSummary.extract(((frame, frame.f_lineno) for frame in frames), lookup_lines=True)
+    return [f"{_short_path(item.filename)}:{item.lineno} in {item.name}" + (f": {item.line}" if item.line else "")
+            for item in summary]
+
+
+def dump_thread_stacks() -> List[dict]:
+    frames = sys._current_frames()
+    threads = []
+    for thread in threading.enumerate():
+        frame = frames.get(thread.ident)
+        stack = []
+        while frame is not None:
+            stack.append(frame)
+            frame = frame.f_back
+        threads.append({
+            "name": thread.name,
+            "ident": thread.ident,
+            "daemon": thread.daemon,
+            "stack": _format_stack(reversed(stack)),
+        })
+    PROFILING_SESSIONS.labels("stacks").inc()
+    return threads
+
+
+def dump_asyncio_tasks(limit: int = 50) -> List[dict]:
+    """Tareas del event loop en curso; hay que llamarla desde el propio loop."""
+    tasks = []
+    for task in asyncio.all_tasks():
+        coro = task.get_coro()
+        tasks.append({
+            "name": task.get_name(),
+            "coroutine": getattr(coro, "__qualname__", repr(coro)),
+            "done": task.done(),
+            "stack": _format_stack(task.get_stack(limit=limit)),
+        })
+    return tasks
@@ -0,0 +1,153 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.metrics import Counter
+
+RATE_LIMIT_REJECTIONS = Counter(
+    "rate_limit_rejections_total",
+    "Requests rejected by the per-user rate limiter, by budget.",
+    ["bucket"]
+)
+
+# Presupuestos disponibles
+READ = "read"
+WRITE = "write"
+LOGIN = "login"
+
+_READ_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+
+
+class Budget(NamedTuple):
+    rate: float  # tokens repuestos por segundo
+    burst: int   # capacidad máxima del bucket
+
+
+class InMemoryTokenBucketBackend:
+    """
+    Token buckets en proceso. El número de claves está acotado: al superarlo
+    se descarta la menos usada, que equivale a un bucket lleno.
+    """
+
+    blocking = False
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, budget: Budget, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = float(budget.burst)
+            else:
+                tokens = min(budget.burst, bucket[0] + (now - bucket[1]) * budget.rate)
+                self._buckets.move_to_end(key)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / budget.rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class RedisTokenBucketBackend:
+    """
+    Token buckets compartidos entre workers mediante un script Lua atómico.
+    Requiere el paquete `redis`.
+    """
+
+    blocking = True  # E/S de red: fuera del event loop (ver RateLimiter.check_async)
+
+    SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local cost = tonumber(ARGV[4])
+    local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(data[1]) or burst
+    local ts = tonumber(data[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+    local wait = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+    else
+        wait = (cost - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], tonumber(ARGV[5]))
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requiere el paquete 'redis'") from e
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def consume(self, key: str, budget: Budget, cost: float = 1.0) -> float:
+        # La clave caduca cuando el bucket se habría rellenado por completo
+        ttl = math.ceil(budget.burst / budget.rate) + 1
+        wait = self._script(keys=[self.prefix + key], args=[budget.rate, budget.burst, time.time(), cost, ttl])
+        return float(wait)
+
+
+class RateLimiter:
+    def __init__(self, backend, budgets: Dict[str, Budget], enabled: bool = True):
+        self.backend = backend
+        self.budgets = budgets
+        self.enabled = enabled
+
+    def check(self, bucket: str, principal: str) -> float:
+        """
+        Consume un token del presupuesto `bucket` para `principal`.
+        Devuelve 0 si la petición se admite o los segundos a esperar si no.
+        """
+        if not self.enabled:
+            return 0.0
+        wait = self.backend.consume(f"{bucket}:{principal}", self.budgets[bucket])
+        if wait > 0:
+            RATE_LIMIT_REJECTIONS.labels(bucket).inc()
+        return wait
+
+    async def check_async(self, bucket: str, principal: str) -> float:
+        """check() desde código async: con un backend bloqueante (Redis), en el threadpool."""
+        if self.enabled and self.backend.blocking:
+            return await run_in_threadpool(self.check, bucket, principal)
+        return self.check(bucket, principal)
+
+
+def bucket_for_method(method: str) -> str:
+    return READ if method in _READ_METHODS else WRITE
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                if settings.RATE_LIMIT_BACKEND == "redis":
+                    backend = RedisTokenBucketBackend(settings.RATE_LIMIT_REDIS_URL or settings.CELERY_BROKER_URL)
+                else:
+                    backend = InMemoryTokenBucketBackend(settings.RATE_LIMIT_MAX_KEYS)
+                _limiter = RateLimiter(backend, {
+                    READ: Budget(settings.RATE_LIMIT_READ_PER_SECOND, settings.RATE_LIMIT_READ_BURST),
+                    WRITE: Budget(settings.RATE_LIMIT_WRITE_PER_SECOND, settings.RATE_LIMIT_WRITE_BURST),
+                    LOGIN: Budget(settings.RATE_LIMIT_LOGIN_PER_SECOND, settings.RATE_LIMIT_LOGIN_BURST),
+                }, enabled=settings.RATE_LIMIT_ENABLED)
+    return _limiter
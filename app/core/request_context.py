@@ -0,0 +1,22 @@
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+
+class RequestStats:
+    """
+    Contadores de base de datos acumulados durante una petición HTTP.
+    Se crea uno por petición en el middleware y los listeners del engine lo
+    actualizan a través de la ContextVar.
+    """
+    __slots__ = ("statements", "db_time", "fingerprints", "n_plus_one", "n_plus_one_threshold")
+
+    def __init__(self, n_plus_one_threshold: Optional[int] = None):
+        self.statements = 0
+        self.db_time = 0.0
+        # Se crean de forma perezosa para no reservar memoria en peticiones sin SQL
+        self.fingerprints: Optional[Dict[str, int]] = None
+        self.n_plus_one: Optional[List[str]] = None
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
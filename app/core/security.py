@@ -1,16 +1,33 @@
+import uuid
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
+from functools import lru_cache
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from .config import settings
+from .metrics import Histogram
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds",
+    "Time spent hashing or verifying passwords with bcrypt.",
+    ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.5)
+)
+_VERIFY_TIMER = PASSWORD_HASH_DURATION.labels("verify")
+_HASH_TIMER = PASSWORD_HASH_DURATION.labels("hash")
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    # passlib y bcrypt se cargan en el primer uso para no penalizar el arranque
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    with _VERIFY_TIMER.time():
+        return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    with _HASH_TIMER.time():
+        return get_pwd_context().hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -20,4 +37,27 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt 
\ No newline at end of file
+    return encoded_jwt
+
+# Tipos de token (claim "typ"). Los access tokens emitidos antes no lo llevan.
+ACCESS_TOKEN_TYPE = "access"
+REFRESH_TOKEN_TYPE = "refresh"
+
+def create_refresh_token(user_id: str, family: Optional[str] = None) -> Tuple[str, dict]:
+    """
+    Refresh token firmado con un `jti` único y la `fam`ilia de rotación a la
+    que pertenece (la misma para todos los tokens derivados de un login).
+    Devuelve el token y sus claims.
+    """
+    claims = {
+        "sub": user_id,
+        "typ": REFRESH_TOKEN_TYPE,
+        "jti": uuid.uuid4().hex,
+        "fam": family or uuid.uuid4().hex,
+        "exp": datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    }
+    return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM), claims
+
+def decode_token(token: str) -> dict:
+    """Verifica firma y caducidad. Lanza JWTError si el token no es válido."""
+    return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
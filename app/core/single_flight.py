@@ -0,0 +1,96 @@
+"""
+Coalescencia de lecturas idénticas concurrentes (single-flight).
+
+Cuando llegan a la vez muchas peticiones por la misma clave (una tarea
+compartida muy consultada, el GET /users/me de una cuenta de servicio),
+solo la primera ejecuta la consulta en el threadpool; las demás esperan su
+resultado. No es una caché: en cuanto termina la consulta la clave se
+libera y la siguiente petición vuelve a la base de datos.
+
+El resultado se comparte entre peticiones, así que debe ser inmutable en la
+práctica (un esquema de pydantic, no una instancia del ORM ligada a la
+sesión de otra petición). Los permisos se comprueban después, por petición.
+"""
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Hashable
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_CALLS = Counter(
+    "single_flight_calls_total",
+    "Coalescible lookups by role: leaders run the query, followers reuse a leader's result",
+    ["flight", "role"],
+)
+SINGLE_FLIGHT_FOLLOWERS = Histogram(
+    "single_flight_followers", "Callers that shared one leader's query",
+    ["flight"],
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 500),
+)
+
+LEADER = "leader"
+FOLLOWER = "follower"
+DISABLED = "disabled"
+
+
+class _LeaderCancelled(Exception):
+    """El líder se canceló sin resultado: cada seguidor ejecuta su propia consulta."""
+
+
+class _Flight:
+    __slots__ = ("future", "followers")
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Agrupa las llamadas concurrentes con la misma clave. Debe usarse desde
+    el event loop; `fn` es síncrona y se ejecuta en el threadpool. Cada
+    llamador pasa su propia `fn` (con su sesión), que solo se usa si es el
+    líder o si el líder se cancela.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    async def do(self, key: Hashable, fn: Callable[..., Any], *args) -> Any:
+        if not settings.SINGLE_FLIGHT_ENABLED:
+            SINGLE_FLIGHT_CALLS.labels(self.name, DISABLED).inc()
+            return await run_in_threadpool(fn, *args)
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            flight.followers += 1
+            SINGLE_FLIGHT_CALLS.labels(self.name, FOLLOWER).inc()
+            try:
+                # shield: cancelar a un seguidor no cancela la consulta de los demás
+                return await asyncio.shield(flight.future)
+            except _LeaderCancelled:
+                return await run_in_threadpool(fn, *args)
+
+        flight = self._flights[key] = _Flight(asyncio.get_running_loop().create_future())
+        SINGLE_FLIGHT_CALLS.labels(self.name, LEADER).inc()
+        try:
+            result = await run_in_threadpool(fn, *args)
+        except asyncio.CancelledError:
+            flight.future.set_exception(_LeaderCancelled())
+            raise
+        except Exception as e:
+            flight.future.set_exception(e)
+            raise
+        else:
+            flight.future.set_result(result)
+            return result
+        finally:
+            del self._flights[key]
+            SINGLE_FLIGHT_FOLLOWERS.labels(self.name).observe(flight.followers)
+            if not flight.followers and flight.future.done() and not flight.future.cancelled():
+                # Sin seguidores nadie lee la excepción: evitar el aviso de asyncio
+                flight.future.exception()
@@ -0,0 +1,97 @@
+import hashlib
+import threading
+import time
+from typing import Dict, Optional
+from app.core.config import settings
+from app.core.metrics import Counter
+
+REFRESH_TOKEN_EVENTS = Counter(
+    "refresh_token_events_total",
+    "Refresh token rotations, rejections and detected reuses.",
+    ["event"]
+)
+
+# Prefijos para que un jti y una familia nunca colisionen en el almacén
+JTI = "j"
+FAMILY = "f"
+
+
+def revocation_key(kind: str, value: str) -> str:
+    """
+    Clave de la lista de revocación: se guarda el hash del identificador,
+    nunca el identificador, y truncado a 128 bits para ocupar poco.
+    """
+    return kind + hashlib.sha256(value.encode()).hexdigest()[:32]
+
+
+class InMemoryRevocationStore:
+    """
+    Revocaciones en proceso: diccionario clave -> caducidad (comprobación
+    O(1)). Las entradas caducadas se barren de forma amortizada cuando el
+    diccionario dobla su tamaño desde el último barrido. Solo vale con un
+    worker; con varios, TOKEN_REVOCATION_BACKEND=redis.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._sweep_at = 1024
+
+    def revoke(self, key: str, ttl: float) -> bool:
+        """Revoca `key` durante `ttl` segundos. Devuelve False si ya estaba revocada."""
+        now = time.monotonic()
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is not None and expires_at > now:
+                return False
+            self._entries[key] = now + max(ttl, 1)
+            if len(self._entries) >= self._sweep_at:
+                self._entries = {k: exp for k, exp in self._entries.items() if exp > now}
+                self._sweep_at = max(1024, 2 * len(self._entries))
+        return True
+
+    def is_revoked(self, *keys: str) -> bool:
+        now = time.monotonic()
+        for key in keys:
+            expires_at = self._entries.get(key)
+            if expires_at is not None and expires_at > now:
+                return True
+        return False
+
+
+class RedisRevocationStore:
+    """
+    Revocaciones compartidas entre workers: SET NX con caducidad, de modo
+    que Redis borra solo las entradas cuando el token ya habría expirado.
+    Requiere el paquete `redis`.
+    """
+
+    def __init__(self, url: str, prefix: str = "revoked:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("TOKEN_REVOCATION_BACKEND=redis requiere el paquete 'redis'") from e
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def revoke(self, key: str, ttl: float) -> bool:
+        return bool(self._client.set(self.prefix + key, 1, nx=True, ex=max(int(ttl), 1)))
+
+    def is_revoked(self, *keys: str) -> bool:
+        return self._client.exists(*(self.prefix + key for key in keys)) > 0
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_revocation_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if settings.TOKEN_REVOCATION_BACKEND == "redis":
+                    _store = RedisRevocationStore(settings.TOKEN_REVOCATION_REDIS_URL or settings.CELERY_BROKER_URL)
+                else:
+                    _store = InMemoryRevocationStore()
+    return _store
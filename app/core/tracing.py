@@ -0,0 +1,408 @@
+"""
+Trazas ligeras de una petición de punta a punta: petición HTTP, handlers de
+TaskService, sentencias SQL y tareas de Celery que encola, con el contexto
+propagado en la cabecera W3C `traceparent` (HTTP y mensajes de Celery).
+
+    with tracing.start_span("reindex", attributes={"tasks": len(ids)}) as span:
+        ...
+
+    @tracing.traced()
+    def handle_create_task(self, command): ...
+
+Muestreo: la decisión se toma en la raíz de la traza (una fracción
+TRACING_SAMPLE_RATE y como mucho TRACING_MAX_TRACES_PER_SECOND por proceso)
+y los hijos, incluidos los de otros procesos, heredan la del padre. Dentro
+de una traza no muestreada no se crean spans: solo se propaga la decisión.
+La cabecera `traceparent` de un cliente HTTP no es de fiar: de ella solo se
+conserva el trace_id y el muestreo se decide aquí como en una traza nueva.
+
+Los spans terminados van al exportador de TRACING_EXPORTER: "memory" (los
+últimos TRACING_MEMORY_MAX_SPANS, consultables en /admin/traces), "file"
+(JSON por línea en TRACING_FILE_PATH, escrito desde un hilo aparte), "none"
+o "paquete.modulo:fabrica" para uno propio (ver SpanExporter).
+"""
+import asyncio
+import functools
+import importlib
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+TRACES_STARTED = Counter(
+    "tracing_traces_total",
+    "New traces by sampling decision (sampled, ratio, rate_limited)",
+    ["decision"],
+)
+SPANS_EXPORTED = Counter("tracing_spans_exported_total", "Finished spans handed to the exporter")
+SPANS_DROPPED = Counter("tracing_spans_dropped_total", "Finished spans the exporter could not keep")
+
+TRACEPARENT = "traceparent"
+_TRACEPARENT_FORMAT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+INTERNAL = "internal"
+SERVER = "server"
+CLIENT = "client"
+PRODUCER = "producer"
+CONSUMER = "consumer"
+
+OK = "ok"
+ERROR = "error"
+
+
+class SpanContext(NamedTuple):
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+
+def format_traceparent(context: SpanContext) -> str:
+    return f"00-{context.trace_id}-{context.span_id}-{'01' if context.sampled else '00'}"
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    match = _TRACEPARENT_FORMAT.match((value or "").strip().lower())
+    if match is None or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return SpanContext(match.group(1), match.group(2), bool(int(match.group(3), 16) & 1))
+
+
+class Span:
+    """
+    Una operación con su duración. Si la traza no se muestrea el span solo
+    lleva el contexto para propagarlo y sus métodos no hacen nada.
+    """
+    __slots__ = ("name", "kind", "context", "parent_id", "start_time", "duration",
+                 "attributes", "status", "error", "_started")
+
+    def __init__(self, name: str, kind: str, context: SpanContext, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.kind = kind
+        self.context = context
+        self.parent_id = parent_id
+        self.start_time = time.time()
+        self.duration: Optional[float] = None
+        self.attributes = dict(attributes) if attributes and context.sampled else {}
+        self.status = OK
+        self.error: Optional[str] = None
+        self._started = time.perf_counter()
+
+    @property
+    def recording(self) -> bool:
+        return self.context.sampled
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if self.context.sampled:
+            self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException) -> None:
+        if self.context.sampled:
+            self.status = ERROR
+            self.error = f"{type(exc).__name__}: {exc}"
+
+    def end(self) -> None:
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._started
+        if self.context.sampled:
+            _export(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time": self.start_time,
+            "duration_ms": (self.duration or 0.0) * 1000,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+            "service": settings.PROJECT_NAME,
+            "pid": os.getpid(),
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def recording() -> bool:
+    """Hay un span muestreado en curso (para no preparar atributos en balde)."""
+    span = _current_span.get()
+    return span is not None and span.context.sampled
+
+
+def current_traceparent() -> Optional[str]:
+    span = _current_span.get()
+    return format_traceparent(span.context) if span is not None else None
+
+
+class _RateLimiter:
+    """Cubo de tokens de trazas nuevas por segundo."""
+
+    def __init__(self):
+        self._tokens: Optional[float] = None  # El cubo empieza lleno
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self, per_second: float) -> bool:
+        if per_second <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            tokens = per_second if self._tokens is None else self._tokens + (now - self._updated) * per_second
+            self._tokens = min(per_second, tokens)
+            self._updated = now
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+
+_rate_limiter = _RateLimiter()
+
+
+def _sample_new_trace() -> bool:
+    if random.random() >= settings.TRACING_SAMPLE_RATE:
+        TRACES_STARTED.labels("ratio").inc()
+        return False
+    if not _rate_limiter.allow(settings.TRACING_MAX_TRACES_PER_SECOND):
+        TRACES_STARTED.labels("rate_limited").inc()
+        return False
+    TRACES_STARTED.labels("sampled").inc()
+    return True
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def begin_span(name: str, kind: str = INTERNAL, attributes: Optional[Dict[str, Any]] = None,
+               parent: Optional[SpanContext] = None, trust_parent: bool = True) -> Tuple[Optional[Span], Optional[Token]]:
+    """
+    Abre un span hijo de `parent` (un contexto remoto) o del span en curso y
+    lo deja como span en curso. Hay que cerrarlo con finish_span. Devuelve
+    (None, None) si no se crea ninguno: trazas desactivadas o dentro de una
+    traza local no muestreada, cuyo span sigue en curso para propagarse.
+    Con `trust_parent=False` (la cabecera de un cliente) el span es una raíz
+    local con el trace_id de `parent`: un cliente que envía el flag de
+    muestreo no se salta TRACING_SAMPLE_RATE ni el tope de trazas por segundo.
+    """
+    if not settings.TRACING_ENABLED:
+        return None, None
+    if parent is None:
+        current = _current_span.get()
+        if current is not None:
+            if not current.context.sampled:
+                return None, None
+            parent = current.context
+    if parent is None or not trust_parent:
+        trace_id = parent.trace_id if parent is not None else _new_id(128)
+        span = Span(name, kind, SpanContext(trace_id, _new_id(64), _sample_new_trace()), None, attributes)
+    else:
+        span = Span(name, kind, SpanContext(parent.trace_id, _new_id(64), parent.sampled), parent.span_id, attributes)
+    return span, _current_span.set(span)
+
+
+def finish_span(span: Optional[Span], token: Optional[Token]) -> None:
+    if span is None:
+        return
+    _current_span.reset(token)
+    span.end()
+
+
+class _NonRecordingSpan(Span):
+    """Lo que recibe `with start_span(...)` cuando no se crea un span."""
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__("", INTERNAL, SpanContext("0" * 32, "0" * 16, False))
+
+
+NON_RECORDING_SPAN = _NonRecordingSpan()
+
+
+@contextmanager
+def start_span(name: str, kind: str = INTERNAL, attributes: Optional[Dict[str, Any]] = None,
+               parent: Optional[SpanContext] = None) -> Iterator[Span]:
+    span, token = begin_span(name, kind, attributes, parent)
+    if span is None:
+        yield _current_span.get() or NON_RECORDING_SPAN
+        return
+    try:
+        yield span
+    except BaseException as e:
+        span.record_exception(e)
+        raise
+    finally:
+        finish_span(span, token)
+
+
+def traced(name: Optional[str] = None, kind: str = INTERNAL):
+    """Decorador: ejecuta la función (síncrona o corrutina) dentro de un span con su nombre."""
+    def decorator(fn: Callable):
+        span_name = name or fn.__qualname__
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with start_span(span_name, kind):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with start_span(span_name, kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_span(name: str, duration: float, kind: str = INTERNAL, attributes: Optional[Dict[str, Any]] = None,
+                error: Optional[str] = None) -> None:
+    """Span hijo del span en curso para una operación que acaba de terminar (p. ej. una sentencia SQL)."""
+    current = _current_span.get()
+    if current is None or not current.context.sampled:
+        return
+    span = Span(name, kind, SpanContext(current.context.trace_id, _new_id(64), True), current.context.span_id, attributes)
+    span.start_time -= duration
+    span.duration = duration
+    if error is not None:
+        span.status, span.error = ERROR, error
+    _export(span)
+
+
+# Exportadores
+class SpanExporter:
+    """Destino de los spans terminados. export() se llama en el hilo que cierra el span: debe ser rápido."""
+
+    def export(self, span: Span) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+
+class NoopSpanExporter(SpanExporter):
+    def export(self, span: Span) -> None:
+        pass
+
+
+class InMemorySpanExporter(SpanExporter):
+    """Los últimos `max_spans` spans del proceso."""
+
+    def __init__(self, max_spans: int):
+        self._spans: deque = deque(maxlen=max_spans)
+
+    def export(self, span: Span) -> None:
+        self._spans.append(span)
+
+    def spans(self, trace_id: Optional[str] = None) -> List[Span]:
+        spans = list(self._spans)
+        if trace_id is not None:
+            spans = [span for span in spans if span.context.trace_id == trace_id]
+        return sorted(spans, key=lambda span: span.start_time)
+
+    def roots(self, limit: int) -> List[Span]:
+        """Spans sin padre en este proceso (peticiones HTTP, tareas sin traza de origen), más recientes primero."""
+        roots = [span for span in self._spans if span.parent_id is None or span.kind == SERVER]
+        return sorted(roots, key=lambda span: span.start_time, reverse=True)[:limit]
+
+    def clear(self) -> None:
+        self._spans.clear()
+
+
+class FileSpanExporter(SpanExporter):
+    """JSON por línea en `path`; un hilo escribe para no bloquear la petición."""
+
+    def __init__(self, path: str, max_queue: int = 10000):
+        self.path = path
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._write_loop, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span.to_dict())
+        except queue.Full:
+            SPANS_DROPPED.inc()
+
+    def _write_loop(self) -> None:
+        with open(self.path, "a", encoding="utf-8") as output:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    return
+                output.write(json.dumps(record, default=str) + "\n")
+                if self._queue.empty():
+                    output.flush()
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+def _create_exporter(name: str) -> SpanExporter:
+    if name == "memory":
+        return InMemorySpanExporter(settings.TRACING_MEMORY_MAX_SPANS)
+    if name == "file":
+        return FileSpanExporter(settings.TRACING_FILE_PATH)
+    if name == "none":
+        return NoopSpanExporter()
+    module_name, _, attribute = name.partition(":")
+    if not attribute:
+        raise ValueError(f"TRACING_EXPORTER no válido: {name}")
+    return getattr(importlib.import_module(module_name), attribute)()
+
+
+_exporter: Optional[SpanExporter] = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter() -> SpanExporter:
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = _create_exporter(settings.TRACING_EXPORTER)
+                logger.info(f"Trazas con el exportador {type(_exporter).__name__}")
+    return _exporter
+
+
+def set_exporter(exporter: SpanExporter) -> None:
+    """Sustituye el exportador (p. ej. en tests o desde el arranque de un worker)."""
+    global _exporter
+    with _exporter_lock:
+        previous, _exporter = _exporter, exporter
+    if previous is not None:
+        previous.shutdown()
+
+
+def _export(span: Span) -> None:
+    try:
+        get_exporter().export(span)
+        SPANS_EXPORTED.inc()
+    except Exception as e:
+        SPANS_DROPPED.inc()
+        logger.warning(f"No se pudo exportar el span {span.name}: {str(e)}")
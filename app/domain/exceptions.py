@@ -0,0 +1,9 @@
+class VersionConflictError(Exception):
+    """
+    La entidad cambió desde que el cliente la leyó: su versión ya no
+    coincide con la esperada (concurrencia optimista).
+    """
+
+    def __init__(self, message: str, current_version: int):
+        super().__init__(message)
+        self.current_version = current_version
@@ -19,4 +19,40 @@ class TaskPriority(str, Enum):
     low = "low"
     medium = "medium"
     high = "high"
-    critical = "critical" 
\ No newline at end of file
+    critical = "critical"
+
+class RollupGranularity(str, Enum):
+    hour = "hour"
+    day = "day"
+
+class ProcessingOperation(str, Enum):
+    checksum = "checksum"
+    stats = "stats"
+    word_count = "word_count"
+
+# Operaciones que acepta ProcessingParams; sus funciones se registran en
+# app.infrastructure.celery.processing
+PROCESSING_OPERATIONS = frozenset(operation.value for operation in ProcessingOperation)
+
+class BatchMode(str, Enum):
+    atomic = "atomic"  # Todo o nada: el primer fallo deshace el lote
+    per_item = "per_item"  # Cada comando se confirma o deshace por separado
+
+# Códigos de almacenamiento de los enums (ver CompactEnum). Son parte del
+# esquema de la base de datos: no reutilizar ni cambiar valores existentes.
+# Las prioridades son ordinales para poder ordenar por prioridad en SQL.
+GENDER_CODES = {Gender.male: 1, Gender.female: 2}
+ROLE_CODES = {Role.admin: 1, Role.user: 2, Role.student: 3}
+TASK_STATUS_CODES = {
+    TaskStatus.pending: 1,
+    TaskStatus.in_progress: 2,
+    TaskStatus.completed: 3,
+    TaskStatus.failed: 4,
+}
+TASK_PRIORITY_CODES = {
+    TaskPriority.low: 1,
+    TaskPriority.medium: 2,
+    TaskPriority.high: 3,
+    TaskPriority.critical: 4,
+}
+ROLLUP_GRANULARITY_CODES = {RollupGranularity.hour: 1, RollupGranularity.day: 2}
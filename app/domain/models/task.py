@@ -1,28 +1,33 @@
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Enum as SQLEnum
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Index, Integer
 from sqlalchemy.orm import relationship
 from app.infrastructure.database import Base
-from app.domain.models.enums import TaskStatus, TaskPriority
+from app.infrastructure.types import GUID, CompactEnum
+from app.domain.models.enums import TaskStatus, TaskPriority, TASK_STATUS_CODES, TASK_PRIORITY_CODES
 import uuid
 from datetime import datetime
 
 class Task(Base):
     __tablename__ = "tasks"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     title = Column(String(255), nullable=False)
     description = Column(Text, nullable=True)
-    status = Column(SQLEnum(TaskStatus), default=TaskStatus.pending, nullable=False)
-    priority = Column(SQLEnum(TaskPriority), default=TaskPriority.medium, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    status = Column(CompactEnum(TaskStatus, TASK_STATUS_CODES), default=TaskStatus.pending, nullable=False)
+    priority = Column(CompactEnum(TaskPriority, TASK_PRIORITY_CODES), default=TaskPriority.medium, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)  # Ventanas de las agregaciones
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     completed_at = Column(DateTime, nullable=True)
+    due_at = Column(DateTime, nullable=True, index=True)
+    reminder_sent_at = Column(DateTime, nullable=True)  # Evita repetir el recordatorio tras reiniciar
     
-    # Clave foránea para el creador de la tarea
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    # Clave foránea para el creador de la tarea: borrar el usuario borra sus
+    # tareas en la base de datos, sin cargarlas en el ORM
+    user_id = Column(GUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     
-    # Clave foránea para el usuario asignado
-    assigned_to_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+    # Clave foránea para el usuario asignado. Sin ON DELETE SET NULL: SQL
+    # Server no admite dos acciones en cascada desde tasks hacia users
+    # ("multiple cascade paths"); UserRepository la pone a NULL con un UPDATE
+    assigned_to_id = Column(GUID(), ForeignKey("users.id"), nullable=True, index=True)
     
     # Establecer relaciones con nombres específicos y foreign_keys explícitas
     # El user es el creador de la tarea
@@ -32,4 +37,56 @@ class Task(Base):
     assigned_to = relationship("User", foreign_keys=[assigned_to_id], back_populates="assigned_tasks")
     
     # ID de la tarea en Celery (si es una tarea asíncrona)
-    celery_task_id = Column(String(255), nullable=True) 
\ No newline at end of file
+    celery_task_id = Column(String(255), nullable=True)
+    
+    # Concurrencia optimista: cada escritura incrementa la versión
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __table_args__ = (
+        # Candidatas a archivar: completadas por antigüedad
+        Index("ix_tasks_status_completed_at", "status", "completed_at"),
+    )
+    # Las escrituras del ORM también comprueban e incrementan la versión
+    __mapper_args__ = {"version_id_col": version}
+
+class ArchivedTask(Base):
+    """
+    Tareas completadas que el job de archivado saca de `tasks`. Mismas
+    columnas que Task más `archived_at`; sin claves foráneas para que el
+    archivo no frene los borrados de usuarios ni las escrituras en `tasks`.
+    """
+    __tablename__ = "tasks_archive"
+
+    id = Column(GUID(), primary_key=True)
+    title = Column(String(255), nullable=False)
+    description = Column(Text, nullable=True)
+    status = Column(CompactEnum(TaskStatus, TASK_STATUS_CODES), nullable=False)
+    priority = Column(CompactEnum(TaskPriority, TASK_PRIORITY_CODES), nullable=False)
+    # Índices por fecha para el backfill de las agregaciones (analytics)
+    created_at = Column(DateTime, nullable=False, index=True)
+    updated_at = Column(DateTime, nullable=False)
+    completed_at = Column(DateTime, nullable=True, index=True)
+    due_at = Column(DateTime, nullable=True)
+    reminder_sent_at = Column(DateTime, nullable=True)
+    user_id = Column(GUID(), nullable=False, index=True)
+    assigned_to_id = Column(GUID(), nullable=True, index=True)
+    celery_task_id = Column(String(255), nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # Solo lectura y sin FK: permiten ?expand= también sobre tareas archivadas
+    user = relationship("User", primaryjoin="foreign(ArchivedTask.user_id) == User.id", viewonly=True)
+    assigned_to = relationship("User", primaryjoin="foreign(ArchivedTask.assigned_to_id) == User.id", viewonly=True)
+
+# Cola de trabajo de POST /tasks/claim-next: pendientes por prioridad
+# descendente y antigüedad, en el mismo orden que el ORDER BY del claim. Incluye
+# las columnas del filtro para resolver la búsqueda sin leer la fila (la clave
+# primaria ya forma parte de cualquier índice)
+Index(
+    "ix_tasks_claim_next", Task.status, Task.priority.desc(), Task.created_at,
+    mssql_include=["user_id", "assigned_to_id"],
+    postgresql_include=["user_id", "assigned_to_id"],
+)
+
+# Columnas que se copian de `tasks` a `tasks_archive`
+ARCHIVED_COLUMNS = [column.name for column in Task.__table__.columns]
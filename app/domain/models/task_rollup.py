@@ -0,0 +1,58 @@
+from sqlalchemy import Column, String, DateTime, Index, Integer, Float, SmallInteger
+from app.infrastructure.database import Base
+from app.infrastructure.types import GUID, CompactEnum
+from app.domain.models.enums import (
+    TaskPriority, RollupGranularity, TASK_PRIORITY_CODES, ROLLUP_GRANULARITY_CODES
+)
+from datetime import datetime
+
+class TaskRollup(Base):
+    """
+    Actividad de tareas por franja (hora o día UTC), creador y prioridad:
+    creadas, completadas y suma de segundos de created_at a completed_at de
+    las completadas. Lo mantiene el job roll_up_task_analytics.
+    """
+    __tablename__ = "task_rollups"
+
+    granularity = Column(CompactEnum(RollupGranularity, ROLLUP_GRANULARITY_CODES), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    user_id = Column(GUID(), primary_key=True)
+    priority = Column(CompactEnum(TaskPriority, TASK_PRIORITY_CODES), primary_key=True)
+    created_count = Column(Integer, nullable=False, default=0)
+    completed_count = Column(Integer, nullable=False, default=0)
+    completion_seconds_sum = Column(Float, nullable=False, default=0.0)
+
+    # La clave primaria sirve los rangos de fechas; este índice, los de un usuario
+    __table_args__ = (
+        Index("ix_task_rollups_user_bucket", "granularity", "user_id", "bucket_start"),
+    )
+
+class TaskCompletionTimeRollup(Base):
+    """
+    Histograma del tiempo de resolución (created_at a completed_at) por
+    franja y prioridad, con los intervalos de COMPLETION_TIME_BINS. Permite
+    estimar la mediana sin leer las tareas.
+    """
+    __tablename__ = "task_completion_time_rollups"
+
+    granularity = Column(CompactEnum(RollupGranularity, ROLLUP_GRANULARITY_CODES), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    priority = Column(CompactEnum(TaskPriority, TASK_PRIORITY_CODES), primary_key=True)
+    bin = Column(SmallInteger, primary_key=True)
+    completed_count = Column(Integer, nullable=False, default=0)
+
+class RollupWatermark(Base):
+    """Instante hasta el que un job incremental ha procesado los cambios (incluido)."""
+    __tablename__ = "rollup_watermarks"
+
+    name = Column(String(64), primary_key=True)
+    value = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+# Límites superiores (segundos) de los intervalos del histograma de tiempo de
+# resolución; el último intervalo no tiene límite. Parte del esquema: cambiarlos
+# exige reconstruir las agregaciones con el backfill
+COMPLETION_TIME_BINS = (
+    60, 300, 900, 1800, 3600, 2 * 3600, 4 * 3600, 8 * 3600, 86400,
+    2 * 86400, 4 * 86400, 7 * 86400, 14 * 86400, 30 * 86400, 60 * 86400, 90 * 86400,
+)
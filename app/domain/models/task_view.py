@@ -0,0 +1,75 @@
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Index, Integer
+from app.infrastructure.database import Base
+from app.infrastructure.types import GUID, CompactEnum
+from app.domain.models.enums import TaskStatus, TaskPriority, TASK_STATUS_CODES, TASK_PRIORITY_CODES
+from datetime import datetime
+
+class TaskView(Base):
+    """
+    Modelo de lectura (CQRS) de las tareas activas: las columnas de Task más
+    los datos de presentación del creador y del asignado, para listar sin
+    joins ni locks sobre `tasks`. Solo lo escribe TaskViewProjector.
+
+    La clave foránea a `tasks` con ON DELETE CASCADE borra la fila al borrar,
+    archivar o purgar la tarea, también en los borrados en bloque que no
+    publican eventos. No tiene claves foráneas a `users`.
+    """
+    __tablename__ = "task_view"
+
+    id = Column(GUID(), ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True)
+    title = Column(String(255), nullable=False)
+    description = Column(Text, nullable=True)
+    status = Column(CompactEnum(TaskStatus, TASK_STATUS_CODES), nullable=False)
+    priority = Column(CompactEnum(TaskPriority, TASK_PRIORITY_CODES), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+    completed_at = Column(DateTime, nullable=True)
+    due_at = Column(DateTime, nullable=True)
+    celery_task_id = Column(String(255), nullable=True)
+    version = Column(Integer, nullable=False)
+
+    # Creador y asignado desnormalizados (UserSummary)
+    user_id = Column(GUID(), nullable=False)
+    user_email = Column(String, nullable=True)
+    user_first_name = Column(String, nullable=True)
+    user_last_name = Column(String, nullable=True)
+    assigned_to_id = Column(GUID(), nullable=True)
+    assigned_to_email = Column(String, nullable=True)
+    assigned_to_first_name = Column(String, nullable=True)
+    assigned_to_last_name = Column(String, nullable=True)
+
+    projected_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # Un índice por forma de GetTasksQuery, con created_at al final para
+    # devolver la página ya ordenada. Las combinaciones que faltan (p. ej.
+    # status + priority) usan el índice del primer filtro y filtran el resto
+    __table_args__ = (
+        Index("ix_task_view_created_at", "created_at"),
+        Index("ix_task_view_user_created_at", "user_id", "created_at"),
+        Index("ix_task_view_user_status_created_at", "user_id", "status", "created_at"),
+        Index("ix_task_view_user_priority_created_at", "user_id", "priority", "created_at"),
+        Index("ix_task_view_assigned_status_created_at", "assigned_to_id", "status", "created_at"),
+        Index("ix_task_view_status_created_at", "status", "created_at"),
+        Index("ix_task_view_priority_created_at", "priority", "created_at"),
+    )
+
+    # Mismas relaciones que Task para ?expand=, resueltas sin consultas
+    @property
+    def user(self):
+        return _summary(self.user_id, self.user_email, self.user_first_name, self.user_last_name)
+
+    @property
+    def assigned_to(self):
+        return _summary(self.assigned_to_id, self.assigned_to_email, self.assigned_to_first_name,
+                        self.assigned_to_last_name)
+
+def _summary(user_id, email, first_name, last_name):
+    if user_id is None or email is None:
+        return None
+    return {"id": user_id, "email": email, "first_name": first_name, "last_name": last_name}
+
+# Columnas de Task que se copian tal cual al modelo de lectura
+TASK_VIEW_TASK_COLUMNS = [
+    "id", "title", "description", "status", "priority", "created_at", "updated_at",
+    "completed_at", "due_at", "celery_task_id", "version", "user_id", "assigned_to_id",
+]
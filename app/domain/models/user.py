@@ -1,24 +1,29 @@
-from sqlalchemy import Column, String, Enum as SQLEnum
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String
 from sqlalchemy.orm import relationship
 from app.infrastructure.database import Base
-from app.domain.models.enums import Gender, Role
+from app.infrastructure.types import GUID, CompactEnum
+from app.domain.models.enums import Gender, Role, GENDER_CODES, ROLE_CODES
 import uuid
 
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
     middle_name = Column(String, nullable=True)
-    gender = Column(SQLEnum(Gender), nullable=False)
-    roles = Column(SQLEnum(Role), nullable=False)
+    gender = Column(CompactEnum(Gender, GENDER_CODES), nullable=False)
+    roles = Column(CompactEnum(Role, ROLE_CODES), nullable=False)
     
     # Relación con las tareas creadas por el usuario (usuario como creador)
-    created_tasks = relationship("Task", foreign_keys="Task.user_id", back_populates="user", cascade="all, delete-orphan")
+    # passive_deletes: al borrar el usuario no se cargan sus tareas; las
+    # borra el ON DELETE CASCADE de la base de datos
+    created_tasks = relationship("Task", foreign_keys="Task.user_id", back_populates="user",
+                                 cascade="all, delete-orphan", passive_deletes=True)
     
     # Relación con las tareas asignadas al usuario (usuario como responsable)
-    assigned_tasks = relationship("Task", foreign_keys="Task.assigned_to_id", back_populates="assigned_to") 
\ No newline at end of file
+    # Las asignaciones se anulan con un UPDATE en bloque (UserRepository.delete)
+    assigned_tasks = relationship("Task", foreign_keys="Task.assigned_to_id", back_populates="assigned_to",
+                                  passive_deletes=True) 
\ No newline at end of file
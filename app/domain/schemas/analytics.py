@@ -0,0 +1,49 @@
+from pydantic import BaseModel, model_validator
+from typing import Optional, List
+from uuid import UUID
+from datetime import datetime, timedelta
+from app.domain.models.enums import TaskPriority, RollupGranularity
+from app.domain.schemas.task import to_naive_utc
+
+# Rango máximo por consulta, para que la respuesta siga siendo pequeña
+MAX_ANALYTICS_RANGE = {
+    RollupGranularity.hour: timedelta(days=31),
+    RollupGranularity.day: timedelta(days=366 * 2),
+}
+
+class GetTaskAnalyticsQuery(BaseModel):
+    start: datetime
+    end: datetime
+    granularity: RollupGranularity = RollupGranularity.day
+    user_id: Optional[UUID] = None  # Solo la actividad de este creador
+
+    @model_validator(mode="after")
+    def _check_range(self):
+        self.start = to_naive_utc(self.start)
+        self.end = to_naive_utc(self.end)
+        if self.end <= self.start:
+            raise ValueError("end debe ser posterior a start")
+        if self.end - self.start > MAX_ANALYTICS_RANGE[self.granularity]:
+            raise ValueError(f"Rango máximo para granularity={self.granularity.value}: "
+                             f"{MAX_ANALYTICS_RANGE[self.granularity].days} días")
+        return self
+
+class TaskActivityBucket(BaseModel):
+    bucket_start: datetime
+    user_id: UUID
+    created: int
+    completed: int
+
+class CompletionTimeStats(BaseModel):
+    priority: TaskPriority
+    completed: int
+    median_seconds: Optional[float] = None  # Aproximada con el histograma; None si se filtra por usuario
+    mean_seconds: Optional[float] = None
+
+class TaskAnalytics(BaseModel):
+    granularity: RollupGranularity
+    start: datetime
+    end: datetime
+    watermark: Optional[datetime] = None  # Datos completos hasta este instante
+    activity: List[TaskActivityBucket]
+    completion_time: List[CompletionTimeStats]
@@ -0,0 +1,52 @@
+from pydantic import BaseModel, Field
+from typing import Annotated, Optional, List, Literal, Union
+from uuid import UUID
+from app.domain.models.enums import BatchMode
+from app.domain.schemas.task import Task, TaskCreate, TaskUpdate
+
+# Máximo de comandos por lote de POST /commands/batch
+MAX_BATCH_COMMANDS = 100
+
+# Comandos del lote tal como los envía el cliente. El usuario y el rol se
+# toman del token al construir los comandos de TaskService
+class BatchCreateTask(TaskCreate):
+    type: Literal["create"]
+
+class BatchUpdateTask(TaskUpdate):
+    type: Literal["update"]
+    task_id: UUID
+    expected_version: Optional[int] = None  # Equivalente al If-Match de PUT /tasks/{id}
+
+class BatchAssignTask(BaseModel):
+    type: Literal["assign"]
+    task_id: UUID
+    assignee_id: UUID
+
+class BatchCompleteTask(BaseModel):
+    type: Literal["complete"]
+    task_id: UUID
+
+class BatchDeleteTask(BaseModel):
+    type: Literal["delete"]
+    task_id: UUID
+
+BatchCommand = Annotated[
+    Union[BatchCreateTask, BatchUpdateTask, BatchAssignTask, BatchCompleteTask, BatchDeleteTask],
+    Field(discriminator="type"),
+]
+
+class CommandBatchRequest(BaseModel):
+    commands: List[BatchCommand] = Field(..., min_length=1, max_length=MAX_BATCH_COMMANDS)
+    mode: BatchMode = BatchMode.atomic
+
+class CommandResult(BaseModel):
+    index: int
+    type: str
+    status: int  # Código HTTP que habría devuelto el endpoint individual; 424 si no se ejecutó
+    task: Optional[Task] = None
+    error: Optional[str] = None
+
+class CommandBatchResponse(BaseModel):
+    mode: BatchMode
+    committed: bool  # atomic: si se confirmó el lote; per_item: si se confirmó al menos un comando
+    results: List[CommandResult]
@@ -0,0 +1,55 @@
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+from datetime import datetime
+
+# Agrupación de tracemalloc: por línea, por fichero o por traza completa
+MemoryGrouping = Literal["lineno", "filename", "traceback"]
+
+class MemoryStat(BaseModel):
+    location: str
+    size_bytes: int
+    count: int
+    size_diff_bytes: Optional[int] = None  # Solo en las diferencias
+    count_diff: Optional[int] = None
+    source: Optional[str] = None
+    traceback: Optional[List[str]] = None  # Solo con group_by=traceback
+
+class MemorySnapshotRef(BaseModel):
+    id: int
+    taken_at: datetime
+
+class MemorySnapshot(MemorySnapshotRef):
+    traced_current_bytes: int
+    traced_peak_bytes: int
+    top: List[MemoryStat]
+
+class MemoryDiff(BaseModel):
+    base_id: int
+    target_id: int
+    elapsed_seconds: float
+    size_diff_bytes: int
+    top: List[MemoryStat]
+
+class MemoryStatus(BaseModel):
+    tracing: bool
+    frames: int
+    traced_current_bytes: int
+    traced_peak_bytes: int
+    snapshots: List[MemorySnapshotRef]
+
+class ThreadStack(BaseModel):
+    name: str
+    ident: Optional[int] = None
+    daemon: bool
+    stack: List[str]
+
+class AsyncioTaskStack(BaseModel):
+    name: str
+    coroutine: str
+    done: bool
+    stack: List[str]
+
+class StackDump(BaseModel):
+    pid: int
+    threads: List[ThreadStack]
+    asyncio_tasks: List[AsyncioTaskStack]
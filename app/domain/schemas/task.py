@@ -1,16 +1,52 @@
-from pydantic import BaseModel
-from typing import Optional
+from functools import lru_cache
+from pydantic import BaseModel, Field, TypeAdapter, create_model, field_validator
+from typing import Optional, List, Any, FrozenSet, Type
 from uuid import UUID
-from datetime import datetime
-from app.domain.models.enums import TaskStatus, TaskPriority
+from datetime import datetime, timezone
+from app.core.config import settings
+from app.domain.models.enums import TaskStatus, TaskPriority, PROCESSING_OPERATIONS
+from app.domain.schemas.user import UserSummary
+
+# Máximo de ids por petición de batch-get
+MAX_BATCH_GET_IDS = 500
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Las fechas se guardan como UTC sin zona (como datetime.utcnow)
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
 
 class TaskBase(BaseModel):
     title: str
     description: Optional[str] = None
     priority: TaskPriority = TaskPriority.medium
 
+class ProcessingParams(BaseModel):
+    """
+    Trabajo de procesamiento en segundo plano de una tarea: `operation` se
+    aplica a cada elemento de `items`, que se reparten en bloques de
+    `chunk_size` procesados en paralelo por los workers.
+    """
+    operation: str = "checksum"
+    # Los elementos viajan en el mensaje del broker: acotar su número
+    items: List[Any] = Field(default_factory=list, max_length=settings.PROCESSING_MAX_ITEMS)
+    chunk_size: int = Field(500, ge=1, le=100_000)
+    cpu_bound: bool = False  # Ejecutar cada bloque en el pool de procesos del worker
+
+    @field_validator("operation")
+    @classmethod
+    def _check_operation(cls, value: str) -> str:
+        # Rechazar al encolar (422) en lugar de fallar después en el worker
+        if value not in PROCESSING_OPERATIONS:
+            raise ValueError(f"Operación desconocida: {value}. Disponibles: {', '.join(sorted(PROCESSING_OPERATIONS))}")
+        return value
+
 class TaskCreate(TaskBase):
     assigned_to_id: Optional[UUID] = None
+    due_at: Optional[datetime] = None
+    processing_params: Optional[ProcessingParams] = None
+
+    _due_at_utc = field_validator("due_at")(to_naive_utc)
 
 class TaskUpdate(BaseModel):
     title: Optional[str] = None
@@ -18,6 +54,9 @@ class TaskUpdate(BaseModel):
     status: Optional[TaskStatus] = None
     priority: Optional[TaskPriority] = None
     assigned_to_id: Optional[UUID] = None
+    due_at: Optional[datetime] = None
+
+    _due_at_utc = field_validator("due_at")(to_naive_utc)
 
 class TaskInDB(TaskBase):
     id: UUID
@@ -27,7 +66,9 @@ class TaskInDB(TaskBase):
     created_at: datetime
     updated_at: datetime
     completed_at: Optional[datetime] = None
+    due_at: Optional[datetime] = None
     celery_task_id: Optional[str] = None
+    version: int = 1
 
     class Config:
         from_attributes = True
@@ -35,26 +76,87 @@ class TaskInDB(TaskBase):
 class Task(TaskInDB):
     pass
 
+class TaskWithUsers(Task):
+    user: Optional[UserSummary] = None
+    assigned_to: Optional[UserSummary] = None
+
+# Relaciones que se pueden incrustar con ?expand=
+TASK_EXPANSIONS = ("user", "assigned_to")
+
+def parse_expand(value: Optional[str]) -> FrozenSet[str]:
+    """Convierte `?expand=user,assigned_to` en un conjunto validado."""
+    if not value:
+        return frozenset()
+    expand = frozenset(part.strip() for part in value.split(",") if part.strip())
+    unknown = expand.difference(TASK_EXPANSIONS)
+    if unknown:
+        raise ValueError(f"expand no soportado: {', '.join(sorted(unknown))}. Valores válidos: {', '.join(TASK_EXPANSIONS)}")
+    return expand
+
+@lru_cache(maxsize=None)
+def expanded_task_schema(expand: FrozenSet[str]) -> Type[Task]:
+    """
+    Esquema de respuesta de Task con las relaciones de `expand` incrustadas.
+    Se crea una vez por combinación: construir modelos de pydantic es caro.
+    """
+    if not expand:
+        return Task
+    fields = {name: (Optional[UserSummary], None) for name in sorted(expand)}
+    return create_model(f"TaskExpanded_{'_'.join(sorted(expand))}", __base__=Task, **fields)
+
+@lru_cache(maxsize=None)
+def expanded_task_adapter(expand: FrozenSet[str], many: bool) -> TypeAdapter:
+    schema = expanded_task_schema(expand)
+    return TypeAdapter(List[schema] if many else schema)
+
+class TaskBatchGetRequest(BaseModel):
+    ids: List[UUID] = Field(..., min_length=1, max_length=MAX_BATCH_GET_IDS)
+    include_users: bool = False  # Incrustar creador y asignado (una consulta extra en total)
+
+class TaskBatchGetResponse(BaseModel):
+    tasks: List[TaskWithUsers]
+    not_found: List[UUID] = []
+    forbidden: List[UUID] = []
+
 # Esquemas para CQRS - Comandos
 class CreateTaskCommand(TaskCreate):
     user_id: UUID
+    needs_background_processing: bool = False
 
 class UpdateTaskCommand(TaskUpdate):
     task_id: UUID
+    user_id: UUID
+    is_admin: bool = False
+    expected_version: Optional[int] = None  # If-Match del cliente; None = última escritura gana
 
 class DeleteTaskCommand(BaseModel):
     task_id: UUID
+    user_id: UUID
+    is_admin: bool = False
 
 class AssignTaskCommand(BaseModel):
     task_id: UUID
-    assigned_to_id: UUID
+    assigner_id: UUID
+    assignee_id: UUID
+    is_admin: bool = False
+
+class ClaimNextTaskCommand(BaseModel):
+    assignee_id: UUID
+    is_admin: bool = False
+    priority: Optional[TaskPriority] = None  # Solo tareas de esta prioridad
+    created_by_id: Optional[UUID] = None  # Solo tareas de este creador
 
 class CompleteTaskCommand(BaseModel):
     task_id: UUID
+    user_id: UUID
+    is_admin: bool = False
 
 # Esquemas para CQRS - Consultas
 class GetTaskQuery(BaseModel):
     task_id: UUID
+    user_id: UUID
+    is_admin: bool = False
+    expand: FrozenSet[str] = frozenset()
 
 class GetTasksQuery(BaseModel):
     user_id: Optional[UUID] = None
@@ -62,4 +164,12 @@ class GetTasksQuery(BaseModel):
     status: Optional[TaskStatus] = None
     priority: Optional[TaskPriority] = None
     skip: int = 0
-    limit: int = 100 
\ No newline at end of file
+    limit: int = 100
+    include_archived: bool = False  # Incluir también las tareas de tasks_archive
+    expand: FrozenSet[str] = frozenset()  # Relaciones a cargar (ver TASK_EXPANSIONS)
+
+class BatchGetTasksQuery(BaseModel):
+    task_ids: List[UUID]
+    user_id: UUID
+    is_admin: bool = False
+    include_users: bool = False
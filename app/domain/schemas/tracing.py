@@ -0,0 +1,29 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+
+class SpanRecord(BaseModel):
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    name: str
+    kind: str
+    start_time: datetime
+    duration_ms: float
+    status: str
+    error: Optional[str] = None
+    attributes: Dict[str, Any]
+    service: str
+    pid: int
+
+class TraceSummary(BaseModel):
+    trace_id: str
+    name: str  # Span raíz en este proceso, p. ej. "POST /api/v1/tasks"
+    start_time: datetime
+    duration_ms: float
+    status: str
+    span_count: int
+
+class Trace(BaseModel):
+    trace_id: str
+    spans: List[SpanRecord]  # Por orden de inicio; parent_id forma el árbol
@@ -35,9 +35,24 @@ class User(UserBase):
     class Config:
         from_attributes = True
 
+class UserSummary(BaseModel):
+    """Datos públicos de un usuario para incrustar en otras respuestas."""
+    id: UUID
+    email: EmailStr
+    first_name: str
+    last_name: str
+
+    class Config:
+        from_attributes = True
+
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None  # Segundos de validez del access token
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     email: Optional[str] = None 
\ No newline at end of file
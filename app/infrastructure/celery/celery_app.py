@@ -1,11 +1,20 @@
 from celery import Celery
+from kombu import Queue
 from app.core.config import settings
+from app.infrastructure.celery.routing import (
+    BROKER_PRIORITIES, MAINTENANCE_QUEUE, NOTIFICATIONS_QUEUE, PROCESSING_QUEUE_ORDER, PROCESSING_QUEUES,
+    PROJECTIONS_QUEUE
+)
+from app.domain.models.enums import TaskPriority
+# Registra los handlers de señales que propagan las trazas en los mensajes
+from app.infrastructure.celery import tracing as _tracing  # noqa: F401
 
 celery_app = Celery(
     "app",
     broker=settings.CELERY_BROKER_URL,
     backend=settings.CELERY_RESULT_BACKEND,
-    include=["app.infrastructure.celery.tasks"]
+    # control: comandos de profiling del worker (ver control.py)
+    include=["app.infrastructure.celery.tasks", "app.infrastructure.celery.control"]
 )
 
 # Configuración opcional
@@ -15,4 +24,46 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
-) 
\ No newline at end of file
+    task_always_eager=settings.CELERY_TASK_ALWAYS_EAGER,
+    result_expires=settings.CELERY_RESULT_EXPIRES_SECONDS,
+    worker_prefetch_multiplier=settings.CELERY_WORKER_PREFETCH_MULTIPLIER,
+    # Colas dedicadas por prioridad y para notificaciones (ver routing.py)
+    task_queues=[
+        Queue(name, queue_arguments={"x-max-priority": 10}) for name in PROCESSING_QUEUE_ORDER
+    ] + [Queue(name, queue_arguments={"x-max-priority": 10}) for name in (NOTIFICATIONS_QUEUE, MAINTENANCE_QUEUE, PROJECTIONS_QUEUE)],
+    task_default_queue=PROCESSING_QUEUES[TaskPriority.medium],
+    task_routes={
+        "app.infrastructure.celery.tasks.send_task_notification": {"queue": NOTIFICATIONS_QUEUE},
+        "app.infrastructure.celery.tasks.archive_completed_tasks": {"queue": MAINTENANCE_QUEUE},
+        "app.infrastructure.celery.tasks.purge_user": {"queue": MAINTENANCE_QUEUE},
+        "app.infrastructure.celery.tasks.roll_up_task_analytics": {"queue": MAINTENANCE_QUEUE},
+        "app.infrastructure.celery.tasks.project_task_view": {"queue": PROJECTIONS_QUEUE},
+        "app.infrastructure.celery.tasks.refresh_task_view_user": {"queue": PROJECTIONS_QUEUE},
+    },
+    task_default_priority=BROKER_PRIORITIES[TaskPriority.medium],
+    # Redis/memoria: consumir las colas en el orden declarado en -Q en lugar
+    # de round robin, y respetar la prioridad de mensaje dentro de cada cola
+    broker_transport_options={
+        "queue_order_strategy": "priority",
+        "priority_steps": list(range(10)),
+        "sep": ":",
+    },
+)
+
+# Jobs periódicos (celery beat)
+beat_schedule = {}
+if settings.ARCHIVE_ENABLED:
+    beat_schedule["archive-completed-tasks"] = {
+        "task": "app.infrastructure.celery.tasks.archive_completed_tasks",
+        "schedule": settings.ARCHIVE_INTERVAL_SECONDS,
+        # Si beat se retrasa no tiene sentido acumular ejecuciones
+        "options": {"expires": settings.ARCHIVE_INTERVAL_SECONDS},
+    }
+if settings.ANALYTICS_ROLLUP_ENABLED:
+    beat_schedule["roll-up-task-analytics"] = {
+        "task": "app.infrastructure.celery.tasks.roll_up_task_analytics",
+        "schedule": settings.ANALYTICS_ROLLUP_INTERVAL_SECONDS,
+        # El watermark recoge lo pendiente en la siguiente ejecución
+        "options": {"expires": settings.ANALYTICS_ROLLUP_INTERVAL_SECONDS},
+    }
+celery_app.conf.beat_schedule = beat_schedule
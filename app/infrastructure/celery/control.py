@@ -0,0 +1,117 @@
+"""
+Comandos de control remoto de Celery para perfilar un worker en marcha
+(equivalentes a los endpoints /admin/profiling de la API, ver
+app.core.profiling):
+
+    celery -A app.infrastructure.celery.celery_app control profile_cpu 30 10 -d celery@host
+    celery -A app.infrastructure.celery.celery_app inspect profile_cpu_result collapsed -d celery@host
+    celery -A app.infrastructure.celery.celery_app control memory_start 10
+    celery -A app.infrastructure.celery.celery_app control memory_snapshot 20
+    celery -A app.infrastructure.celery.celery_app inspect memory_diff 1 2
+    celery -A app.infrastructure.celery.celery_app control memory_stop
+    celery -A app.infrastructure.celery.celery_app inspect dump_stacks
+
+Los comandos los atiende el proceso principal del worker y no deben
+bloquearlo: profile_cpu arranca el muestreo en segundo plano y el resultado
+se recoge después con profile_cpu_result. Con --pool=threads o --pool=solo
+(los recomendados para el procesamiento) las tareas se ejecutan en ese
+proceso; con prefork se ejecutan en los hijos y no aparecen en el profile.
+"""
+import os
+from datetime import datetime
+from celery.worker.control import control_command, inspect_command, nok, ok
+from app.core import profiling
+
+
+def _jsonable(value):
+    """Fechas en ISO 8601 para que la respuesta se lea igual desde la CLI."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_jsonable(item) for item in value]
+    return value
+
+
+@control_command(
+    args=[("seconds", float), ("interval_ms", float)],
+    signature="[seconds=10] [interval_ms=10]",
+)
+def profile_cpu(state, seconds=10.0, interval_ms=10.0, **kwargs):
+    """Inicia un profile de CPU por muestreo de este proceso del worker."""
+    try:
+        profiling.start_cpu_profile(seconds, interval_ms / 1000)
+    except (profiling.ProfilerBusyError, ValueError) as e:
+        return nok(str(e))
+    return ok(f"Profile de CPU de {seconds} s iniciado en el proceso {os.getpid()}")
+
+
+@inspect_command(
+    args=[("output_format", str)],
+    signature="[format=collapsed]",
+)
+def profile_cpu_result(state, output_format=profiling.COLLAPSED, **kwargs):
+    """Devuelve el último profile de CPU terminado (collapsed o JSON de speedscope)."""
+    if output_format not in profiling.PROFILE_FORMATS:
+        return nok(f"Formato no soportado: {output_format}. Valores válidos: {', '.join(profiling.PROFILE_FORMATS)}")
+    active, last = profiling.last_cpu_profile()
+    if active is not None:
+        return nok(f"Profile de CPU en curso: faltan {max(0.0, active.seconds - active.result().duration):.1f} s")
+    if last is None:
+        return nok("No hay ningún profile de CPU terminado")
+    profile = last.result()
+    return ok({
+        "started_at": profile.started_at.isoformat(),
+        "duration_seconds": profile.duration,
+        "samples": profile.samples,
+        "unit": profile.unit,
+        "profile": profile.render(output_format),
+    })
+
+
+@control_command(
+    args=[("frames", int)],
+    signature="[frames=10]",
+)
+def memory_start(state, frames=10, **kwargs):
+    """Activa tracemalloc en este proceso del worker."""
+    profiling.start_memory_tracing(frames)
+    return ok(_jsonable(profiling.memory_status()))
+
+
+@control_command(
+    args=[("limit", int), ("group_by", str)],
+    signature="[limit=20] [group_by=lineno]",
+)
+def memory_snapshot(state, limit=20, group_by="lineno", **kwargs):
+    """Toma un snapshot de tracemalloc y devuelve sus mayores consumidores."""
+    try:
+        return ok(_jsonable(profiling.take_memory_snapshot(limit, group_by)))
+    except ValueError as e:
+        return nok(str(e))
+
+
+@inspect_command(
+    args=[("base", int), ("target", int), ("limit", int), ("group_by", str)],
+    signature="<base> [target=last] [limit=20] [group_by=lineno]",
+)
+def memory_diff(state, base, target=None, limit=20, group_by="lineno", **kwargs):
+    """Compara dos snapshots de tracemalloc (crecimiento desde `base`)."""
+    try:
+        return ok(_jsonable(profiling.diff_memory_snapshots(base, target, limit, group_by)))
+    except (LookupError, ValueError) as e:
+        return nok(str(e))
+
+
+@control_command()
+def memory_stop(state, **kwargs):
+    """Desactiva tracemalloc y descarta sus snapshots."""
+    profiling.stop_memory_tracing()
+    return ok("tracemalloc desactivado")
+
+
+@inspect_command()
+def dump_stacks(state, **kwargs):
+    """Vuelca la pila de cada hilo de este proceso del worker."""
+    return ok({"pid": os.getpid(), "threads": profiling.dump_thread_stacks()})
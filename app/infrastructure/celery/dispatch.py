@@ -0,0 +1,55 @@
+import importlib
+from typing import NamedTuple, Optional
+from uuid import uuid4
+from app.core import after_commit, tracing
+from app.core.metrics import Histogram
+from app.domain.models.enums import TaskPriority
+from app.infrastructure.celery.routing import route_options
+
+CELERY_ENQUEUE_DURATION = Histogram(
+    "celery_enqueue_duration_seconds",
+    "Time spent publishing a Celery task to the broker.",
+    ["task"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+
+# Celery y el módulo de tareas se importan en el primer encolado, no al
+# importar los servicios, para que el arranque de la API sea rápido
+TASKS_MODULE = "app.infrastructure.celery.tasks"
+
+
+def get_task(name: str):
+    return getattr(importlib.import_module(TASKS_MODULE), name)
+
+
+class PendingTask(NamedTuple):
+    """Tarea diferida hasta el commit de la transacción externa; su id ya es el definitivo."""
+    id: str
+
+
+def enqueue(task_name: str, *args, priority: Optional[TaskPriority] = None, **kwargs):
+    """
+    Encola una tarea de Celery por nombre en la cola que le corresponde según
+    su tipo y prioridad, midiendo el tiempo de publicación en el broker.
+    Dentro de una transacción externa (ver app.core.after_commit) la
+    publicación se aplaza hasta su commit y se devuelve un PendingTask.
+    """
+    if after_commit.active():
+        task_id = str(uuid4())
+        after_commit.defer(_publish, task_name, args, kwargs, priority, task_id)
+        return PendingTask(task_id)
+    return _publish(task_name, args, kwargs, priority)
+
+
+def _publish(task_name: str, args: tuple, kwargs: dict, priority: Optional[TaskPriority], task_id: Optional[str] = None):
+    task = get_task(task_name)
+    options = route_options(task_name, priority)
+    if task_id is not None:
+        options["task_id"] = task_id
+    # La cabecera traceparent la añade el handler de before_task_publish (ver celery/tracing.py)
+    with tracing.start_span(f"celery.publish {task_name}", tracing.PRODUCER,
+                            {"celery.task": task_name, "celery.queue": options.get("queue")}) as span:
+        with CELERY_ENQUEUE_DURATION.labels(task_name).time():
+            result = task.apply_async(args=args, kwargs=kwargs, **options)
+        span.set_attribute("celery.task_id", result.id)
+        return result
@@ -0,0 +1,131 @@
+"""
+Operaciones del pipeline de procesamiento de tareas.
+
+Cada operación define una función `map` que procesa un elemento y una
+función `reduce` que combina los resultados parciales de los bloques. Las
+funciones son de nivel de módulo para poder enviarse a un pool de procesos.
+Este módulo no importa Celery.
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from app.core.config import settings
+from app.domain.models.enums import PROCESSING_OPERATIONS, ProcessingOperation
+
+logger = logging.getLogger(__name__)
+
+
+class Operation(NamedTuple):
+    map_item: Callable[[Any], Any]
+    reduce_chunk: Callable[[List[Any]], Any]    # resultados de un bloque -> parcial
+    reduce_partials: Callable[[List[Any]], Any]  # parciales de todos los bloques -> resultado
+
+
+OPERATIONS: Dict[str, Operation] = {}
+
+
+def register_operation(name: str, map_item, reduce_chunk, reduce_partials) -> None:
+    # ProcessingParams solo acepta las operaciones del dominio
+    if name not in PROCESSING_OPERATIONS:
+        raise ValueError(f"Operación no declarada en ProcessingOperation: {name}")
+    OPERATIONS[name] = Operation(map_item, reduce_chunk, reduce_partials)
+
+
+def get_operation(name: str) -> Operation:
+    try:
+        return OPERATIONS[name]
+    except KeyError:
+        raise ValueError(f"Operación de procesamiento desconocida: {name}")
+
+
+# checksum: huella SHA-256 del conjunto de elementos. Se suman los digests
+# módulo 2^256 para que el resultado no dependa del tamaño de bloque.
+_CHECKSUM_MOD = 1 << 256
+
+def _checksum_item(item) -> int:
+    return int.from_bytes(hashlib.sha256(json.dumps(item, sort_keys=True, default=str).encode()).digest(), "big")
+
+def _checksum_chunk(digests: List[int]) -> dict:
+    return {"items": len(digests), "sha256": f"{sum(digests) % _CHECKSUM_MOD:064x}"}
+
+def _checksum_partials(partials: List[dict]) -> dict:
+    total = sum(int(p["sha256"], 16) for p in partials) % _CHECKSUM_MOD
+    return {"items": sum(p["items"] for p in partials), "sha256": f"{total:064x}"}
+
+# word_count: frecuencia de palabras de elementos de texto
+def _word_count_item(item) -> Dict[str, int]:
+    return Counter(str(item).lower().split())
+
+def _word_count_combine(counts: List[Dict[str, int]]) -> Dict[str, int]:
+    total = Counter()
+    for count in counts:
+        total.update(count)
+    return dict(total)
+
+# stats: count/sum/min/max de elementos numéricos
+def _stats_item(item) -> float:
+    return float(item)
+
+def _stats_chunk(values: List[float]) -> dict:
+    return {"count": len(values), "sum": sum(values), "min": min(values, default=None), "max": max(values, default=None)}
+
+def _stats_partials(partials: List[dict]) -> dict:
+    mins = [p["min"] for p in partials if p["min"] is not None]
+    maxs = [p["max"] for p in partials if p["max"] is not None]
+    count = sum(p["count"] for p in partials)
+    total = sum(p["sum"] for p in partials)
+    return {"count": count, "sum": total, "min": min(mins, default=None), "max": max(maxs, default=None),
+            "mean": total / count if count else None}
+
+
+register_operation(ProcessingOperation.checksum.value, _checksum_item, _checksum_chunk, _checksum_partials)
+register_operation(ProcessingOperation.word_count.value, _word_count_item, _word_count_combine, _word_count_combine)
+register_operation(ProcessingOperation.stats.value, _stats_item, _stats_chunk, _stats_partials)
+
+
+def split_chunks(items: List[Any], chunk_size: int) -> List[List[Any]]:
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)] or [[]]
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_inline_only = False  # Proceso daemon: decidido en el primer bloque
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Pool de procesos del worker, creado en el primer bloque CPU-bound.
+    Los hijos del pool prefork de Celery son daemon y no pueden crear
+    procesos: en ese caso se procesa en línea. Para bloques CPU-bound se
+    recomienda arrancar el worker con --pool=threads o --pool=solo.
+    """
+    global _pool, _pool_workers, _inline_only
+    if _pool is None and not _inline_only:
+        if multiprocessing.current_process().daemon:
+            _inline_only = True
+            logger.warning("Worker en proceso daemon: los bloques CPU-bound se procesarán en línea")
+            return None
+        _pool_workers = settings.PROCESSING_POOL_SIZE or os.cpu_count() or 1
+        _pool = ProcessPoolExecutor(max_workers=_pool_workers)
+    return _pool
+
+
+def run_chunk(operation_name: str, items: List[Any], cpu_bound: bool = False) -> Any:
+    """Aplica la operación a los elementos de un bloque y devuelve su resultado parcial."""
+    operation = get_operation(operation_name)
+    pool = _get_pool() if cpu_bound and len(items) > 1 else None
+    if pool is not None:
+        chunksize = max(1, len(items) // (_pool_workers * 4))
+        results = list(pool.map(operation.map_item, items, chunksize=chunksize))
+    else:
+        results = [operation.map_item(item) for item in items]
+    return operation.reduce_chunk(results)
+
+
+def combine_partials(operation_name: str, partials: List[Any]) -> Any:
+    return get_operation(operation_name).reduce_partials(partials)
@@ -0,0 +1,88 @@
+"""
+Enrutado de tareas de Celery por tipo y prioridad.
+
+El procesamiento de tareas va a una cola por clase de TaskPriority y las
+notificaciones a su propia cola, para que un backlog de procesamiento de
+baja prioridad no retrase ni las notificaciones ni las tareas críticas.
+Además se fija la prioridad de mensaje del broker (0-9) dentro de cada cola,
+que solo importa en las colas que mezclan prioridades (notificaciones).
+
+Perfiles de worker recomendados:
+
+    # Procesamiento: las colas se consumen en el orden indicado
+    celery -A app.infrastructure.celery.celery_app worker \\
+        -Q processing.critical,processing.high,processing.medium,processing.low
+
+    # Notificaciones: worker ligero dedicado
+    celery -A app.infrastructure.celery.celery_app worker -Q notifications
+
+    # Modelo de lectura task_view con TASK_VIEW_PROJECTION=celery
+    celery -A app.infrastructure.celery.celery_app worker -Q projections
+
+    # Mantenimiento (archivado, purga de usuarios, analítica): beat y un worker de la cola maintenance
+    celery -A app.infrastructure.celery.celery_app beat
+    celery -A app.infrastructure.celery.celery_app worker -Q maintenance -c 1
+
+Este módulo no importa Celery para poder usarse desde el camino de encolado.
+"""
+from typing import Dict, Optional
+from app.core.config import settings
+from app.domain.models.enums import TaskPriority
+
+NOTIFICATIONS_QUEUE = "notifications"
+MAINTENANCE_QUEUE = "maintenance"
+PROJECTIONS_QUEUE = "projections"
+PROCESSING_QUEUES: Dict[TaskPriority, str] = {
+    TaskPriority.critical: "processing.critical",
+    TaskPriority.high: "processing.high",
+    TaskPriority.medium: "processing.medium",
+    TaskPriority.low: "processing.low",
+}
+# Orden de consumo de mayor a menor prioridad
+PROCESSING_QUEUE_ORDER = [PROCESSING_QUEUES[p] for p in (
+    TaskPriority.critical, TaskPriority.high, TaskPriority.medium, TaskPriority.low
+)]
+
+# Prioridad de mensaje según el transporte. En AMQP (RabbitMQ) 9 es la más
+# alta; en Redis y el resto de transportes virtuales de kombu el paso 0 se
+# consume primero, así que la escala va al revés
+AMQP_PRIORITIES: Dict[TaskPriority, int] = {
+    TaskPriority.critical: 9,
+    TaskPriority.high: 6,
+    TaskPriority.medium: 3,
+    TaskPriority.low: 0,
+}
+VIRTUAL_PRIORITIES: Dict[TaskPriority, int] = {
+    TaskPriority.critical: 0,
+    TaskPriority.high: 3,
+    TaskPriority.medium: 6,
+    TaskPriority.low: 9,
+}
+
+
+def broker_priorities(broker_url: str) -> Dict[TaskPriority, int]:
+    scheme = broker_url.split("://", 1)[0].split("+", 1)[0]
+    return AMQP_PRIORITIES if scheme in ("amqp", "amqps", "pyamqp") else VIRTUAL_PRIORITIES
+
+
+BROKER_PRIORITIES = broker_priorities(settings.CELERY_BROKER_URL)
+
+TASK_QUEUES = {
+    "process_task": None,  # depende de la prioridad
+    "send_task_notification": NOTIFICATIONS_QUEUE,
+    "archive_completed_tasks": MAINTENANCE_QUEUE,
+    "purge_user": MAINTENANCE_QUEUE,
+    "roll_up_task_analytics": MAINTENANCE_QUEUE,
+    "project_task_view": PROJECTIONS_QUEUE,
+    "refresh_task_view_user": PROJECTIONS_QUEUE,
+}
+
+
+def route_options(task_name: str, priority: Optional[TaskPriority] = None) -> dict:
+    """
+    Opciones de apply_async (cola y prioridad de broker) para una tarea.
+    Sin prioridad se usa la de por defecto de las tareas (medium).
+    """
+    priority = TaskPriority(priority) if priority is not None else TaskPriority.medium
+    queue = TASK_QUEUES.get(task_name) or PROCESSING_QUEUES[priority]
+    return {"queue": queue, "priority": BROKER_PRIORITIES[priority]}
@@ -1,24 +1,105 @@
 import time
+from celery import chord, group
 from app.infrastructure.celery.celery_app import celery_app
+from app.infrastructure.celery.processing import split_chunks, run_chunk, combine_partials
+from app.domain.schemas.task import ProcessingParams
+from app.core.config import settings
+from datetime import timedelta
 from celery.utils.log import get_task_logger
 
 logger = get_task_logger(__name__)
 
-@celery_app.task(bind=True)
+PROGRESS = "PROGRESS"
+
+# Contadores de progreso para backends sin incremento atómico (modo eager, tests)
+_local_progress = {}
+
+def _progress_key(root_id: str) -> str:
+    return f"processing-progress-{root_id}"
+
+def _increment_progress(backend, root_id: str) -> int:
+    # Los bloques terminan en paralelo: con Redis/cache se usa un INCR atómico
+    client = getattr(backend, "client", None)
+    if client is not None and hasattr(client, "incr"):
+        key = _progress_key(root_id)
+        try:
+            value = client.incr(key)
+        except (KeyError, ValueError):
+            # Memcached y la caché en memoria no crean la clave en el primer incr
+            client.set(key, 1)
+            value = 1
+        if hasattr(client, "expire"):
+            client.expire(key, settings.PROCESSING_PROGRESS_TTL_SECONDS)
+        return int(value)
+    _local_progress[root_id] = _local_progress.get(root_id, 0) + 1
+    return _local_progress[root_id]
+
+def _same_queue(request) -> dict:
+    # Los bloques heredan la cola (y por tanto la prioridad) de la tarea original
+    routing_key = (request.delivery_info or {}).get("routing_key")
+    return {"queue": routing_key} if routing_key else {}
+
+@celery_app.task(
+    bind=True,
+    acks_late=settings.CELERY_PROCESSING_ACKS_LATE,
+    ignore_result=settings.CELERY_PROCESSING_IGNORE_RESULT
+)
 def process_task(self, task_id: str, params: dict = None):
     """
     Tarea asíncrona para procesar una tarea.
-    Puede ser una tarea de larga duración.
+
+    Divide `params.items` en bloques que se procesan en paralelo con un
+    chord (group de process_chunk + aggregate_chunks). La tarea se reemplaza
+    por el chord, así que su id (guardado en Task.celery_task_id) termina con
+    el resultado agregado. Mientras tanto su estado es PROGRESS con
+    completed_chunks/total_chunks.
     """
-    logger.info(f"Comenzando procesamiento de tarea {task_id}")
-    
-    # Simular procesamiento de larga duración
-    time.sleep(5)
-    
-    logger.info(f"Procesamiento de tarea {task_id} completado")
-    return {"task_id": task_id, "status": "completed"}
+    params = ProcessingParams(**(params or {}))
+    chunks = split_chunks(params.items, params.chunk_size)
+    logger.info(f"Comenzando procesamiento de tarea {task_id}: {len(params.items)} elementos en {len(chunks)} bloques")
 
-@celery_app.task(bind=True)
+    if len(chunks) == 1:
+        partial = run_chunk(params.operation, chunks[0], params.cpu_bound)
+        result = combine_partials(params.operation, [partial])
+        logger.info(f"Procesamiento de tarea {task_id} completado")
+        return {"task_id": task_id, "status": "completed", "chunks": 1, "result": result}
+
+    self.update_state(state=PROGRESS, meta={"task_id": task_id, "completed_chunks": 0, "total_chunks": len(chunks)})
+    options = _same_queue(self.request)
+    header = group(
+        process_chunk.s(task_id, params.operation, chunk, params.cpu_bound, self.request.id, len(chunks)).set(**options)
+        for chunk in chunks
+    )
+    body = aggregate_chunks.s(task_id, params.operation).set(**options)
+    return self.replace(chord(header, body))
+
+@celery_app.task(bind=True, acks_late=settings.CELERY_PROCESSING_ACKS_LATE)
+def process_chunk(self, task_id: str, operation: str, items: list, cpu_bound: bool, progress_id: str, total_chunks: int):
+    """
+    Procesa un bloque de elementos y notifica el progreso en el estado de la
+    tarea original.
+    """
+    partial = run_chunk(operation, items, cpu_bound)
+    completed = _increment_progress(self.backend, progress_id)
+    self.update_state(
+        task_id=progress_id,
+        state=PROGRESS,
+        meta={"task_id": task_id, "completed_chunks": completed, "total_chunks": total_chunks}
+    )
+    return partial
+
+@celery_app.task(bind=True, acks_late=settings.CELERY_PROCESSING_ACKS_LATE)
+def aggregate_chunks(self, partials: list, task_id: str, operation: str):
+    """Combina los resultados parciales de todos los bloques."""
+    result = combine_partials(operation, partials)
+    logger.info(f"Procesamiento de tarea {task_id} completado ({len(partials)} bloques)")
+    return {"task_id": task_id, "status": "completed", "chunks": len(partials), "result": result}
+
+@celery_app.task(
+    bind=True,
+    acks_late=settings.CELERY_NOTIFICATION_ACKS_LATE,
+    ignore_result=settings.CELERY_NOTIFICATION_IGNORE_RESULT
+)
 def send_task_notification(self, user_id: str, task_id: str, notification_type: str):
     """
     Tarea asíncrona para enviar notificaciones relacionadas con tareas.
@@ -29,4 +110,104 @@ def send_task_notification(self, user_id: str, task_id: str, notification_type:
     time.sleep(2)
     
     logger.info(f"Notificación enviada para la tarea {task_id}")
-    return {"user_id": user_id, "task_id": task_id, "status": "sent"} 
\ No newline at end of file
+    return {"user_id": user_id, "task_id": task_id, "status": "sent"}
+
+@celery_app.task(bind=True, ignore_result=True)
+def archive_completed_tasks(self):
+    """
+    Job periódico: mueve a tasks_archive las tareas completadas hace más de
+    ARCHIVE_COMPLETED_AFTER_DAYS días, en lotes acotados.
+    """
+    # Importación diferida: el worker de notificaciones no necesita la capa de datos
+    from app.infrastructure.database import SessionLocal
+    from app.infrastructure.repositories.sharded_task_repository import open_task_repository
+    from app.application.services.task_service import TaskService
+
+    db = SessionLocal()
+    try:
+        with open_task_repository(db) as repository:
+            result = TaskService(repository).handle_archive_completed_tasks(
+                older_than=timedelta(days=settings.ARCHIVE_COMPLETED_AFTER_DAYS),
+                batch_size=settings.ARCHIVE_BATCH_SIZE,
+                max_batches=settings.ARCHIVE_MAX_BATCHES_PER_RUN,
+                pause_seconds=settings.ARCHIVE_BATCH_PAUSE_SECONDS,
+            )
+    finally:
+        db.close()
+    logger.info(f"Archivado completado: {result}")
+    return result
+
+@celery_app.task(bind=True, ignore_result=True)
+def roll_up_task_analytics(self):
+    """
+    Job periódico: suma a las agregaciones de analítica las tareas creadas o
+    completadas desde el último watermark.
+    """
+    from app.infrastructure.database import SessionLocal
+    from app.infrastructure.repositories.analytics_repository import TaskAnalyticsRepository
+    from app.application.services.analytics_service import TaskAnalyticsService
+
+    db = SessionLocal()
+    try:
+        result = TaskAnalyticsService(TaskAnalyticsRepository(db)).roll_up(
+            lag=timedelta(seconds=settings.ANALYTICS_ROLLUP_LAG_SECONDS),
+            max_window=timedelta(hours=settings.ANALYTICS_ROLLUP_MAX_WINDOW_HOURS),
+        )
+    finally:
+        db.close()
+    logger.info(f"Agregación de analítica completada: {result}")
+    return result
+
+@celery_app.task(bind=True, acks_late=True, ignore_result=True)
+def purge_user(self, user_id: str):
+    """
+    Borra en lotes acotados las tareas de un usuario con demasiadas tareas
+    para un único DELETE en cascada, y después al usuario. Es idempotente:
+    si el worker muere se reentrega y continúa donde quedó.
+    """
+    from uuid import UUID
+    from app.infrastructure.database import SessionLocal
+    from app.infrastructure.repositories.user_repository import UserRepository
+    from app.infrastructure.repositories.sharded_task_repository import open_task_repository
+    from app.application.services.user_service import UserService
+
+    db = SessionLocal()
+    try:
+        with open_task_repository(db) as task_repository:
+            result = UserService(UserRepository(db), task_repository).purge_user(
+                UUID(user_id),
+                batch_size=settings.USER_PURGE_BATCH_SIZE,
+                pause_seconds=settings.USER_PURGE_BATCH_PAUSE_SECONDS,
+            )
+    finally:
+        db.close()
+    logger.info(f"Purga de usuario completada: {result}")
+    return result
+
+@celery_app.task(bind=True, acks_late=True, ignore_result=True, max_retries=5, default_retry_delay=1)
+def project_task_view(self, events: list):
+    """
+    Aplica eventos de escritura de tareas al modelo de lectura task_view
+    (TASK_VIEW_PROJECTION=celery). Reproyectar es idempotente, así que un
+    reintento o una reentrega no duplican nada.
+    """
+    from app.application.events import TaskEvent
+    from app.application.services.task_view_projection import get_projector
+
+    try:
+        get_projector().apply([TaskEvent.from_json(raw) for raw in events])
+    except Exception as e:
+        logger.error(f"Error proyectando {len(events)} eventos en task_view: {str(e)}")
+        raise self.retry(exc=e)
+
+@celery_app.task(bind=True, acks_late=True, ignore_result=True, max_retries=5, default_retry_delay=1)
+def refresh_task_view_user(self, user_id: str):
+    """Recalcula en task_view las filas que muestran los datos de un usuario."""
+    from uuid import UUID
+    from app.application.services.task_view_projection import get_projector
+
+    try:
+        get_projector().refresh_user(UUID(user_id))
+    except Exception as e:
+        logger.error(f"Error actualizando task_view para el usuario {user_id}: {str(e)}")
+        raise self.retry(exc=e)
@@ -0,0 +1,60 @@
+"""
+Propagación de trazas (app.core.tracing) a través de Celery.
+
+Al publicar, la cabecera `traceparent` del span en curso se añade a los
+mensajes (también a los de chords y replace dentro de una tarea). En el
+worker cada tarea se ejecuta dentro de un span hijo de esa cabecera, así
+que la traza de un POST /tasks sigue en process_task, sus bloques y
+send_task_notification. En modo eager la tarea hereda el span en curso.
+"""
+from threading import Lock
+from typing import Dict, Tuple
+from celery import signals
+from app.core import tracing
+
+_task_spans: Dict[str, Tuple[tracing.Span, object]] = {}
+_task_spans_lock = Lock()
+
+
+@signals.before_task_publish.connect
+def inject_trace_context(headers=None, **kwargs):
+    traceparent = tracing.current_traceparent()
+    if traceparent is not None and headers is not None:
+        headers.setdefault(tracing.TRACEPARENT, traceparent)
+
+
+def _incoming_context(request):
+    # Worker: las cabeceras del mensaje son atributos del request. Eager: van en request.headers
+    value = getattr(request, tracing.TRACEPARENT, None) or (getattr(request, "headers", None) or {}).get(tracing.TRACEPARENT)
+    return tracing.parse_traceparent(value)
+
+
+@signals.task_prerun.connect
+def start_task_span(task_id=None, task=None, **kwargs):
+    span, token = tracing.begin_span(
+        f"celery.run {task.name.rsplit('.', 1)[-1]}", tracing.CONSUMER,
+        {"celery.task": task.name, "celery.task_id": task_id,
+         "celery.retries": task.request.retries or 0},
+        _incoming_context(task.request),
+    )
+    if span is not None:
+        with _task_spans_lock:
+            _task_spans[task_id] = (span, token)
+
+
+@signals.task_failure.connect
+def record_task_failure(task_id=None, exception=None, **kwargs):
+    entry = _task_spans.get(task_id)
+    if entry is not None and exception is not None:
+        entry[0].record_exception(exception)
+
+
+@signals.task_postrun.connect
+def finish_task_span(task_id=None, state=None, **kwargs):
+    with _task_spans_lock:
+        entry = _task_spans.pop(task_id, None)
+    if entry is None:
+        return
+    span, token = entry
+    span.set_attribute("celery.state", state)
+    tracing.finish_span(span, token)
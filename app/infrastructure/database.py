@@ -1,19 +1,39 @@
 from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from app.core.config import settings
+from app.infrastructure.sql_instrumentation import instrument_engine
 import urllib.parse
 
-# Crear el motor SQL
-engine = create_engine(settings.DATABASE_URL, echo=True)
+def create_database_engine(url: str):
+    """Motor SQL con la configuración de conexión y la instrumentación de la aplicación."""
+    # SQLite (benchmarks y entornos locales) necesita compartir conexiones entre
+    # el hilo del event loop y el threadpool de FastAPI
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    new_engine = create_engine(url, echo=settings.SQL_ECHO, connect_args=connect_args,
+                               query_cache_size=settings.SQL_COMPILED_CACHE_SIZE)
+
+    # Configurar opciones específicas para SQL Server
+    @event.listens_for(new_engine, "connect")
+    def configure_connection(dbapi_connection, connection_record):
+        if new_engine.dialect.name == "sqlite":
+            # SQLite no aplica las claves foráneas (ni ON DELETE CASCADE) si no se activan
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.close()
+            return
+        if new_engine.dialect.name != "mssql":
+            return
+        cursor = dbapi_connection.cursor()
+        cursor.execute("SET NOCOUNT ON")
+        cursor.close()
 
-# Configurar opciones específicas para SQL Server
-@event.listens_for(engine, "connect")
-def configure_connection(dbapi_connection, connection_record):
-    # Configurar opciones específicas de SQL Server si es necesario
-    cursor = dbapi_connection.cursor()
-    cursor.execute("SET NOCOUNT ON")
-    cursor.close()
+    # Medir sentencias SQL, registrar las lentas y detectar patrones N+1
+    instrument_engine(new_engine)
+    return new_engine
+
+# Crear el motor SQL
+engine = create_database_engine(settings.DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -24,4 +44,67 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close() 
+
+class SingleTransaction:
+    """
+    Sesión cuyos commit() y rollback() solo liberan o deshacen SAVEPOINTs
+    dentro de una transacción externa, que se confirma una única vez. Permite
+    ejecutar varios comandos a través de los repositorios (que confirman por
+    su cuenta) con un solo commit real.
+
+        with SingleTransaction() as tx:
+            ...  # repositorios sobre tx.db
+            tx.commit()
+    """
+
+    def __init__(self, bind=None):
+        self.connection = (bind or engine).connect()
+        self.transaction = self.connection.begin()
+        self._sqlite = self.connection.dialect.name == "sqlite"
+        if self._sqlite:
+            # pysqlite no abre la transacción antes de un SAVEPOINT, con lo que
+            # su RELEASE confirmaría: emitir el BEGIN a mano en esta conexión
+            self.connection.connection.driver_connection.isolation_level = None
+            self.connection.exec_driver_sql("BEGIN")
+        self.db = Session(bind=self.connection, autoflush=False, join_transaction_mode="create_savepoint")
+
+    def savepoint(self):
+        """SAVEPOINT explícito que agrupa varios commits de la sesión (p. ej. un comando)."""
+        # Liberar antes el SAVEPOINT que la sesión tenga abierto (p. ej. por
+        # una carga perezosa), para que el nuevo contenga los siguientes
+        self.db.commit()
+        return self.connection.begin_nested()
+
+    def release(self, savepoint) -> None:
+        self.db.commit()
+        savepoint.commit()
+
+    def rollback_to(self, savepoint) -> None:
+        self.db.rollback()
+        savepoint.rollback()
+
+    def commit(self) -> None:
+        self.db.flush()
+        self.transaction.commit()
+
+    def rollback(self) -> None:
+        self.db.rollback()
+        if self.transaction.is_active:
+            self.transaction.rollback()
+
+    def close(self) -> None:
+        self.db.close()
+        if self._sqlite and not self.connection.invalidated:
+            if self.transaction.is_active:
+                self.transaction.rollback()
+            # La conexión vuelve al pool: restaurar el modo de pysqlite
+            self.connection.connection.driver_connection.isolation_level = ""
+        # Cerrar la conexión deshace la transacción externa si no se confirmó
+        self.connection.close()
+
+    def __enter__(self) -> "SingleTransaction":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,46 @@
+"""
+Carga por lotes con caché al estilo DataLoader.
+
+Un DataLoader vive lo que dura una petición: agrupa las claves pedidas en una
+sola consulta (`batch_fn`) y recuerda los resultados, de modo que resolver
+las relaciones de N filas cuesta una consulta en lugar de N.
+"""
+from typing import Callable, Dict, Generic, Hashable, Iterable, List, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+# Tamaño máximo de cada IN: SQL Server admite hasta 2100 parámetros por sentencia
+MAX_BATCH_SIZE = 1000
+
+
+class DataLoader(Generic[K, V]):
+    def __init__(self, batch_fn: Callable[[List[K]], Dict[K, V]], max_batch_size: int = MAX_BATCH_SIZE):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self._cache: Dict[K, Optional[V]] = {}
+        self.batches = 0
+
+    def load_many(self, keys: Iterable[K]) -> Dict[K, Optional[V]]:
+        """Resuelve `keys`; solo las que no están en caché van a `batch_fn`."""
+        keys = [key for key in dict.fromkeys(keys) if key is not None]
+        pending = [key for key in keys if key not in self._cache]
+        for start in range(0, len(pending), self.max_batch_size):
+            chunk = pending[start:start + self.max_batch_size]
+            found = self.batch_fn(chunk)
+            self.batches += 1
+            for key in chunk:
+                # Las claves inexistentes también se cachean para no repetir la consulta
+                self._cache[key] = found.get(key)
+        return {key: self._cache[key] for key in keys}
+
+    def load(self, key: K) -> Optional[V]:
+        if key is None:
+            return None
+        return self.load_many([key])[key]
+
+    def prime(self, key: K, value: V) -> None:
+        self._cache.setdefault(key, value)
+
+    def clear(self, key: K) -> None:
+        self._cache.pop(key, None)
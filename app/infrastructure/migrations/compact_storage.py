@@ -0,0 +1,155 @@
+"""
+Migración de datos al almacenamiento compacto (GUID binario/nativo y enums
+como enteros pequeños).
+
+Las tablas heredadas guardan los ids como texto de 36 caracteres y los enums
+por nombre. La migración:
+
+    1. Renombra `users`/`tasks` a `users_legacy`/`tasks_legacy` y elimina sus
+       índices secundarios (los nombres de índice chocarían con los nuevos).
+    2. Crea las tablas con el esquema actual de los modelos.
+    3. Copia los datos en lotes acotados por keyset sobre el id, convirtiendo
+       ids y enums en Python. Cada lote es una transacción corta.
+    4. Opcionalmente elimina las tablas heredadas (--drop-legacy). Por defecto
+       se conservan para poder volver atrás.
+
+Uso:
+    python -m app.infrastructure.migrations.compact_storage --batch-size 5000
+"""
+import argparse
+import logging
+import uuid
+from enum import Enum
+from typing import Callable, Dict, Type
+from sqlalchemy import MetaData, Table, inspect, select, text
+from sqlalchemy.engine import Engine
+from app.domain.models.enums import Gender, Role, TaskStatus, TaskPriority
+
+logger = logging.getLogger(__name__)
+
+LEGACY_SUFFIX = "_legacy"
+
+
+def _to_uuid(value):
+    if value is None or isinstance(value, uuid.UUID):
+        return value
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return uuid.UUID(bytes=bytes(value))
+    return uuid.UUID(str(value).strip())
+
+
+def _to_enum(enum_class: Type[Enum]) -> Callable:
+    def convert(value):
+        if value is None or isinstance(value, enum_class):
+            return value
+        # SQLEnum guardaba el nombre del miembro; se aceptan también valores
+        value = str(value).strip()
+        return enum_class[value] if value in enum_class.__members__ else enum_class(value)
+    return convert
+
+
+CONVERTERS: Dict[str, Dict[str, Callable]] = {
+    "users": {
+        "id": _to_uuid,
+        "gender": _to_enum(Gender),
+        "roles": _to_enum(Role),
+    },
+    "tasks": {
+        "id": _to_uuid,
+        "user_id": _to_uuid,
+        "assigned_to_id": _to_uuid,
+        "status": _to_enum(TaskStatus),
+        "priority": _to_enum(TaskPriority),
+    },
+}
+
+
+def _rename_table(conn, old: str, new: str) -> None:
+    if conn.dialect.name == "mssql":
+        conn.execute(text(f"EXEC sp_rename '{old}', '{new}'"))
+    else:
+        conn.execute(text(f"ALTER TABLE {old} RENAME TO {new}"))
+
+
+def _copy_table(engine: Engine, source: Table, target: Table, converters: Dict[str, Callable], batch_size: int) -> int:
+    columns = [column.name for column in target.columns if column.name in source.columns]
+    copied = 0
+    last_id = None
+    while True:
+        query = select(*[source.c[name] for name in columns]).order_by(source.c.id).limit(batch_size)
+        if last_id is not None:
+            query = query.where(source.c.id > last_id)
+        with engine.begin() as conn:
+            rows = conn.execute(query).fetchall()
+            if not rows:
+                break
+            payload = []
+            for row in rows:
+                record = dict(zip(columns, row))
+                for name, convert in converters.items():
+                    if name in record:
+                        record[name] = convert(record[name])
+                payload.append(record)
+            conn.execute(target.insert(), payload)
+        last_id = rows[-1][columns.index("id")]
+        copied += len(rows)
+        logger.info(f"Migradas {copied} filas de {source.name} a {target.name}")
+    return copied
+
+
+def migrate_to_compact_storage(engine: Engine, batch_size: int = 5000, drop_legacy: bool = False) -> Dict[str, int]:
+    """
+    Migra `users` y `tasks` del esquema heredado al compacto.
+    Devuelve el número de filas copiadas por tabla.
+    """
+    from app.infrastructure.database import Base
+    from app.domain.models.user import User
+    from app.domain.models.task import Task
+
+    inspector = inspect(engine)
+    existing = set(inspector.get_table_names())
+    if "users" + LEGACY_SUFFIX in existing or "tasks" + LEGACY_SUFFIX in existing:
+        raise RuntimeError("Ya existen tablas *_legacy: la migración parece haberse ejecutado antes")
+
+    legacy_metadata = MetaData()
+    with engine.begin() as conn:
+        for name in ("tasks", "users"):
+            if name not in existing:
+                continue
+            _rename_table(conn, name, name + LEGACY_SUFFIX)
+            legacy = Table(name + LEGACY_SUFFIX, legacy_metadata, autoload_with=conn)
+            for index in list(legacy.indexes):
+                index.drop(conn)
+
+    Base.metadata.create_all(bind=engine, tables=[User.__table__, Task.__table__])
+
+    copied = {}
+    legacy_tables = {}
+    for model in (User, Task):
+        name = model.__tablename__
+        if name not in existing:
+            continue
+        legacy_tables[name] = Table(name + LEGACY_SUFFIX, MetaData(), autoload_with=engine)
+        copied[name] = _copy_table(engine, legacy_tables[name], model.__table__, CONVERTERS[name], batch_size)
+
+    if drop_legacy:
+        with engine.begin() as conn:
+            for name in ("tasks", "users"):
+                if name in legacy_tables:
+                    legacy_tables[name].drop(conn)
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra ids y enums al almacenamiento compacto")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--drop-legacy", action="store_true", help="Eliminar las tablas *_legacy al terminar")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from app.infrastructure.database import engine
+    print(migrate_to_compact_storage(engine, args.batch_size, args.drop_legacy))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Gestión explícita del esquema de la base de datos.
+
+La aplicación ya no crea tablas al importarse; el esquema se crea o completa
+con este comando como paso de despliegue:
+
+    python -m app.infrastructure.migrations.migrate
+    python -m app.infrastructure.migrations.migrate --compact-storage
+    python -m app.infrastructure.migrations.migrate --shards
+
+Las tareas existentes se reparten después entre los shards con
+app.infrastructure.migrations.shard_tasks.
+"""
+import argparse
+import logging
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn, CreateTable
+
+logger = logging.getLogger(__name__)
+
+
+# Tablas que viven en cada shard de tareas (ver app.infrastructure.sharding)
+SHARD_TABLES = ("tasks", "tasks_archive")
+
+
+def add_missing_columns(engine: Engine, metadata, tables=None) -> None:
+    """
+    Añade a las tablas existentes las columnas e índices nuevos del modelo.
+    Solo columnas que admiten NULL o tienen server_default; el resto
+    requiere una migración explícita.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    tables = metadata.sorted_tables if tables is None else tables
+    with engine.begin() as conn:
+        for table in tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    logger.warning(f"Columna {table.name}.{column.name} sin valor por defecto: requiere migración manual")
+                    continue
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD {ddl}")
+                logger.info(f"Columna añadida: {table.name}.{column.name}")
+    for table in tables:
+        if table.name not in existing_tables:
+            continue
+        existing_indexes = {index["name"] for index in inspect(engine).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(engine)
+                logger.info(f"Índice creado: {index.name}")
+
+
+def ensure_foreign_key_actions(engine: Engine, metadata) -> None:
+    """
+    Recrea las claves foráneas existentes cuyo ON DELETE no coincide con el
+    modelo (p. ej. tasks.user_id -> ON DELETE CASCADE). SQLite no permite
+    modificar restricciones: ahí hay que recrear la tabla.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        current = inspector.get_foreign_keys(table.name)
+        for constraint in table.foreign_key_constraints:
+            wanted = (constraint.ondelete or "").upper()
+            columns = [column.name for column in constraint.columns]
+            for fk in current:
+                if fk["constrained_columns"] != columns:
+                    continue
+                actual = (fk.get("options", {}).get("ondelete") or "").upper()
+                if actual == wanted:
+                    continue
+                if engine.dialect.name == "sqlite" or not fk.get("name"):
+                    logger.warning(f"No se puede cambiar ON DELETE de {table.name}.{columns} en {engine.dialect.name}")
+                    continue
+                referred = constraint.elements[0].column
+                action = f" ON DELETE {wanted}" if wanted else ""
+                with engine.begin() as conn:
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} DROP CONSTRAINT {fk['name']}")
+                    conn.exec_driver_sql(
+                        f"ALTER TABLE {table.name} ADD CONSTRAINT {fk['name']} FOREIGN KEY ({', '.join(columns)}) "
+                        f"REFERENCES {referred.table.name} ({referred.name}){action}"
+                    )
+                logger.info(f"Clave foránea {fk['name']} recreada con ON DELETE {wanted or 'NO ACTION'}")
+
+
+def create_schema(engine: Engine) -> None:
+    """Crea las tablas e índices que falten y añade las columnas nuevas a las existentes."""
+    from app.infrastructure.database import Base
+    # Registrar todos los modelos en el metadata antes de crear las tablas
+    import app.domain.models.user  # noqa: F401
+    import app.domain.models.task  # noqa: F401
+    import app.domain.models.task_view  # noqa: F401
+    import app.domain.models.task_rollup  # noqa: F401
+
+    add_missing_columns(engine, Base.metadata)
+    ensure_foreign_key_actions(engine, Base.metadata)
+    Base.metadata.create_all(bind=engine)
+    logger.info("Esquema de base de datos actualizado")
+
+
+def create_shard_schema(engine: Engine) -> None:
+    """
+    Crea o completa en un shard las tablas de tareas, sin claves foráneas:
+    `users` solo existe en DATABASE_URL.
+    """
+    from app.infrastructure.database import Base
+    import app.domain.models.user  # noqa: F401
+    import app.domain.models.task  # noqa: F401
+
+    tables = [Base.metadata.tables[name] for name in SHARD_TABLES]
+    add_missing_columns(engine, Base.metadata, tables)
+    existing_tables = set(inspect(engine).get_table_names())
+    with engine.begin() as conn:
+        for table in tables:
+            if table.name in existing_tables:
+                continue
+            conn.execute(CreateTable(table, include_foreign_key_constraints=[]))
+            for index in table.indexes:
+                index.create(conn)
+    logger.info(f"Esquema de shard actualizado en {engine.url.render_as_string(hide_password=True)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crea o actualiza el esquema de la base de datos")
+    parser.add_argument("--compact-storage", action="store_true",
+                        help="Migrar antes las tablas heredadas al almacenamiento compacto")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--shards", action="store_true",
+                        help="Crear también las tablas de tareas en los shards de TASK_SHARD_URLS")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from app.infrastructure.database import engine
+
+    if args.compact_storage:
+        from app.infrastructure.migrations.compact_storage import migrate_to_compact_storage
+        print(migrate_to_compact_storage(engine, args.batch_size))
+    create_schema(engine)
+    if args.shards:
+        from app.infrastructure.sharding import get_shard_registry
+        for shard_engine in get_shard_registry().engines:
+            if shard_engine is not engine:
+                create_shard_schema(shard_engine)
+
+
+if __name__ == "__main__":
+    main()
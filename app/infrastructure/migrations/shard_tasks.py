@@ -0,0 +1,106 @@
+"""
+Reparto entre los shards de las tareas creadas antes del sharding.
+
+Las tareas anteriores tienen un uuid4 cualquiera como id: su bucket no es el
+de su creador, así que ShardMap las buscaría en otro shard. Al activar
+TASK_SHARD_URLS, con el esquema de los shards creado y antes de abrir la API:
+
+    python -m app.infrastructure.migrations.shard_tasks --batch-size 1000
+
+Para cada fila de `tasks` y `tasks_archive` en DATABASE_URL:
+
+    1. Si su id no lleva el bucket del creador se le asigna otro que sí lo
+       lleva (rekeyed_task_id: el mismo id con los 12 bits bajos del
+       creador, así que repetir la migración da el mismo resultado).
+    2. Se copia al shard de ese id, salvo que ya esté allí.
+    3. Se borra de DATABASE_URL, salvo que DATABASE_URL sea su shard y el id
+       no haya cambiado.
+
+Cada lote se copia en una transacción por shard y después se borra del
+origen: si la migración se interrumpe entre ambos pasos, al repetirla se
+saltan las filas ya copiadas. Los ids anteriores dejan de resolver (enlaces
+externos, respuestas guardadas con Idempotency-Key) y sus filas de
+task_view se borran en cascada.
+"""
+import argparse
+import logging
+from collections import defaultdict
+from typing import Dict
+from uuid import UUID
+from sqlalchemy import Table, delete, insert, select
+from sqlalchemy.engine import Engine
+from app.infrastructure.sharding import NUM_BUCKETS, ShardRegistry, shard_bucket
+
+logger = logging.getLogger(__name__)
+
+
+def rekeyed_task_id(task_id: UUID, user_id: UUID) -> UUID:
+    """`task_id` con el bucket de `user_id` (el mismo id si ya lo lleva)."""
+    return UUID(int=(task_id.int & ~(NUM_BUCKETS - 1)) | shard_bucket(user_id))
+
+
+def _move_table(source: Engine, registry: ShardRegistry, table: Table, batch_size: int) -> Dict[str, int]:
+    moved = rekeyed = 0
+    last_id = None
+    while True:
+        query = select(table).order_by(table.c.id).limit(batch_size)
+        if last_id is not None:
+            query = query.where(table.c.id > last_id)
+        with source.connect() as conn:
+            rows = [dict(row) for row in conn.execute(query).mappings()]
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+
+        by_shard = defaultdict(list)
+        old_ids = []
+        for row in rows:
+            task_id = rekeyed_task_id(row["id"], row["user_id"])
+            shard = registry.shard_map.shard_for(task_id)
+            if registry.engines[shard] is source and task_id == row["id"]:
+                continue
+            old_ids.append(row["id"])
+            rekeyed += task_id != row["id"]
+            by_shard[shard].append({**row, "id": task_id})
+
+        for shard, shard_rows in by_shard.items():
+            with registry.engines[shard].begin() as conn:
+                ids = [row["id"] for row in shard_rows]
+                copied = set(conn.execute(select(table.c.id).where(table.c.id.in_(ids))).scalars())
+                pending = [row for row in shard_rows if row["id"] not in copied]
+                if pending:
+                    conn.execute(insert(table), pending)
+        if old_ids:
+            # Una fila con id nuevo en la propia DATABASE_URL aparece más
+            # adelante en el recorrido y ya se salta: está en su sitio
+            with source.begin() as conn:
+                conn.execute(delete(table).where(table.c.id.in_(old_ids)))
+        moved += len(old_ids)
+        logger.info(f"{table.name}: {moved} tareas movidas a su shard ({rekeyed} con id nuevo)")
+    return {"moved": moved, "rekeyed": rekeyed}
+
+
+def move_tasks_to_shards(source: Engine, registry: ShardRegistry, batch_size: int = 1000) -> Dict[str, dict]:
+    """
+    Mueve las tareas de `source` (DATABASE_URL) al shard de su creador.
+    Devuelve, por tabla, las filas movidas y cuántas cambiaron de id.
+    """
+    from app.domain.models.task import Task, ArchivedTask
+
+    return {model.__tablename__: _move_table(source, registry, model.__table__, batch_size)
+            for model in (Task, ArchivedTask)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mueve las tareas de DATABASE_URL al shard de su creador")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from app.infrastructure.database import engine
+    from app.infrastructure.sharding import get_shard_registry
+    print(move_tasks_to_shards(engine, get_shard_registry(), args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
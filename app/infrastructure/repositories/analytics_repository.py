@@ -0,0 +1,211 @@
+from sqlalchemy import and_, delete, func, insert, select, union_all, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.domain.models.task import Task, ArchivedTask
+from app.domain.models.task_rollup import TaskRollup, TaskCompletionTimeRollup, RollupWatermark
+from app.domain.models.enums import TaskStatus, TaskPriority, RollupGranularity
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Claves de los deltas: (granularity, bucket_start, user_id, priority) y
+# (granularity, bucket_start, priority, bin)
+ActivityKey = Tuple[RollupGranularity, datetime, UUID, TaskPriority]
+CompletionKey = Tuple[RollupGranularity, datetime, TaskPriority, int]
+
+class TaskAnalyticsRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    # Watermarks
+    def get_watermark(self, name: str) -> Optional[datetime]:
+        return self.db.execute(select(RollupWatermark.value).where(RollupWatermark.name == name)).scalar()
+
+    def init_watermark(self, name: str, value: datetime) -> datetime:
+        """Crea el watermark si no existe y devuelve el vigente."""
+        try:
+            self.db.add(RollupWatermark(name=name, value=value))
+            self.db.commit()
+            return value
+        except IntegrityError:
+            # Otro proceso lo creó a la vez
+            self.db.rollback()
+            return self.get_watermark(name)
+
+    # Lectura de las tablas de origen
+    def _sources(self, include_archive: bool) -> list:
+        return [Task, ArchivedTask] if include_archive else [Task]
+
+    @staticmethod
+    def _window(column, start: datetime, end: datetime, half_open: bool):
+        # (start, end] para el job incremental; [start, end) para días completos del backfill
+        if half_open:
+            return (column >= start, column < end)
+        return (column > start, column <= end)
+
+    def created_between(self, start: datetime, end: datetime, include_archive: bool = False,
+                        half_open: bool = False) -> list:
+        """(created_at, user_id, priority) de las tareas creadas en la ventana."""
+        statements = [
+            select(model.created_at, model.user_id, model.priority)
+            .where(*self._window(model.created_at, start, end, half_open))
+            for model in self._sources(include_archive)
+        ]
+        return self.db.execute(union_all(*statements) if len(statements) > 1 else statements[0]).all()
+
+    def completed_between(self, start: datetime, end: datetime, include_archive: bool = False,
+                          half_open: bool = False) -> list:
+        """(created_at, completed_at, user_id, priority) de las completadas en la ventana."""
+        statements = [
+            select(model.created_at, model.completed_at, model.user_id, model.priority)
+            .where(model.status == TaskStatus.completed, *self._window(model.completed_at, start, end, half_open))
+            for model in self._sources(include_archive)
+        ]
+        return self.db.execute(union_all(*statements) if len(statements) > 1 else statements[0]).all()
+
+    # Escritura de las agregaciones
+    def apply_increment(self, name: str, previous: datetime, watermark: datetime,
+                        activity: Dict[ActivityKey, list], completion: Dict[CompletionKey, int]) -> bool:
+        """
+        Suma los deltas a las agregaciones y avanza el watermark de
+        `previous` a `watermark` en una transacción. El watermark se avanza
+        primero con un UPDATE condicional: una ejecución concurrente espera su
+        lock y luego no encuentra `previous`, así que ningún delta se suma dos
+        veces. Devuelve False si otra ejecución ya había avanzado.
+        """
+        try:
+            claimed = self.db.execute(
+                update(RollupWatermark)
+                .where(RollupWatermark.name == name, RollupWatermark.value == previous)
+                .values(value=watermark, updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not claimed:
+                self.db.rollback()
+                return False
+            self._merge_activity(activity)
+            self._merge_completion(completion)
+            self.db.commit()
+            return True
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error applying rollup increment {previous} -> {watermark}: {str(e)}")
+            raise
+
+    def _existing(self, model, key_columns, buckets: set) -> set:
+        if not buckets:
+            return set()
+        rows = self.db.execute(
+            select(*key_columns).where(
+                model.granularity.in_({granularity for granularity, _ in buckets}),
+                model.bucket_start.in_({bucket for _, bucket in buckets}),
+            )
+        ).all()
+        return {tuple(row) for row in rows}
+
+    def _merge_activity(self, activity: Dict[ActivityKey, list]) -> None:
+        columns = (TaskRollup.granularity, TaskRollup.bucket_start, TaskRollup.user_id, TaskRollup.priority)
+        existing = self._existing(TaskRollup, columns, {key[:2] for key in activity})
+        new_rows, increments = [], []
+        for (granularity, bucket, user_id, priority), (created, completed, seconds) in activity.items():
+            values = {"granularity": granularity, "bucket_start": bucket, "user_id": user_id, "priority": priority}
+            if (granularity, bucket, user_id, priority) in existing:
+                increments.append({**values, "created": created, "completed": completed, "seconds": seconds})
+            else:
+                new_rows.append({**values, "created_count": created, "completed_count": completed,
+                                 "completion_seconds_sum": seconds})
+        if new_rows:
+            self.db.execute(insert(TaskRollup), new_rows)
+        for row in increments:
+            self.db.execute(
+                update(TaskRollup)
+                .where(TaskRollup.granularity == row["granularity"], TaskRollup.bucket_start == row["bucket_start"],
+                       TaskRollup.user_id == row["user_id"], TaskRollup.priority == row["priority"])
+                .values(created_count=TaskRollup.created_count + row["created"],
+                        completed_count=TaskRollup.completed_count + row["completed"],
+                        completion_seconds_sum=TaskRollup.completion_seconds_sum + row["seconds"])
+                .execution_options(synchronize_session=False)
+            )
+
+    def _merge_completion(self, completion: Dict[CompletionKey, int]) -> None:
+        columns = (TaskCompletionTimeRollup.granularity, TaskCompletionTimeRollup.bucket_start,
+                   TaskCompletionTimeRollup.priority, TaskCompletionTimeRollup.bin)
+        existing = self._existing(TaskCompletionTimeRollup, columns, {key[:2] for key in completion})
+        new_rows = []
+        for key, count in completion.items():
+            granularity, bucket, priority, bin_index = key
+            if key in existing:
+                self.db.execute(
+                    update(TaskCompletionTimeRollup)
+                    .where(TaskCompletionTimeRollup.granularity == granularity,
+                           TaskCompletionTimeRollup.bucket_start == bucket,
+                           TaskCompletionTimeRollup.priority == priority,
+                           TaskCompletionTimeRollup.bin == bin_index)
+                    .values(completed_count=TaskCompletionTimeRollup.completed_count + count)
+                    .execution_options(synchronize_session=False)
+                )
+            else:
+                new_rows.append({"granularity": granularity, "bucket_start": bucket, "priority": priority,
+                                 "bin": bin_index, "completed_count": count})
+        if new_rows:
+            self.db.execute(insert(TaskCompletionTimeRollup), new_rows)
+
+    def replace_range(self, start: datetime, end: datetime,
+                      activity: Dict[ActivityKey, list], completion: Dict[CompletionKey, int]) -> None:
+        """
+        Backfill: sustituye todas las agregaciones con franja en [start, end)
+        (límites de día) por las recalculadas, en una transacción.
+        """
+        try:
+            for model in (TaskRollup, TaskCompletionTimeRollup):
+                self.db.execute(delete(model).where(model.bucket_start >= start, model.bucket_start < end))
+            self._merge_activity(activity)
+            self._merge_completion(completion)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error replacing rollups in [{start}, {end}): {str(e)}")
+            raise
+
+    # Consultas
+    def activity(self, granularity: RollupGranularity, start: datetime, end: datetime,
+                 user_id: Optional[UUID] = None) -> list:
+        """Creadas y completadas por franja y usuario (sumando prioridades)."""
+        conditions = [TaskRollup.granularity == granularity,
+                      TaskRollup.bucket_start >= start, TaskRollup.bucket_start < end]
+        if user_id is not None:
+            conditions.append(TaskRollup.user_id == user_id)
+        return self.db.execute(
+            select(TaskRollup.bucket_start, TaskRollup.user_id,
+                   func.sum(TaskRollup.created_count).label("created"),
+                   func.sum(TaskRollup.completed_count).label("completed"))
+            .where(and_(*conditions))
+            .group_by(TaskRollup.bucket_start, TaskRollup.user_id)
+            .order_by(TaskRollup.bucket_start)
+        ).all()
+
+    def completion_seconds(self, granularity: RollupGranularity, start: datetime, end: datetime,
+                           user_id: Optional[UUID] = None) -> list:
+        """(priority, completadas, suma de segundos) en el rango."""
+        conditions = [TaskRollup.granularity == granularity,
+                      TaskRollup.bucket_start >= start, TaskRollup.bucket_start < end]
+        if user_id is not None:
+            conditions.append(TaskRollup.user_id == user_id)
+        return self.db.execute(
+            select(TaskRollup.priority, func.sum(TaskRollup.completed_count), func.sum(TaskRollup.completion_seconds_sum))
+            .where(and_(*conditions))
+            .group_by(TaskRollup.priority)
+        ).all()
+
+    def completion_histogram(self, granularity: RollupGranularity, start: datetime, end: datetime) -> list:
+        """(priority, bin, completadas) en el rango."""
+        return self.db.execute(
+            select(TaskCompletionTimeRollup.priority, TaskCompletionTimeRollup.bin,
+                   func.sum(TaskCompletionTimeRollup.completed_count))
+            .where(TaskCompletionTimeRollup.granularity == granularity,
+                   TaskCompletionTimeRollup.bucket_start >= start, TaskCompletionTimeRollup.bucket_start < end)
+            .group_by(TaskCompletionTimeRollup.priority, TaskCompletionTimeRollup.bin)
+        ).all()
@@ -0,0 +1,204 @@
+import heapq
+import itertools
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, FrozenSet, List, Optional
+from uuid import UUID
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from app.domain.models.task import Task
+from app.domain.models.enums import TaskPriority, TASK_PRIORITY_CODES
+from app.domain.schemas.task import TaskCreate, TaskUpdate, GetTasksQuery
+from app.infrastructure.repositories.task_repository import TaskRepository
+from app.infrastructure.repositories.user_repository import UserRepository
+from app.infrastructure.sharding import ShardRegistry, get_shard_registry, sharding_enabled
+from app.core.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+SHARD_CALLS = Counter("task_shard_calls_total", "Sharded task repository calls by routing", ["routing"])
+
+# Columna con el id de cada relación expandible
+EXPANSION_KEYS = {"user": "user_id", "assigned_to": "assigned_to_id"}
+
+def window_order(task):
+    return task.created_at, task.id
+
+class ShardedTaskRepository:
+    """
+    Misma interfaz que TaskRepository sobre varios shards (ver
+    app.infrastructure.sharding). Las operaciones por id de tarea o por
+    creador van a un solo shard; las demás (por asignado, listados de admin,
+    mantenimiento) consultan todos en paralelo y mezclan los resultados.
+
+    Las sesiones de los shards se abren al primer uso y se cierran con close().
+    Las relaciones `user`/`assigned_to` se cargan desde DATABASE_URL con
+    `user_repository`: los shards no tienen la tabla de usuarios.
+    """
+
+    def __init__(self, registry: ShardRegistry, user_repository: Optional[UserRepository] = None):
+        self.registry = registry
+        self.shard_map = registry.shard_map
+        self.user_repository = user_repository
+        self._repositories: Dict[int, TaskRepository] = {}
+
+    def shard(self, shard: int) -> TaskRepository:
+        repository = self._repositories.get(shard)
+        if repository is None:
+            repository = self._repositories[shard] = TaskRepository(self.registry.session(shard))
+        return repository
+
+    def route(self, key: UUID) -> TaskRepository:
+        """Repositorio del shard de un creador o de una tarea (su id lleva el bucket del creador)."""
+        SHARD_CALLS.labels("routed").inc()
+        return self.shard(self.shard_map.shard_for(key))
+
+    def scatter(self, fn, shards=None) -> list:
+        SHARD_CALLS.labels("scatter").inc()
+        return self.registry.scatter(lambda shard: fn(self.shard(shard)), shards)
+
+    def end_read(self) -> None:
+        for repository in self._repositories.values():
+            repository.end_read()
+
+    def close(self) -> None:
+        for repository in self._repositories.values():
+            repository.db.close()
+        self._repositories.clear()
+
+    def _attach_users(self, tasks: list, expand: FrozenSet[str]) -> list:
+        """Rellena las relaciones de `expand` con una consulta IN a la base de datos principal."""
+        if not expand or not tasks or self.user_repository is None:
+            return tasks
+        users = self.user_repository.get_many(list({
+            getattr(task, EXPANSION_KEYS[name]) for task in tasks for name in expand
+        } - {None}))
+        for task in tasks:
+            for name in expand:
+                set_committed_value(task, name, users.get(getattr(task, EXPANSION_KEYS[name])))
+        return tasks
+
+    # Lecturas
+    def get_by_id(self, task_id: UUID, expand: FrozenSet[str] = frozenset()) -> Optional[Task]:
+        task = self.route(task_id).get_by_id(task_id)
+        return self._attach_users([task], expand)[0] if task else None
+
+    def get_many(self, task_ids: List[UUID]) -> List[Task]:
+        groups = self.shard_map.group(dict.fromkeys(task_ids))
+        SHARD_CALLS.labels("grouped").inc()
+        results = self.registry.scatter(lambda shard: self.shard(shard).get_many(groups[shard]), groups)
+        return list(itertools.chain.from_iterable(results))
+
+    def get_by_celery_task_id(self, celery_task_id: str) -> Optional[Task]:
+        return next((task for task in self.scatter(lambda repo: repo.get_by_celery_task_id(celery_task_id)) if task), None)
+
+    def get_write_state(self, task_id: UUID):
+        return self.route(task_id).get_write_state(task_id)
+
+    def get_all(self, query: GetTasksQuery) -> List[Task]:
+        """
+        Con `user_id` se consulta solo el shard del creador. Sin él (p. ej.
+        por asignado) cada shard devuelve sus primeras skip + limit filas en
+        orden (created_at, id) y se mezclan por ese orden; las archivadas van
+        detrás de las activas y solo se piden si estas no llenan la página.
+        """
+        expand = query.expand
+        query = query.model_copy(update={"expand": frozenset()})
+        if query.user_id:
+            return self._attach_users(self.route(query.user_id).get_all(query), expand)
+
+        window = query.skip + query.limit
+        tasks = self._merge(self.scatter(lambda repo: repo.get_window(query, window)), window)
+        if query.include_archived and len(tasks) < window:
+            remaining = window - len(tasks)
+            tasks += self._merge(self.scatter(lambda repo: repo.get_window(query, remaining, archived=True)), remaining)
+        return self._attach_users(tasks[query.skip:window], expand)
+
+    @staticmethod
+    def _merge(results: List[list], limit: int) -> list:
+        return list(itertools.islice(heapq.merge(*results, key=window_order), limit))
+
+    # Escrituras
+    def create(self, task: TaskCreate, user_id: UUID) -> Task:
+        return self.route(user_id).create(task, user_id)
+
+    def update(self, task_id: UUID, task_update: TaskUpdate) -> Optional[Task]:
+        return self.route(task_id).update(task_id, task_update)
+
+    def update_conditional(self, task_id: UUID, values: dict, user_id: UUID, is_admin: bool,
+                           expected_version: Optional[int] = None) -> Optional[Task]:
+        return self.route(task_id).update_conditional(task_id, values, user_id, is_admin, expected_version)
+
+    def delete(self, task_id: UUID) -> bool:
+        return self.route(task_id).delete(task_id)
+
+    def complete_task(self, task_id: UUID) -> Optional[Task]:
+        return self.route(task_id).complete_task(task_id)
+
+    def update_celery_task_id(self, task_id: UUID, celery_task_id: str) -> Optional[Task]:
+        return self.route(task_id).update_celery_task_id(task_id, celery_task_id)
+
+    def claim_next(self, assignee_id: UUID, visible_to: Optional[UUID] = None,
+                   priority: Optional[TaskPriority] = None, created_by_id: Optional[UUID] = None) -> Optional[Task]:
+        """
+        Con `created_by_id` se reclama en su shard. Si no, se mira la mejor
+        candidata de cada shard (sin bloquear) y se intenta reclamar en ellos
+        de mejor a peor: si otro claim se lleva la candidata se pasa al
+        siguiente, así que el orden global de prioridad es aproximado.
+        """
+        if created_by_id is not None:
+            return self.route(created_by_id).claim_next(assignee_id, visible_to, priority, created_by_id)
+        candidates = self.scatter(lambda repo: repo.peek_claim_candidate(assignee_id, visible_to, priority))
+        ranked = sorted(
+            (shard for shard, candidate in enumerate(candidates) if candidate is not None),
+            # Mismo orden que claim_next: prioridad descendente y después la más antigua
+            key=lambda shard: (-TASK_PRIORITY_CODES[candidates[shard].priority], candidates[shard].created_at),
+        )
+        for shard in ranked:
+            task = self.shard(shard).claim_next(assignee_id, visible_to, priority)
+            if task is not None:
+                return task
+        return None
+
+    # Mantenimiento
+    def archive_completed_batch(self, completed_before: datetime, batch_size: int) -> int:
+        return sum(self.scatter(lambda repo: repo.archive_completed_batch(completed_before, batch_size)))
+
+    def get_due_between(self, start: datetime, end: datetime) -> list:
+        return list(heapq.merge(*self.scatter(lambda repo: repo.get_due_between(start, end)),
+                                key=lambda row: row.due_at))
+
+    def mark_reminders_sent(self, task_ids: List[UUID]) -> None:
+        groups = self.shard_map.group(task_ids)
+        SHARD_CALLS.labels("grouped").inc()
+        self.registry.scatter(lambda shard: self.shard(shard).mark_reminders_sent(groups[shard]), groups)
+
+    # Tareas de un usuario que se borra: los shards no tienen claves foráneas
+    # a `users`, así que nada las borra ni las desasigna junto con el usuario
+    def count_created_by(self, user_id: UUID, limit: int) -> int:
+        return self.route(user_id).count_created_by(user_id, limit)
+
+    def release_user_tasks(self, user_id: UUID, batch_size: Optional[int] = None) -> int:
+        """
+        Las tareas creadas están en el shard del usuario; las asignadas, en
+        cualquiera. Cada shard confirma su parte por separado.
+        """
+        unassigned = sum(self.scatter(lambda repo: repo.unassign_user(user_id, batch_size)))
+        return unassigned + self.route(user_id).delete_created_by(user_id, batch_size)
+
+
+@contextmanager
+def open_task_repository(db: Session):
+    """
+    TaskRepository sobre `db` o, con TASK_SHARD_URLS, el repositorio de los
+    shards (con `db` para los usuarios), cuyas sesiones se cierran al salir.
+    """
+    if not sharding_enabled():
+        yield TaskRepository(db)
+        return
+    repository = ShardedTaskRepository(get_shard_registry(), UserRepository(db))
+    try:
+        yield repository
+    finally:
+        repository.close()
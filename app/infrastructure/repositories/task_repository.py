@@ -1,49 +1,167 @@
-from sqlalchemy.orm import Session
-from app.domain.models.task import Task
+from sqlalchemy import Integer, bindparam, delete, func, insert, literal, or_, select, update
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+from app.domain.models.task import Task, ArchivedTask, ARCHIVED_COLUMNS
+from app.domain.models.user import User
 from app.domain.schemas.task import TaskCreate, TaskUpdate, GetTasksQuery
-from app.domain.models.enums import TaskStatus
-from typing import List, Optional
+from app.domain.models.enums import TaskStatus, TaskPriority
+from app.domain.exceptions import VersionConflictError
+from app.infrastructure.dataloader import MAX_BATCH_SIZE
+from app.infrastructure.sharding import colocated_task_id
+from app.infrastructure.statement_cache import StatementCache
+from app.core.config import settings
+from typing import FrozenSet, List, Optional, Tuple
 from uuid import UUID
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Columnas de usuario que se cargan al expandir (UserSummary); nunca hashed_password
+USER_SUMMARY_COLUMNS = (User.id, User.email, User.first_name, User.last_name)
+
+def expand_options(model, expand: FrozenSet[str], strategy=selectinload) -> list:
+    """
+    Opciones de carga para las relaciones de `expand`. selectinload para
+    listas (una consulta IN por relación, sin multiplicar filas ni romper
+    offset/limit); joinedload para una sola fila (todo en una consulta).
+    """
+    return [strategy(getattr(model, name)).load_only(*USER_SUMMARY_COLUMNS) for name in sorted(expand)]
+
+# Alias de `tasks` para la subconsulta de claim_next. Se crea una vez: construir
+# y adaptar un alias en cada llamada cuesta más que la propia sentencia
+CLAIM_CANDIDATE = aliased(Task, name="claim_candidate")
+
+def archive_candidates(completed_before: datetime, batch_size: int):
+    """Ids del siguiente lote de archivado, bloqueados hasta el commit y saltando los ya bloqueados."""
+    return (
+        select(Task.id)
+        .where(Task.status == TaskStatus.completed, Task.completed_at < completed_before)
+        .order_by(Task.completed_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .with_hint(Task, "WITH (ROWLOCK, UPDLOCK, READPAST)", "mssql")
+    )
+
+# Filtros de GetTasksQuery, en el orden en que se aplican. Cada combinación
+# presente es una forma de consulta con su sentencia en TASK_STATEMENTS
+TASK_FILTERS = ("user_id", "assigned_to_id", "status", "priority")
+
+TASK_STATEMENTS = StatementCache("task", settings.STATEMENT_CACHE_SIZE)
+
+def query_filters(query: GetTasksQuery) -> Tuple[str, ...]:
+    return tuple(name for name in TASK_FILTERS if getattr(query, name))
+
+def filter_params(query: GetTasksQuery, filters: Tuple[str, ...]) -> dict:
+    return {name: getattr(query, name) for name in filters}
+
+def filter_conditions(model, filters: Tuple[str, ...]) -> list:
+    """Una condición por filtro con un bindparam que se llama como el campo de GetTasksQuery."""
+    return [getattr(model, name) == bindparam(name) for name in filters]
+
 class TaskRepository:
     def __init__(self, db: Session):
         self.db = db
 
-    def get_by_id(self, task_id: UUID) -> Optional[Task]:
-        return self.db.query(Task).filter(Task.id == task_id).first()
+    def get_by_id(self, task_id: UUID, expand: FrozenSet[str] = frozenset()) -> Optional[Task]:
+        def build():
+            statement = select(Task).where(Task.id == bindparam("task_id")).limit(1)
+            if expand:
+                statement = statement.options(*expand_options(Task, expand, joinedload))
+            return statement
+
+        statement = TASK_STATEMENTS.get(("by_id", expand), build)
+        return self.db.execute(statement, {"task_id": task_id}).scalars().first()
+
+    def end_read(self) -> None:
+        """Termina la transacción de lectura para devolver la conexión al pool."""
+        self.db.rollback()
+
+    def get_many(self, task_ids: List[UUID]) -> List[Task]:
+        """Tareas por id con una consulta IN por cada MAX_BATCH_SIZE ids."""
+        ids = list(dict.fromkeys(task_ids))
+        tasks: List[Task] = []
+        for start in range(0, len(ids), MAX_BATCH_SIZE):
+            tasks.extend(self.db.query(Task).filter(Task.id.in_(ids[start:start + MAX_BATCH_SIZE])))
+        return tasks
 
     def get_by_celery_task_id(self, celery_task_id: str) -> Optional[Task]:
         return self.db.query(Task).filter(Task.celery_task_id == celery_task_id).first()
 
+    def _page(self, model, query: GetTasksQuery, filters: Tuple[str, ...], skip: int, limit: int) -> list:
+        def build():
+            # OFFSET y LIMIT como parámetros: una sentencia por forma de consulta,
+            # no por página. SQL Server exige ORDER BY para paginar con parámetros
+            statement = (
+                select(model)
+                .where(*filter_conditions(model, filters))
+                .order_by(model.created_at, model.id)
+                .offset(bindparam("skip", type_=Integer, literal_execute=True))
+                .limit(bindparam("limit", type_=Integer, literal_execute=True))
+            )
+            if query.expand:
+                statement = statement.options(*expand_options(model, query.expand))
+            return statement
+
+        key = ("page", model.__tablename__, filters, query.expand)
+        statement = TASK_STATEMENTS.get(key, build)
+        params = {**filter_params(query, filters), "skip": skip, "limit": limit}
+        return self.db.execute(statement, params).scalars().all()
+
+    def _count(self, model, query: GetTasksQuery, filters: Tuple[str, ...]) -> int:
+        def build():
+            return select(func.count()).select_from(model).where(*filter_conditions(model, filters))
+
+        statement = TASK_STATEMENTS.get(("count", model.__tablename__, filters), build)
+        return self.db.execute(statement, filter_params(query, filters)).scalar_one()
+
     def get_all(self, query: GetTasksQuery) -> List[Task]:
-        db_query = self.db.query(Task)
+        filters = query_filters(query)
+        tasks = self._page(Task, query, filters, query.skip, query.limit)
+        if not query.include_archived or len(tasks) == query.limit:
+            return tasks
         
-        if query.user_id:
-            db_query = db_query.filter(Task.user_id == query.user_id)
-        
-        if query.assigned_to_id:
-            db_query = db_query.filter(Task.assigned_to_id == query.assigned_to_id)
-        
-        if query.status:
-            db_query = db_query.filter(Task.status == query.status)
-        
-        if query.priority:
-            db_query = db_query.filter(Task.priority == query.priority)
-            
-        return db_query.offset(query.skip).limit(query.limit).all()
+        # Las archivadas van después de las activas: solo se consultan si la
+        # página no se ha llenado con `tasks`
+        if tasks:
+            active_count = query.skip + len(tasks)
+        else:
+            active_count = self._count(Task, query, filters) if query.skip else 0
+        archived = self._page(ArchivedTask, query, filters, max(0, query.skip - active_count),
+                              query.limit - len(tasks))
+        return tasks + archived
+
+    def get_window(self, query: GetTasksQuery, limit: int, archived: bool = False) -> list:
+        """
+        Primeras `limit` tareas (o archivadas) del filtro en orden
+        (created_at, id), sin expandir: la parte de un shard en las consultas
+        scatter-gather, que se mezclan por ese mismo orden.
+        """
+        model = ArchivedTask if archived else Task
+        filters = query_filters(query)
+
+        def build():
+            return (
+                select(model)
+                .where(*filter_conditions(model, filters))
+                .order_by(model.created_at, model.id)
+                .limit(bindparam("limit", type_=Integer, literal_execute=True))
+            )
+
+        statement = TASK_STATEMENTS.get(("window", model.__tablename__, filters), build)
+        return self.db.execute(statement, {**filter_params(query, filters), "limit": limit}).scalars().all()
 
     def create(self, task: TaskCreate, user_id: UUID) -> Task:
         try:
             db_task = Task(
+                # El id lleva el bucket de shard del creador (ver app.infrastructure.sharding)
+                id=colocated_task_id(user_id),
                 title=task.title,
                 description=task.description,
                 priority=task.priority,
                 user_id=user_id,
-                assigned_to_id=task.assigned_to_id
+                assigned_to_id=task.assigned_to_id,
+                due_at=task.due_at
             )
             self.db.add(db_task)
             self.db.commit()
@@ -67,11 +185,130 @@ class TaskRepository:
             self.db.commit()
             self.db.refresh(db_task)
             return db_task
+        except StaleDataError:
+            self.db.rollback()
+            return self._version_conflict(task_id)
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error updating task {task_id}: {str(e)}")
+            raise
+
+    def update_conditional(self, task_id: UUID, values: dict, user_id: UUID, is_admin: bool,
+                           expected_version: Optional[int] = None) -> Optional[Task]:
+        """
+        Actualización en una sola sentencia: UPDATE ... SET ..., version =
+        version + 1 WHERE id = :id [AND version = :v] AND (user_id = :u OR
+        :is_admin) con OUTPUT/RETURNING. Devuelve la tarea actualizada o None
+        si ninguna fila cumplió las condiciones (ver get_write_state).
+        """
+        try:
+            conditions = [Task.id == task_id]
+            if not is_admin:
+                conditions.append(Task.user_id == user_id)
+            if expected_version is not None:
+                conditions.append(Task.version == expected_version)
+            statement = (
+                update(Task)
+                .where(*conditions)
+                .values(**values, version=Task.version + 1, updated_at=datetime.utcnow())
+                .returning(Task)
+                .execution_options(synchronize_session=False)
+            )
+            # populate_existing: si la tarea ya estaba en la sesión (creada o
+            # leída antes en la misma unidad de trabajo) toma lo devuelto por
+            # OUTPUT en vez de conservar los valores anteriores
+            db_task = self.db.execute(
+                select(Task).from_statement(statement).execution_options(populate_existing=True)
+            ).scalars().first()
+            if db_task is not None:
+                # Separar la instancia para que el commit no la expire: la
+                # respuesta se construye con lo devuelto por OUTPUT, sin otro SELECT
+                self.db.expunge(db_task)
+            self.db.commit()
+            return db_task
         except Exception as e:
             self.db.rollback()
             logger.error(f"Error updating task {task_id}: {str(e)}")
             raise
 
+    @staticmethod
+    def _claim_conditions(candidate, assignee_id: UUID, visible_to: Optional[UUID],
+                          priority: Optional[TaskPriority], created_by_id: Optional[UUID]) -> list:
+        conditions = [
+            candidate.status == TaskStatus.pending,
+            or_(candidate.assigned_to_id.is_(None), candidate.assigned_to_id == assignee_id),
+        ]
+        if visible_to is not None:
+            conditions.append(or_(candidate.user_id == visible_to, candidate.assigned_to_id == visible_to))
+        if priority is not None:
+            conditions.append(candidate.priority == priority)
+        if created_by_id is not None:
+            conditions.append(candidate.user_id == created_by_id)
+        return conditions
+
+    def peek_claim_candidate(self, assignee_id: UUID, visible_to: Optional[UUID] = None,
+                             priority: Optional[TaskPriority] = None, created_by_id: Optional[UUID] = None):
+        """
+        (priority, created_at) de la tarea que reclamaría claim_next, sin
+        bloquearla. Sirve para elegir el shard con la mejor candidata.
+        """
+        candidate = CLAIM_CANDIDATE
+        return self.db.execute(
+            select(candidate.priority, candidate.created_at)
+            .where(*self._claim_conditions(candidate, assignee_id, visible_to, priority, created_by_id))
+            .order_by(candidate.priority.desc(), candidate.created_at)
+            .limit(1)
+        ).first()
+
+    def claim_next(self, assignee_id: UUID, visible_to: Optional[UUID] = None,
+                   priority: Optional[TaskPriority] = None, created_by_id: Optional[UUID] = None) -> Optional[Task]:
+        """
+        Reclama la tarea pendiente de mayor prioridad y más antigua en una
+        sola sentencia: UPDATE ... SET assigned_to_id, status = in_progress
+        WHERE id = (SELECT TOP 1 id ... ORDER BY priority DESC, created_at)
+        con OUTPUT/RETURNING. La subconsulta salta las filas que otro claim
+        tiene bloqueadas (READPAST/UPDLOCK en SQL Server, FOR UPDATE SKIP
+        LOCKED en PostgreSQL), así que los claims concurrentes no se esperan
+        ni se pisan. Sin tareas disponibles devuelve None.
+
+        `visible_to` limita la búsqueda a las tareas que ese usuario puede ver.
+        """
+        candidate = CLAIM_CANDIDATE
+        conditions = self._claim_conditions(candidate, assignee_id, visible_to, priority, created_by_id)
+        next_id = (
+            select(candidate.id)
+            .where(*conditions)
+            .order_by(candidate.priority.desc(), candidate.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .with_hint(candidate, "WITH (ROWLOCK, UPDLOCK, READPAST)", "mssql")
+            .scalar_subquery()
+        )
+        try:
+            statement = (
+                update(Task)
+                # El estado se comprueba otra vez por si la fila cambió entre la búsqueda y el bloqueo
+                .where(Task.id == next_id, Task.status == TaskStatus.pending)
+                .values(assigned_to_id=assignee_id, status=TaskStatus.in_progress,
+                        version=Task.version + 1, updated_at=datetime.utcnow())
+                .returning(Task)
+                .execution_options(synchronize_session=False)
+            )
+            db_task = self.db.execute(statement).scalars().first()
+            if db_task is not None:
+                # Igual que update_conditional: la respuesta sale del OUTPUT, sin otro SELECT
+                self.db.expunge(db_task)
+            self.db.commit()
+            return db_task
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error claiming next task for {assignee_id}: {str(e)}")
+            raise
+
+    def get_write_state(self, task_id: UUID):
+        """(user_id, version) de una tarea para explicar un update condicional fallido."""
+        return self.db.execute(select(Task.user_id, Task.version).where(Task.id == task_id)).first()
+
     def delete(self, task_id: UUID) -> bool:
         try:
             db_task = self.get_by_id(task_id)
@@ -98,23 +335,158 @@ class TaskRepository:
             self.db.commit()
             self.db.refresh(db_task)
             return db_task
+        except StaleDataError:
+            self.db.rollback()
+            return self._version_conflict(task_id)
         except Exception as e:
             self.db.rollback()
             logger.error(f"Error completing task {task_id}: {str(e)}")
             raise
         
     def update_celery_task_id(self, task_id: UUID, celery_task_id: str) -> Optional[Task]:
+        """
+        Sin comprobar la versión (UPDATE condicional solo por id): el id de
+        Celery no compite con los cambios del usuario y la creación no debe
+        fallar porque la tarea se modificara justo después.
+        """
+        return self.update_conditional(task_id, {"celery_task_id": celery_task_id}, None, True)
+
+    def _version_conflict(self, task_id: UUID) -> None:
+        """
+        Traduce un StaleDataError del ORM (el UPDATE ... WHERE version = :v
+        de `version_id_col` no encontró la fila): None si la tarea ya no
+        existe, VersionConflictError con la versión actual si otra
+        transacción la modificó entre la lectura y la escritura.
+        """
+        state = self.get_write_state(task_id)
+        if state is None:
+            return None
+        logger.info(f"Conflicto de versión al escribir la tarea {task_id}: versión actual {state.version}")
+        raise VersionConflictError("La tarea ha cambiado desde que se leyó", state.version)
+
+    def archive_completed_batch(self, completed_before: datetime, batch_size: int) -> int:
+        """
+        Mueve a `tasks_archive` un lote de tareas completadas antes de
+        `completed_before`. Cada lote es una transacción corta (INSERT ...
+        SELECT + DELETE por clave primaria) para no bloquear `tasks`.
+        Las filas del lote se bloquean al seleccionarlas (UPDLOCK en SQL
+        Server, FOR UPDATE en PostgreSQL) y se saltan las que otra
+        transacción tiene bloqueadas, así que nadie puede reabrir una tarea
+        entre el INSERT y el DELETE: se borra exactamente lo que se copió.
+        Devuelve el número de tareas archivadas.
+        """
         try:
-            db_task = self.get_by_id(task_id)
-            if not db_task:
-                return None
-                
-            db_task.celery_task_id = celery_task_id
+            ids = self.db.execute(archive_candidates(completed_before, batch_size)).scalars().all()
+            if not ids:
+                return 0
             
+            batch = (Task.id.in_(ids), Task.status == TaskStatus.completed)
+            columns = [Task.__table__.c[name] for name in ARCHIVED_COLUMNS]
+            archived = self.db.execute(
+                insert(ArchivedTask).from_select(
+                    ARCHIVED_COLUMNS + ["archived_at"],
+                    select(*columns, literal(datetime.utcnow(), ArchivedTask.archived_at.type)).where(*batch)
+                )
+            ).rowcount
+            self.db.execute(delete(Task).where(*batch))
             self.db.commit()
-            self.db.refresh(db_task)
-            return db_task
+            return archived
         except Exception as e:
             self.db.rollback()
-            logger.error(f"Error updating celery task ID for task {task_id}: {str(e)}")
-            raise 
\ No newline at end of file
+            logger.error(f"Error archiving completed tasks: {str(e)}")
+            raise
+
+    def get_due_between(self, start: datetime, end: datetime) -> list:
+        """
+        Tareas abiertas sin recordatorio enviado con due_at en [start, end).
+        Range scan sobre ix_tasks_due_at; nunca recorre la tabla completa.
+        """
+        return self.db.execute(
+            select(Task.id, Task.user_id, Task.priority, Task.due_at)
+            .where(
+                Task.due_at >= start,
+                Task.due_at < end,
+                Task.reminder_sent_at.is_(None),
+                Task.status.in_((TaskStatus.pending, TaskStatus.in_progress)),
+            )
+            .order_by(Task.due_at)
+        ).all()
+
+    def mark_reminders_sent(self, task_ids: List[UUID]) -> None:
+        try:
+            for start in range(0, len(task_ids), MAX_BATCH_SIZE):
+                self.db.execute(
+                    update(Task)
+                    .where(Task.id.in_(task_ids[start:start + MAX_BATCH_SIZE]))
+                    .values(reminder_sent_at=datetime.utcnow())
+                    .execution_options(synchronize_session=False)
+                )
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error marking reminders as sent: {str(e)}")
+            raise
+
+    # Tareas de un usuario que se borra (ver UserService.delete_user y purge_user)
+    def count_created_by(self, user_id: UUID, limit: int) -> int:
+        """Tareas creadas por el usuario, contando como mucho `limit` + 1 (índice de user_id)."""
+        subquery = select(Task.id).where(Task.user_id == user_id).limit(limit + 1).subquery()
+        return self.db.execute(select(func.count()).select_from(subquery)).scalar_one()
+
+    @staticmethod
+    def _user_rows(column, user_id: UUID, batch_size: Optional[int]):
+        if batch_size is None:
+            return column == user_id
+        return Task.id.in_(select(Task.id).where(column == user_id).limit(batch_size).scalar_subquery())
+
+    def _unassign(self, user_id: UUID, batch_size: Optional[int]) -> int:
+        return self.db.execute(
+            update(Task)
+            .where(self._user_rows(Task.assigned_to_id, user_id, batch_size))
+            .values(assigned_to_id=None, version=Task.version + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    def _delete_created(self, user_id: UUID, batch_size: Optional[int]) -> int:
+        return self.db.execute(
+            delete(Task)
+            .where(self._user_rows(Task.user_id, user_id, batch_size))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    def unassign_user(self, user_id: UUID, batch_size: Optional[int] = None) -> int:
+        """Anula hasta `batch_size` asignaciones al usuario (todas sin `batch_size`)."""
+        try:
+            unassigned = self._unassign(user_id, batch_size)
+            self.db.commit()
+            return unassigned
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error unassigning tasks of user {user_id}: {str(e)}")
+            raise
+
+    def delete_created_by(self, user_id: UUID, batch_size: Optional[int] = None) -> int:
+        """Borra hasta `batch_size` tareas creadas por el usuario (todas sin `batch_size`)."""
+        try:
+            deleted = self._delete_created(user_id, batch_size)
+            self.db.commit()
+            return deleted
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error deleting tasks of user {user_id}: {str(e)}")
+            raise
+
+    def release_user_tasks(self, user_id: UUID, batch_size: Optional[int] = None) -> int:
+        """
+        Anula las asignaciones al usuario y borra las tareas que creó, hasta
+        `batch_size` de cada (un lote del borrado en segundo plano) o todas,
+        en una transacción corta. Devuelve las filas afectadas.
+        """
+        try:
+            affected = self._unassign(user_id, batch_size) + self._delete_created(user_id, batch_size)
+            self.db.commit()
+            return affected
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error releasing tasks of user {user_id}: {str(e)}")
+            raise
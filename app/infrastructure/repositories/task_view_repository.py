@@ -0,0 +1,105 @@
+from sqlalchemy import delete, insert, literal, or_, select
+from sqlalchemy.orm import Session, aliased
+from app.domain.models.task import Task
+from app.domain.models.task_view import TaskView, TASK_VIEW_TASK_COLUMNS
+from app.domain.models.user import User
+from app.domain.schemas.task import GetTasksQuery
+from app.infrastructure.dataloader import MAX_BATCH_SIZE
+from typing import List, Optional
+from uuid import UUID
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+_CREATOR = aliased(User, name="creator")
+_ASSIGNEE = aliased(User, name="assignee")
+
+def _projection_select(task_ids: List[UUID]):
+    """SELECT de las filas de task_view para `task_ids`, desde tasks + users."""
+    return (
+        select(
+            *(Task.__table__.c[name] for name in TASK_VIEW_TASK_COLUMNS),
+            _CREATOR.email, _CREATOR.first_name, _CREATOR.last_name,
+            _ASSIGNEE.email, _ASSIGNEE.first_name, _ASSIGNEE.last_name,
+            literal(datetime.utcnow(), TaskView.projected_at.type),
+        )
+        .outerjoin(_CREATOR, _CREATOR.id == Task.user_id)
+        .outerjoin(_ASSIGNEE, _ASSIGNEE.id == Task.assigned_to_id)
+        .where(Task.id.in_(task_ids))
+    )
+
+_PROJECTED_COLUMNS = TASK_VIEW_TASK_COLUMNS + [
+    "user_email", "user_first_name", "user_last_name",
+    "assigned_to_email", "assigned_to_first_name", "assigned_to_last_name",
+    "projected_at",
+]
+
+class TaskViewRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    # Consultas
+    def get_by_id(self, task_id: UUID) -> Optional[TaskView]:
+        return self.db.get(TaskView, task_id)
+
+    def get_all(self, query: GetTasksQuery) -> List[TaskView]:
+        db_query = self.db.query(TaskView)
+        if query.user_id:
+            db_query = db_query.filter(TaskView.user_id == query.user_id)
+        if query.assigned_to_id:
+            db_query = db_query.filter(TaskView.assigned_to_id == query.assigned_to_id)
+        if query.status:
+            db_query = db_query.filter(TaskView.status == query.status)
+        if query.priority:
+            db_query = db_query.filter(TaskView.priority == query.priority)
+        return db_query.order_by(TaskView.created_at, TaskView.id).offset(query.skip).limit(query.limit).all()
+
+    # Proyección
+    def project(self, task_ids: List[UUID]) -> int:
+        """
+        Vuelve a calcular las filas de `task_ids` desde tasks + users (DELETE +
+        INSERT ... SELECT, una transacción por cada MAX_BATCH_SIZE ids). Las
+        tareas que ya no existen quedan fuera. Devuelve las filas escritas.
+        """
+        ids = list(dict.fromkeys(task_ids))
+        written = 0
+        try:
+            for start in range(0, len(ids), MAX_BATCH_SIZE):
+                chunk = ids[start:start + MAX_BATCH_SIZE]
+                self.db.execute(delete(TaskView).where(TaskView.id.in_(chunk)))
+                written += self.db.execute(
+                    insert(TaskView).from_select(_PROJECTED_COLUMNS, _projection_select(chunk))
+                ).rowcount
+                self.db.commit()
+            return written
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error projecting {len(ids)} tasks into task_view: {str(e)}")
+            raise
+
+    def remove(self, task_ids: List[UUID]) -> None:
+        try:
+            for start in range(0, len(task_ids), MAX_BATCH_SIZE):
+                self.db.execute(delete(TaskView).where(TaskView.id.in_(task_ids[start:start + MAX_BATCH_SIZE])))
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error removing tasks from task_view: {str(e)}")
+            raise
+
+    def ids_for_user(self, user_id: UUID) -> List[UUID]:
+        """Filas que muestran datos del usuario, como creador o como asignado."""
+        return self.db.execute(
+            select(TaskView.id).where(or_(TaskView.user_id == user_id, TaskView.assigned_to_id == user_id))
+        ).scalars().all()
+
+    def source_ids_after(self, after: Optional[UUID], batch_size: int) -> List[UUID]:
+        """Lote de ids de `tasks` por orden de clave primaria, para reconstruir."""
+        statement = select(Task.id).order_by(Task.id).limit(batch_size)
+        if after is not None:
+            statement = statement.where(Task.id > after)
+        return self.db.execute(statement).scalars().all()
+
+    def count(self) -> int:
+        return self.db.query(TaskView).count()
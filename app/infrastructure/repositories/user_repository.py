@@ -1,22 +1,43 @@
+from sqlalchemy import bindparam, select, update
 from sqlalchemy.orm import Session
 from app.domain.models.user import User
+from app.domain.models.task import Task
 from app.domain.schemas.user import UserCreate, UserUpdate
 from app.core.security import get_password_hash
-from typing import List, Optional
+from app.core.config import settings
+from app.infrastructure.statement_cache import StatementCache
+from typing import Dict, List, Optional
 from uuid import UUID
 import logging
 
 logger = logging.getLogger(__name__)
 
+USER_STATEMENTS = StatementCache("user", settings.STATEMENT_CACHE_SIZE)
+
+def _user_by(column, name: str):
+    return select(User).where(column == bindparam(name)).limit(1)
+
 class UserRepository:
     def __init__(self, db: Session):
         self.db = db
 
     def get_by_id(self, user_id: UUID) -> Optional[User]:
-        return self.db.query(User).filter(User.id == user_id).first()
+        statement = USER_STATEMENTS.get("by_id", lambda: _user_by(User.id, "user_id"))
+        return self.db.execute(statement, {"user_id": user_id}).scalars().first()
+
+    def end_read(self) -> None:
+        """Termina la transacción de lectura para devolver la conexión al pool."""
+        self.db.rollback()
+
+    def get_many(self, user_ids: List[UUID]) -> Dict[UUID, User]:
+        """Usuarios por id con una sola consulta IN (batch_fn de DataLoader)."""
+        if not user_ids:
+            return {}
+        return {user.id: user for user in self.db.query(User).filter(User.id.in_(user_ids))}
 
     def get_by_email(self, email: str) -> Optional[User]:
-        return self.db.query(User).filter(User.email == email).first()
+        statement = USER_STATEMENTS.get("by_email", lambda: _user_by(User.email, "email"))
+        return self.db.execute(statement, {"email": email}).scalars().first()
 
     def get_all(self) -> List[User]:
         return self.db.query(User).all()
@@ -59,16 +80,31 @@ class UserRepository:
             logger.error(f"Error updating user {user_id}: {str(e)}")
             raise
 
+    def _unassign_statement(self, user_id: UUID):
+        return (
+            update(Task)
+            .where(Task.assigned_to_id == user_id)
+            .values(assigned_to_id=None, version=Task.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
     def delete(self, user_id: UUID) -> bool:
+        """
+        Borra el usuario sin cargar sus tareas: las asignaciones se anulan con
+        un UPDATE en bloque y sus tareas las borra ON DELETE CASCADE. Solo
+        alcanza a la base de datos principal: las tareas de los shards las
+        libera antes UserService con el repositorio de tareas.
+        """
         try:
             db_user = self.get_by_id(user_id)
             if not db_user:
                 return False
 
+            self.db.execute(self._unassign_statement(user_id))
             self.db.delete(db_user)
             self.db.commit()
             return True
         except Exception as e:
             self.db.rollback()
             logger.error(f"Error deleting user {user_id}: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
@@ -0,0 +1,135 @@
+"""
+Sharding de tareas por creador (Task.user_id).
+
+Cada UUID cae en uno de NUM_BUCKETS buckets (sus 12 bits bajos) y cada
+shard posee un rango contiguo de buckets. Los ids de tarea se generan con el
+bucket de su creador (colocated_task_id), así que una tarea se localiza por
+su id sin consultar ningún directorio y todas las tareas de un usuario viven
+en el mismo shard.
+
+Los shards se configuran con TASK_SHARD_URLS (URLs separadas por comas; con
+SQLite, un fichero por shard). Cada shard contiene `tasks` y `tasks_archive`
+sin claves foráneas a `users`, que sigue en DATABASE_URL. Un shard puede
+ser la propia DATABASE_URL. Crear el esquema de los shards:
+
+    python -m app.infrastructure.migrations.migrate --shards
+
+Las tareas creadas antes de activar el sharding no llevan el bucket de su
+creador en el id: se mueven a su shard (con un id nuevo) con
+app.infrastructure.migrations.shard_tasks antes de abrir la API.
+
+El orden de las URLs es parte del mapa: añadir un shard reasigna rangos de
+buckets y exige mover antes las tareas de esos buckets.
+"""
+import logging
+import threading
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, TypeVar
+from uuid import UUID
+from sqlalchemy.orm import Session, sessionmaker
+from app.core.config import settings
+from app.core.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+NUM_BUCKETS = 4096
+_BUCKET_MASK = NUM_BUCKETS - 1
+
+SHARD_FANOUT = Histogram(
+    "task_shard_fanout", "Shards queried per scatter-gather call",
+    buckets=(1, 2, 4, 8, 16, 32),
+)
+
+T = TypeVar("T")
+
+
+def shard_bucket(key: UUID) -> int:
+    return key.int & _BUCKET_MASK
+
+
+def colocated_task_id(user_id: UUID) -> UUID:
+    """uuid4 con el bucket de `user_id`: la tarea cae en el shard de su creador."""
+    return UUID(int=(uuid.uuid4().int & ~_BUCKET_MASK) | shard_bucket(user_id))
+
+
+class ShardMap:
+    """Bucket -> shard, con rangos contiguos del mismo tamaño."""
+
+    def __init__(self, shard_count: int):
+        if shard_count < 1:
+            raise ValueError("Se necesita al menos un shard")
+        self.shard_count = shard_count
+
+    def shard_for(self, key: UUID) -> int:
+        return shard_bucket(key) * self.shard_count // NUM_BUCKETS
+
+    def group(self, keys: Iterable[UUID]) -> Dict[int, List[UUID]]:
+        """Claves agrupadas por shard, conservando el orden dentro de cada grupo."""
+        groups: Dict[int, List[UUID]] = defaultdict(list)
+        for key in keys:
+            groups[self.shard_for(key)].append(key)
+        return dict(groups)
+
+
+class ShardRegistry:
+    """Motores y fábricas de sesiones de los shards, y el pool para consultarlos en paralelo."""
+
+    def __init__(self, urls: List[str], scatter_workers: int = 8):
+        from app.infrastructure.database import create_database_engine, engine
+        self.urls = urls
+        # La DATABASE_URL reutiliza el motor principal (y su pool) si es uno de los shards
+        self.engines = [engine if url == settings.DATABASE_URL else create_database_engine(url) for url in urls]
+        self.session_factories = [sessionmaker(autocommit=False, autoflush=False, bind=e) for e in self.engines]
+        self.shard_map = ShardMap(len(urls))
+        self._executor = ThreadPoolExecutor(max_workers=max(1, min(scatter_workers, len(urls))),
+                                            thread_name_prefix="task-shards")
+
+    def __len__(self) -> int:
+        return len(self.engines)
+
+    def session(self, shard: int) -> Session:
+        return self.session_factories[shard]()
+
+    def scatter(self, fn: Callable[[int], T], shards: Optional[Iterable[int]] = None) -> List[T]:
+        """
+        Ejecuta fn(shard) en cada shard (todos por defecto) en paralelo y
+        devuelve los resultados en el orden de `shards`. Con un solo shard se
+        ejecuta en el hilo actual.
+        """
+        shards = list(range(len(self))) if shards is None else list(shards)
+        SHARD_FANOUT.observe(len(shards))
+        if len(shards) == 1:
+            return [fn(shards[0])]
+        return list(self._executor.map(fn, shards))
+
+    def dispose(self) -> None:
+        self._executor.shutdown(wait=False)
+        for shard_engine in self.engines:
+            shard_engine.dispose()
+
+
+def shard_urls() -> List[str]:
+    return [url.strip() for url in settings.TASK_SHARD_URLS.split(",") if url.strip()]
+
+
+def sharding_enabled() -> bool:
+    return bool(shard_urls())
+
+
+_registry: Optional[ShardRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_shard_registry() -> ShardRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                urls = shard_urls()
+                if not urls:
+                    raise RuntimeError("TASK_SHARD_URLS no está configurado")
+                _registry = ShardRegistry(urls, settings.TASK_SHARD_SCATTER_WORKERS)
+                logger.info(f"Sharding de tareas activo con {len(urls)} shards")
+    return _registry
@@ -0,0 +1,222 @@
+import logging
+import re
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from time import perf_counter
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core import tracing
+from app.core.config import settings
+from app.core.metrics import Counter, Histogram
+from app.core.request_context import RequestStats, request_stats
+
+logger = logging.getLogger(__name__)
+
+SQL_STATEMENTS_TOTAL = Counter(
+    "db_statements_total",
+    "SQL statements executed."
+)
+SQL_STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds",
+    "Time spent executing individual SQL statements.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+SQL_SLOW_STATEMENTS_TOTAL = Counter(
+    "db_slow_statements_total",
+    "SQL statements slower than SLOW_QUERY_THRESHOLD_MS."
+)
+SQL_COMPILED_CACHE_TOTAL = Counter(
+    "db_compiled_cache_total",
+    "Statements executed by SQLAlchemy compiled cache outcome (cache_hit, cache_miss, no_cache_key, ...).",
+    ["result"]
+)
+SQL_N_PLUS_ONE_TOTAL = Counter(
+    "db_n_plus_one_total",
+    "Requests where one statement fingerprint exceeded N_PLUS_ONE_THRESHOLD executions."
+)
+
+_START_KEY = "query_start_time"
+_SPAN_STATEMENT_MAX = 1000  # Caracteres de la huella que se guardan en el span
+_OTHER_FINGERPRINT = "<other>"
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|:\w+|\?|%s")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+class NPlusOneError(AssertionError):
+    """Una misma sentencia se ejecutó más veces de las permitidas en una petición."""
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """
+    Normaliza una sentencia SQL para agrupar ejecuciones equivalentes:
+    literales y parámetros pasan a '?', las listas IN se colapsan y se
+    compactan los espacios.
+    """
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _PLACEHOLDER.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _IN_LIST.sub("IN (?...)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+def _redact(parameters) -> str:
+    # Nunca se registran valores, solo cuántos parámetros y de qué tipo
+    if not parameters:
+        return "[]"
+    if isinstance(parameters, dict):
+        values = list(parameters.values())
+    elif isinstance(parameters, (list, tuple)):
+        values = list(parameters)
+    else:
+        return "[<redacted>]"
+    return "[" + ", ".join(f"<{type(value).__name__}>" for value in values) + "]"
+
+
+class QueryStats:
+    """
+    Estadísticas agregadas por huella de sentencia: ejecuciones, tiempo total
+    y máximo. El número de huellas está acotado; el resto se agrupa en '<other>'.
+    """
+
+    def __init__(self, max_fingerprints: int):
+        self.max_fingerprints = max_fingerprints
+        self._stats: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, elapsed: float, slow: bool) -> None:
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    key = _OTHER_FINGERPRINT
+                    entry = self._stats.get(key)
+                if entry is None:
+                    entry = self._stats[key] = [0, 0.0, 0.0, 0]
+            entry[0] += 1
+            entry[1] += elapsed
+            if elapsed > entry[2]:
+                entry[2] = elapsed
+            if slow:
+                entry[3] += 1
+
+    def top(self, limit: int = 20, order_by: str = "total_time") -> List[dict]:
+        with self._lock:
+            items = [
+                {
+                    "fingerprint": key,
+                    "count": int(entry[0]),
+                    "total_time": entry[1],
+                    "mean_time": entry[1] / entry[0],
+                    "max_time": entry[2],
+                    "slow_count": int(entry[3]),
+                }
+                for key, entry in self._stats.items()
+            ]
+        items.sort(key=lambda item: item[order_by], reverse=True)
+        return items[:limit]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+query_stats = QueryStats(settings.SQL_STATS_MAX_FINGERPRINTS)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info[_START_KEY] = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info.pop(_START_KEY, None)
+    if start is None:
+        return
+    elapsed = perf_counter() - start
+    key = fingerprint(statement)
+    slow = elapsed * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS
+
+    SQL_STATEMENTS_TOTAL.inc()
+    SQL_STATEMENT_DURATION.observe(elapsed)
+    cache_hit = getattr(context, "cache_hit", None)
+    if cache_hit is not None:
+        SQL_COMPILED_CACHE_TOTAL.labels(cache_hit.name.lower()).inc()
+    query_stats.record(key, elapsed, slow)
+
+    if slow:
+        SQL_SLOW_STATEMENTS_TOTAL.inc()
+        logger.warning(
+            f"Sentencia SQL lenta ({elapsed * 1000:.1f} ms): {key} parámetros={_redact(parameters)}"
+        )
+
+    if tracing.recording():
+        tracing.record_span(f"SQL {key.split(' ', 1)[0]}", elapsed, tracing.CLIENT, {
+            "db.system": conn.dialect.name,
+            "db.statement": key[:_SPAN_STATEMENT_MAX],
+        })
+
+    stats = request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_time += elapsed
+        _track_n_plus_one(stats, key)
+
+
+def _track_n_plus_one(stats: RequestStats, key: str) -> None:
+    if stats.fingerprints is None:
+        stats.fingerprints = {}
+    count = stats.fingerprints.get(key, 0) + 1
+    stats.fingerprints[key] = count
+
+    threshold = stats.n_plus_one_threshold
+    if threshold is None:
+        threshold = settings.N_PLUS_ONE_THRESHOLD
+    # Se avisa una sola vez por huella, al superar el umbral
+    if count != threshold + 1:
+        return
+    if stats.n_plus_one is None:
+        stats.n_plus_one = []
+        SQL_N_PLUS_ONE_TOTAL.inc()
+    stats.n_plus_one.append(key)
+    logger.warning(f"Posible N+1: la sentencia se ejecutó más de {threshold} veces en la misma petición: {key}")
+    if settings.N_PLUS_ONE_RAISE:
+        raise NPlusOneError(f"Sentencia ejecutada más de {threshold} veces en una petición: {key}")
+
+
+@contextmanager
+def assert_no_n_plus_one(threshold: Optional[int] = None):
+    """
+    Context manager para tests de servicios y repositorios: falla si dentro
+    del bloque una misma sentencia se ejecuta más de `threshold` veces.
+    Para tests HTTP basta con N_PLUS_ONE_RAISE=true, que hace fallar la
+    petición en el momento de la detección (ver tests/conftest.py).
+
+    Uso:
+        with assert_no_n_plus_one(threshold=3):
+            task_service.handle_get_tasks(query)
+    """
+    stats = RequestStats(n_plus_one_threshold=threshold)
+    token = request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        request_stats.reset(token)
+    if stats.n_plus_one:
+        raise NPlusOneError(f"Patrones N+1 detectados: {stats.n_plus_one}")
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Registra los listeners de cursor que miden cada sentencia SQL, registran
+    las lentas y acumulan las estadísticas de la petición en curso.
+    """
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,77 @@
+"""
+Sentencias SELECT construidas una vez por forma de consulta.
+
+Construir un Query, aplicarle los filtros y calcular su clave de caché
+cuesta más que ejecutar las lecturas cortas por clave (get_by_id,
+get_by_email). Los repositorios guardan aquí una sentencia por forma (qué
+filtros lleva, qué relaciones expande) con los valores, también OFFSET y
+LIMIT, como bindparam con nombre, y la ejecutan con los parámetros de cada
+llamada:
+
+    statement = USER_STATEMENTS.get("by_email", lambda: select(User).where(User.email == bindparam("email")))
+    db.execute(statement, {"email": email})
+
+Reutilizar el mismo objeto hace que SQLAlchemy memorice su clave de caché y
+encuentre el SQL ya compilado en el motor (ver SQL_COMPILED_CACHE_SIZE y
+db_compiled_cache_total en app.infrastructure.sql_instrumentation).
+Las sentencias son inmutables, así que se comparten entre hilos.
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+from sqlalchemy.sql import Executable
+from app.core.config import settings
+from app.core.metrics import Counter, Gauge
+
+STATEMENT_CACHE_LOOKUPS = Counter(
+    "statement_cache_lookups_total",
+    "Repository statement cache lookups by result (hit, miss, disabled)",
+    ["cache", "result"],
+)
+STATEMENT_CACHE_EVICTIONS = Counter(
+    "statement_cache_evictions_total", "Statements evicted from a full repository statement cache", ["cache"]
+)
+STATEMENT_CACHE_SIZE = Gauge("statement_cache_size", "Statements held by each repository statement cache", ["cache"])
+
+
+class StatementCache:
+    """LRU de sentencias por forma de consulta, acotada a `max_size`."""
+
+    def __init__(self, name: str, max_size: int):
+        self.name = name
+        self.max_size = max_size
+        self._statements: "OrderedDict[Hashable, Executable]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, build: Callable[[], Executable]) -> Executable:
+        if not settings.STATEMENT_CACHE_ENABLED:
+            STATEMENT_CACHE_LOOKUPS.labels(self.name, "disabled").inc()
+            return build()
+
+        with self._lock:
+            statement = self._statements.get(key)
+            if statement is not None:
+                self._statements.move_to_end(key)
+        if statement is not None:
+            STATEMENT_CACHE_LOOKUPS.labels(self.name, "hit").inc()
+            return statement
+
+        STATEMENT_CACHE_LOOKUPS.labels(self.name, "miss").inc()
+        # Se construye fuera del lock: si dos hilos fallan a la vez, gana el último
+        statement = build()
+        with self._lock:
+            self._statements[key] = statement
+            self._statements.move_to_end(key)
+            while len(self._statements) > self.max_size:
+                self._statements.popitem(last=False)
+                STATEMENT_CACHE_EVICTIONS.labels(self.name).inc()
+            STATEMENT_CACHE_SIZE.labels(self.name).set(len(self._statements))
+        return statement
+
+    def __len__(self) -> int:
+        return len(self._statements)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._statements.clear()
+            STATEMENT_CACHE_SIZE.labels(self.name).set(0)
@@ -0,0 +1,83 @@
+import uuid
+from enum import Enum
+from typing import Dict, Optional, Type
+from sqlalchemy.dialects import mssql, postgresql
+from sqlalchemy.types import BINARY, SmallInteger, TypeDecorator
+
+
+class GUID(TypeDecorator):
+    """
+    UUID portable y compacto: UNIQUEIDENTIFIER nativo en SQL Server, UUID en
+    PostgreSQL y BINARY(16) en el resto (SQLite, MySQL). Nunca se guarda como
+    texto de 36 caracteres.
+    """
+    impl = BINARY(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "mssql":
+            return dialect.type_descriptor(mssql.UNIQUEIDENTIFIER(as_uuid=True))
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=True))
+        return dialect.type_descriptor(BINARY(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if not isinstance(value, uuid.UUID):
+            value = uuid.UUID(str(value))
+        if dialect.name in ("mssql", "postgresql"):
+            return value
+        return value.bytes
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return uuid.UUID(bytes=bytes(value))
+        return uuid.UUID(str(value))
+
+
+class CompactEnum(TypeDecorator):
+    """
+    Enum almacenado como entero pequeño (TINYINT/SMALLINT) en lugar de texto.
+    Los códigos son explícitos y estables: nunca dependen del orden de
+    declaración del Enum, por lo que añadir miembros no reescribe datos.
+    """
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, enum_class: Type[Enum], codes: Dict[Enum, int], *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        missing = set(enum_class) - set(codes)
+        if missing:
+            raise ValueError(f"Faltan códigos para {enum_class.__name__}: {sorted(m.name for m in missing)}")
+        self.enum_class = enum_class
+        # Tuplas para que el tipo sea hashable y cacheable por SQLAlchemy
+        self._codes = tuple(sorted(codes.items(), key=lambda item: item[1]))
+        self._to_code = dict(self._codes)
+        self._to_member = {code: member for member, code in self._codes}
+
+    @property
+    def python_type(self):
+        return self.enum_class
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "mssql":
+            return dialect.type_descriptor(mssql.TINYINT())
+        return dialect.type_descriptor(SmallInteger())
+
+    def process_bind_param(self, value, dialect) -> Optional[int]:
+        if value is None:
+            return None
+        if not isinstance(value, self.enum_class):
+            value = self.enum_class(value)
+        return self._to_code[value]
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return self._to_member[value]
+
+    def code_of(self, value) -> int:
+        return self._to_code[self.enum_class(value)]
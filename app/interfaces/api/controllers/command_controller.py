@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from app.application.services.command_batch_service import CommandBatchService
+from app.domain.schemas.command import CommandBatchRequest, CommandBatchResponse
+from app.domain.schemas.user import User
+from app.interfaces.api.controllers.user_controller import get_current_user
+from app.core.idempotency import get_idempotency_manager, IDEMPOTENCY_HEADER
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+def get_command_batch_service() -> CommandBatchService:
+    # El lote abre su propia conexión y transacción (no usa get_db)
+    return CommandBatchService()
+
+# Endpoint para ejecutar varios comandos de tareas en una transacción
+@router.post("/commands/batch", response_model=CommandBatchResponse)
+async def execute_command_batch(
+    request: CommandBatchRequest,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
+    batch_service: CommandBatchService = Depends(get_command_batch_service),
+    current_user: User = Depends(get_current_user)
+):
+    def handle():
+        try:
+            return batch_service.handle_batch(request, current_user.id, current_user.roles == "admin")
+        except Exception as e:
+            logger.error(f"Error al ejecutar lote de comandos: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=str(e)
+            )
+
+    return await get_idempotency_manager().run(
+        idempotency_key, f"{current_user.id}:command_batch", request, handle,
+        encode=lambda response: response.model_dump(mode="json")
+    )
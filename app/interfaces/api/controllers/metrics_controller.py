@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from app.core.metrics import REGISTRY, CONTENT_TYPE_LATEST
+
+router = APIRouter()
+
+# Endpoint para el scrape de Prometheus
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=REGISTRY.generate_latest(), media_type=CONTENT_TYPE_LATEST)
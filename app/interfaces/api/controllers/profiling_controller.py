@@ -0,0 +1,93 @@
+import asyncio
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from app.core import profiling
+from app.domain.schemas.profiling import MemoryDiff, MemoryGrouping, MemorySnapshot, MemoryStatus, StackDump
+from app.domain.schemas.user import User
+from app.interfaces.api.controllers.user_controller import require_admin
+from app.core.config import settings
+from typing import Literal, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin/profiling")
+
+# Profile de CPU de este worker durante `seconds` segundos. La petición
+# espera a que termine; solo puede haber uno en curso por proceso
+@router.post("/cpu")
+async def profile_cpu(
+    seconds: float = Query(10.0, gt=0, le=settings.PROFILING_MAX_SECONDS),
+    interval_ms: float = Query(10.0, ge=1, le=1000),
+    format: Literal["collapsed", "speedscope"] = profiling.COLLAPSED,
+    current_user: User = Depends(require_admin)
+):
+    try:
+        sampler = profiling.start_cpu_profile(seconds, interval_ms / 1000)
+    except profiling.ProfilerBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    logger.warning(f"Profile de CPU de {seconds} s solicitado por {current_user.id}")
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        # También si el cliente se desconecta: el hilo de muestreo no sobrevive a la petición
+        profile = await run_in_threadpool(sampler.stop)
+
+    headers = {"X-Profile-Samples": str(profile.samples), "X-Profile-Unit": profile.unit}
+    if format == profiling.COLLAPSED:
+        return PlainTextResponse(profile.collapsed(), headers=headers)
+    return JSONResponse(profile.speedscope(), headers=headers)
+
+@router.get("/memory", response_model=MemoryStatus)
+async def get_memory_status(current_user: User = Depends(require_admin)):
+    return profiling.memory_status()
+
+# Activa tracemalloc. Mientras está activo cada asignación de memoria tiene
+# coste: desactivarlo con DELETE al terminar
+@router.post("/memory/start", response_model=MemoryStatus)
+async def start_memory_tracing(
+    frames: int = Query(10, ge=1, le=100),
+    current_user: User = Depends(require_admin)
+):
+    if profiling.start_memory_tracing(frames):
+        logger.warning(f"tracemalloc activado por {current_user.id}")
+    return profiling.memory_status()
+
+@router.post("/memory/snapshots", response_model=MemorySnapshot)
+async def take_memory_snapshot(
+    limit: int = Query(20, ge=1, le=500),
+    group_by: MemoryGrouping = "lineno",
+    current_user: User = Depends(require_admin)
+):
+    try:
+        return await run_in_threadpool(profiling.take_memory_snapshot, limit, group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.get("/memory/diff", response_model=MemoryDiff)
+async def diff_memory_snapshots(
+    base: int,
+    target: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=500),
+    group_by: MemoryGrouping = "lineno",
+    current_user: User = Depends(require_admin)
+):
+    try:
+        return await run_in_threadpool(profiling.diff_memory_snapshots, base, target, limit, group_by)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+@router.delete("/memory", status_code=status.HTTP_204_NO_CONTENT)
+async def stop_memory_tracing(current_user: User = Depends(require_admin)):
+    profiling.stop_memory_tracing()
+
+# Se ejecuta en el event loop para poder listar sus tareas de asyncio
+@router.get("/stacks", response_model=StackDump)
+async def dump_stacks(current_user: User = Depends(require_admin)):
+    return {
+        "pid": os.getpid(),
+        "threads": profiling.dump_thread_stacks(),
+        "asyncio_tasks": profiling.dump_asyncio_tasks(),
+    }
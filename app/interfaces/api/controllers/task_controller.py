@@ -1,72 +1,154 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from kombu.exceptions import OperationalError as BrokerError
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.orm import Session
 from app.infrastructure.database import get_db
-from app.infrastructure.repositories.task_repository import TaskRepository
+from app.infrastructure.repositories.sharded_task_repository import open_task_repository
+from app.infrastructure.repositories.task_view_repository import TaskViewRepository
+from app.infrastructure.repositories.user_repository import UserRepository
+from app.infrastructure.dataloader import DataLoader
 from app.application.services.task_service import TaskService
+from app.application.services.analytics_service import TaskAnalyticsService
+from app.infrastructure.repositories.analytics_repository import TaskAnalyticsRepository
 from app.domain.schemas.task import (
     Task, TaskCreate, TaskUpdate, 
     CreateTaskCommand, UpdateTaskCommand, DeleteTaskCommand,
-    AssignTaskCommand, CompleteTaskCommand,
-    GetTaskQuery, GetTasksQuery
+    AssignTaskCommand, ClaimNextTaskCommand, CompleteTaskCommand,
+    GetTaskQuery, GetTasksQuery, BatchGetTasksQuery,
+    TaskBatchGetRequest, TaskBatchGetResponse, TaskWithUsers,
+    TASK_EXPANSIONS, parse_expand, expanded_task_adapter
 )
+from app.domain.schemas.analytics import GetTaskAnalyticsQuery, TaskAnalytics
 from app.domain.schemas.user import User
+from app.domain.models.enums import TaskStatus, TaskPriority, RollupGranularity
 from app.interfaces.api.controllers.user_controller import get_current_user
-from typing import List
+from app.core.config import settings
+from app.core.idempotency import get_idempotency_manager, IDEMPOTENCY_HEADER
+from app.domain.exceptions import VersionConflictError
+from pydantic import ValidationError
+from typing import List, Optional
 from uuid import UUID
+from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-def get_task_service(db: Session = Depends(get_db)) -> TaskService:
-    repository = TaskRepository(db)
-    return TaskService(repository)
+def get_task_repository(db: Session = Depends(get_db)):
+    # Con TASK_SHARD_URLS, las sesiones de los shards se cierran al terminar la petición
+    with open_task_repository(db) as repository:
+        yield repository
+
+def get_task_service(repository=Depends(get_task_repository), db: Session = Depends(get_db)) -> TaskService:
+    view_repository = TaskViewRepository(db) if settings.TASK_VIEW_READS else None
+    return TaskService(repository, view_repository)
+
+def get_user_loader(db: Session = Depends(get_db)) -> DataLoader:
+    # Las dependencias se resuelven una vez por petición: la caché es por petición
+    return DataLoader(UserRepository(db).get_many)
+
+EXPAND_DESCRIPTION = f"Relaciones a incrustar, separadas por comas: {', '.join(TASK_EXPANSIONS)}"
+
+def get_expand(expand: Optional[str] = Query(None, description=EXPAND_DESCRIPTION)) -> frozenset:
+    try:
+        return parse_expand(expand)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+def render_tasks(tasks, expand: frozenset, many: bool = True) -> Response:
+    # Serializar con el esquema cacheado de la expansión; las relaciones ya
+    # vienen cargadas, así que validar no dispara consultas perezosas
+    adapter = expanded_task_adapter(expand, many)
+    return Response(adapter.dump_json(adapter.validate_python(tasks, from_attributes=True)), media_type="application/json")
+
+def parse_if_match(if_match: Optional[str] = Header(None, alias="If-Match")) -> Optional[int]:
+    # ETag de tarea: su versión entre comillas (W/"3", "3" o 3)
+    if if_match is None or if_match.strip() == "*":
+        return None
+    value = if_match.strip().removeprefix("W/").strip('"')
+    if not value.isdigit():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="If-Match debe ser la versión de la tarea")
+    return int(value)
+
+def etag(task) -> str:
+    return f'"{task.version}"'
+
+def encode_task(task) -> dict:
+    # Respuesta guardada para reintentos con Idempotency-Key
+    return Task.model_validate(task).model_dump(mode="json")
 
 # Endpoint para crear una tarea
 @router.post("/tasks", response_model=Task)
 async def create_task(
     task: TaskCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
     task_service: TaskService = Depends(get_task_service),
     current_user: User = Depends(get_current_user)
 ):
-    try:
-        command = CreateTaskCommand(
-            title=task.title,
-            description=task.description,
-            priority=task.priority,
-            user_id=current_user.id,
-            assigned_to_id=task.assigned_to_id,
-            needs_background_processing=False,
-            processing_params={}
-        )
-        return task_service.handle_create_task(command)
-    except Exception as e:
-        logger.error(f"Error al crear tarea: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
-        )
+    def handle():
+        try:
+            command = CreateTaskCommand(
+                title=task.title,
+                description=task.description,
+                priority=task.priority,
+                user_id=current_user.id,
+                assigned_to_id=task.assigned_to_id,
+                due_at=task.due_at,
+                needs_background_processing=task.processing_params is not None,
+                processing_params=task.processing_params
+            )
+            return task_service.handle_create_task(command)
+        except (ValueError, IntegrityError) as e:
+            # Datos inválidos (p. ej. assigned_to_id inexistente): reintentar no cambia nada
+            logger.warning(f"Tarea rechazada: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        except (SQLAlchemyError, BrokerError) as e:
+            # Caída de la base de datos o del broker: con Idempotency-Key la
+            # clave se libera y el reintento vuelve a ejecutarse
+            logger.error(f"Error de infraestructura al crear tarea: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servicio no disponible temporalmente, reintente más tarde",
+                headers={"Retry-After": "1"},
+            )
+        except Exception as e:
+            logger.error(f"Error al crear tarea: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=str(e)
+            )
+
+    return await get_idempotency_manager().run(
+        idempotency_key, f"{current_user.id}:create_task", task, handle, encode=encode_task
+    )
 
 # Endpoint para obtener todas las tareas (con filtros)
-@router.get("/tasks", response_model=List[Task])
+@router.get("/tasks", response_model=List[TaskWithUsers], response_model_exclude_unset=True)
 async def get_tasks(
-    status: str = None,
-    priority: str = None,
+    task_status: Optional[TaskStatus] = Query(None, alias="status"),
+    priority: Optional[TaskPriority] = None,
     skip: int = 0,
     limit: int = 100,
+    include_archived: bool = False,
+    expand: frozenset = Depends(get_expand),
     task_service: TaskService = Depends(get_task_service),
     current_user: User = Depends(get_current_user)
 ):
     try:
         query = GetTasksQuery(
             user_id=current_user.id if current_user.roles != "admin" else None,
-            status=status,
+            status=task_status,
             priority=priority,
             skip=skip,
-            limit=limit
+            limit=limit,
+            include_archived=include_archived,
+            expand=expand
         )
-        return task_service.handle_get_tasks(query)
+        return render_tasks(task_service.handle_get_tasks(query), expand)
     except Exception as e:
         logger.error(f"Error al obtener tareas: {str(e)}")
         raise HTTPException(
@@ -74,10 +156,72 @@ async def get_tasks(
             detail=str(e)
         )
 
+# Endpoint para obtener varias tareas por ID en una sola consulta
+@router.post("/tasks/batch-get", response_model=TaskBatchGetResponse)
+async def batch_get_tasks(
+    request: TaskBatchGetRequest,
+    task_service: TaskService = Depends(get_task_service),
+    user_loader: DataLoader = Depends(get_user_loader),
+    current_user: User = Depends(get_current_user)
+):
+    try:
+        query = BatchGetTasksQuery(
+            task_ids=request.ids,
+            user_id=current_user.id,
+            is_admin=(current_user.roles == "admin"),
+            include_users=request.include_users
+        )
+        return task_service.handle_batch_get_tasks(query, user_loader)
+    except Exception as e:
+        logger.error(f"Error al obtener lote de tareas: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+def get_analytics_service(db: Session = Depends(get_db)) -> TaskAnalyticsService:
+    return TaskAnalyticsService(TaskAnalyticsRepository(db))
+
+# Endpoint de analítica: responde desde las agregaciones, nunca desde `tasks`.
+# Declarado antes de /tasks/{task_id} para que "analytics" no se lea como id
+@router.get("/tasks/analytics", response_model=TaskAnalytics)
+async def get_task_analytics(
+    start: datetime,
+    end: datetime,
+    granularity: RollupGranularity = RollupGranularity.day,
+    user_id: Optional[UUID] = None,
+    analytics_service: TaskAnalyticsService = Depends(get_analytics_service),
+    current_user: User = Depends(get_current_user)
+):
+    # Sin ser admin solo se consulta la actividad propia
+    if current_user.roles != "admin":
+        if user_id is not None and user_id != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="No tienes permisos para ver la analítica de otro usuario"
+            )
+        user_id = current_user.id
+    try:
+        query = GetTaskAnalyticsQuery(start=start, end=end, granularity=granularity, user_id=user_id)
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=e.errors()[0]["msg"].removeprefix("Value error, ")
+        )
+    try:
+        return analytics_service.get_analytics(query)
+    except Exception as e:
+        logger.error(f"Error al obtener analítica de tareas: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
 # Endpoint para obtener una tarea por ID
-@router.get("/tasks/{task_id}", response_model=Task)
+@router.get("/tasks/{task_id}", response_model=TaskWithUsers, response_model_exclude_unset=True)
 async def get_task(
     task_id: UUID,
+    expand: frozenset = Depends(get_expand),
     task_service: TaskService = Depends(get_task_service),
     current_user: User = Depends(get_current_user)
 ):
@@ -85,15 +229,20 @@ async def get_task(
         query = GetTaskQuery(
             task_id=task_id,
             user_id=current_user.id,
-            is_admin=(current_user.roles == "admin")
+            is_admin=(current_user.roles == "admin"),
+            expand=expand
         )
-        task = task_service.handle_get_task(query)
+        task = await task_service.handle_get_task_coalesced(query)
         if not task:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Tarea no encontrada"
             )
-        return task
+        rendered = render_tasks(task, expand, many=False)
+        rendered.headers["ETag"] = etag(task)
+        return rendered
+    except HTTPException:
+        raise
     except ValueError as e:
         logger.warning(f"Acceso no autorizado a tarea {task_id} por usuario {current_user.id}: {str(e)}")
         raise HTTPException(
@@ -112,6 +261,8 @@ async def get_task(
 async def update_task(
     task_id: UUID,
     task_update: TaskUpdate,
+    response: Response,
+    expected_version: Optional[int] = Depends(parse_if_match),
     task_service: TaskService = Depends(get_task_service),
     current_user: User = Depends(get_current_user)
 ):
@@ -119,12 +270,9 @@ async def update_task(
         command = UpdateTaskCommand(
             task_id=task_id,
             user_id=current_user.id,
-            title=task_update.title,
-            description=task_update.description,
-            status=task_update.status,
-            priority=task_update.priority,
-            assigned_to_id=task_update.assigned_to_id,
-            is_admin=(current_user.roles == "admin")
+            is_admin=(current_user.roles == "admin"),
+            expected_version=expected_version,
+            **task_update.dict(exclude_unset=True)
         )
         updated_task = task_service.handle_update_task(command)
         if not updated_task:
@@ -132,7 +280,16 @@ async def update_task(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Tarea no encontrada"
             )
+        response.headers["ETag"] = etag(updated_task)
         return updated_task
+    except HTTPException:
+        raise
+    except VersionConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e),
+            headers={"ETag": f'"{e.current_version}"'}
+        )
     except ValueError as e:
         logger.warning(f"Acceso no autorizado para actualizar tarea {task_id} por usuario {current_user.id}: {str(e)}")
         raise HTTPException(
@@ -166,6 +323,8 @@ async def delete_task(
                 detail="Tarea no encontrada"
             )
         return None
+    except HTTPException:
+        raise
     except ValueError as e:
         logger.warning(f"Acceso no autorizado para eliminar tarea {task_id} por usuario {current_user.id}: {str(e)}")
         raise HTTPException(
@@ -184,65 +343,146 @@ async def delete_task(
 async def assign_task(
     task_id: UUID,
     assignee_id: UUID,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
     task_service: TaskService = Depends(get_task_service),
     current_user: User = Depends(get_current_user)
 ):
-    try:
-        command = AssignTaskCommand(
-            task_id=task_id,
-            assigner_id=current_user.id,
-            assignee_id=assignee_id,
-            is_admin=(current_user.roles == "admin")
-        )
-        updated_task = task_service.handle_assign_task(command)
-        if not updated_task:
+    def handle():
+        try:
+            command = AssignTaskCommand(
+                task_id=task_id,
+                assigner_id=current_user.id,
+                assignee_id=assignee_id,
+                is_admin=(current_user.roles == "admin")
+            )
+            updated_task = task_service.handle_assign_task(command)
+            if not updated_task:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Tarea no encontrada"
+                )
+            return updated_task
+        except HTTPException:
+            raise
+        except VersionConflictError as e:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Tarea no encontrada"
+                status_code=status.HTTP_409_CONFLICT,
+                detail=str(e),
+                headers={"ETag": f'"{e.current_version}"'}
             )
-        return updated_task
-    except ValueError as e:
-        logger.warning(f"Acceso no autorizado para asignar tarea {task_id} por usuario {current_user.id}: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail=str(e)
-        )
-    except Exception as e:
-        logger.error(f"Error al asignar tarea {task_id}: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e)
-        )
+        except ValueError as e:
+            logger.warning(f"Acceso no autorizado para asignar tarea {task_id} por usuario {current_user.id}: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=str(e)
+            )
+        except Exception as e:
+            logger.error(f"Error al asignar tarea {task_id}: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=str(e)
+            )
+
+    return await get_idempotency_manager().run(
+        idempotency_key, f"{current_user.id}:assign_task", {"task_id": task_id, "assignee_id": assignee_id},
+        handle, encode=encode_task
+    )
+
+# Endpoint para reclamar la siguiente tarea pendiente (cola de trabajo)
+@router.post("/tasks/claim-next", response_model=Task)
+async def claim_next_task(
+    priority: Optional[TaskPriority] = None,
+    created_by_id: Optional[UUID] = None,
+    assignee_id: Optional[UUID] = Query(None, description="Solo admin: reclamar en nombre de otro usuario"),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
+    task_service: TaskService = Depends(get_task_service),
+    current_user: User = Depends(get_current_user)
+):
+    is_admin = current_user.roles == "admin"
+
+    def handle():
+        try:
+            if assignee_id is not None and assignee_id != current_user.id and not is_admin:
+                raise ValueError("No tienes permisos para reclamar tareas en nombre de otro usuario")
+            command = ClaimNextTaskCommand(
+                assignee_id=assignee_id or current_user.id,
+                is_admin=is_admin,
+                priority=priority,
+                created_by_id=created_by_id
+            )
+            task = task_service.handle_claim_next_task(command)
+            if not task:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="No hay tareas pendientes disponibles"
+                )
+            return task
+        except HTTPException:
+            raise
+        except ValueError as e:
+            logger.warning(f"Acceso no autorizado para reclamar tarea por usuario {current_user.id}: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=str(e)
+            )
+        except Exception as e:
+            logger.error(f"Error al reclamar tarea: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=str(e)
+            )
+
+    # Con Idempotency-Key un reintento devuelve la misma tarea en vez de reclamar otra
+    return await get_idempotency_manager().run(
+        idempotency_key, f"{current_user.id}:claim_next",
+        {"priority": priority, "created_by_id": created_by_id, "assignee_id": assignee_id},
+        handle, encode=encode_task
+    )
 
 # Endpoint para marcar una tarea como completada
 @router.post("/tasks/{task_id}/complete", response_model=Task)
 async def complete_task(
     task_id: UUID,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
     task_service: TaskService = Depends(get_task_service),
     current_user: User = Depends(get_current_user)
 ):
-    try:
-        command = CompleteTaskCommand(
-            task_id=task_id,
-            user_id=current_user.id,
-            is_admin=(current_user.roles == "admin")
-        )
-        completed_task = task_service.handle_complete_task(command)
-        if not completed_task:
+    def handle():
+        try:
+            command = CompleteTaskCommand(
+                task_id=task_id,
+                user_id=current_user.id,
+                is_admin=(current_user.roles == "admin")
+            )
+            completed_task = task_service.handle_complete_task(command)
+            if not completed_task:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Tarea no encontrada"
+                )
+            return completed_task
+        except HTTPException:
+            raise
+        except VersionConflictError as e:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Tarea no encontrada"
+                status_code=status.HTTP_409_CONFLICT,
+                detail=str(e),
+                headers={"ETag": f'"{e.current_version}"'}
             )
-        return completed_task
-    except ValueError as e:
-        logger.warning(f"Acceso no autorizado para completar tarea {task_id} por usuario {current_user.id}: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail=str(e)
-        )
-    except Exception as e:
-        logger.error(f"Error al completar tarea {task_id}: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e)
-        ) 
\ No newline at end of file
+        except ValueError as e:
+            logger.warning(f"Acceso no autorizado para completar tarea {task_id} por usuario {current_user.id}: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=str(e)
+            )
+        except Exception as e:
+            logger.error(f"Error al completar tarea {task_id}: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=str(e)
+            )
+
+
+    return await get_idempotency_manager().run(
+        idempotency_key, f"{current_user.id}:complete_task", {"task_id": task_id}, handle, encode=encode_task
+    )
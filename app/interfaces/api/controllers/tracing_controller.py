@@ -0,0 +1,51 @@
+from collections import Counter
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from app.core import tracing
+from app.domain.schemas.tracing import Trace, TraceSummary
+from app.domain.schemas.user import User
+from app.interfaces.api.controllers.user_controller import require_admin
+from typing import List
+
+router = APIRouter(prefix="/admin/traces")
+
+def get_memory_exporter() -> tracing.InMemorySpanExporter:
+    exporter = tracing.get_exporter()
+    if not isinstance(exporter, tracing.InMemorySpanExporter):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Las trazas solo se consultan aquí con TRACING_EXPORTER=memory"
+        )
+    return exporter
+
+# Trazas recientes de este proceso. Los spans de los workers de Celery
+# quedan en su propio proceso: para verlos juntos usar TRACING_EXPORTER=file
+@router.get("", response_model=List[TraceSummary])
+async def list_traces(
+    limit: int = Query(50, ge=1, le=500),
+    exporter: tracing.InMemorySpanExporter = Depends(get_memory_exporter),
+    current_user: User = Depends(require_admin)
+):
+    roots = exporter.roots(limit)
+    counts = Counter(span.context.trace_id for span in exporter.spans())
+    return [
+        {
+            "trace_id": span.context.trace_id,
+            "name": span.name,
+            "start_time": span.start_time,
+            "duration_ms": span.duration * 1000,
+            "status": span.status,
+            "span_count": counts[span.context.trace_id],
+        }
+        for span in roots
+    ]
+
+@router.get("/{trace_id}", response_model=Trace)
+async def get_trace(
+    trace_id: str,
+    exporter: tracing.InMemorySpanExporter = Depends(get_memory_exporter),
+    current_user: User = Depends(require_admin)
+):
+    spans = exporter.spans(trace_id.lower())
+    if not spans:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Traza no encontrada")
+    return {"trace_id": trace_id.lower(), "spans": [span.to_dict() for span in spans]}
@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from app.infrastructure.database import get_db
 from app.infrastructure.repositories.user_repository import UserRepository
-from app.application.services.user_service import UserService
-from app.domain.schemas.user import User, UserCreate, UserUpdate, Token
+from app.infrastructure.repositories.sharded_task_repository import open_task_repository
+from app.application.services.user_service import UserService, USER_PURGE_SCHEDULED
+from app.domain.schemas.user import User, UserCreate, UserUpdate, Token, RefreshTokenRequest
 from typing import List
 from uuid import UUID
 from jose import JWTError, jwt
 from app.core.config import settings
+from app.core.rate_limit import get_rate_limiter, bucket_for_method, LOGIN
+from app.core.security import REFRESH_TOKEN_TYPE
+import math
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,11 +21,23 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def get_user_service(db: Session = Depends(get_db)) -> UserService:
-    repository = UserRepository(db)
-    return UserService(repository)
+def get_user_service(db: Session = Depends(get_db)):
+    # Al borrar un usuario también se liberan sus tareas, que pueden estar en los shards
+    with open_task_repository(db) as task_repository:
+        yield UserService(UserRepository(db), task_repository)
+
+async def enforce_rate_limit(bucket: str, principal: str) -> None:
+    retry_after = await get_rate_limiter().check_async(bucket, principal)
+    if retry_after > 0:
+        logger.warning(f"Límite de peticiones '{bucket}' superado por {principal}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Demasiadas peticiones",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
 
 async def get_current_user(
+    request: Request,
     token: str = Depends(oauth2_scheme),
     user_service: UserService = Depends(get_user_service)
 ) -> User:
@@ -32,21 +49,40 @@ async def get_current_user(
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id: str = payload.get("sub")
-        if user_id is None:
+        # Un refresh token no sirve como access token
+        if user_id is None or payload.get("typ") == REFRESH_TOKEN_TYPE:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     
-    user = user_service.get_user(UUID(user_id))
+    # Presupuesto de lecturas o escrituras del usuario antes de tocar la base de datos
+    await enforce_rate_limit(bucket_for_method(request.method), user_id)
+    
+    user = await user_service.get_user_coalesced(UUID(user_id))
     if user is None:
         raise credentials_exception
     return user
 
+def require_admin(current_user: User = Depends(get_current_user)) -> User:
+    """Dependencia de los endpoints de administración (profiling, trazas)."""
+    if current_user.roles != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo un administrador puede usar este endpoint"
+        )
+    return current_user
+
 @router.post("/token", response_model=Token)
 async def login_for_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     user_service: UserService = Depends(get_user_service)
 ):
+    # Limitar por cuenta e IP antes de pagar el coste de bcrypt. Solo por
+    # cuenta, cualquiera podría bloquear el login de otro usuario enviando
+    # contraseñas erróneas; así solo agota sus propios intentos
+    client_ip = request.client.host if request.client else "unknown"
+    await enforce_rate_limit(LOGIN, f"{form_data.username.lower()}@{client_ip}")
     user = user_service.authenticate_user(form_data.username, form_data.password)
     if not user:
         logger.warning(f"Intento de login fallido para usuario: {form_data.username}")
@@ -56,8 +92,37 @@ async def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token = user_service.create_access_token_for_user(user)
-    return {"access_token": access_token, "token_type": "bearer"}
+    return user_service.issue_tokens(user)
+
+@router.post("/token/refresh", response_model=Token)
+async def refresh_access_token(
+    request: RefreshTokenRequest,
+    user_service: UserService = Depends(get_user_service)
+):
+    # Rotación sin contraseña: evita pagar bcrypt en cada renovación
+    try:
+        return user_service.refresh_tokens(request.refresh_token)
+    except ValueError as e:
+        logger.warning(f"Refresh token rechazado: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e),
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+@router.post("/token/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_refresh_token(
+    request: RefreshTokenRequest,
+    user_service: UserService = Depends(get_user_service)
+):
+    try:
+        user_service.revoke_refresh_token(request.refresh_token)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e),
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
 @router.post("/users", response_model=User)
 async def create_user(
@@ -90,7 +155,7 @@ async def read_user(
     user_service: UserService = Depends(get_user_service),
     current_user: User = Depends(get_current_user)
 ):
-    user = user_service.get_user(user_id)
+    user = await user_service.get_user_coalesced(user_id)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -123,4 +188,7 @@ async def delete_user(
     result = user_service.delete_user(user_id)
     if not result:
         raise HTTPException(status_code=404, detail="User not found")
+    if result == USER_PURGE_SCHEDULED:
+        # Demasiadas tareas para un borrado síncrono: se completa en segundo plano
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={"status": result})
     return None 
\ No newline at end of file
@@ -0,0 +1,102 @@
+import asyncio
+import json
+from collections import deque
+from app.core.metrics import Counter, Gauge
+
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total",
+    "Requests rejected by admission control, by reason.",
+    ["reason"]
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth",
+    "Requests waiting for an admission slot."
+)
+
+_queue_depth = ADMISSION_QUEUE_DEPTH.labels()
+
+
+class AdmissionControlMiddleware:
+    """
+    Limita las peticiones en curso del worker. Las que no caben esperan en
+    una cola acotada; si la cola está llena o la espera supera el timeout se
+    responde inmediatamente 503 con Retry-After, en lugar de acumularlas
+    sobre el pool de conexiones hasta que expiren.
+    """
+
+    def __init__(self, app, max_in_flight: int, max_queue: int, queue_timeout: float,
+                 retry_after: int = 1, exempt_paths=("/metrics",)):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = str(retry_after)
+        self.exempt_paths = frozenset(exempt_paths)
+        self._in_flight = 0
+        self._waiters = deque()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        reason = await self._acquire()
+        if reason is not None:
+            ADMISSION_REJECTIONS.labels(reason).inc()
+            await self._reject(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._release()
+
+    async def _acquire(self):
+        if self._in_flight < self.max_in_flight and not self._waiters:
+            self._in_flight += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        _queue_depth.inc()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+            # _release nos ha cedido su hueco: _in_flight no cambia
+            return None
+        except asyncio.TimeoutError:
+            # El hueco pudo cederse justo al vencer el timeout: devolverlo
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            return "timeout"
+        except asyncio.CancelledError:
+            # Si el hueco llegó a concederse, devolverlo antes de propagar la cancelación
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            raise
+        finally:
+            _queue_depth.dec()
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def _release(self):
+        # Ceder el hueco al primer waiter que siga esperando
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": "Servidor saturado, reintente más tarde"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", self.retry_after.encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,79 @@
+from time import perf_counter
+from app.core.metrics import Counter, Gauge, Histogram
+from app.core.request_context import RequestStats, request_stats
+
+HTTP_REQUESTS_TOTAL = Counter(
+    "http_requests_total",
+    "HTTP requests processed, by route template and status code.",
+    ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ["method", "route"]
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being processed."
+)
+HTTP_REQUEST_DB_STATEMENTS = Histogram(
+    "http_request_db_statements",
+    "SQL statements executed per HTTP request.",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+)
+HTTP_REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in the database per HTTP request.",
+    ["method", "route"]
+)
+
+# Las peticiones que no encajan con ninguna ruta comparten etiqueta para no
+# disparar la cardinalidad con rutas arbitrarias
+UNMATCHED_ROUTE = "<unmatched>"
+
+_in_progress = HTTP_REQUESTS_IN_PROGRESS.labels()
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mide latencia, peticiones en curso y el número de
+    sentencias SQL y tiempo de base de datos de cada petición.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        _in_progress.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = perf_counter() - start
+            _in_progress.dec()
+            request_stats.reset(token)
+
+            # El router deja la ruta que hizo match en el scope
+            route = scope.get("route")
+            route_path = getattr(route, "path", UNMATCHED_ROUTE)
+            method = scope["method"]
+
+            HTTP_REQUESTS_TOTAL.labels(method, route_path, str(status_code)).inc()
+            HTTP_REQUEST_DURATION.labels(method, route_path).observe(elapsed)
+            HTTP_REQUEST_DB_STATEMENTS.labels(method, route_path).observe(stats.statements)
+            HTTP_REQUEST_DB_DURATION.labels(method, route_path).observe(stats.db_time)
@@ -0,0 +1,56 @@
+from app.core import tracing
+from app.interfaces.api.middleware.metrics_middleware import UNMATCHED_ROUTE
+
+TRACE_ID_HEADER = b"x-trace-id"
+
+
+class TracingMiddleware:
+    """
+    Middleware ASGI que abre el span raíz de cada petición (con el trace_id
+    de la cabecera `traceparent` entrante, si la hay; su flag de muestreo se
+    ignora porque lo envía el cliente). Los spans de servicios,
+    SQL y encolado de Celery de la petición cuelgan de él. Si la traza se
+    muestrea, la respuesta lleva su id en X-Trace-Id.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        parent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                parent = tracing.parse_traceparent(value.decode("latin-1"))
+                break
+        span, token = tracing.begin_span(f"{method} {scope['path']}", tracing.SERVER,
+                                         {"http.method": method, "http.target": scope["path"]}, parent,
+                                         trust_parent=False)
+        if span is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+                if span.recording:
+                    if message["status"] >= 500:
+                        span.status = tracing.ERROR
+                    message["headers"] = [*message.get("headers", []), (TRACE_ID_HEADER, span.context.trace_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            # El nombre final usa la plantilla de la ruta, no la URL con ids
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            span.name = f"{method} {route}"
+            span.set_attribute("http.route", route)
+            tracing.finish_span(span, token)
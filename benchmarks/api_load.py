@@ -0,0 +1,277 @@
+"""
+Prueba de carga reproducible de la API contra sustitutos locales.
+
+Arranca `main:app` con uvicorn en un subproceso apuntando a una base de datos
+SQLite sembrada con benchmarks.seed y a un broker de Celery en memoria, y
+ejecuta cada flujo con una concurrencia fija:
+
+    login        POST /token (bcrypt)
+    tasks_crud   POST /tasks -> GET /tasks/{id} -> PUT -> /complete -> DELETE
+    tasks_list   GET /tasks con filtros de estado y prioridad
+    users        GET /users/me, GET /users/{id} y GET /users
+
+Por cada flujo y endpoint se guardan throughput, p50/p95/p99 y consultas SQL
+por petición (a partir de /metrics) en benchmarks/results/api_load-*.json.
+
+Uso:
+    python -m benchmarks.api_load --scale 0.01 --concurrency 16 --requests 2000
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import httpx
+
+from benchmarks.common import REPO_ROOT, format_table, local_environment, percentiles, write_results
+from benchmarks.seed import ADMIN_EMAIL, BENCH_PASSWORD, default_db_path, is_seeded, load_summary, seed_database, user_email
+
+API = "/api/v1"
+FLOWS = ("login", "tasks_crud", "tasks_list", "users")
+
+_DB_STATEMENTS = re.compile(
+    r'^http_request_db_statements_(sum|count)\{method="(\w+)",route="([^"]+)"\} ([0-9.e+-]+)$', re.MULTILINE
+)
+
+
+class Recorder:
+    """Acumula latencias y errores por endpoint."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def call(self, label: str, request) -> httpx.Response:
+        start = time.perf_counter()
+        response = await request
+        self.latencies[label].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[label] += 1
+        return response
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(db_path: Path, port: int, celery_eager: bool) -> subprocess.Popen:
+    env = {**os.environ, **local_environment(db_path, celery_eager)}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/metrics")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("El servidor no respondió a tiempo")
+
+
+async def scrape_db_statements(client: httpx.AsyncClient) -> Dict[Tuple[str, str], Dict[str, float]]:
+    text = (await client.get("/metrics")).text
+    samples: Dict[Tuple[str, str], Dict[str, float]] = defaultdict(dict)
+    for kind, method, route, value in _DB_STATEMENTS.findall(text):
+        samples[(method, route)][kind] = float(value)
+    return samples
+
+
+async def login(client: httpx.AsyncClient, email: str) -> str:
+    response = await client.post(f"{API}/token", data={"username": email, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def _auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def flow_login(client, recorder, rng, ctx):
+    email = user_email(rng.randint(1, ctx["user_count"] - 1))
+    await recorder.call("POST /token", client.post(f"{API}/token", data={"username": email, "password": BENCH_PASSWORD}))
+
+
+async def flow_tasks_crud(client, recorder, rng, ctx):
+    headers = _auth(rng.choice(ctx["tokens"]))
+    payload = {"title": f"Bench {rng.random():.6f}", "description": "crud", "priority": rng.choice(["low", "medium", "high", "critical"])}
+    response = await recorder.call("POST /tasks", client.post(f"{API}/tasks", json=payload, headers=headers))
+    if response.status_code != 200:
+        return
+    task_id = response.json()["id"]
+    await recorder.call("GET /tasks/{id}", client.get(f"{API}/tasks/{task_id}", headers=headers))
+    await recorder.call("PUT /tasks/{id}", client.put(f"{API}/tasks/{task_id}", json={"status": "in_progress"}, headers=headers))
+    await recorder.call("POST /tasks/{id}/complete", client.post(f"{API}/tasks/{task_id}/complete", headers=headers))
+    await recorder.call("DELETE /tasks/{id}", client.delete(f"{API}/tasks/{task_id}", headers=headers))
+
+
+async def flow_tasks_list(client, recorder, rng, ctx):
+    params = {"limit": 50}
+    if rng.random() < 0.7:
+        params["status"] = rng.choice(["pending", "in_progress", "completed"])
+    if rng.random() < 0.5:
+        params["priority"] = rng.choice(["low", "medium", "high", "critical"])
+    if rng.random() < 0.1:
+        await recorder.call("GET /tasks (admin)", client.get(f"{API}/tasks", params=params, headers=_auth(ctx["admin_token"])))
+    else:
+        await recorder.call("GET /tasks", client.get(f"{API}/tasks", params=params, headers=_auth(rng.choice(ctx["tokens"]))))
+
+
+async def flow_users(client, recorder, rng, ctx):
+    headers = _auth(rng.choice(ctx["tokens"]))
+    roll = rng.random()
+    if roll < 0.45:
+        await recorder.call("GET /users/me", client.get(f"{API}/users/me", headers=headers))
+    elif roll < 0.95:
+        me = rng.choice(ctx["user_ids"])
+        await recorder.call("GET /users/{id}", client.get(f"{API}/users/{me}", headers=headers))
+    else:
+        await recorder.call("GET /users", client.get(f"{API}/users", headers=headers))
+
+
+FLOW_FUNCTIONS: Dict[str, Callable] = {
+    "login": flow_login,
+    "tasks_crud": flow_tasks_crud,
+    "tasks_list": flow_tasks_list,
+    "users": flow_users,
+}
+
+
+async def run_flow(client, name: str, iterations: int, concurrency: int, ctx: dict, seed: int) -> dict:
+    recorder = Recorder()
+    remaining = iterations
+    function = FLOW_FUNCTIONS[name]
+
+    async def worker(worker_id: int):
+        nonlocal remaining
+        rng = random.Random(seed * 1000 + worker_id)
+        while remaining > 0:
+            remaining -= 1
+            await function(client, recorder, rng, ctx)
+
+    before = await scrape_db_statements(client)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    after = await scrape_db_statements(client)
+
+    queries = {}
+    for key, values in after.items():
+        if key[1] == "/metrics":
+            continue
+        count = values.get("count", 0) - before.get(key, {}).get("count", 0)
+        if count > 0:
+            total = values.get("sum", 0) - before.get(key, {}).get("sum", 0)
+            queries[f"{key[0]} {key[1]}"] = round(total / count, 2)
+
+    total_requests = sum(len(samples) for samples in recorder.latencies.values())
+    endpoints = {}
+    for label, samples in recorder.latencies.items():
+        endpoints[label] = {
+            "requests": len(samples),
+            "errors": recorder.errors[label],
+            "latency_ms": {k: round(v * 1000, 3) for k, v in percentiles(samples).items()},
+        }
+    all_samples = [sample for samples in recorder.latencies.values() for sample in samples]
+    return {
+        "iterations": iterations,
+        "requests": total_requests,
+        "errors": sum(recorder.errors.values()),
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(total_requests / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {k: round(v * 1000, 3) for k, v in percentiles(all_samples).items()},
+        "queries_per_request": queries,
+        "endpoints": endpoints,
+    }
+
+
+async def run(args) -> dict:
+    port = args.port or _free_port()
+    server = start_server(args.db, port, args.celery_eager)
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60.0) as client:
+            await wait_until_ready(client)
+
+            summary = load_summary(args.db)
+            user_count = summary["users"]
+            rng = random.Random(args.seed)
+            emails = [user_email(rng.randint(1, user_count - 1)) for _ in range(args.concurrency)]
+            ctx = {
+                "user_count": user_count,
+                "user_ids": summary["sample_user_ids"],
+                "tokens": [await login(client, email) for email in emails],
+                "admin_token": await login(client, ADMIN_EMAIL),
+            }
+
+            results = {}
+            for name in args.flows:
+                if args.warmup:
+                    await run_flow(client, name, args.warmup, args.concurrency, ctx, args.seed + 1)
+                results[name] = await run_flow(client, name, args.requests, args.concurrency, ctx, args.seed)
+                print(f"{name}: {results[name]['throughput_rps']} req/s, p99 {results[name]['latency_ms']['p99']} ms")
+            return results
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga de la API")
+    parser.add_argument("--scale", type=float, default=0.01, help="Factor sobre 100k usuarios / 10M tareas")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000, help="Iteraciones por flujo")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--flows", nargs="+", choices=FLOWS, default=list(FLOWS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", type=Path, default=None)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--reseed", action="store_true")
+    parser.add_argument("--celery-eager", action="store_true", help="Ejecutar las tareas de Celery en proceso")
+    args = parser.parse_args()
+
+    args.db = (args.db or default_db_path(args.scale)).resolve()
+    if args.reseed or not is_seeded(args.db, args.scale, args.seed):
+        print("Sembrando base de datos:", seed_database(args.db, args.scale, args.seed))
+
+    results = asyncio.run(run(args))
+
+    rows = [["flujo", "req/s", "p50 ms", "p95 ms", "p99 ms", "errores"]]
+    for name, result in results.items():
+        latency = result["latency_ms"]
+        rows.append([name, result["throughput_rps"], latency["p50"], latency["p95"], latency["p99"], result["errors"]])
+    print(format_table(rows))
+
+    path = write_results("api_load", {
+        "config": {
+            "scale": args.scale,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "celery_eager": args.celery_eager,
+        },
+        "flows": results,
+    })
+    print(f"Resultados guardados en {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+CPU de autenticación por sesión-hora, antes y después de los refresh tokens.
+
+Antes: el cliente repite el login (bcrypt) cada vez que caduca el access
+token, 60 / ACCESS_TOKEN_EXPIRE_MINUTES veces por hora. Después: renueva con
+/token/refresh (firma HMAC, consulta de revocación y lectura del usuario) y
+el login se amortiza a lo largo de REFRESH_TOKEN_EXPIRE_DAYS. Ambos casos
+incluyen la validación del access token en cada petición autenticada.
+
+Se mide tiempo de CPU del proceso (time.process_time) llamando directamente
+a UserService contra SQLite.
+
+Uso:
+    python -m benchmarks.auth_cpu --iterations 20 --requests-per-hour 600
+"""
+import argparse
+import time
+
+from benchmarks.common import DATA_DIR, format_table, use_local_environment, write_results
+
+DB_PATH = DATA_DIR / "auth-cpu.db"
+EMAIL = "auth-bench@example.com"
+PASSWORD = "benchmark-password"
+
+
+def cpu_per_call(fn, iterations: int) -> float:
+    fn()  # calentamiento
+    started = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - started) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU de autenticación por sesión-hora")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--requests-per-hour", type=int, default=600,
+                        help="Peticiones autenticadas por sesión y hora")
+    args = parser.parse_args()
+
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    if DB_PATH.exists():
+        DB_PATH.unlink()
+    use_local_environment(DB_PATH)
+    from app.core.config import settings
+    from app.core.security import decode_token
+    from app.infrastructure.database import SessionLocal, engine
+    from app.infrastructure.migrations.migrate import create_schema
+    from app.infrastructure.repositories.user_repository import UserRepository
+    from app.application.services.user_service import UserService
+    from app.domain.schemas.user import UserCreate
+
+    create_schema(engine)
+    db = SessionLocal()
+    service = UserService(UserRepository(db))
+    service.create_user(UserCreate(email=EMAIL, password=PASSWORD, first_name="Auth", last_name="Bench",
+                                   gender="male", roles="user"))
+
+    def login():
+        return service.issue_tokens(service.authenticate_user(EMAIL, PASSWORD))
+
+    state = {"refresh_token": login()["refresh_token"]}
+
+    def refresh():
+        state["refresh_token"] = service.refresh_tokens(state["refresh_token"])["refresh_token"]
+
+    access_token = login()["access_token"]
+
+    def validate():
+        decode_token(access_token)
+
+    login_cpu = cpu_per_call(login, args.iterations)
+    refresh_cpu = cpu_per_call(refresh, args.iterations * 10)
+    validate_cpu = cpu_per_call(validate, args.iterations * 100)
+    db.close()
+
+    renewals_per_hour = 60 / settings.ACCESS_TOKEN_EXPIRE_MINUTES
+    logins_per_hour_after = 1 / (settings.REFRESH_TOKEN_EXPIRE_DAYS * 24)
+    requests_cpu = args.requests_per_hour * validate_cpu
+    before = renewals_per_hour * login_cpu + requests_cpu
+    after = renewals_per_hour * refresh_cpu + logins_per_hour_after * login_cpu + requests_cpu
+
+    rows = [
+        ["operación", "CPU ms/llamada"],
+        ["login (bcrypt)", round(login_cpu * 1000, 3)],
+        ["refresh (rotación)", round(refresh_cpu * 1000, 3)],
+        ["validar access token", round(validate_cpu * 1000, 4)],
+    ]
+    print(format_table(rows))
+    print(format_table([
+        ["flujo", "CPU ms/sesión-hora"],
+        ["antes: login al caducar", round(before * 1000, 2)],
+        ["después: refresh tokens", round(after * 1000, 2)],
+    ]))
+    print(f"Reducción: {before / after:.1f}x")
+
+    path = write_results("auth_cpu", {
+        "config": {**vars(args), "access_token_minutes": settings.ACCESS_TOKEN_EXPIRE_MINUTES,
+                   "refresh_token_days": settings.REFRESH_TOKEN_EXPIRE_DAYS},
+        "cpu_ms_per_call": {"login": login_cpu * 1000, "refresh": refresh_cpu * 1000, "validate": validate_cpu * 1000},
+        "cpu_ms_per_session_hour": {"before": before * 1000, "after": after * 1000},
+    })
+    print(f"Resultados guardados en {path}")
+
+
+if __name__ == "__main__":
+    main()
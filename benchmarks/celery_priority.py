@@ -0,0 +1,187 @@
+"""
+Latencia de cola por clase de prioridad con un backlog saturado.
+
+Usa el broker en memoria y workers de Celery en el propio proceso. Se
+precarga un backlog de procesamiento de prioridad baja y, mientras los
+workers lo consumen, llegan trabajos critical/high/medium y notificaciones.
+Se mide el tiempo desde el encolado hasta el inicio de ejecución en dos
+configuraciones:
+
+    fifo    todo en una sola cola (comportamiento anterior)
+    routed  colas por prioridad + cola de notificaciones (routing.py)
+
+Además se mide el orden de consumo de la cola de notificaciones, que mezcla
+prioridades de mensaje: se encolan notificaciones de todas las clases sin
+worker y se anota en qué posición sale cada una. El broker en memoria
+ignora la prioridad de mensaje (sale en orden FIFO); para comprobarla hay
+que usar Redis con --broker. Con otro broker solo se ejecuta esta prueba:
+varios workers en hilos del mismo proceso no se detienen limpiamente sobre
+Redis.
+
+Uso:
+    python -m benchmarks.celery_priority --backlog 300 --arrivals 60
+    python -m benchmarks.celery_priority --broker redis://localhost:6379/15
+"""
+import argparse
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+
+from benchmarks.common import DATA_DIR, format_table, percentiles, use_local_environment, write_results
+
+FIFO_QUEUE = "bench.fifo"
+
+_latencies = defaultdict(list)
+_consumed = []
+_lock = threading.Lock()
+_done = threading.Semaphore(0)
+
+
+def run_mode(celery_app, probe, mode: str, args) -> dict:
+    from celery.contrib.testing.worker import start_worker
+    from app.domain.models.enums import TaskPriority
+    from app.infrastructure.celery.routing import NOTIFICATIONS_QUEUE, PROCESSING_QUEUE_ORDER, route_options
+
+    _latencies.clear()
+
+    def options(kind: str) -> dict:
+        if mode == "fifo":
+            return {"queue": FIFO_QUEUE}
+        if kind == "notification":
+            return route_options("send_task_notification", TaskPriority.medium)
+        return route_options("process_task", TaskPriority(kind))
+
+    def send(kind: str, work: float):
+        probe.apply_async(args=(kind, time.time(), work), **options(kind))
+
+    rng = random.Random(args.seed)
+    for _ in range(args.backlog):
+        send("low", args.work)
+
+    # Workers "solo" en hilos: con el pool de hilos y el transporte en memoria
+    # el bucle síncrono se bloquea hasta 2 s cuando el QoS está lleno
+    def workers_for(queues, count):
+        return [
+            start_worker(celery_app, pool="solo", perform_ping_check=False, queues=queues)
+            for _ in range(count)
+        ]
+
+    if mode == "fifo":
+        workers = workers_for([FIFO_QUEUE], args.concurrency + 1)
+    else:
+        workers = workers_for(PROCESSING_QUEUE_ORDER, args.concurrency) + workers_for([NOTIFICATIONS_QUEUE], 1)
+
+    started = time.perf_counter()
+    for worker in workers:
+        worker.__enter__()
+    try:
+        kinds = ["critical", "high", "medium", "notification"]
+        for _ in range(args.arrivals):
+            time.sleep(args.interval)
+            kind = rng.choice(kinds)
+            send(kind, args.work if kind != "notification" else args.work / 10)
+        total = args.backlog + args.arrivals
+        for _ in range(total):
+            if not _done.acquire(timeout=120):
+                raise RuntimeError("Timeout esperando a que se vacíe la cola")
+    finally:
+        for worker in reversed(workers):
+            worker.__exit__(None, None, None)
+    elapsed = time.perf_counter() - started
+
+    with _lock:
+        result = {
+            kind: {"count": len(samples), **{k: round(v * 1000, 1) for k, v in percentiles(samples).items()}}
+            for kind, samples in _latencies.items()
+        }
+    return {"seconds": round(elapsed, 2), "queue_latency_ms": result}
+
+
+def run_ordering(celery_app, probe, args) -> dict:
+    """Posición media de consumo de cada clase en la cola de notificaciones (0 = la primera)."""
+    from celery.contrib.testing.worker import start_worker
+    from app.domain.models.enums import TaskPriority
+    from app.infrastructure.celery.routing import NOTIFICATIONS_QUEUE, route_options
+
+    _latencies.clear()
+    _consumed.clear()
+    kinds = [priority.value for priority in TaskPriority] * args.ordering_per_class
+    random.Random(args.seed).shuffle(kinds)
+    for kind in kinds:
+        probe.apply_async(args=(kind, time.time(), 0.0),
+                          **route_options("send_task_notification", TaskPriority(kind)))
+
+    with start_worker(celery_app, pool="solo", perform_ping_check=False, queues=[NOTIFICATIONS_QUEUE]):
+        for _ in kinds:
+            if not _done.acquire(timeout=120):
+                raise RuntimeError("Timeout esperando a que se vacíe la cola")
+
+    positions = defaultdict(list)
+    for position, kind in enumerate(_consumed):
+        positions[kind].append(position)
+    return {kind: round(sum(values) / len(values), 1) for kind, values in positions.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de latencia de colas de Celery por prioridad")
+    parser.add_argument("--backlog", type=int, default=300, help="Trabajos de prioridad baja precargados")
+    parser.add_argument("--arrivals", type=int, default=60, help="Trabajos que llegan con el backlog en curso")
+    parser.add_argument("--interval", type=float, default=0.02, help="Segundos entre llegadas")
+    parser.add_argument("--work", type=float, default=0.02, help="Duración simulada de cada trabajo")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ordering-per-class", type=int, default=25,
+                        help="Notificaciones por clase en la prueba de orden de consumo")
+    parser.add_argument("--broker", default="memory://",
+                        help="URL del broker (p. ej. una base de datos de Redis vacía)")
+    args = parser.parse_args()
+
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    use_local_environment(DATA_DIR / "celery-priority.db")
+    os.environ["CELERY_BROKER_URL"] = args.broker
+
+    from kombu import Queue
+    from app.infrastructure.celery.celery_app import celery_app
+
+    celery_app.conf.task_queues = list(celery_app.conf.task_queues) + [Queue(FIFO_QUEUE)]
+    celery_app.conf.task_ignore_result = True
+    # El transporte en memoria sondea las colas; con el intervalo por defecto
+    # (1 s) la latencia mediría el sondeo y no el orden de las colas
+    celery_app.conf.broker_transport_options = {
+        **celery_app.conf.broker_transport_options,
+        "polling_interval": 0.005,
+    }
+
+    @celery_app.task(name="benchmarks.celery_priority.probe")
+    def probe(kind: str, enqueued_at: float, work: float):
+        with _lock:
+            _latencies[kind].append(time.time() - enqueued_at)
+            _consumed.append(kind)
+        time.sleep(work)
+        _done.release()
+
+    results = {}
+    if args.broker == "memory://":
+        results = {mode: run_mode(celery_app, probe, mode, args) for mode in ("fifo", "routed")}
+        rows = [["clase", "fifo p50 ms", "fifo p95 ms", "routed p50 ms", "routed p95 ms"]]
+        for kind in ("critical", "high", "medium", "notification", "low"):
+            fifo = results["fifo"]["queue_latency_ms"].get(kind, {})
+            routed = results["routed"]["queue_latency_ms"].get(kind, {})
+            rows.append([kind, fifo.get("p50", "-"), fifo.get("p95", "-"), routed.get("p50", "-"), routed.get("p95", "-")])
+        print(format_table(rows))
+    ordering = run_ordering(celery_app, probe, args)
+
+    rows = [["clase", "posición media en notifications"]]
+    for kind in ("critical", "high", "medium", "low"):
+        rows.append([kind, ordering.get(kind, "-")])
+    print(format_table(rows))
+
+    path = write_results("celery_priority", {"config": vars(args), "modes": results,
+                                             "notification_order": ordering})
+    print(f"Resultados guardados en {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Contención al repartir trabajo entre muchos agentes concurrentes.
+
+Compara dos formas de que N agentes se repartan una cola de tareas pendientes:
+
+- antes: listar las pendientes (GET /tasks?status=pending) y asignar la
+  primera con un update condicional por versión; si otro agente la ha tomado
+  antes, el intento falla y el agente vuelve a listar.
+- después: TaskRepository.claim_next (POST /tasks/claim-next), una sola
+  sentencia que salta las filas bloqueadas por otros claims.
+
+Cada agente es un hilo con su propia sesión contra la misma base de datos.
+Se mide el throughput de claims, los intentos fallidos por claim, la latencia
+por claim y se comprueba que ninguna tarea se reparte dos veces.
+
+SQLite serializa las escrituras, así que aquí no hay bloqueos de fila que
+saltar; el benchmark mide sobre todo los reintentos y sentencias que se
+ahorran. Con SQL Server o PostgreSQL (DATABASE_URL) se mide además el efecto
+de READPAST / SKIP LOCKED.
+
+Uso:
+    python -m benchmarks.claim_contention --tasks 2000 --workers 1,8,32
+"""
+import argparse
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks.common import DATA_DIR, format_table, percentiles, use_local_environment, write_results
+
+DB_PATH = DATA_DIR / "claim-contention.db"
+LIST_PAGE_SIZE = 10
+
+
+def seed_queue(engine, tasks: int, workers: int):
+    """Vacía `tasks` y crea un creador, `workers` agentes y `tasks` pendientes."""
+    from sqlalchemy import delete, insert
+    from app.domain.models.enums import Gender, Role, TaskPriority
+    from app.domain.models.task import Task
+    from app.domain.models.user import User
+
+    priorities = list(TaskPriority)
+    creator_id = uuid.uuid4()
+    agent_ids = [uuid.uuid4() for _ in range(workers)]
+    created = datetime.utcnow() - timedelta(days=1)
+    with engine.begin() as conn:
+        conn.execute(delete(Task))
+        conn.execute(delete(User))
+        conn.execute(insert(User), [
+            {"id": user_id, "email": f"claim-{user_id}@example.com", "hashed_password": "-",
+             "first_name": "Claim", "last_name": "Bench", "gender": Gender.male,
+             "roles": Role.admin if user_id == creator_id else Role.user}
+            for user_id in [creator_id, *agent_ids]
+        ])
+        conn.execute(insert(Task), [
+            {"id": uuid.uuid4(), "title": f"tarea {i}", "priority": priorities[i % len(priorities)],
+             "user_id": creator_id, "created_at": created + timedelta(milliseconds=i),
+             "updated_at": created, "version": 1}
+            for i in range(tasks)
+        ])
+    return agent_ids
+
+
+def list_then_assign(repository, agent_id, stats):
+    """Flujo anterior: listar pendientes y asignar la primera; reintentar si otro ganó."""
+    from sqlalchemy import select
+    from app.domain.models.enums import TaskStatus
+    from app.domain.models.task import Task
+
+    while True:
+        page = repository.db.execute(
+            select(Task.id, Task.version)
+            .where(Task.status == TaskStatus.pending, Task.assigned_to_id.is_(None))
+            .order_by(Task.priority.desc(), Task.created_at)
+            .limit(LIST_PAGE_SIZE)
+        ).all()
+        repository.db.commit()
+        if not page:
+            return None
+        candidate = page[0]
+        task = repository.update_conditional(
+            candidate.id, {"assigned_to_id": agent_id, "status": TaskStatus.in_progress},
+            agent_id, True, candidate.version,
+        )
+        if task is not None:
+            return task
+        stats["conflicts"] += 1
+
+
+def claim_next(repository, agent_id, stats):
+    return repository.claim_next(agent_id)
+
+
+def run(strategy, session_factory, agent_ids):
+    from app.infrastructure.repositories.task_repository import TaskRepository
+
+    claimed = []
+    latencies = []
+    lock = threading.Lock()
+    start = threading.Barrier(len(agent_ids) + 1)
+    totals = {"conflicts": 0}
+
+    def agent(agent_id):
+        db = session_factory()
+        repository = TaskRepository(db)
+        stats = {"conflicts": 0}
+        mine, times = [], []
+        start.wait()
+        try:
+            while True:
+                began = time.perf_counter()
+                task = strategy(repository, agent_id, stats)
+                if task is None:
+                    break
+                times.append(time.perf_counter() - began)
+                mine.append(task.id)
+        finally:
+            db.close()
+        with lock:
+            claimed.extend(mine)
+            latencies.extend(times)
+            totals["conflicts"] += stats["conflicts"]
+
+    threads = [threading.Thread(target=agent, args=(agent_id,)) for agent_id in agent_ids]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+    return claimed, latencies, totals["conflicts"], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Contención al reclamar tareas con muchos agentes")
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--workers", default="1,8,32", help="Número de agentes concurrentes, separados por comas")
+    args = parser.parse_args()
+
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    if DB_PATH.exists():
+        DB_PATH.unlink()
+    use_local_environment(DB_PATH)
+    from app.infrastructure.database import SessionLocal, engine
+    from app.infrastructure.migrations.migrate import create_schema
+
+    create_schema(engine)
+    strategies = [("listar + asignar", list_then_assign), ("claim-next", claim_next)]
+    rows = [["flujo", "agentes", "claims/s", "conflictos/claim", "p50 ms", "p99 ms", "duplicadas"]]
+    results = []
+    for workers in (int(count) for count in args.workers.split(",")):
+        for name, strategy in strategies:
+            agent_ids = seed_queue(engine, args.tasks, workers)
+            claimed, latencies, conflicts, elapsed = run(strategy, SessionLocal, agent_ids)
+            duplicates = len(claimed) - len(set(claimed))
+            if len(set(claimed)) != args.tasks:
+                raise SystemExit(f"{name}: se reclamaron {len(set(claimed))} de {args.tasks} tareas")
+            stats = percentiles(latencies)
+            result = {
+                "strategy": name, "workers": workers, "claims": len(claimed),
+                "claims_per_second": len(claimed) / elapsed, "conflicts": conflicts,
+                "conflicts_per_claim": conflicts / len(claimed), "duplicates": duplicates,
+                "latency_ms": {key: value * 1000 for key, value in stats.items()},
+            }
+            results.append(result)
+            rows.append([name, workers, round(result["claims_per_second"]), round(result["conflicts_per_claim"], 2),
+                         round(stats["p50"] * 1000, 2), round(stats["p99"] * 1000, 2), duplicates])
+    print(format_table(rows))
+
+    path = write_results("claim_contention", {"config": vars(args), "results": results})
+    print(f"Resultados guardados en {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Utilidades compartidas por los benchmarks: entorno local (SQLite + Celery en
+memoria), percentiles y escritura de resultados en JSON.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+DATA_DIR = BENCH_DIR / ".data"
+RESULTS_DIR = BENCH_DIR / "results"
+
+
+def local_environment(db_path: Path, celery_eager: bool = False) -> Dict[str, str]:
+    """
+    Variables de entorno que sustituyen SQL Server y Redis por una base de
+    datos SQLite en fichero y un broker de Celery en memoria.
+    """
+    return {
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "CELERY_BROKER_URL": "memory://",
+        "CELERY_RESULT_BACKEND": "cache+memory://",
+        "CELERY_TASK_ALWAYS_EAGER": "true" if celery_eager else "false",
+        "SQL_ECHO": "false",
+        # Los benchmarks miden la capacidad de la API, no los límites por usuario
+        "RATE_LIMIT_ENABLED": "false",
+    }
+
+
+def use_local_environment(db_path: Path, celery_eager: bool = False) -> Dict[str, str]:
+    """
+    Aplica el entorno local al proceso actual. Debe llamarse antes de
+    importar cualquier módulo de `app`, que lee la configuración al importarse.
+    """
+    env = local_environment(db_path, celery_eager)
+    os.environ.update(env)
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+    return env
+
+
+def percentiles(samples: Iterable[float]) -> Dict[str, float]:
+    values = sorted(samples)
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+
+    def pick(fraction: float) -> float:
+        index = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+        return values[index]
+
+    return {
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "mean": sum(values) / len(values),
+        "max": values[-1],
+    }
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write_results(name: str, payload: dict) -> Path:
+    """
+    Guarda el resultado en benchmarks/results/<name>-<timestamp>.json con
+    metadatos suficientes para comparar ejecuciones en el tiempo.
+    """
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    document = {
+        "benchmark": name,
+        "timestamp": timestamp,
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        **payload,
+    }
+    path = RESULTS_DIR / f"{name}-{timestamp}.json"
+    path.write_text(json.dumps(document, indent=2, default=str))
+    return path
+
+
+def format_table(rows: List[List[str]]) -> str:
+    widths = [max(len(str(row[i])) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join("  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)) for row in rows)
@@ -0,0 +1,90 @@
+"""
+Throughput del pipeline de procesamiento de tareas (process_task).
+
+Ejecuta process_task en modo eager (sin broker ni workers) con distintos
+tamaños de bloque, con y sin el pool de procesos para la etapa CPU-bound, y
+lo compara con el procesamiento en serie de todos los elementos. En modo
+eager los bloques se ejecutan uno tras otro, así que la diferencia entre
+configuraciones mide el coste del fan-out/agregado y la ganancia del pool de
+procesos; el paralelismo entre workers se suma en despliegue.
+
+Uso:
+    python -m benchmarks.processing_pipeline --items 20000 --chunk-sizes 500,2000,10000
+"""
+import argparse
+import time
+
+from benchmarks.common import DATA_DIR, format_table, percentiles, use_local_environment, write_results
+
+
+def _items(operation: str, count: int) -> list:
+    if operation == "word_count":
+        return [f"tarea {i % 97} revisar informe {i % 13} pendiente" for i in range(count)]
+    if operation == "stats":
+        return list(range(count))
+    return [{"id": i, "payload": "x" * 64} for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de throughput del pipeline de procesamiento")
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--operation", default="checksum", choices=("checksum", "word_count", "stats"))
+    parser.add_argument("--chunk-sizes", default="500,2000,10000")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    use_local_environment(DATA_DIR / "processing.db", celery_eager=True)
+    from app.infrastructure.celery.processing import combine_partials, run_chunk
+    from app.infrastructure.celery.tasks import process_task
+
+    items = _items(args.operation, args.items)
+
+    def serial():
+        return combine_partials(args.operation, [run_chunk(args.operation, items)])
+
+    def pipeline(chunk_size: int, cpu_bound: bool):
+        params = {"operation": args.operation, "items": items, "chunk_size": chunk_size, "cpu_bound": cpu_bound}
+        return process_task.apply(args=("benchmark", params)).get()["result"]
+
+    expected = serial()
+    configs = [("serie", None, False, serial)]
+    for chunk_size in (int(size) for size in args.chunk_sizes.split(",")):
+        for cpu_bound in (False, True):
+            configs.append((
+                f"chunk={chunk_size}{' pool' if cpu_bound else ''}", chunk_size, cpu_bound,
+                lambda chunk_size=chunk_size, cpu_bound=cpu_bound: pipeline(chunk_size, cpu_bound),
+            ))
+
+    results = []
+    for name, chunk_size, cpu_bound, run in configs:
+        # Calentamiento: arranque del pool de procesos y caches de importación
+        if run() != expected:
+            raise SystemExit(f"{name}: el resultado no coincide con el procesamiento en serie")
+        durations = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            run()
+            durations.append(time.perf_counter() - started)
+        stats = percentiles(durations)
+        results.append({
+            "config": name,
+            "chunk_size": chunk_size,
+            "cpu_bound": cpu_bound,
+            "p50_s": round(stats["p50"], 4),
+            "items_per_second": round(args.items / stats["p50"]),
+        })
+
+    baseline = results[0]["items_per_second"]
+    rows = [["configuración", "p50 s", "elementos/s", "vs serie"]]
+    for result in results:
+        rows.append([result["config"], result["p50_s"], result["items_per_second"],
+                     f"{result['items_per_second'] / baseline:.2f}x"])
+    print(format_table(rows))
+
+    path = write_results("processing_pipeline", {"config": vars(args), "results": results})
+    print(f"Resultados guardados en {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Coste por llamada de las consultas calientes de los repositorios, con y sin
+la caché de sentencias (STATEMENT_CACHE_ENABLED, ver
+app.infrastructure.statement_cache).
+
+Se llama directamente a TaskRepository y UserRepository contra SQLite. El
+tiempo de base de datos (cursor.execute, medido por la instrumentación de
+SQL) se resta del total: el resto es el coste en Python de construir la
+sentencia, buscar su SQL compilado y cargar las filas.
+
+Uso:
+    python -m benchmarks.repository_overhead --iterations 2000
+"""
+import argparse
+import time
+import uuid
+
+from benchmarks.common import DATA_DIR, format_table, use_local_environment, write_results
+
+DB_PATH = DATA_DIR / "repository-overhead.db"
+USERS = 50
+TASKS = 2000
+
+
+def seed(engine):
+    from sqlalchemy import insert
+    from app.domain.models.enums import Gender, Role, TaskPriority, TaskStatus
+    from app.domain.models.task import Task
+    from app.domain.models.user import User
+
+    user_ids = [uuid.uuid4() for _ in range(USERS)]
+    statuses, priorities = list(TaskStatus), list(TaskPriority)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": user_id, "email": f"overhead-{index}@example.com", "hashed_password": "-",
+             "first_name": "Repo", "last_name": "Bench", "gender": Gender.male, "roles": Role.user}
+            for index, user_id in enumerate(user_ids)
+        ])
+        task_ids = [uuid.uuid4() for _ in range(TASKS)]
+        conn.execute(insert(Task), [
+            {"id": task_id, "title": f"tarea {index}", "user_id": user_ids[index % USERS],
+             "assigned_to_id": user_ids[(index * 7) % USERS], "status": statuses[index % len(statuses)],
+             "priority": priorities[index % len(priorities)], "version": 1}
+            for index, task_id in enumerate(task_ids)
+        ])
+    return user_ids, task_ids
+
+
+def operations(task_repository, user_repository, user_ids, task_ids):
+    from app.domain.models.enums import TaskStatus
+    from app.domain.schemas.task import GetTasksQuery
+
+    expand = frozenset({"user", "assigned_to"})
+    return {
+        "task.get_by_id": lambda i: task_repository.get_by_id(task_ids[i % TASKS]),
+        "task.get_by_id expand": lambda i: task_repository.get_by_id(task_ids[i % TASKS], expand),
+        "task.get_all creador": lambda i: task_repository.get_all(GetTasksQuery(user_id=user_ids[i % USERS], limit=20)),
+        "task.get_all asignado+estado": lambda i: task_repository.get_all(
+            GetTasksQuery(assigned_to_id=user_ids[i % USERS], status=TaskStatus.pending, limit=20)),
+        "task.get_all creador expand": lambda i: task_repository.get_all(
+            GetTasksQuery(user_id=user_ids[i % USERS], expand=expand, limit=20)),
+        "task.get_window asignado": lambda i: task_repository.get_window(
+            GetTasksQuery(assigned_to_id=user_ids[i % USERS]), 20),
+        "user.get_by_id": lambda i: user_repository.get_by_id(user_ids[i % USERS]),
+        "user.get_by_email": lambda i: user_repository.get_by_email(f"overhead-{i % USERS}@example.com"),
+    }
+
+
+def measure(fn, iterations: int) -> dict:
+    """Microsegundos por llamada: total, en la base de datos y el resto (Python)."""
+    from app.core.request_context import RequestStats, request_stats
+
+    for i in range(min(iterations, 100)):
+        fn(i)  # calentamiento: sentencias en caché y SQL compilado
+    stats = RequestStats(n_plus_one_threshold=iterations * 10)
+    token = request_stats.set(stats)
+    try:
+        began = time.perf_counter()
+        for i in range(iterations):
+            fn(i)
+        elapsed = time.perf_counter() - began
+    finally:
+        request_stats.reset(token)
+    total = elapsed / iterations * 1e6
+    database = stats.db_time / iterations * 1e6
+    return {"total_us": total, "db_us": database, "overhead_us": total - database}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coste por llamada de los repositorios con y sin caché de sentencias")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    if DB_PATH.exists():
+        DB_PATH.unlink()
+    env = use_local_environment(DB_PATH)
+    from app.core.config import settings
+    from app.infrastructure.database import SessionLocal, engine
+    from app.infrastructure.migrations.migrate import create_schema
+    from app.infrastructure.repositories.task_repository import TaskRepository
+    from app.infrastructure.repositories.user_repository import UserRepository
+
+    create_schema(engine)
+    user_ids, task_ids = seed(engine)
+    db = SessionLocal()
+    results = {}
+    try:
+        calls = operations(TaskRepository(db), UserRepository(db), user_ids, task_ids)
+        for enabled in (False, True):
+            settings.STATEMENT_CACHE_ENABLED = enabled
+            for name, fn in calls.items():
+                results.setdefault(name, {})["cached" if enabled else "uncached"] = measure(fn, args.iterations)
+    finally:
+        db.close()
+
+    rows = [["método", "sin caché µs", "con caché µs", "Python sin caché", "Python con caché", "ahorro Python"]]
+    for name, result in results.items():
+        before, after = result["uncached"], result["cached"]
+        rows.append([name, round(before["total_us"], 1), round(after["total_us"], 1),
+                     round(before["overhead_us"], 1), round(after["overhead_us"], 1),
+                     f"{1 - after['overhead_us'] / before['overhead_us']:.0%}"])
+    print(format_table(rows))
+
+    path = write_results("repository_overhead", {"config": {**vars(args), "env": env}, "results": results})
+    print(f"Resultados guardados en {path}")
+
+
+if __name__ == "__main__":
+    main()
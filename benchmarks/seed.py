@@ -0,0 +1,175 @@
+"""
+Genera un conjunto de datos reproducible para los benchmarks.
+
+Los volúmenes de referencia (100k usuarios, 10M tareas) se multiplican por
+`--scale`; con la escala por defecto (0.01) se generan 1.000 usuarios y
+100.000 tareas. Todos los usuarios comparten la contraseña BENCH_PASSWORD y
+se hashea una sola vez para no pagar bcrypt por fila.
+
+Uso:
+    python -m benchmarks.seed --scale 0.01
+"""
+import argparse
+import hashlib
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from benchmarks.common import DATA_DIR, use_local_environment
+
+BASE_USERS = 100_000
+BASE_TASKS = 10_000_000
+BENCH_PASSWORD = "benchmark"
+ADMIN_EMAIL = "bench-admin@example.com"
+
+STATUS_WEIGHTS = {"pending": 40, "in_progress": 25, "completed": 30, "failed": 5}
+PRIORITY_WEIGHTS = {"low": 30, "medium": 40, "high": 20, "critical": 10}
+
+
+def default_db_path(scale: float) -> Path:
+    return DATA_DIR / f"bench-{scale:g}.db"
+
+
+def user_email(index: int) -> str:
+    return f"bench-user-{index}@example.com"
+
+
+def _meta_path(db_path: Path) -> Path:
+    return db_path.with_suffix(".json")
+
+
+def load_summary(db_path: Path) -> dict:
+    return json.loads(_meta_path(db_path).read_text())
+
+
+def schema_fingerprint() -> str:
+    """Huella del DDL actual de los modelos, para detectar datos sembrados con un esquema antiguo."""
+    from sqlalchemy.dialects import sqlite
+    from sqlalchemy.schema import CreateIndex, CreateTable
+    from app.infrastructure.database import Base
+    import app.domain.models.user  # noqa: F401
+    import app.domain.models.task  # noqa: F401
+
+    dialect = sqlite.dialect()
+    ddl = []
+    for table in Base.metadata.sorted_tables:
+        ddl.append(str(CreateTable(table).compile(dialect=dialect)))
+        ddl.extend(str(CreateIndex(index).compile(dialect=dialect)) for index in sorted(table.indexes, key=lambda i: i.name))
+    return hashlib.sha1("\n".join(ddl).encode()).hexdigest()[:12]
+
+
+def is_seeded(db_path: Path, scale: float, seed: int) -> bool:
+    meta = _meta_path(db_path)
+    if not db_path.exists() or not meta.exists():
+        return False
+    info = json.loads(meta.read_text())
+    use_local_environment(db_path)
+    return info.get("scale") == scale and info.get("seed") == seed and info.get("schema") == schema_fingerprint()
+
+
+def seed_database(db_path: Path, scale: float, seed: int = 42, batch_size: int = 10_000) -> dict:
+    """
+    Crea el esquema y lo llena con usuarios y tareas deterministas.
+    Devuelve un resumen con los volúmenes generados.
+    """
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+    use_local_environment(db_path)
+
+    from app.core.security import get_password_hash
+    from app.infrastructure.database import engine, Base
+    from app.domain.models.user import User
+    from app.domain.models.task import Task
+    from app.infrastructure.sharding import colocated_task_id
+
+    Base.metadata.create_all(bind=engine)
+
+    rng = random.Random(seed)
+    user_count = max(2, int(BASE_USERS * scale))
+    task_count = max(1, int(BASE_TASKS * scale))
+    hashed_password = get_password_hash(BENCH_PASSWORD)
+    started = time.perf_counter()
+
+    user_ids = [uuid.UUID(int=rng.getrandbits(128), version=4) for _ in range(user_count)]
+    with engine.begin() as conn:
+        rows = []
+        for index, user_id in enumerate(user_ids):
+            rows.append({
+                "id": user_id,
+                "email": ADMIN_EMAIL if index == 0 else user_email(index),
+                "hashed_password": hashed_password,
+                "first_name": f"Nombre{index}",
+                "last_name": f"Apellido{index}",
+                "middle_name": None,
+                "gender": rng.choice(["male", "female"]),
+                "roles": "admin" if index == 0 else "user",
+            })
+            if len(rows) >= batch_size:
+                conn.execute(User.__table__.insert(), rows)
+                rows = []
+        if rows:
+            conn.execute(User.__table__.insert(), rows)
+
+    statuses = list(STATUS_WEIGHTS)
+    status_weights = list(STATUS_WEIGHTS.values())
+    priorities = list(PRIORITY_WEIGHTS)
+    priority_weights = list(PRIORITY_WEIGHTS.values())
+    now = datetime.utcnow()
+
+    with engine.begin() as conn:
+        rows = []
+        for index in range(task_count):
+            status = rng.choices(statuses, status_weights)[0]
+            created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+            user_id = rng.choice(user_ids)
+            rows.append({
+                # Como TaskRepository.create: en el shard de su creador si se usa TASK_SHARD_URLS
+                "id": colocated_task_id(user_id),
+                "title": f"Tarea {index}",
+                "description": "Tarea generada para benchmarks",
+                "status": status,
+                "priority": rng.choices(priorities, priority_weights)[0],
+                "created_at": created_at,
+                "updated_at": created_at,
+                "completed_at": created_at + timedelta(hours=rng.randint(1, 72)) if status == "completed" else None,
+                "user_id": user_id,
+                "assigned_to_id": rng.choice(user_ids) if rng.random() < 0.6 else None,
+                "celery_task_id": None,
+            })
+            if len(rows) >= batch_size:
+                conn.execute(Task.__table__.insert(), rows)
+                rows = []
+        if rows:
+            conn.execute(Task.__table__.insert(), rows)
+
+    engine.dispose()
+    summary = {
+        "scale": scale,
+        "seed": seed,
+        "users": user_count,
+        "tasks": task_count,
+        "seconds": round(time.perf_counter() - started, 2),
+        "schema": schema_fingerprint(),
+    }
+    # Muestra de ids para los flujos que consultan usuarios concretos
+    _meta_path(db_path).write_text(json.dumps({**summary, "sample_user_ids": [str(u) for u in user_ids[:1000]]}))
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera la base de datos de benchmarks")
+    parser.add_argument("--scale", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", type=Path, default=None)
+    args = parser.parse_args()
+
+    db_path = args.db or default_db_path(args.scale)
+    print(seed_database(db_path, args.scale, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Latencia de arranque de un worker de la API.
+
+Lanza intérpretes nuevos (arranque en frío, sin caché de imports en memoria)
+y mide el tiempo de `import main` y de ejecutar el lifespan hasta que la
+aplicación está lista. También comprueba que el arranque no importa Celery
+ni passlib, y lista los módulos más caros según `python -X importtime`.
+
+Uso:
+    python -m benchmarks.startup --runs 10
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+import time
+
+from benchmarks.common import DATA_DIR, REPO_ROOT, format_table, local_environment, percentiles, write_results
+
+PROBE = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def boot():
+    async with main.app.router.lifespan_context(main.app):
+        pass
+
+asyncio.run(boot())
+ready = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - start,
+    "ready_s": ready - start,
+    "celery_loaded": "celery" in sys.modules,
+    "passlib_loaded": "passlib" in sys.modules,
+    "modules": len(sys.modules),
+}))
+"""
+
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|\s+(.*)$")
+
+
+def _env() -> dict:
+    import os
+    return {**os.environ, **local_environment(DATA_DIR / "startup.db")}
+
+
+def probe_once() -> dict:
+    started = time.perf_counter()
+    output = subprocess.check_output([sys.executable, "-c", PROBE], cwd=REPO_ROOT, env=_env())
+    result = json.loads(output.decode().strip().splitlines()[-1])
+    result["process_s"] = time.perf_counter() - started
+    return result
+
+
+def heaviest_imports(limit: int) -> list:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=REPO_ROOT, env=_env(), capture_output=True, text=True, check=True,
+    )
+    entries = []
+    for line in completed.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            entries.append({"module": match.group(3).strip(), "cumulative_ms": int(match.group(2)) / 1000})
+    entries.sort(key=lambda entry: entry["cumulative_ms"], reverse=True)
+    return entries[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de arranque en frío de la API")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    runs = [probe_once() for _ in range(args.runs)]
+    summary = {
+        key: {k: round(v * 1000, 1) for k, v in percentiles(run[key] for run in runs).items()}
+        for key in ("import_s", "ready_s", "process_s")
+    }
+    imports = heaviest_imports(args.top)
+
+    rows = [["medida", "p50 ms", "p95 ms", "max ms"]]
+    for key, values in summary.items():
+        rows.append([key, values["p50"], values["p95"], values["max"]])
+    print(format_table(rows))
+    print("Celery importado al arrancar:", any(run["celery_loaded"] for run in runs))
+    print("passlib importado al arrancar:", any(run["passlib_loaded"] for run in runs))
+
+    path = write_results("startup", {
+        "config": vars(args),
+        "summary_ms": summary,
+        "celery_loaded": any(run["celery_loaded"] for run in runs),
+        "passlib_loaded": any(run["passlib_loaded"] for run in runs),
+        "modules_loaded": runs[-1]["modules"],
+        "heaviest_imports": imports,
+    })
+    print(f"Resultados guardados en {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Tamaño de índices y velocidad de range scans antes y después de migrar al
+almacenamiento compacto (GUID binario y enums como enteros).
+
+Crea una base SQLite con el esquema heredado (ids como texto de 36
+caracteres y enums por nombre), mide, ejecuta la migración de
+app.infrastructure.migrations.compact_storage y vuelve a medir.
+
+Uso:
+    python -m benchmarks.storage_compact --users 2000 --tasks 200000
+"""
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks.common import DATA_DIR, format_table, percentiles, use_local_environment, write_results
+
+DB_PATH = DATA_DIR / "storage-compact.db"
+
+
+def create_legacy_schema(engine, users: int, tasks: int, seed: int):
+    from sqlalchemy import Column, DateTime, ForeignKey, Index, MetaData, String, Table, Text
+
+    metadata = MetaData()
+    users_table = Table(
+        "users", metadata,
+        Column("id", String(36), primary_key=True),
+        Column("email", String(255), nullable=False),
+        Column("hashed_password", String(255), nullable=False),
+        Column("first_name", String(255), nullable=False),
+        Column("last_name", String(255), nullable=False),
+        Column("middle_name", String(255)),
+        Column("gender", String(6), nullable=False),
+        Column("roles", String(7), nullable=False),
+        Index("ix_users_email", "email", unique=True),
+    )
+    tasks_table = Table(
+        "tasks", metadata,
+        Column("id", String(36), primary_key=True),
+        Column("title", String(255), nullable=False),
+        Column("description", Text),
+        Column("status", String(11), nullable=False),
+        Column("priority", String(8), nullable=False),
+        Column("created_at", DateTime, nullable=False),
+        Column("updated_at", DateTime, nullable=False),
+        Column("completed_at", DateTime),
+        Column("user_id", String(36), ForeignKey("users.id"), nullable=False),
+        Column("assigned_to_id", String(36), ForeignKey("users.id")),
+        Column("celery_task_id", String(255)),
+        Index("ix_tasks_user_id", "user_id"),
+        Index("ix_tasks_assigned_to_id", "assigned_to_id"),
+    )
+    metadata.create_all(engine)
+
+    rng = random.Random(seed)
+    user_ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(users)]
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(users_table.insert(), [
+            {
+                "id": user_id, "email": f"user-{i}@example.com", "hashed_password": "x",
+                "first_name": "N", "last_name": "A", "middle_name": None,
+                "gender": rng.choice(["male", "female"]), "roles": "user",
+            }
+            for i, user_id in enumerate(user_ids)
+        ])
+        batch = []
+        for i in range(tasks):
+            batch.append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                "title": f"Tarea {i}", "description": None,
+                "status": rng.choice(["pending", "in_progress", "completed", "failed"]),
+                "priority": rng.choice(["low", "medium", "high", "critical"]),
+                "created_at": now, "updated_at": now, "completed_at": None,
+                "user_id": rng.choice(user_ids),
+                "assigned_to_id": rng.choice(user_ids) if rng.random() < 0.6 else None,
+                "celery_task_id": None,
+            })
+            if len(batch) >= 10_000:
+                conn.execute(tasks_table.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(tasks_table.insert(), batch)
+    return user_ids
+
+
+def object_sizes(engine) -> dict:
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT name, SUM(pgsize) FROM dbstat WHERE name NOT IN ('sqlite_schema', 'sqlite_master') "
+            "AND name NOT LIKE 'sqlite_stat%' GROUP BY name"
+        )).fetchall()
+    return {name: size for name, size in rows}
+
+
+def range_scans(engine, lookups, rounds: int = 3) -> dict:
+    """Escaneos por rango sobre los índices de user_id y assigned_to_id."""
+    from sqlalchemy import text
+
+    by_user = text("SELECT id, status, priority FROM tasks WHERE user_id = :value")
+    by_assignee = text("SELECT id, status FROM tasks WHERE assigned_to_id = :value AND status = :status")
+    timings = {"user_id": [], "assigned_to_id": []}
+    rows = 0
+    with engine.connect() as conn:
+        for _ in range(rounds):
+            for value, status in lookups:
+                start = time.perf_counter()
+                rows += len(conn.execute(by_user, {"value": value}).fetchall())
+                timings["user_id"].append(time.perf_counter() - start)
+                start = time.perf_counter()
+                rows += len(conn.execute(by_assignee, {"value": value, "status": status}).fetchall())
+                timings["assigned_to_id"].append(time.perf_counter() - start)
+    return {
+        name: {k: round(v * 1e6, 1) for k, v in percentiles(samples).items()}
+        for name, samples in timings.items()
+    } | {"rows_read": rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de almacenamiento compacto de UUID/enums")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--tasks", type=int, default=200_000)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    if DB_PATH.exists():
+        DB_PATH.unlink()
+    use_local_environment(DB_PATH)
+
+    from sqlalchemy import text
+    from app.infrastructure.database import engine
+    from app.infrastructure.migrations.compact_storage import migrate_to_compact_storage
+    from app.domain.models.enums import TASK_STATUS_CODES, TaskStatus
+
+    user_ids = create_legacy_schema(engine, args.users, args.tasks, args.seed)
+    rng = random.Random(args.seed)
+    sample = [(rng.choice(user_ids), rng.choice(list(TaskStatus))) for _ in range(args.lookups)]
+
+    with engine.connect() as conn:
+        conn.execute(text("VACUUM"))
+        conn.execute(text("ANALYZE"))
+    before = {
+        "sizes": object_sizes(engine),
+        "range_scan_us": range_scans(engine, [(value, status.name) for value, status in sample]),
+    }
+
+    started = time.perf_counter()
+    copied = migrate_to_compact_storage(engine, batch_size=10_000, drop_legacy=True)
+    migration_seconds = time.perf_counter() - started
+
+    with engine.connect() as conn:
+        conn.execute(text("VACUUM"))
+        conn.execute(text("ANALYZE"))
+    after = {
+        "sizes": object_sizes(engine),
+        "range_scan_us": range_scans(engine, [(uuid.UUID(value).bytes, TASK_STATUS_CODES[status]) for value, status in sample]),
+    }
+
+    rows = [["objeto", "antes (KiB)", "después (KiB)"]]
+    for name in sorted(set(before["sizes"]) | set(after["sizes"])):
+        rows.append([name, before["sizes"].get(name, 0) // 1024, after["sizes"].get(name, 0) // 1024])
+    print(format_table(rows))
+    print("range scan user_id p50 (µs):", before["range_scan_us"]["user_id"]["p50"], "->", after["range_scan_us"]["user_id"]["p50"])
+    print("range scan assigned_to_id p50 (µs):", before["range_scan_us"]["assigned_to_id"]["p50"], "->", after["range_scan_us"]["assigned_to_id"]["p50"])
+
+    path = write_results("storage_compact", {
+        "config": vars(args),
+        "migration": {"rows": copied, "seconds": round(migration_seconds, 2)},
+        "before": before,
+        "after": after,
+    })
+    print(f"Resultados guardados en {path}")
+
+
+if __name__ == "__main__":
+    main()
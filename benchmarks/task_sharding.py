@@ -0,0 +1,161 @@
+"""
+Escrituras y consultas de tareas con 1 frente a N shards.
+
+Cada configuración usa ficheros SQLite nuevos, uno por shard (ver
+app.infrastructure.sharding), y el mismo ShardedTaskRepository que la API:
+
+- escritura: `writers` hilos crean tareas de usuarios aleatorios. SQLite
+  serializa las escrituras de cada fichero, así que repartirlas entre
+  ficheros se parece a repartirlas entre servidores.
+- lectura enrutada: get_by_id (un shard por el bucket del id).
+- lectura por creador: get_all con user_id (un shard).
+- lectura por asignado: get_all con assigned_to_id, scatter-gather a todos
+  los shards con mezcla por (created_at, id) y paginación skip/limit.
+
+Uso:
+    python -m benchmarks.task_sharding --tasks 20000 --shards 1,4 --writers 8
+"""
+import argparse
+import random
+import shutil
+import threading
+import time
+import uuid
+
+from benchmarks.common import DATA_DIR, format_table, percentiles, use_local_environment, write_results
+
+SHARD_DIR = DATA_DIR / "task-sharding"
+READ_SAMPLES = 300
+
+
+def create_shards(count: int):
+    from app.infrastructure.migrations.migrate import create_shard_schema
+    from app.infrastructure.sharding import ShardRegistry
+
+    directory = SHARD_DIR / f"{count}-shards"
+    directory.mkdir(parents=True)
+    registry = ShardRegistry([f"sqlite:///{directory / f'shard-{shard}.db'}" for shard in range(count)],
+                             scatter_workers=count)
+    for shard_engine in registry.engines:
+        create_shard_schema(shard_engine)
+    return registry
+
+
+def write_phase(registry, tasks: int, writers: int, creators, assignees):
+    """Crea `tasks` tareas repartidas entre `writers` hilos; devuelve (ids, latencias, segundos)."""
+    from app.domain.models.enums import TaskPriority
+    from app.domain.schemas.task import TaskCreate
+    from app.infrastructure.repositories.sharded_task_repository import ShardedTaskRepository
+
+    priorities = list(TaskPriority)
+    created, latencies = [], []
+    lock = threading.Lock()
+    start = threading.Barrier(writers + 1)
+
+    def writer(index):
+        rng = random.Random(index)
+        repository = ShardedTaskRepository(registry)
+        mine, times = [], []
+        start.wait()
+        try:
+            for i in range(index, tasks, writers):
+                task = TaskCreate(title=f"tarea {i}", priority=priorities[i % len(priorities)],
+                                  assigned_to_id=rng.choice(assignees))
+                began = time.perf_counter()
+                db_task = repository.create(task, rng.choice(creators))
+                times.append(time.perf_counter() - began)
+                mine.append((db_task.id, db_task.user_id))
+        finally:
+            repository.close()
+        with lock:
+            created.extend(mine)
+            latencies.extend(times)
+
+    threads = [threading.Thread(target=writer, args=(index,)) for index in range(writers)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return created, latencies, time.perf_counter() - began
+
+
+def read_phase(registry, created, assignees, page_size: int):
+    from app.domain.schemas.task import GetTasksQuery
+    from app.infrastructure.repositories.sharded_task_repository import ShardedTaskRepository
+
+    rng = random.Random(0)
+    repository = ShardedTaskRepository(registry)
+    samples = {"get_by_id": [], "by_creator": [], "by_assignee": [], "by_assignee_page_5": []}
+    try:
+        for _ in range(READ_SAMPLES):
+            task_id, user_id = rng.choice(created)
+            assignee = rng.choice(assignees)
+            operations = {
+                "get_by_id": lambda: repository.get_by_id(task_id),
+                "by_creator": lambda: repository.get_all(GetTasksQuery(user_id=user_id, limit=page_size)),
+                "by_assignee": lambda: repository.get_all(GetTasksQuery(assigned_to_id=assignee, limit=page_size)),
+                "by_assignee_page_5": lambda: repository.get_all(
+                    GetTasksQuery(assigned_to_id=assignee, skip=4 * page_size, limit=page_size)),
+            }
+            for name, operation in operations.items():
+                began = time.perf_counter()
+                operation()
+                samples[name].append(time.perf_counter() - began)
+                # Cada consulta en su propia transacción de lectura, como una petición
+                for shard_repository in repository._repositories.values():
+                    shard_repository.db.rollback()
+    finally:
+        repository.close()
+    return {name: percentiles(values) for name, values in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tareas con 1 frente a N shards")
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--shards", default="1,4", help="Número de shards a comparar, separados por comas")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--assignees", type=int, default=50)
+    parser.add_argument("--page-size", type=int, default=20)
+    args = parser.parse_args()
+
+    if SHARD_DIR.exists():
+        shutil.rmtree(SHARD_DIR)
+    SHARD_DIR.mkdir(parents=True)
+    use_local_environment(SHARD_DIR / "primary.db")
+
+    creators = [uuid.uuid4() for _ in range(args.users)]
+    assignees = [uuid.uuid4() for _ in range(args.assignees)]
+    rows = [["shards", "creadas/s", "create p50 ms", "create p99 ms", "get_by_id p50", "creador p50",
+             "asignado p50", "asignado pág. 5 p50"]]
+    results = []
+    for count in (int(value) for value in args.shards.split(",")):
+        registry = create_shards(count)
+        try:
+            created, latencies, elapsed = write_phase(registry, args.tasks, args.writers, creators, assignees)
+            reads = read_phase(registry, created, assignees, args.page_size)
+        finally:
+            registry.dispose()
+        writes = percentiles(latencies)
+        result = {
+            "shards": count, "tasks": len(created), "creates_per_second": len(created) / elapsed,
+            "create_latency_ms": {key: value * 1000 for key, value in writes.items()},
+            "read_latency_ms": {name: {key: value * 1000 for key, value in stats.items()}
+                                for name, stats in reads.items()},
+        }
+        results.append(result)
+        read_ms = result["read_latency_ms"]
+        rows.append([count, round(result["creates_per_second"]), round(writes["p50"] * 1000, 2),
+                     round(writes["p99"] * 1000, 2), round(read_ms["get_by_id"]["p50"], 2),
+                     round(read_ms["by_creator"]["p50"], 2), round(read_ms["by_assignee"]["p50"], 2),
+                     round(read_ms["by_assignee_page_5"]["p50"], 2)])
+    print(format_table(rows))
+
+    path = write_results("task_sharding", {"config": vars(args), "results": results})
+    print(f"Resultados guardados en {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Ráfagas de peticiones idénticas concurrentes (thundering herd) con y sin
+single-flight (SINGLE_FLIGHT_ENABLED).
+
+La API se ejecuta en el mismo proceso (httpx + ASGITransport) contra SQLite.
+Cada escenario lanza `bursts` ráfagas de `concurrency` peticiones a la vez:
+
+    shared_task   GET /tasks/{id} de una misma tarea por `viewers` usuarios
+                  distintos (la mitad sin permiso: 403 por petición)
+    users_me      GET /users/me de una misma cuenta de servicio
+
+Se mide throughput, latencia, sentencias SQL por petición y el ratio de
+coalescencia (seguidores / llamadas) de single_flight_calls_total.
+
+Uso:
+    python -m benchmarks.thundering_herd --concurrency 200 --bursts 20
+"""
+import argparse
+import asyncio
+import os
+import re
+import time
+import uuid
+from collections import defaultdict
+
+from benchmarks.common import DATA_DIR, format_table, percentiles, use_local_environment, write_results
+
+DB_PATH = DATA_DIR / "thundering-herd.db"
+API = "/api/v1"
+
+_METRIC_LINE = re.compile(r'^(db_statements_total|single_flight_calls_total)(\{[^}]*\})? ([0-9.e+-]+)$', re.MULTILINE)
+
+
+def seed(engine, viewers: int):
+    """Un creador, `viewers` usuarios (la mitad admins), una cuenta de servicio y una tarea compartida."""
+    from sqlalchemy import insert
+    from app.domain.models.enums import Gender, Role
+    from app.domain.models.task import Task
+    from app.domain.models.user import User
+
+    creator_id, service_id = uuid.uuid4(), uuid.uuid4()
+    viewer_ids = [uuid.uuid4() for _ in range(viewers)]
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": user_id, "email": f"herd-{user_id}@example.com", "hashed_password": "-",
+             "first_name": "Herd", "last_name": "Bench", "gender": Gender.female,
+             "roles": Role.admin if index % 2 == 0 else Role.user}
+            for index, user_id in enumerate([creator_id, service_id, *viewer_ids])
+        ])
+        task_id = uuid.uuid4()
+        conn.execute(insert(Task), [{"id": task_id, "title": "tarea compartida", "user_id": creator_id, "version": 1}])
+    return task_id, service_id, viewer_ids
+
+
+async def scrape(client) -> dict:
+    text = (await client.get("/metrics")).text
+    values = defaultdict(float)
+    for name, labels, value in _METRIC_LINE.findall(text):
+        values[(name, labels)] += float(value)
+    return values
+
+
+def delta(after: dict, before: dict, name: str, contains: str = "") -> float:
+    return sum(value - before.get(key, 0.0) for key, value in after.items()
+               if key[0] == name and contains in key[1])
+
+
+async def run_scenario(client, requests, bursts: int) -> dict:
+    """requests: lista de (url, headers) de una ráfaga. Devuelve latencias y estados."""
+    latencies, statuses = [], defaultdict(int)
+
+    async def call(url, headers):
+        began = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        latencies.append(time.perf_counter() - began)
+        statuses[response.status_code] += 1
+
+    before = await scrape(client)
+    began = time.perf_counter()
+    for _ in range(bursts):
+        await asyncio.gather(*(call(url, headers) for url, headers in requests))
+    elapsed = time.perf_counter() - began
+    after = await scrape(client)
+    total = len(latencies)
+    followers = delta(after, before, "single_flight_calls_total", 'role="follower"')
+    calls = delta(after, before, "single_flight_calls_total")
+    stats = percentiles(latencies)
+    return {
+        "requests": total,
+        "requests_per_second": total / elapsed,
+        "statuses": dict(statuses),
+        "sql_per_request": delta(after, before, "db_statements_total") / total,
+        "coalescing_ratio": followers / calls if calls else 0.0,
+        "latency_ms": {key: value * 1000 for key, value in stats.items()},
+    }
+
+
+async def run(args, task_id, service_id, viewer_ids) -> list:
+    import httpx
+    import main
+    from app.core.config import settings
+    from app.core.security import create_access_token
+
+    def auth(user_id):
+        return {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"}
+
+    viewer_headers = [auth(user_id) for user_id in viewer_ids]
+    scenarios = {
+        "shared_task": [(f"{API}/tasks/{task_id}", viewer_headers[i % len(viewer_headers)])
+                        for i in range(args.concurrency)],
+        "users_me": [(f"{API}/users/me", auth(service_id))] * args.concurrency,
+    }
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as client:
+        for name, requests in scenarios.items():
+            # Calentar conexiones y caches antes de medir
+            await run_scenario(client, requests[:10], 1)
+            for enabled in (False, True):
+                settings.SINGLE_FLIGHT_ENABLED = enabled
+                result = await run_scenario(client, requests, args.bursts)
+                results.append({"scenario": name, "single_flight": enabled, **result})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ráfagas de lecturas idénticas con y sin single-flight")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--bursts", type=int, default=20)
+    parser.add_argument("--viewers", type=int, default=20)
+    args = parser.parse_args()
+
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    if DB_PATH.exists():
+        DB_PATH.unlink()
+    env = use_local_environment(DB_PATH)
+    # La ráfaga entera debe llegar a la API, no quedarse en el control de admisión
+    os.environ["ADMISSION_MAX_IN_FLIGHT"] = str(args.concurrency * 2)
+    from app.infrastructure.database import engine
+    from app.infrastructure.migrations.migrate import create_schema
+
+    create_schema(engine)
+    task_id, service_id, viewer_ids = seed(engine, args.viewers)
+    results = asyncio.run(run(args, task_id, service_id, viewer_ids))
+
+    rows = [["escenario", "single-flight", "req/s", "SQL/req", "coalescencia", "p50 ms", "p99 ms", "estados"]]
+    for result in results:
+        rows.append([result["scenario"], "sí" if result["single_flight"] else "no",
+                     round(result["requests_per_second"]), round(result["sql_per_request"], 2),
+                     f"{result['coalescing_ratio']:.0%}", round(result["latency_ms"]["p50"], 2),
+                     round(result["latency_ms"]["p99"], 2),
+                     " ".join(f"{code}x{count}" for code, count in sorted(result["statuses"].items()))])
+    print(format_table(rows))
+
+    path = write_results("thundering_herd", {"config": {**vars(args), "env": env}, "results": results})
+    print(f"Resultados guardados en {path}")
+
+
+if __name__ == "__main__":
+    main()
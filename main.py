@@ -1,44 +1,141 @@
+from time import perf_counter
+
+# Se mide desde la primera línea para incluir el coste de importar la aplicación
+_IMPORT_STARTED = perf_counter()
+
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.interfaces.api.controllers import user_controller, task_controller
+from app.interfaces.api.controllers import (
+    user_controller, task_controller, command_controller, metrics_controller, profiling_controller,
+    tracing_controller
+)
+from app.interfaces.api.middleware.metrics_middleware import MetricsMiddleware
+from app.interfaces.api.middleware.admission_middleware import AdmissionControlMiddleware
+from app.interfaces.api.middleware.tracing_middleware import TracingMiddleware
 from app.core.config import settings
-from app.infrastructure.database import engine, Base
 from app.core.logging_config import setup_logging
+from app.core.metrics import Gauge
+from app.application import events
 
-# Configurar el sistema de logging
-setup_logging()
+logger = logging.getLogger(__name__)
 
-# Crear las tablas en la base de datos
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(
-    title=settings.PROJECT_NAME,
-    version=settings.VERSION,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+APP_IMPORT_DURATION = Gauge(
+    "app_import_duration_seconds",
+    "Time spent importing the application module."
 )
-
-# Configurar CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+APP_STARTUP_DURATION = Gauge(
+    "app_startup_duration_seconds",
+    "Time from the start of the import to the end of the lifespan startup."
 )
 
-# Incluir los routers
-app.include_router(
-    user_controller.router,
-    prefix=settings.API_V1_STR,
-    tags=["users"]
-)
+APP_IMPORT_DURATION.set(perf_counter() - _IMPORT_STARTED)
 
-app.include_router(
-    task_controller.router,
-    prefix=settings.API_V1_STR,
-    tags=["tasks"]
-)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # El logging se configura al arrancar el servidor, no al importar el módulo.
+    # El esquema de la base de datos se gestiona aparte con
+    # `python -m app.infrastructure.migrations.migrate`.
+    setup_logging()
+    startup = perf_counter() - _IMPORT_STARTED
+    APP_STARTUP_DURATION.set(startup)
+    logger.info(f"Aplicación lista en {startup * 1000:.0f} ms (importación {APP_IMPORT_DURATION.labels().get() * 1000:.0f} ms)")
+    events.configure_publishers()
+    from app.application.services.task_view_projection import configure_projection
+    configure_projection()
+
+    # Despliegues de un solo proceso: el planificador de recordatorios corre
+    # en un hilo y recibe los eventos en memoria. Con varios workers se
+    # arranca aparte con `python -m app.application.services.reminder_scheduler`
+    stop_reminders = None
+    if settings.REMINDER_SCHEDULER_IN_PROCESS:
+        import threading
+        from app.application.services.reminder_scheduler import create_scheduler, start_in_background
+        stop_reminders = threading.Event()
+        scheduler = create_scheduler()
+        start_in_background(scheduler, stop_reminders)
+    yield
+    if stop_reminders is not None:
+        stop_reminders.set()
+        scheduler.stop_waiting()
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(
+        title=settings.PROJECT_NAME,
+        version=settings.VERSION,
+        openapi_url=f"{settings.API_V1_STR}/openapi.json",
+        lifespan=lifespan
+    )
+
+    # Configurar CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Limitar peticiones en curso y rechazar rápido con 503 cuando hay saturación
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+        max_queue=settings.ADMISSION_MAX_QUEUE,
+        queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        retry_after=settings.ADMISSION_RETRY_AFTER_SECONDS
+    )
+
+    # Métricas de latencia, peticiones en curso y SQL por petición.
+    # Se añade el último para envolver al resto y contar también los rechazos
+    app.add_middleware(MetricsMiddleware)
+
+    # Span raíz de cada petición; el más externo para que la traza incluya la espera de admisión
+    app.add_middleware(TracingMiddleware)
+
+    # Incluir los routers
+    app.include_router(
+        user_controller.router,
+        prefix=settings.API_V1_STR,
+        tags=["users"]
+    )
+
+    app.include_router(
+        task_controller.router,
+        prefix=settings.API_V1_STR,
+        tags=["tasks"]
+    )
+
+    app.include_router(
+        command_controller.router,
+        prefix=settings.API_V1_STR,
+        tags=["commands"]
+    )
+
+    app.include_router(
+        profiling_controller.router,
+        prefix=settings.API_V1_STR,
+        tags=["admin"]
+    )
+
+    app.include_router(
+        tracing_controller.router,
+        prefix=settings.API_V1_STR,
+        tags=["admin"]
+    )
+
+    app.include_router(
+        metrics_controller.router,
+        tags=["metrics"]
+    )
+
+    return app
+
+
+app = create_app()
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,136 @@
+"""
+Configuración común de los tests.
+
+La aplicación se importa contra una base de datos SQLite temporal, con el
+broker de Celery en memoria y el detector de N+1 en modo estricto: una
+petición que repite una misma sentencia más de N_PLUS_ONE_THRESHOLD veces
+hace fallar el test (y el build), aunque el controlador convierta el error
+en un 500.
+"""
+import os
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+_DATA_DIR = tempfile.mkdtemp(prefix="tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DATA_DIR}/app.db"
+os.environ["TASK_SHARD_URLS"] = ""
+os.environ["CELERY_BROKER_URL"] = "memory://"
+os.environ["CELERY_RESULT_BACKEND"] = "cache+memory://"
+os.environ["N_PLUS_ONE_RAISE"] = "true"
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("TRACING_ENABLED", "false")
+
+import pytest
+from fastapi.testclient import TestClient
+from app.infrastructure.database import Base, SessionLocal, engine
+from app.infrastructure.migrations.migrate import create_schema
+from app.infrastructure.sql_instrumentation import SQL_N_PLUS_ONE_TOTAL
+
+create_schema(engine)
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    yield
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+
+
+@pytest.fixture(autouse=True)
+def no_n_plus_one(request):
+    """Falla el test si alguna petición disparó el detector de N+1."""
+    if request.node.get_closest_marker("allow_n_plus_one"):
+        yield
+        return
+    before = SQL_N_PLUS_ONE_TOTAL.labels().get()
+    yield
+    detected = SQL_N_PLUS_ONE_TOTAL.labels().get() - before
+    if detected:
+        pytest.fail(f"{detected:.0f} petición(es) con patrón N+1 (ver el log de app.infrastructure.sql_instrumentation)")
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client():
+    import main
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def create_user(client):
+    """Crea un usuario y devuelve (usuario, cabeceras con su token)."""
+    def _create_user(role: str = "user", email: str = None):
+        email = email or f"{uuid.uuid4().hex[:12]}@example.com"
+        response = client.post("/api/v1/users", json={
+            "email": email, "first_name": "Test", "last_name": "User",
+            "gender": "male", "roles": role, "password": "secret",
+        })
+        assert response.status_code == 200, response.text
+        token = client.post("/api/v1/token", data={"username": email, "password": "secret"}).json()["access_token"]
+        return response.json(), {"Authorization": f"Bearer {token}"}
+    return _create_user
+
+
+@pytest.fixture
+def create_tasks(db):
+    """
+    Crea tareas de un usuario con las prioridades dadas y devuelve sus ids
+    en orden de created_at (un segundo entre cada una). Se insertan en
+    orden inverso: las consultas tienen que ordenar por created_at, no por
+    orden de inserción.
+    """
+    from sqlalchemy import update
+    from app.domain.models.task import Task
+    from app.domain.schemas.task import TaskCreate
+    from app.infrastructure.repositories.task_repository import TaskRepository
+
+    def _create_tasks(user_id, priorities) -> list:
+        repository = TaskRepository(db)
+        start = datetime.utcnow() - timedelta(hours=1)
+        ids = []
+        for number in reversed(range(len(priorities))):
+            task = repository.create(TaskCreate(title=f"t{number}", priority=priorities[number]), uuid.UUID(str(user_id)))
+            db.execute(update(Task).where(Task.id == task.id).values(created_at=start + timedelta(seconds=number)))
+            ids.insert(0, task.id)
+        db.commit()
+        return ids
+    return _create_tasks
+
+
+class RecordingSession:
+    """Sesión falsa que guarda las sentencias y sus parámetros en lugar de ejecutarlas."""
+
+    def __init__(self):
+        self.executed = []
+
+    def execute(self, statement, params=None):
+        self.executed.append((statement, params))
+        return self
+
+    def scalars(self):
+        return self
+
+    def first(self):
+        return None
+
+    def all(self):
+        return []
+
+    def commit(self):
+        pass
+
+
+@pytest.fixture
+def recording_session():
+    return RecordingSession()
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import pytest
+from app.core.rate_limit import READ, Budget, InMemoryTokenBucketBackend, RateLimiter, get_rate_limiter
+from app.interfaces.api.middleware import admission_middleware
+from app.interfaces.api.middleware.admission_middleware import AdmissionControlMiddleware
+
+
+class ClientAddress:
+    """Envuelve la app ASGI para simular peticiones desde otra IP."""
+
+    def __init__(self, app, host: str):
+        self.app = app
+        self.host = host
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            scope = {**scope, "client": (self.host, 50000)}
+        await self.app(scope, receive, send)
+
+
+@pytest.fixture
+def rate_limited(monkeypatch):
+    monkeypatch.setattr(get_rate_limiter(), "enabled", True)
+
+
+def test_failed_logins_only_exhaust_the_attackers_budget(client, create_user, rate_limited):
+    from fastapi.testclient import TestClient
+    import main
+    user, _ = create_user()
+    attacker = TestClient(ClientAddress(main.app, "203.0.113.7"))
+    victim = TestClient(ClientAddress(main.app, "198.51.100.20"))
+
+    statuses = [
+        attacker.post("/api/v1/token", data={"username": user["email"], "password": "wrong"}).status_code
+        for _ in range(10)
+    ]
+    assert statuses[-1] == 429
+
+    response = victim.post("/api/v1/token", data={"username": user["email"], "password": "secret"})
+    assert response.status_code == 200
+
+
+def test_admission_returns_slot_granted_as_the_wait_times_out(monkeypatch):
+    async def app(scope, receive, send):
+        pass
+
+    middleware = AdmissionControlMiddleware(app, max_in_flight=1, max_queue=1, queue_timeout=0.01)
+
+    async def wait_for_granted_then_timeout(future, timeout):
+        # Carrera de wait_for (asyncio.timeout en 3.12+): _release cede el
+        # hueco al waiter en la misma vuelta en la que vence el timeout
+        middleware._release()
+        assert future.done()
+        raise asyncio.TimeoutError
+
+    async def scenario():
+        assert await middleware._acquire() is None
+        monkeypatch.setattr(admission_middleware.asyncio, "wait_for", wait_for_granted_then_timeout)
+        assert await middleware._acquire() == "timeout"
+
+    asyncio.run(scenario())
+    # El hueco cedido se devolvió: no queda ninguna petición en curso
+    assert middleware._in_flight == 0
+    assert not middleware._waiters
+
+
+def test_blocking_rate_limit_backend_is_called_off_the_event_loop():
+    calls = []
+
+    class BlockingBackend(InMemoryTokenBucketBackend):
+        blocking = True
+
+        def consume(self, *args):
+            calls.append(threading.get_ident())
+            return super().consume(*args)
+
+    limiter = RateLimiter(BlockingBackend(10), {READ: Budget(1.0, 1)})
+
+    async def scenario():
+        waits = [await limiter.check_async(READ, "user") for _ in range(2)]
+        return waits, threading.get_ident()
+
+    waits, loop_thread = asyncio.run(scenario())
+
+    assert waits[0] == 0 and waits[1] > 0
+    assert len(calls) == 2 and loop_thread not in calls
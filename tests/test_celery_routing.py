@@ -0,0 +1,21 @@
+from app.domain.models.enums import TaskPriority
+from app.infrastructure.celery.routing import broker_priorities, route_options
+
+
+def test_redis_consumes_critical_first():
+    # kombu consume antes el paso 0 en Redis y los transportes virtuales
+    priorities = broker_priorities("redis://localhost:6379/0")
+    ordered = sorted(TaskPriority, key=priorities.get)
+    assert ordered == [TaskPriority.critical, TaskPriority.high, TaskPriority.medium, TaskPriority.low]
+
+
+def test_amqp_consumes_critical_first():
+    priorities = broker_priorities("pyamqp://guest@localhost//")
+    ordered = sorted(TaskPriority, key=priorities.get, reverse=True)
+    assert ordered == [TaskPriority.critical, TaskPriority.high, TaskPriority.medium, TaskPriority.low]
+
+
+def test_processing_is_routed_by_priority_and_notifications_to_their_queue():
+    assert route_options("process_task", TaskPriority.critical)["queue"] == "processing.critical"
+    assert route_options("process_task")["queue"] == "processing.medium"
+    assert route_options("send_task_notification", TaskPriority.low)["queue"] == "notifications"
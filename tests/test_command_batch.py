@@ -0,0 +1,108 @@
+import uuid
+import pytest
+from sqlalchemy import select
+from app.application import events
+from app.domain.models.task import Task
+from app.infrastructure.celery import dispatch
+from app.infrastructure.database import engine
+from app.infrastructure.repositories.task_repository import TaskRepository
+
+BATCH_URL = "/api/v1/commands/batch"
+
+
+@pytest.fixture
+def side_effects(monkeypatch):
+    """Registra los encolados de Celery y los eventos que llegan a emitirse."""
+    enqueued, published = [], []
+    monkeypatch.setattr(dispatch, "_publish", lambda task_name, *args: enqueued.append(task_name))
+    events.subscribe(published.append)
+    yield enqueued, published
+    events.unsubscribe(published.append)
+
+
+def _titles() -> list:
+    with engine.connect() as conn:
+        return sorted(conn.execute(select(Task.title)).scalars())
+
+
+def _statuses(response) -> list:
+    assert response.status_code == 200, response.text
+    return [result["status"] for result in response.json()["results"]]
+
+
+def test_atomic_failure_rolls_back_the_whole_batch(client, create_user, side_effects):
+    enqueued, published = side_effects
+    _, headers = create_user()
+    response = client.post(BATCH_URL, headers=headers, json={"mode": "atomic", "commands": [
+        {"type": "create", "title": "a", "processing_params": {"operation": "stats", "items": [1, 2]}},
+        {"type": "delete", "task_id": str(uuid.uuid4())},
+        {"type": "create", "title": "b"},
+    ]})
+
+    assert _statuses(response) == [200, 404, 424]
+    assert response.json()["committed"] is False
+    assert _titles() == []
+    # Ni encolados ni eventos de un lote deshecho
+    assert enqueued == [] and published == []
+
+
+def test_atomic_success_commits_and_then_emits_side_effects(client, create_user, side_effects):
+    enqueued, published = side_effects
+    _, headers = create_user()
+    response = client.post(BATCH_URL, headers=headers, json={"mode": "atomic", "commands": [
+        {"type": "create", "title": "a", "processing_params": {"operation": "stats", "items": [1, 2]}},
+        {"type": "create", "title": "b"},
+    ]})
+
+    assert _statuses(response) == [200, 200]
+    assert response.json()["committed"] is True
+    assert _titles() == ["a", "b"]
+    assert enqueued == ["process_task", "send_task_notification"]
+    assert [event.kind for event in published] == [events.SAVED, events.SAVED]
+
+
+def test_per_item_failure_only_rolls_back_that_command(client, create_user, side_effects):
+    enqueued, published = side_effects
+    _, headers = create_user()
+    response = client.post(BATCH_URL, headers=headers, json={"mode": "per_item", "commands": [
+        {"type": "create", "title": "a"},
+        {"type": "delete", "task_id": str(uuid.uuid4())},
+        {"type": "create", "title": "b"},
+    ]})
+
+    assert _statuses(response) == [200, 404, 200]
+    assert response.json()["committed"] is True
+    assert _titles() == ["a", "b"]
+    assert len(published) == 2
+
+
+def test_per_item_discards_writes_and_side_effects_of_a_failed_command(client, create_user, side_effects, monkeypatch):
+    enqueued, published = side_effects
+    _, headers = create_user()
+
+    # Falla después de insertar la tarea y de diferir el encolado de process_task
+    def fail(self, task_id, celery_task_id):
+        raise RuntimeError("fallo simulado")
+    monkeypatch.setattr(TaskRepository, "update_celery_task_id", fail)
+
+    response = client.post(BATCH_URL, headers=headers, json={"mode": "per_item", "commands": [
+        {"type": "create", "title": "kept"},
+        {"type": "create", "title": "failed", "processing_params": {"operation": "stats", "items": [1]}},
+    ]})
+
+    assert _statuses(response) == [200, 400]
+    assert _titles() == ["kept"]
+    assert enqueued == []
+    assert [event.task_id for event in published] == [response.json()["results"][0]["task"]["id"]]
+
+
+def test_per_item_batch_with_only_failures_is_not_committed(client, create_user, side_effects):
+    enqueued, published = side_effects
+    _, headers = create_user()
+    response = client.post(BATCH_URL, headers=headers, json={"mode": "per_item", "commands": [
+        {"type": "complete", "task_id": str(uuid.uuid4())},
+    ]})
+
+    assert _statuses(response) == [404]
+    assert response.json()["committed"] is False
+    assert enqueued == [] and published == []
@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import uuid
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from app.application.services.task_service import TaskService
+from app.core.idempotency import (
+    IDEMPOTENCY_HEADER, REPLAYED_HEADER, IdempotencyManager, InMemoryIdempotencyBackend, StoredResponse,
+    request_fingerprint
+)
+from app.domain.models.task import Task
+from app.infrastructure.database import engine
+
+
+def _manager(wait_timeout: float = 1.0) -> IdempotencyManager:
+    return IdempotencyManager(InMemoryIdempotencyBackend(100), ttl=60, lock_ttl=10, wait_timeout=wait_timeout)
+
+
+def _task_count() -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(Task)).scalar_one()
+
+
+def test_retry_replays_the_stored_response(client, create_user):
+    _, headers = create_user()
+    headers = {**headers, IDEMPOTENCY_HEADER: str(uuid.uuid4())}
+    first = client.post("/api/v1/tasks", json={"title": "t"}, headers=headers)
+    second = client.post("/api/v1/tasks", json={"title": "t"}, headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert second.json()["id"] == first.json()["id"]
+    assert second.headers[REPLAYED_HEADER] == "true"
+    assert REPLAYED_HEADER.lower() not in first.headers
+    assert _task_count() == 1
+
+
+def test_key_reused_with_another_body_is_rejected(client, create_user):
+    _, headers = create_user()
+    headers = {**headers, IDEMPOTENCY_HEADER: str(uuid.uuid4())}
+    assert client.post("/api/v1/tasks", json={"title": "a"}, headers=headers).status_code == 200
+    response = client.post("/api/v1/tasks", json={"title": "b"}, headers=headers)
+    assert response.status_code == 422
+    assert _task_count() == 1
+
+
+def test_infrastructure_failure_is_not_stored(client, create_user, monkeypatch):
+    _, headers = create_user()
+    headers = {**headers, IDEMPOTENCY_HEADER: str(uuid.uuid4())}
+    original = TaskService.handle_create_task
+
+    def database_down(self, command):
+        raise OperationalError("INSERT INTO tasks", {}, Exception("database is down"))
+
+    monkeypatch.setattr(TaskService, "handle_create_task", database_down)
+    failed = client.post("/api/v1/tasks", json={"title": "t"}, headers=headers)
+    assert failed.status_code == 503
+
+    monkeypatch.setattr(TaskService, "handle_create_task", original)
+    retried = client.post("/api/v1/tasks", json={"title": "t"}, headers=headers)
+    assert retried.status_code == 200
+    assert REPLAYED_HEADER.lower() not in retried.headers
+    assert _task_count() == 1
+
+
+@pytest.mark.parametrize("status_code, stored", [(404, True), (403, True), (409, True), (401, False), (503, False)])
+def test_only_deterministic_errors_are_stored(status_code, stored):
+    manager = _manager()
+    calls = []
+
+    def handler():
+        calls.append(1)
+        raise HTTPException(status_code=status_code, detail="error")
+
+    async def scenario():
+        with pytest.raises(HTTPException):
+            await manager.run("key", "scope", {"a": 1}, handler)
+        try:
+            return await manager.run("key", "scope", {"a": 1}, handler)
+        except HTTPException:
+            return None
+
+    replay = asyncio.run(scenario())
+    if stored:
+        assert len(calls) == 1
+        assert replay.status_code == status_code
+    else:
+        assert len(calls) == 2
+
+
+def test_concurrent_duplicate_waits_for_the_request_in_flight():
+    manager = _manager()
+    calls = []
+
+    async def scenario():
+        # Otra petición con la misma clave tiene la reserva y termina mientras esta espera
+        claimed, _, _ = manager.backend.claim("scope:key", request_fingerprint({"a": 1}), 10)
+        assert claimed
+
+        async def finish_original():
+            await asyncio.sleep(0.05)
+            manager.backend.complete("scope:key", StoredResponse(200, {"id": "original"}, request_fingerprint({"a": 1})), 60)
+
+        finisher = asyncio.create_task(finish_original())
+        response = await manager.run("key", "scope", {"a": 1}, lambda: calls.append(1))
+        await finisher
+        return response
+
+    response = asyncio.run(scenario())
+    assert not calls
+    assert response.status_code == 200
+    assert response.body == b'{"id":"original"}'
+
+
+def test_concurrent_duplicate_gets_409_while_the_original_is_still_running():
+    manager = _manager(wait_timeout=0.05)
+
+    async def scenario():
+        manager.backend.claim("scope:key", request_fingerprint({"a": 1}), 10)
+        await manager.run("key", "scope", {"a": 1}, lambda: None)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(scenario())
+    assert error.value.status_code == 409
+
+
+def test_blocking_backend_is_called_off_the_event_loop():
+    calls = []
+
+    class BlockingBackend(InMemoryIdempotencyBackend):
+        blocking = True
+
+        def claim(self, *args):
+            calls.append(threading.get_ident())
+            return super().claim(*args)
+
+        def complete(self, *args):
+            calls.append(threading.get_ident())
+            super().complete(*args)
+
+    manager = IdempotencyManager(BlockingBackend(100), ttl=60, lock_ttl=10, wait_timeout=1.0)
+
+    async def scenario():
+        await manager.run("key", "scope", {"a": 1}, lambda: {"id": "original"})
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(scenario())
+
+    assert len(calls) == 2 and loop_thread not in calls
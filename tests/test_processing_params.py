@@ -0,0 +1,45 @@
+import logging
+from types import SimpleNamespace
+from app.core.config import settings
+from app.domain.models.enums import PROCESSING_OPERATIONS
+from app.infrastructure.celery import processing
+
+
+def test_unknown_operation_is_rejected_before_enqueueing(client, create_user):
+    _, headers = create_user()
+    response = client.post("/api/v1/tasks", headers=headers,
+                           json={"title": "t", "processing_params": {"operation": "nope", "items": [1]}})
+    assert response.status_code == 422
+    assert "checksum" in response.text
+
+
+def test_items_are_capped(client, create_user):
+    _, headers = create_user()
+    too_many = list(range(settings.PROCESSING_MAX_ITEMS + 1))
+    response = client.post("/api/v1/tasks", headers=headers,
+                           json={"title": "t", "processing_params": {"operation": "stats", "items": too_many}})
+    assert response.status_code == 422
+
+
+def test_known_operation_is_accepted(client, create_user):
+    _, headers = create_user()
+    response = client.post("/api/v1/tasks", headers=headers,
+                           json={"title": "t", "processing_params": {"operation": "stats", "items": [1, 2, 3]}})
+    assert response.status_code == 200
+    assert response.json()["celery_task_id"]
+
+
+def test_registered_operations_match_the_domain():
+    assert set(processing.OPERATIONS) == PROCESSING_OPERATIONS
+
+
+def test_daemon_worker_warns_once_and_processes_inline(monkeypatch, caplog):
+    monkeypatch.setattr(processing, "_pool", None)
+    monkeypatch.setattr(processing, "_inline_only", False)
+    monkeypatch.setattr(processing.multiprocessing, "current_process", lambda: SimpleNamespace(daemon=True))
+
+    with caplog.at_level(logging.WARNING, logger=processing.__name__):
+        results = [processing.run_chunk("stats", [1, 2, 3], cpu_bound=True) for _ in range(3)]
+
+    assert results[0]["sum"] == 6.0
+    assert len([record for record in caplog.records if "daemon" in record.message]) == 1
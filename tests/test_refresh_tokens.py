@@ -0,0 +1,61 @@
+import time
+from app.core import token_revocation
+from app.core.config import settings
+
+
+def _login(client, create_user) -> dict:
+    user, _ = create_user()
+    response = client.post("/api/v1/token", data={"username": user["email"], "password": "secret"})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _refresh(client, refresh_token: str):
+    return client.post("/api/v1/token/refresh", json={"refresh_token": refresh_token})
+
+
+def test_refresh_rotates_the_token_pair(client, create_user):
+    tokens = _login(client, create_user)
+
+    rotated = _refresh(client, tokens["refresh_token"])
+
+    assert rotated.status_code == 200
+    assert rotated.json()["refresh_token"] != tokens["refresh_token"]
+    me = client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {rotated.json()['access_token']}"})
+    assert me.status_code == 200
+    # Un refresh token no sirve como access token
+    assert client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {tokens['refresh_token']}"}).status_code == 401
+
+
+def test_reusing_a_refresh_token_revokes_its_family(client, create_user):
+    tokens = _login(client, create_user)
+    rotated = _refresh(client, tokens["refresh_token"]).json()
+
+    assert _refresh(client, tokens["refresh_token"]).status_code == 401
+    # El token legítimo más reciente cae con la familia: hay que volver a hacer login
+    assert _refresh(client, rotated["refresh_token"]).status_code == 401
+
+
+def test_logout_revokes_the_family(client, create_user):
+    tokens = _login(client, create_user)
+    rotated = _refresh(client, tokens["refresh_token"]).json()
+
+    assert client.post("/api/v1/token/revoke", json={"refresh_token": rotated["refresh_token"]}).status_code == 204
+    assert _refresh(client, rotated["refresh_token"]).status_code == 401
+
+
+def test_used_jti_is_revoked_until_the_token_expires_whatever_the_host_timezone(client, create_user, monkeypatch):
+    tokens = _login(client, create_user)
+    revoked = []
+    store = token_revocation.get_revocation_store()
+    original_revoke = store.revoke
+    monkeypatch.setattr(store, "revoke", lambda key, ttl: revoked.append(ttl) or original_revoke(key, ttl))
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        assert _refresh(client, tokens["refresh_token"]).status_code == 200
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+    assert abs(revoked[0] - settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400) < 60
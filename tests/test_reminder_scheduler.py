@@ -0,0 +1,103 @@
+import threading
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from uuid import UUID
+from app.application.events import TaskEvent, SAVED
+from app.application.services.reminder_scheduler import ReminderScheduler
+from app.domain.schemas.task import TaskCreate
+from app.infrastructure.celery import dispatch
+from app.infrastructure.database import SessionLocal
+from app.infrastructure.repositories.task_repository import TaskRepository
+
+NOW = datetime(2024, 1, 1, 12, 0)
+LEAD = timedelta(minutes=10)
+
+
+def _scheduler() -> ReminderScheduler:
+    scheduler = ReminderScheduler(SessionLocal, lead=LEAD, window=timedelta(hours=1), grace=timedelta(minutes=5),
+                                  clock=lambda: NOW)
+    scheduler.rebuild()
+    return scheduler
+
+
+def _event(task_id: str, due_at: datetime, reminder_sent_at=None) -> TaskEvent:
+    return TaskEvent(SAVED, task_id, str(uuid.uuid4()), "pending", "medium", due_at,
+                     reminder_sent_at=reminder_sent_at)
+
+
+def test_saving_a_task_after_its_reminder_does_not_send_it_again():
+    scheduler = _scheduler()
+    task_id = str(uuid.uuid4())
+    scheduler.on_event(_event(task_id, NOW + LEAD))
+    assert [reminder.task_id for reminder in scheduler.pop_due(NOW)] == [task_id]
+
+    # Guardado durante el envío, antes de marcar reminder_sent_at
+    scheduler.on_event(_event(task_id, NOW + LEAD))
+    assert scheduler.pop_due(NOW) == []
+    # Guardado después (cambio de título, asignación, claim...)
+    scheduler._firing.clear()
+    scheduler.on_event(_event(task_id, NOW + LEAD, reminder_sent_at=NOW))
+    assert scheduler.pop_due(NOW) == []
+
+
+def test_new_due_date_schedules_the_reminder_again():
+    scheduler = _scheduler()
+    task_id = str(uuid.uuid4())
+    scheduler.on_event(_event(task_id, NOW + LEAD))
+    scheduler.pop_due(NOW)
+    scheduler._firing.clear()
+
+    # handle_update_task anula reminder_sent_at al cambiar due_at
+    scheduler.on_event(_event(task_id, NOW + LEAD + timedelta(minutes=5)))
+
+    assert [reminder.task_id for reminder in scheduler.pop_due(NOW + timedelta(minutes=5))] == [task_id]
+
+
+def test_fired_reminder_is_marked_and_later_saves_skip_it(db, create_user, monkeypatch):
+    user, _ = create_user()
+    repository = TaskRepository(db)
+    task = repository.create(TaskCreate(title="t", due_at=datetime.utcnow() + LEAD), UUID(user["id"]))
+    sent = []
+    monkeypatch.setattr(dispatch, "enqueue", lambda name, *args, **kwargs: sent.append(args[1]))
+    scheduler = ReminderScheduler(SessionLocal, lead=LEAD, window=timedelta(hours=1), grace=timedelta(minutes=5))
+    scheduler.rebuild()
+
+    scheduler.fire(scheduler.pop_due(datetime.utcnow() + timedelta(seconds=1)))
+    db.expire_all()
+    renamed = repository.update_conditional(task.id, {"title": "renamed"}, UUID(user["id"]), False)
+    scheduler.on_event(TaskEvent.saved(renamed))
+
+    assert sent == [str(task.id)]
+    assert renamed.reminder_sent_at is not None
+    assert scheduler.pop_due(datetime.utcnow() + timedelta(seconds=1)) == []
+
+
+def test_window_refill_runs_the_query_without_the_lock(monkeypatch):
+    scheduler = _scheduler()
+    task_id = str(uuid.uuid4())
+    loading, release = threading.Event(), threading.Event()
+    # La consulta lee el due_at anterior de la tarea
+    stale = SimpleNamespace(id=task_id, user_id=uuid.uuid4(), priority="medium",
+                            due_at=NOW + timedelta(minutes=80))
+
+    def slow_load(start, end):
+        loading.set()
+        assert release.wait(5)
+        return [stale]
+    monkeypatch.setattr(scheduler, "_load", slow_load)
+
+    refill = threading.Thread(target=scheduler._advance_window, args=(NOW + timedelta(minutes=30),))
+    refill.start()
+    assert loading.wait(5)
+    # Un evento durante la consulta no espera a que termine
+    delivered = threading.Thread(target=scheduler.on_event, args=(_event(task_id, NOW + timedelta(minutes=85)),))
+    delivered.start()
+    delivered.join(2)
+    assert not delivered.is_alive()
+    release.set()
+    refill.join(5)
+
+    # El evento, posterior a la consulta, prevalece sobre la fila cargada
+    due = scheduler.pop_due(NOW + timedelta(hours=2))
+    assert [(reminder.task_id, reminder.remind_at) for reminder in due] == [(task_id, NOW + timedelta(minutes=75))]
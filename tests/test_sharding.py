@@ -0,0 +1,157 @@
+import uuid
+from datetime import datetime, timedelta
+from uuid import UUID
+import pytest
+from sqlalchemy import select, update
+from app.application.services import user_service as user_service_module
+from app.application.services.user_service import UserService, USER_DELETED, USER_PURGE_SCHEDULED
+from app.core.config import settings
+from app.domain.models.task import Task
+from app.domain.models.user import User
+from app.domain.schemas.task import GetTasksQuery, TaskCreate
+from app.infrastructure.database import engine
+from app.infrastructure.migrations.migrate import create_shard_schema
+from app.infrastructure.migrations.shard_tasks import move_tasks_to_shards, rekeyed_task_id
+from app.infrastructure.repositories.sharded_task_repository import ShardedTaskRepository
+from app.infrastructure.repositories.user_repository import UserRepository
+from app.infrastructure.sharding import NUM_BUCKETS, ShardRegistry, shard_bucket
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = ShardRegistry([f"sqlite:///{tmp_path}/shard{i}.db" for i in range(2)])
+    for shard_engine in registry.engines:
+        create_shard_schema(shard_engine)
+    yield registry
+    registry.dispose()
+
+
+@pytest.fixture
+def repository(registry, db):
+    repository = ShardedTaskRepository(registry, UserRepository(db))
+    yield repository
+    repository.close()
+
+
+def _user_on_shard(db, shard: int, shard_count: int = 2) -> UUID:
+    """Usuario en la base de datos principal cuyo id cae en `shard`."""
+    bucket = shard * NUM_BUCKETS // shard_count
+    user_id = UUID(int=(uuid.uuid4().int & ~(NUM_BUCKETS - 1)) | bucket)
+    db.add(User(id=user_id, email=f"{user_id.hex[:12]}@example.com", hashed_password="x",
+                first_name="Test", last_name="User", gender="male", roles="user"))
+    db.commit()
+    return user_id
+
+
+def _shard_rows(registry, shard: int) -> dict:
+    with registry.engines[shard].connect() as conn:
+        return {row.id: row for row in conn.execute(select(Task.id, Task.user_id, Task.assigned_to_id, Task.version))}
+
+
+def test_tasks_live_on_their_creator_shard_and_route_by_id(registry, repository, db):
+    creators = [_user_on_shard(db, 0), _user_on_shard(db, 1)]
+    tasks = [repository.create(TaskCreate(title=str(shard)), creator) for shard, creator in enumerate(creators)]
+
+    for shard, task in enumerate(tasks):
+        assert set(_shard_rows(registry, shard)) == {task.id}
+        assert registry.shard_map.shard_for(task.id) == shard
+        assert repository.get_by_id(task.id).title == str(shard)
+
+
+def test_scatter_merges_pages_in_created_at_order(registry, repository, db):
+    assignee = _user_on_shard(db, 0)
+    creators = [_user_on_shard(db, 0), _user_on_shard(db, 1)]
+    start = datetime(2024, 1, 1)
+    expected = []
+    # Fechas intercaladas entre los dos shards
+    for minute in range(6):
+        creator = creators[minute % 2]
+        task = repository.create(TaskCreate(title=f"t{minute}", assigned_to_id=assignee), creator)
+        session = repository.route(creator).db
+        session.execute(update(Task).where(Task.id == task.id).values(created_at=start + timedelta(minutes=minute)))
+        session.commit()
+        expected.append(f"t{minute}")
+
+    page = repository.get_all(GetTasksQuery(assigned_to_id=assignee, skip=1, limit=4))
+
+    assert [task.title for task in page] == expected[1:5]
+
+
+@pytest.fixture
+def service(repository, db, monkeypatch):
+    enqueued = []
+    monkeypatch.setattr(user_service_module, "enqueue", lambda name, *args: enqueued.append((name, args)))
+    service = UserService(UserRepository(db), repository)
+    service.enqueued = enqueued
+    return service
+
+
+def _cascade_fixture(repository, db):
+    """Usuario del shard 0 con tareas propias y una tarea del shard 1 asignada a él."""
+    user = _user_on_shard(db, 0)
+    other = _user_on_shard(db, 1)
+    own = [repository.create(TaskCreate(title=f"own{i}"), user) for i in range(3)]
+    assigned_id = repository.create(TaskCreate(title="assigned", assigned_to_id=user), other).id
+    # Fila tal como quedó escrita (la instancia del ORM se recarga al leerla)
+    assigned = _shard_rows(repository.registry, 1)[assigned_id]
+    return user, other, own, assigned
+
+
+def _assert_released(registry, db, user, other, assigned):
+    assert _shard_rows(registry, 0) == {}
+    row = _shard_rows(registry, 1)[assigned.id]
+    assert row.assigned_to_id is None and row.user_id == other
+    assert row.version == assigned.version + 1
+    assert db.get(User, user) is None
+
+
+def test_delete_user_releases_tasks_on_every_shard(registry, repository, service, db):
+    user, other, _, assigned = _cascade_fixture(repository, db)
+
+    assert service.delete_user(user) == USER_DELETED
+
+    db.expire_all()
+    _assert_released(registry, db, user, other, assigned)
+
+
+def test_large_delete_is_purged_in_batches_across_shards(registry, repository, service, db, monkeypatch):
+    user, other, own, assigned = _cascade_fixture(repository, db)
+    monkeypatch.setattr(settings, "USER_DELETE_SYNC_MAX_TASKS", len(own) - 1)
+
+    # Se cuentan las tareas del shard del usuario, no las de DATABASE_URL
+    assert service.delete_user(user) == USER_PURGE_SCHEDULED
+    assert service.enqueued == [("purge_user", (str(user),))]
+    assert len(_shard_rows(registry, 0)) == len(own)
+
+    result = service.purge_user(user, batch_size=1)
+
+    db.expire_all()
+    assert result["task_rows"] == len(own) + 1 and result["user_deleted"] is True
+    _assert_released(registry, db, user, other, assigned)
+
+
+def test_legacy_tasks_move_to_their_creator_shard_with_a_new_id(registry, db):
+    creators = [_user_on_shard(db, 0), _user_on_shard(db, 1)]
+    legacy = []
+    for shard, creator in enumerate(creators):
+        # uuid4 anterior al sharding con el bucket del otro shard
+        task_id = rekeyed_task_id(uuid.uuid4(), creators[1 - shard])
+        db.add(Task(id=task_id, title=f"legacy{shard}", user_id=creator))
+        legacy.append(task_id)
+    db.commit()
+    # Ejecución anterior interrumpida tras copiar la primera tarea a su shard
+    with engine.connect() as conn:
+        row = dict(conn.execute(select(Task.__table__).where(Task.id == legacy[0])).mappings().one())
+    with registry.engines[0].begin() as conn:
+        conn.execute(Task.__table__.insert(), {**row, "id": rekeyed_task_id(legacy[0], creators[0])})
+
+    result = move_tasks_to_shards(engine, registry, batch_size=1)
+
+    assert result["tasks"] == {"moved": 2, "rekeyed": 2}
+    db.expire_all()
+    assert db.query(Task).count() == 0
+    for shard, (creator, task_id) in enumerate(zip(creators, legacy)):
+        new_id = rekeyed_task_id(task_id, creator)
+        assert shard_bucket(new_id) == shard_bucket(creator)
+        assert set(_shard_rows(registry, shard)) == {new_id}
+    assert move_tasks_to_shards(engine, registry)["tasks"] == {"moved": 0, "rekeyed": 0}
@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.request_context import RequestStats, request_stats
+from app.infrastructure.database import engine
+from app.infrastructure.sql_instrumentation import NPlusOneError, assert_no_n_plus_one, fingerprint
+
+
+def _execute(times: int) -> None:
+    with engine.connect() as conn:
+        for value in range(times):
+            conn.execute(text("SELECT :value"), {"value": value})
+
+
+def test_fingerprint_normalizes_literals_and_in_lists():
+    assert fingerprint("SELECT * FROM t WHERE a = 'x' AND b IN (?, ?, ?) AND c = 42") == \
+        "SELECT * FROM t WHERE a = ? AND b IN (?...) AND c = ?"
+
+
+def test_assert_no_n_plus_one_allows_up_to_threshold():
+    with assert_no_n_plus_one(threshold=3) as stats:
+        _execute(3)
+    assert stats.n_plus_one is None
+
+
+@pytest.mark.allow_n_plus_one
+def test_assert_no_n_plus_one_fails_above_threshold(monkeypatch):
+    monkeypatch.setattr(settings, "N_PLUS_ONE_RAISE", False)
+    with pytest.raises(NPlusOneError):
+        with assert_no_n_plus_one(threshold=3):
+            _execute(4)
+
+
+@pytest.mark.allow_n_plus_one
+def test_zero_threshold_is_not_replaced_by_default(monkeypatch):
+    monkeypatch.setattr(settings, "N_PLUS_ONE_RAISE", False)
+    stats = RequestStats(n_plus_one_threshold=0)
+    token = request_stats.set(stats)
+    try:
+        _execute(1)
+    finally:
+        request_stats.reset(token)
+    assert stats.n_plus_one == ["SELECT ?"]
+
+
+@pytest.mark.allow_n_plus_one
+def test_strict_mode_raises_at_detection():
+    assert settings.N_PLUS_ONE_RAISE
+    stats = RequestStats(n_plus_one_threshold=2)
+    token = request_stats.set(stats)
+    try:
+        with pytest.raises(NPlusOneError):
+            _execute(3)
+    finally:
+        request_stats.reset(token)
+
+
+def test_task_listing_with_expand_has_no_n_plus_one(client, create_user):
+    # El fixture no_n_plus_one de conftest hace fallar el test si la petición repite sentencias
+    user, headers = create_user()
+    for number in range(settings.N_PLUS_ONE_THRESHOLD + 5):
+        assert client.post("/api/v1/tasks", json={"title": f"t{number}"}, headers=headers).status_code == 200
+    response = client.get("/api/v1/tasks?expand=user,assigned_to", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == settings.N_PLUS_ONE_THRESHOLD + 5
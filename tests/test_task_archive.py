@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+from uuid import UUID
+from sqlalchemy import select
+from sqlalchemy.dialects import mssql, postgresql
+from app.domain.models.enums import TaskStatus
+from app.domain.models.task import ArchivedTask, Task
+from app.domain.schemas.task import TaskCreate
+from app.infrastructure.repositories.task_repository import TaskRepository, archive_candidates
+
+
+def test_archive_candidates_lock_the_batch_and_skip_locked_rows():
+    statement = archive_candidates(datetime.utcnow(), 10)
+    assert "UPDLOCK, READPAST" in str(statement.compile(dialect=mssql.dialect()))
+    assert "FOR UPDATE SKIP LOCKED" in str(statement.compile(dialect=postgresql.dialect()))
+
+
+def test_archive_moves_only_old_completed_tasks(create_user, db):
+    user, _ = create_user()
+    old = datetime.utcnow() - timedelta(days=60)
+    repository = TaskRepository(db)
+    ids = {}
+    for name, status, completed_at in (
+        ("old", TaskStatus.completed, old),
+        ("recent", TaskStatus.completed, datetime.utcnow()),
+        ("reopened", TaskStatus.pending, old),
+    ):
+        task = repository.create(TaskCreate(title=name), UUID(user["id"]))
+        task.status, task.completed_at = status, completed_at
+        ids[name] = task.id
+    db.commit()
+
+    archived = repository.archive_completed_batch(datetime.utcnow() - timedelta(days=30), 10)
+
+    assert archived == 1
+    remaining = set(db.execute(select(Task.id)).scalars())
+    assert remaining == {ids["recent"], ids["reopened"]}
+    assert list(db.execute(select(ArchivedTask.id)).scalars()) == [ids["old"]]
@@ -0,0 +1,87 @@
+import threading
+import uuid
+from collections import Counter
+from uuid import UUID
+from sqlalchemy.dialects import mssql, postgresql
+from app.core.idempotency import IDEMPOTENCY_HEADER, REPLAYED_HEADER
+from app.domain.models.enums import TaskPriority, TaskStatus
+from app.domain.models.task import Task
+from app.infrastructure.database import SessionLocal
+from app.infrastructure.repositories.task_repository import TaskRepository
+
+
+def test_claims_highest_priority_then_oldest(client, create_user, create_tasks, db):
+    creator, headers = create_user()
+    ids = create_tasks(creator["id"], [TaskPriority.low, TaskPriority.high, TaskPriority.high])
+    version = db.get(Task, ids[1]).version
+    db.rollback()
+
+    first = client.post("/api/v1/tasks/claim-next", headers=headers).json()
+    second = client.post("/api/v1/tasks/claim-next", headers=headers).json()
+    third = client.post("/api/v1/tasks/claim-next", headers=headers).json()
+
+    assert [first["id"], second["id"], third["id"]] == [str(ids[1]), str(ids[2]), str(ids[0])]
+    assert first["status"] == TaskStatus.in_progress.value
+    assert first["assigned_to_id"] == creator["id"]
+    assert first["version"] == version + 1
+    assert client.post("/api/v1/tasks/claim-next", headers=headers).status_code == 404
+
+
+def test_users_only_claim_tasks_they_can_see(client, create_user, create_tasks, db):
+    creator, _ = create_user()
+    _, other_headers = create_user()
+    _, admin_headers = create_user(role="admin")
+    create_tasks(creator["id"], [TaskPriority.medium])
+
+    assert client.post("/api/v1/tasks/claim-next", headers=other_headers).status_code == 404
+    assert client.post("/api/v1/tasks/claim-next", headers=admin_headers).status_code == 200
+
+
+def test_idempotent_retry_returns_the_same_claim(client, create_user, create_tasks, db):
+    creator, headers = create_user()
+    create_tasks(creator["id"], [TaskPriority.medium, TaskPriority.medium])
+    headers = {**headers, IDEMPOTENCY_HEADER: str(uuid.uuid4())}
+
+    first = client.post("/api/v1/tasks/claim-next", headers=headers)
+    retried = client.post("/api/v1/tasks/claim-next", headers=headers)
+
+    assert retried.json()["id"] == first.json()["id"]
+    assert retried.headers[REPLAYED_HEADER] == "true"
+    assert db.query(Task).filter(Task.status == TaskStatus.pending).count() == 1
+
+
+def test_concurrent_claims_never_hand_out_a_task_twice(create_user, create_tasks, db):
+    creator, _ = create_user()
+    ids = create_tasks(creator["id"], [TaskPriority.medium] * 40)
+    agents = [UUID(create_user()[0]["id"]) for _ in range(4)]
+    claimed = []
+    lock = threading.Lock()
+
+    def agent(agent_id):
+        session = SessionLocal()
+        try:
+            repository = TaskRepository(session)
+            while True:
+                task = repository.claim_next(agent_id)
+                if task is None:
+                    return
+                with lock:
+                    claimed.append(task.id)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=agent, args=(agent_id,)) for agent_id in agents]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert Counter(claimed).most_common(1)[0][1] == 1
+    assert set(claimed) == set(ids)
+
+
+def test_claim_skips_rows_locked_by_other_claims(recording_session):
+    TaskRepository(recording_session).claim_next(uuid.uuid4())
+    statement, _ = recording_session.executed[0]
+    assert "WITH (ROWLOCK, UPDLOCK, READPAST)" in str(statement.compile(dialect=mssql.dialect()))
+    assert "FOR UPDATE SKIP LOCKED" in str(statement.compile(dialect=postgresql.dialect()))
@@ -0,0 +1,48 @@
+from uuid import UUID
+from sqlalchemy.dialects import mssql
+from app.domain.models.enums import TaskPriority
+from app.domain.schemas.task import GetTasksQuery
+from app.infrastructure.repositories.task_repository import TASK_STATEMENTS, TaskRepository
+
+
+def test_pages_share_one_cached_statement(db, create_user, create_tasks):
+    user, _ = create_user()
+    user_id = UUID(user["id"])
+    ids = create_tasks(user_id, [TaskPriority.medium] * 5)
+    repository = TaskRepository(db)
+
+    first = repository.get_all(GetTasksQuery(user_id=user_id, skip=0, limit=2))
+    cached = len(TASK_STATEMENTS)
+    pages = [first] + [repository.get_all(GetTasksQuery(user_id=user_id, skip=skip, limit=limit))
+                       for skip, limit in ((2, 2), (4, 2), (1, 3))]
+
+    assert [[task.id for task in page] for page in pages] == [
+        ids[0:2], ids[2:4], ids[4:5], ids[1:4],
+    ]
+    assert len(TASK_STATEMENTS) == cached
+
+
+def test_window_limit_is_a_parameter(db, create_user, create_tasks):
+    user, _ = create_user()
+    user_id = UUID(user["id"])
+    ids = create_tasks(user_id, [TaskPriority.medium] * 3)
+    repository = TaskRepository(db)
+
+    repository.get_window(GetTasksQuery(user_id=user_id), 1)
+    cached = len(TASK_STATEMENTS)
+
+    assert [task.id for task in repository.get_window(GetTasksQuery(user_id=user_id), 3)] == ids
+    assert len(TASK_STATEMENTS) == cached
+
+
+def test_page_compiles_on_sql_server_with_bound_offset_and_limit(recording_session):
+    TaskRepository(recording_session).get_all(GetTasksQuery(status="pending", skip=40, limit=20))
+    statement, params = recording_session.executed[0]
+
+    assert params["skip"] == 40 and params["limit"] == 20
+    # SQL Server exige ORDER BY para OFFSET o un LIMIT que no es un literal
+    dialect = mssql.dialect()
+    dialect._supports_offset_fetch = True  # SQL Server 2012+
+    sql = " ".join(str(statement.compile(dialect=dialect)).split())
+    assert "ORDER BY tasks.created_at, tasks.id" in sql
+    assert "OFFSET __[POSTCOMPILE_skip] ROWS FETCH FIRST __[POSTCOMPILE_limit] ROWS ONLY" in sql
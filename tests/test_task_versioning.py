@@ -0,0 +1,61 @@
+import uuid
+from uuid import UUID
+import pytest
+from sqlalchemy import update
+from app.domain.exceptions import VersionConflictError
+from app.domain.models.task import Task
+from app.domain.schemas.task import TaskCreate, TaskUpdate
+from app.infrastructure.database import SessionLocal
+from app.infrastructure.repositories.task_repository import TaskRepository
+
+
+def test_put_with_if_match_maps_to_404_403_and_409(client, create_user):
+    _, headers = create_user()
+    _, other_headers = create_user()
+    task = client.post("/api/v1/tasks", headers=headers, json={"title": "t"}).json()
+    url = f"/api/v1/tasks/{task['id']}"
+
+    missing = client.put(f"/api/v1/tasks/{uuid.uuid4()}", headers={**headers, "If-Match": '"1"'}, json={"title": "x"})
+    forbidden = client.put(url, headers={**other_headers, "If-Match": f'"{task["version"]}"'}, json={"title": "x"})
+    updated = client.put(url, headers={**headers, "If-Match": f'"{task["version"]}"'}, json={"title": "x"})
+    stale = client.put(url, headers={**headers, "If-Match": f'"{task["version"]}"'}, json={"title": "y"})
+
+    assert (missing.status_code, forbidden.status_code, updated.status_code) == (404, 403, 200)
+    assert stale.status_code == 409
+    assert stale.headers["ETag"] == updated.headers["ETag"] == f'"{task["version"] + 1}"'
+
+
+def _concurrent_write(task_id: UUID) -> None:
+    """Otra transacción modifica la tarea después de que `db` la haya leído."""
+    with SessionLocal() as other:
+        other.execute(update(Task).where(Task.id == task_id).values(version=Task.version + 1))
+        other.commit()
+
+
+@pytest.mark.parametrize("write", [
+    lambda repository, task_id: repository.complete_task(task_id),
+    lambda repository, task_id: repository.update(task_id, TaskUpdate(title="assigned")),
+], ids=["complete_task", "update"])
+def test_orm_write_on_a_stale_row_raises_version_conflict(db, create_user, write):
+    user, _ = create_user()
+    repository = TaskRepository(db)
+    task = repository.create(TaskCreate(title="t"), UUID(user["id"]))
+    version = task.version
+    _concurrent_write(task.id)
+
+    with pytest.raises(VersionConflictError) as conflict:
+        write(repository, task.id)
+
+    assert conflict.value.current_version == version + 1
+
+
+def test_celery_task_id_is_written_without_a_version_check(db, create_user):
+    user, _ = create_user()
+    repository = TaskRepository(db)
+    task = repository.create(TaskCreate(title="t"), UUID(user["id"]))
+    version = task.version
+    _concurrent_write(task.id)
+
+    updated = repository.update_celery_task_id(task.id, "celery-id")
+
+    assert updated.celery_task_id == "celery-id" and updated.version == version + 2
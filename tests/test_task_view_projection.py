@@ -0,0 +1,55 @@
+import pytest
+from app.application import events
+from app.application.services import task_view_projection
+from app.application.services.task_view_projection import TaskViewProjector, configure_projection
+from app.core.config import settings
+from app.domain.models.task_view import TaskView
+from app.infrastructure.database import SessionLocal
+
+
+@pytest.fixture
+def projection(monkeypatch):
+    monkeypatch.setattr(settings, "TASK_VIEW_PROJECTION", task_view_projection.INLINE)
+    projector = TaskViewProjector(SessionLocal)
+    monkeypatch.setattr(task_view_projection, "_projector", projector)
+    events.subscribe(projector.on_event)
+    yield projector
+    events.unsubscribe(projector.on_event)
+
+
+def _row(db, task_id):
+    db.expire_all()
+    return db.get(TaskView, task_id)
+
+
+def test_task_writes_and_user_rename_reach_task_view(projection, client, create_user, db):
+    creator, headers = create_user()
+    assignee, _ = create_user()
+
+    task = client.post("/api/v1/tasks", headers=headers,
+                       json={"title": "original", "assigned_to_id": assignee["id"]}).json()
+    row = _row(db, task["id"])
+    assert row.title == "original" and row.assigned_to_email == assignee["email"]
+
+    assert client.put(f"/api/v1/tasks/{task['id']}", headers=headers, json={"title": "renamed"}).status_code == 200
+    assert _row(db, task["id"]).title == "renamed"
+
+    # Cambio de nombre del asignado: refresh_user reproyecta sus tareas
+    response = client.put(f"/api/v1/users/{assignee['id']}", headers=headers, json={"first_name": "Nuevo"})
+    assert response.status_code == 200
+    assert _row(db, task["id"]).assigned_to_first_name == "Nuevo"
+
+    assert client.delete(f"/api/v1/tasks/{task['id']}", headers=headers).status_code == 204
+    assert _row(db, task["id"]) is None
+
+
+def test_projection_is_off_by_default_and_with_shards(monkeypatch):
+    subscribed = []
+    monkeypatch.setattr(events, "subscribe", subscribed.append)
+
+    configure_projection()
+    monkeypatch.setattr(settings, "TASK_VIEW_PROJECTION", task_view_projection.INLINE)
+    monkeypatch.setattr(settings, "TASK_SHARD_URLS", "sqlite:///shard0.db,sqlite:///shard1.db")
+    configure_projection()
+
+    assert subscribed == []
@@ -0,0 +1,63 @@
+import pytest
+from app.core import tracing
+from app.core.config import settings
+from app.interfaces.api.middleware.tracing_middleware import TRACE_ID_HEADER
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+SAMPLED_PARENT = tracing.SpanContext(TRACE_ID, "00f067aa0ba902b7", True)
+
+
+@pytest.fixture
+def tracing_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "TRACING_ENABLED", True)
+    monkeypatch.setattr(settings, "TRACING_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(settings, "TRACING_MAX_TRACES_PER_SECOND", 0.0)
+    monkeypatch.setattr(tracing, "_rate_limiter", tracing._RateLimiter())
+    exporter = tracing.InMemorySpanExporter(100)
+    monkeypatch.setattr(tracing, "_exporter", exporter)
+    return exporter
+
+
+def _begin(parent, trust_parent):
+    span, token = tracing.begin_span("span", tracing.SERVER, parent=parent, trust_parent=trust_parent)
+    tracing.finish_span(span, token)
+    return span
+
+
+def test_untrusted_parent_does_not_bypass_the_sample_rate(tracing_enabled, monkeypatch):
+    monkeypatch.setattr(settings, "TRACING_SAMPLE_RATE", 0.0)
+
+    span = _begin(SAMPLED_PARENT, trust_parent=False)
+
+    assert not span.context.sampled
+    # Solo se conserva el trace_id del cliente, para correlacionar
+    assert span.context.trace_id == TRACE_ID and span.parent_id is None
+
+
+def test_untrusted_parent_does_not_bypass_the_rate_limit(tracing_enabled, monkeypatch):
+    monkeypatch.setattr(settings, "TRACING_MAX_TRACES_PER_SECOND", 1.0)
+
+    spans = [_begin(SAMPLED_PARENT, trust_parent=False) for _ in range(3)]
+
+    assert [span.context.sampled for span in spans] == [True, False, False]
+
+
+def test_trusted_parent_keeps_its_sampling_decision(tracing_enabled, monkeypatch):
+    # Contextos propagados por la propia aplicación (mensajes de Celery)
+    monkeypatch.setattr(settings, "TRACING_SAMPLE_RATE", 0.0)
+
+    span = _begin(SAMPLED_PARENT, trust_parent=True)
+
+    assert span.context.sampled and span.parent_id == SAMPLED_PARENT.span_id
+
+
+def test_client_traceparent_is_sampled_locally(client, tracing_enabled, monkeypatch):
+    traceparent = {"traceparent": tracing.format_traceparent(SAMPLED_PARENT)}
+
+    sampled = client.get("/api/v1/users/me", headers=traceparent)
+    monkeypatch.setattr(settings, "TRACING_SAMPLE_RATE", 0.0)
+    unsampled = client.get("/api/v1/users/me", headers=traceparent)
+
+    assert sampled.headers[TRACE_ID_HEADER.decode()] == TRACE_ID
+    assert TRACE_ID_HEADER.decode() not in unsampled.headers
+    assert [span.parent_id for span in tracing_enabled.spans(TRACE_ID) if span.kind == tracing.SERVER] == [None]